@@ -26,6 +26,7 @@ if current_dir not in sys.path:
 from Particle import Particle
 from PBDSystem import PBDSystem
 from Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from blender_writeback import posiciones_particulas, escribir_coords
 
 # ============================================
 # CONFIGURACIÓN
@@ -197,7 +198,7 @@ def actualizar_malla_tela(tela, obj):
         return
     
     mesh = obj.data
-    mesh.vertices.foreach_set("co", [coord for p in tela.particles for coord in p.location])
+    escribir_coords(mesh.vertices, posiciones_particulas(tela))
     mesh.update()
 
 
@@ -8,6 +8,14 @@ import mathutils  # type: ignore
 import math
 import sys
 import os
+import tempfile
+import time
+from bpy.app.handlers import persistent  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Añadir la ruta del directorio padre al path de Python
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +27,8 @@ if parent_dir not in sys.path:
 from core.Particle import Particle
 from core.PBDSystem import PBDSystem
 from geometry.Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from core.BakeCache import BakeWriter, BakeCache
+from blender.blender_writeback import posiciones_particulas, leer_coords, escribir_coords
 
 # ============================================
 # PROPIEDADES DEL PANEL
@@ -346,6 +356,33 @@ def init_properties():
         min=0.1,
         max=10.0
     )
+    
+    # Formato del bake
+    scene.pbd_bake_format = bpy.props.EnumProperty(
+        name="Formato Bake",
+        description="Dónde se guardan los frames simulados",
+        items=[
+            ('FLOAT32', "Caché float32", "Fichero binario con memmap, posiciones exactas"),
+            ('FLOAT16', "Caché float16", "Fichero binario con memmap, mitad de tamaño"),
+            ('INT16', "Caché int16", "Fichero binario con memmap, cuantizado por frame"),
+            ('SHAPE_KEYS', "Shape Keys", "Un Shape Key por frame (lento con muchos frames)"),
+        ],
+        default='FLOAT32'
+    )
+    
+    scene.pbd_bake_dir = bpy.props.StringProperty(
+        name="Carpeta Bakes",
+        description="Carpeta donde se guardan los ficheros .pbdbake",
+        default="//pbd_bakes",
+        subtype='DIR_PATH'
+    )
+    
+    scene.pbd_topologia_dir = bpy.props.StringProperty(
+        name="Caché Topología",
+        description="Carpeta de la caché de topologías (.npz) del cubo y la esfera (vacío = sin caché)",
+        default="//pbd_topologia",
+        subtype='DIR_PATH'
+    )
 
 
 # ============================================
@@ -464,6 +501,10 @@ class PBD_CLOTH_PT_Panel(bpy.types.Panel):
         box.label(text="Solver:", icon='SETTINGS')
         box.prop(scene, "pbd_cloth_solver_iterations")
         box.prop(scene, "pbd_cloth_num_frames")
+        box.prop(scene, "pbd_bake_format")
+        if scene.pbd_bake_format != 'SHAPE_KEYS':
+            box.prop(scene, "pbd_bake_dir")
+        box.prop(scene, "pbd_topologia_dir")
         
         # Fuerzas
         box = layout.box()
@@ -479,7 +520,14 @@ class PBD_CLOTH_PT_Panel(bpy.types.Panel):
         box = layout.box()
         if scene.pbd_cloth_is_simulating:
             box.label(text="⏳ Simulando...", icon='TIME')
-            box.operator("pbd_cloth.reset_simulando", text="Reset Estado")
+            if _bake_estado['activo']:
+                hechos, total = _bake_estado['frame'], _bake_estado['total']
+                progreso = hechos / total * 100 if total else 0.0
+                box.label(text=f"Frame {hechos}/{total} ({progreso:.0f}%)")
+                box.label(text=f"{_bake_estado['fps']:.1f} frames/s - ETA {_bake_estado['eta']:.0f}s")
+                box.operator("pbd_cloth.cancelar_bake", text="Cancelar (Esc)", icon='CANCEL')
+            else:
+                box.operator("pbd_cloth.reset_simulando", text="Reset Estado")
         else:
             if mode == 'CLOTH':
                 box.operator("pbd_cloth.simular_shapekeys", text="Simular Tela", icon='PLAY')
@@ -497,15 +545,120 @@ class PBD_CLOTH_PT_Panel(bpy.types.Panel):
         box.operator("pbd_cloth.forzar_actualizacion", text="Forzar Actualización", icon='FILE_REFRESH')
 
 
+# ============================================
+# BAKE ASÍNCRONO
+# ============================================
+# Estado del bake modal en curso (lo lee el panel)
+_bake_estado = {
+    'activo': False,
+    'cancelar': False,
+    'frame': 0,
+    'total': 0,
+    'inicio': 0.0,
+    'fps': 0.0,
+    'eta': 0.0,
+}
+
+
+def redibujar_paneles(context):
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+class BakeAsincrono:
+    """
+    Mixin de operadores de bake: desde la UI (invoke) el bake corre en modo modal,
+    avanzando el generador de pasos a trozos de PRESUPUESTO segundos en cada evento
+    del timer, así Blender sigue respondiendo y el bake se puede cancelar con Esc.
+    Desde scripts (execute) el bake sigue siendo síncrono.
+    Las subclases definen pasos(context): generador de (frames terminados, total).
+    """
+    PRESUPUESTO = 0.05  # segundos de simulación por evento del timer
+    
+    def invoke(self, context, event):
+        if _bake_estado['activo'] or context.scene.pbd_cloth_is_simulating:
+            self.report({'WARNING'}, "Ya hay un bake en curso")
+            return {'CANCELLED'}
+        
+        self._pasos = self.pasos(context)
+        _bake_estado.update(activo=True, cancelar=False, frame=0, total=0,
+                            inicio=time.perf_counter(), fps=0.0, eta=0.0)
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC' or _bake_estado['cancelar']:
+            self._terminar(context, cancelado=True)
+            self.report({'WARNING'}, f"Bake cancelado en el frame {_bake_estado['frame']}")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        limite = time.perf_counter() + self.PRESUPUESTO
+        try:
+            while True:
+                hechos, total = next(self._pasos)
+                _bake_estado.update(frame=hechos, total=total)
+                if time.perf_counter() >= limite:
+                    break
+        except StopIteration:
+            self._terminar(context, cancelado=False)
+            return {'FINISHED'}
+        except Exception as e:
+            self._terminar(context, cancelado=True)
+            self.report({'ERROR'}, f"Error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return {'CANCELLED'}
+        
+        transcurrido = time.perf_counter() - _bake_estado['inicio']
+        if hechos > 0 and transcurrido > 0.0:
+            _bake_estado['fps'] = hechos / transcurrido
+            _bake_estado['eta'] = (total - hechos) / _bake_estado['fps']
+        redibujar_paneles(context)
+        return {'PASS_THROUGH'}
+    
+    def cancel(self, context):
+        self._terminar(context, cancelado=True)
+    
+    def _terminar(self, context, cancelado):
+        if self._timer is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        # close() lanza GeneratorExit en el frame en curso: los finally del bake
+        # resetean el flag de simulación y cierran la caché
+        if cancelado:
+            self._pasos.close()
+        _bake_estado['activo'] = False
+        redibujar_paneles(context)
+
+
 # ============================================
 # OPERADORES
 # ============================================
-class PBD_CLOTH_OT_SimularShapeKeys(bpy.types.Operator):
+class PBD_CLOTH_OT_CancelarBake(bpy.types.Operator):
+    """Operador para cancelar el bake asíncrono en curso"""
+    bl_idname = "pbd_cloth.cancelar_bake"
+    bl_label = "Cancelar Bake"
+    
+    def execute(self, context):
+        _bake_estado['cancelar'] = True
+        return {'FINISHED'}
+
+
+class PBD_CLOTH_OT_SimularShapeKeys(BakeAsincrono, bpy.types.Operator):
     """Operador para simular y guardar en Shape Keys"""
     bl_idname = "pbd_cloth.simular_shapekeys"
     bl_label = "Simular y Guardar en Shape Keys"
     bl_options = {'REGISTER', 'UNDO'}
     
+    def pasos(self, context):
+        return pasos_simular_tela(context)
+    
     def execute(self, context):
         try:
             simular_y_guardar_shapekeys(context)
@@ -641,12 +794,15 @@ class PBD_CLOTH_OT_ForzarActualizacion(bpy.types.Operator):
             return {'CANCELLED'}
 
 
-class PBD_CLOTH_OT_SimularCuboVolumen(bpy.types.Operator):
+class PBD_CLOTH_OT_SimularCuboVolumen(BakeAsincrono, bpy.types.Operator):
     """Operador para simular cubo con restricciones de volumen"""
     bl_idname = "pbd_cloth.simular_cubo_volumen"
     bl_label = "Simular Cubo Volumen"
     bl_options = {'REGISTER', 'UNDO'}
     
+    def pasos(self, context):
+        return pasos_simular_cubo_volumen(context)
+    
     def execute(self, context):
         try:
             simular_cubo_volumen(context)
@@ -658,12 +814,15 @@ class PBD_CLOTH_OT_SimularCuboVolumen(bpy.types.Operator):
             return {'CANCELLED'}
 
 
-class PBD_CLOTH_OT_SimularEsferaVolumen(bpy.types.Operator):
+class PBD_CLOTH_OT_SimularEsferaVolumen(BakeAsincrono, bpy.types.Operator):
     """Operador para simular esfera con restricciones de volumen"""
     bl_idname = "pbd_cloth.simular_esfera_volumen"
     bl_label = "Simular Esfera Volumen"
     bl_options = {'REGISTER', 'UNDO'}
     
+    def pasos(self, context):
+        return pasos_simular_esfera_volumen(context)
+    
     def execute(self, context):
         try:
             simular_esfera_volumen(context)
@@ -675,6 +834,131 @@ class PBD_CLOTH_OT_SimularEsferaVolumen(bpy.types.Operator):
             return {'CANCELLED'}
 
 
+# ============================================
+# CACHÉ BINARIA DE BAKES
+# ============================================
+# Lectores abiertos (ruta absoluta -> BakeCache), compartidos por el handler de frames
+_bakes_abiertos = {}
+
+
+def directorio_topologia(scene):
+    """
+    Carpeta absoluta de la caché de topologías, o None si está desactivada
+    (también con rutas relativas '//' y el .blend sin guardar)
+    """
+    carpeta = scene.pbd_topologia_dir
+    if not carpeta or np is None:
+        return None
+    if carpeta.startswith("//") and not bpy.data.filepath:
+        return None
+    return bpy.path.abspath(carpeta)
+
+
+def directorio_bakes(scene):
+    """
+    Carpeta absoluta de los .pbdbake
+    Con una ruta relativa '//' y el .blend sin guardar, bpy.path.abspath la resolvería
+    contra el directorio de trabajo de Blender: se usa una carpeta temporal
+    """
+    carpeta = scene.pbd_bake_dir or "//pbd_bakes"
+    if carpeta.startswith("//") and not bpy.data.filepath:
+        temporal = os.path.join(tempfile.gettempdir(), "pbd_bakes")
+        print(f"   ⚠️ .blend sin guardar: la ruta relativa '{carpeta}' no tiene base, "
+              f"bake en la carpeta temporal {temporal}")
+        return temporal
+    return bpy.path.abspath(carpeta)
+
+
+def usa_bake_cache(scene):
+    """True si el bake se guarda en un fichero .pbdbake en lugar de Shape Keys"""
+    return scene.pbd_bake_format != 'SHAPE_KEYS' and np is not None
+
+
+def iniciar_bake_cache(scene, obj, num_frames, system):
+    """
+    Crear el BakeWriter del objeto y guardar el frame 0 (None si se usan Shape Keys)
+    """
+    if not usa_bake_cache(scene):
+        return None
+    
+    carpeta = directorio_bakes(scene)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, bpy.path.clean_name(obj.name) + ".pbdbake")
+    
+    # Soltar el memmap de un bake anterior antes de sobrescribir el fichero
+    cerrar_bake_cache(ruta)
+    if "pbd_bake_path" in obj:
+        del obj["pbd_bake_path"]
+    # Los Shape Keys de un bake anterior taparían las posiciones del mesh
+    if obj.data.shape_keys:
+        obj.shape_key_clear()
+    
+    formato = scene.pbd_bake_format.lower()
+    writer = BakeWriter(ruta, num_frames + 1, len(system.particles), fps=scene.render.fps, formato=formato)
+    writer.write_frame(posiciones_particulas(system))
+    print(f"   💾 Bake en caché binaria ({formato}): {ruta}")
+    return writer
+
+
+def terminar_bake_cache(writer, obj, scene):
+    """Cerrar el bake, enlazarlo al objeto y mostrar el frame actual"""
+    writer.close()
+    ruta = writer.ruta
+    if bpy.data.filepath:
+        ruta = bpy.path.relpath(ruta)
+    obj["pbd_bake_path"] = ruta
+    
+    registrar_handler_bake()
+    # Frame N de la escena = frame N del bake (igual que sim_NNNN con Shape Keys)
+    scene.frame_end = writer.frames_escritos - 1
+    pbd_bake_frame_handler(scene)
+    
+    tamano_mb = os.path.getsize(writer.ruta) / (1024 * 1024)
+    print(f"   ✅ Bake guardado: {writer.frames_escritos} frames, {tamano_mb:.1f} MB")
+
+
+def abrir_bake_cache(ruta):
+    """BakeCache de la ruta (se reabre si el fichero ha cambiado)"""
+    ruta = os.path.abspath(bpy.path.abspath(ruta))
+    bake = _bakes_abiertos.get(ruta)
+    if bake is not None and bake.mtime == os.path.getmtime(ruta):
+        return bake
+    bake = BakeCache(ruta)
+    _bakes_abiertos[ruta] = bake
+    return bake
+
+
+def cerrar_bake_cache(ruta):
+    bake = _bakes_abiertos.pop(os.path.abspath(bpy.path.abspath(ruta)), None)
+    if bake is not None:
+        bake.close()
+
+
+@persistent
+def pbd_bake_frame_handler(scene, depsgraph=None):
+    """Copiar al mesh las posiciones del frame actual de los objetos con bake binario"""
+    for obj in scene.objects:
+        ruta = obj.get("pbd_bake_path")
+        if obj.type != 'MESH' or not ruta:
+            continue
+        try:
+            bake = abrir_bake_cache(ruta)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Bake de '{obj.name}' no disponible: {e}")
+            continue
+        if len(bake) == 0 or bake.n != len(obj.data.vertices):
+            continue
+        
+        i = min(max(scene.frame_current, 0), len(bake) - 1)
+        obj.data.vertices.foreach_set('co', bake.frame(i).ravel())
+        obj.data.update()
+
+
+def registrar_handler_bake():
+    if pbd_bake_frame_handler not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(pbd_bake_frame_handler)
+
+
 # ============================================
 # FUNCIONES DE SIMULACIÓN
 # ============================================
@@ -938,6 +1222,15 @@ def crear_malla_tela_blender(ancho, alto, n_ancho, n_alto):
 
 def simular_y_guardar_shapekeys(context):
     """Función principal que simula y guarda en Shape Keys"""
+    for _ in pasos_simular_tela(context):
+        pass
+
+
+def pasos_simular_tela(context):
+    """
+    Generador de simular_y_guardar_shapekeys: avanza un frame por cada next()
+    y devuelve (frames terminados, total) para el bake asíncrono
+    """
     scene = context.scene
     
     # Obtener parámetros
@@ -984,17 +1277,15 @@ def simular_y_guardar_shapekeys(context):
     for i in range(len(system.particles)):
         system.particles[i].debugId = i
     
-    for i, vertex in enumerate(mesh.vertices):
-        if i < len(system.particles):
-            system.particles[i].location = mathutils.Vector(vertex.co)
-            system.particles[i].last_location = mathutils.Vector(vertex.co)
-            
-            # LOG: Verificar posición inicial
-            import math
-            if (math.isnan(system.particles[i].location.x) or math.isnan(system.particles[i].location.y) or math.isnan(system.particles[i].location.z)):
-                print(f"   🔴 Partícula {i}: Posición inicial inválida: {system.particles[i].location}")
-        else:
-            break
+    # Leer todas las posiciones del mesh de una vez (foreach_get)
+    coords_iniciales = leer_coords(mesh.vertices)[:len(system.particles)]
+    for i, co in enumerate(coords_iniciales):
+        system.particles[i].location = mathutils.Vector(co)
+        system.particles[i].last_location = mathutils.Vector(co)
+    
+    # LOG: Verificar posiciones iniciales
+    for i in np.flatnonzero(~np.isfinite(coords_iniciales).all(axis=1)):
+        print(f"   🔴 Partícula {i}: Posición inicial inválida: {system.particles[i].location}")
     
     print(f"   ✓ {min(len(mesh.vertices), len(system.particles))} partículas posicionadas según el mesh")
     
@@ -1051,8 +1342,9 @@ def simular_y_guardar_shapekeys(context):
         while obj.data.shape_keys and len(obj.data.shape_keys.key_blocks) > 0:
             obj.shape_key_remove(obj.active_shape_key)
     
-    # Crear Shape Key base (Basis)
-    obj.shape_key_add(name="Basis")
+    # Crear Shape Key base (Basis) (con caché binaria el mesh se anima sin Shape Keys)
+    if not usa_bake_cache(scene):
+        obj.shape_key_add(name="Basis")
     
     # Obtener fuerzas
     gravity_value = scene.pbd_cloth_gravity
@@ -1116,9 +1408,19 @@ def simular_y_guardar_shapekeys(context):
     print(f"   ✅ Warm-up completado. La tela debería estar estabilizada.\n")
     
     # Usar try/finally para asegurar que el flag se resetee
+    bake_writer = None
     try:
+        # Caché binaria (frame 0 = estado tras el warm-up)
+        bake_writer = iniciar_bake_cache(scene, obj, num_frames, system)
+        
+        # Respaldo para posiciones inválidas: el mesh base no cambia durante el bake
+        coords_base = leer_coords(mesh.vertices)
+        
         # Simular frame por frame
         for frame in range(1, num_frames + 1):
+            # Punto de pausa del bake asíncrono: (frames terminados, total)
+            yield frame - 1, num_frames
+            
             # CRÍTICO: Resetear fuerzas antes de aplicar nuevas
             for particle in system.particles:
                 particle.force = mathutils.Vector((0.0, 0.0, 0.0))
@@ -1182,6 +1484,13 @@ def simular_y_guardar_shapekeys(context):
                 else:
                     print(f"   ✅ Frame {frame}: Todas las partículas válidas DESPUÉS del solver")
             
+            # Caché binaria: guardar el frame en el bake en lugar de crear un Shape Key
+            if bake_writer is not None:
+                bake_writer.write_frame(posiciones_particulas(system))
+                if frame % 10 == 0 or frame == num_frames:
+                    print(f"     ✅ Progreso: {frame}/{num_frames} frames ({frame / num_frames * 100:.1f}%)")
+                continue
+            
             # Crear Shape Key para este frame
             shape_key_name = f"sim_{frame:04d}"
             shape_key = obj.shape_key_add(name=shape_key_name)
@@ -1190,166 +1499,51 @@ def simular_y_guardar_shapekeys(context):
             if frame == 1 or frame % 10 == 0:
                 print(f"\n  📝 Frame {frame}: Creando Shape Key '{shape_key_name}'")
             
-            # Actualizar posiciones de vértices en el Shape Key
-            vertices_actualizados = 0
-            
-            # CORREGIDO: Inicializar min/max con valores válidos
-            # Verificar que hay partículas y que tienen posiciones válidas
-            if len(system.particles) == 0:
-                print(f"   ❌ ERROR: No hay partículas en el sistema")
-                continue
-            
-            # Encontrar primera partícula con posición válida
-            primera_pos_valida = None
-            particulas_invalidas = 0
-            particulas_validas = 0
-            
-            for i, p in enumerate(system.particles):
-                pos = p.location
-                if (isinstance(pos.x, (int, float)) and isinstance(pos.y, (int, float)) and isinstance(pos.z, (int, float)) and
-                    not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z)) and
-                    not (math.isinf(pos.x) or math.isinf(pos.y) or math.isinf(pos.z))):
-                    particulas_validas += 1
-                    if primera_pos_valida is None:
-                        primera_pos_valida = pos
-                else:
-                    particulas_invalidas += 1
-                    # LOG: Mostrar detalles de partículas inválidas (solo primeras 3 en frame 2)
-                    if frame == 2 and particulas_invalidas <= 3:
-                        print(f"   🔴 Partícula {i}: Posición inválida: x={pos.x}, y={pos.y}, z={pos.z}, bloqueada={p.bloqueada}, masa={p.masa}")
-            
-            # LOG: Estadísticas de partículas válidas/inválidas
-            if frame == 2 or (frame <= 10 and particulas_invalidas > 0):
-                print(f"   📊 Frame {frame}: {particulas_validas} válidas, {particulas_invalidas} inválidas")
+            # Volcar todas las posiciones al Shape Key de una vez
+            # Las posiciones inválidas (NaN/Inf) usan la posición del mesh base
+            posiciones = posiciones_particulas(system)
+            if len(shape_key.data) != len(posiciones) and frame == 1:
+                print(f"   ⚠️ ADVERTENCIA: Shape Key tiene {len(shape_key.data)} vértices, pero hay {len(posiciones)} partículas")
+            vertices_invalidos = escribir_coords(shape_key.data, posiciones, respaldo=coords_base)
+            vertices_actualizados = min(len(shape_key.data), len(posiciones)) - vertices_invalidos
             
-            if primera_pos_valida is None:
+            validas = np.isfinite(posiciones).all(axis=1)
+            if not validas.any():
                 print(f"   ❌ ERROR: No se encontró ninguna partícula con posición válida")
-                print(f"   💡 Todas las {len(system.particles)} partículas tienen posiciones inválidas")
-                # Intentar usar la posición del mesh base como respaldo
-                if len(mesh.vertices) > 0:
-                    primera_pos_valida = mathutils.Vector(mesh.vertices[0].co)
-                    print(f"   💡 Usando posición del mesh base como respaldo: {primera_pos_valida}")
-                else:
-                    print(f"   ❌ No hay mesh base disponible, saltando este frame")
-                    continue
-            
-            # Inicializar min/max con la primera posición válida
-            import math
-            posiciones_min = mathutils.Vector((primera_pos_valida.x, primera_pos_valida.y, primera_pos_valida.z))
-            posiciones_max = mathutils.Vector((primera_pos_valida.x, primera_pos_valida.y, primera_pos_valida.z))
-            
-            # Verificar que hay suficientes vértices
-            if len(shape_key.data) != len(system.particles):
-                if frame == 1:
-                    print(f"   ⚠️ ADVERTENCIA: Shape Key tiene {len(shape_key.data)} vértices, pero hay {len(system.particles)} partículas")
-            
-            # Guardar posiciones en el Shape Key
-            # PRIMERO: Recopilar todas las posiciones válidas para calcular min/max correctamente
-            posiciones_validas = []
-            for i, particle in enumerate(system.particles):
-                if i < len(shape_key.data):
-                    pos = particle.location
-                    
-                    # Verificar que la posición es válida
-                    if (isinstance(pos.x, (int, float)) and isinstance(pos.y, (int, float)) and isinstance(pos.z, (int, float)) and
-                        not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z)) and
-                        not (math.isinf(pos.x) or math.isinf(pos.y) or math.isinf(pos.z))):
-                        posiciones_validas.append((i, pos))
-            
-            # Si hay posiciones válidas, recalcular min/max desde cero
-            if len(posiciones_validas) > 0:
-                primera_valida = posiciones_validas[0][1]
-                posiciones_min = mathutils.Vector((primera_valida.x, primera_valida.y, primera_valida.z))
-                posiciones_max = mathutils.Vector((primera_valida.x, primera_valida.y, primera_valida.z))
-                
-                # Calcular min/max de todas las posiciones válidas
-                for i, pos in posiciones_validas:
-                    posiciones_min.x = min(posiciones_min.x, pos.x)
-                    posiciones_min.y = min(posiciones_min.y, pos.y)
-                    posiciones_min.z = min(posiciones_min.z, pos.z)
-                    posiciones_max.x = max(posiciones_max.x, pos.x)
-                    posiciones_max.y = max(posiciones_max.y, pos.y)
-                    posiciones_max.z = max(posiciones_max.z, pos.z)
-            
-            # SEGUNDO: Guardar todas las posiciones en el Shape Key
-            for i, particle in enumerate(system.particles):
-                if i < len(shape_key.data):
-                    pos = particle.location
-                    
-                    # Verificar que la posición es válida
-                    if (isinstance(pos.x, (int, float)) and isinstance(pos.y, (int, float)) and isinstance(pos.z, (int, float)) and
-                        not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z)) and
-                        not (math.isinf(pos.x) or math.isinf(pos.y) or math.isinf(pos.z))):
-                        
-                        # Guardar posición
-                        shape_key.data[i].co = mathutils.Vector((pos.x, pos.y, pos.z))
-                        vertices_actualizados += 1
-                    else:
-                        # Si la posición es inválida, usar la posición del mesh base
-                        if i < len(mesh.vertices):
-                            shape_key.data[i].co = mathutils.Vector(mesh.vertices[i].co)
-                        else:
-                            # Si no hay mesh base, usar la última posición válida o cero
-                            if len(posiciones_validas) > 0:
-                                ultima_valida = posiciones_validas[-1][1]
-                                shape_key.data[i].co = mathutils.Vector((ultima_valida.x, ultima_valida.y, ultima_valida.z))
-                            else:
-                                shape_key.data[i].co = mathutils.Vector((0.0, 0.0, 0.0))
-                else:
-                    break
+                print(f"   💡 Se usaron las posiciones del mesh base para las {len(posiciones)} partículas")
+            elif vertices_invalidos > 0 and (frame == 2 or frame <= 10):
+                print(f"   📊 Frame {frame}: {len(posiciones) - vertices_invalidos} válidas, {vertices_invalidos} inválidas")
             
             # Verificar que las posiciones cambiaron (comparar con frame anterior)
-            if posiciones_frame_anterior is not None and (frame == 2 or frame % 20 == 0):
-                diferencias = 0
-                max_diff = 0.0
-                for i in range(min(len(system.particles), len(posiciones_frame_anterior))):
-                    pos_actual = system.particles[i].location
-                    pos_anterior = posiciones_frame_anterior[i]
-                    
-                    # Verificar que ambas posiciones son válidas
-                    if (isinstance(pos_actual.x, (int, float)) and isinstance(pos_anterior.x, (int, float)) and
-                        not (math.isnan(pos_actual.x) or math.isnan(pos_anterior.x))):
-                        diff = (pos_actual - pos_anterior).length
-                        if diff > 0.001:
-                            diferencias += 1
-                        max_diff = max(max_diff, diff)
-                
-                if frame == 2:
-                    if diferencias > 0:
-                        print(f"   ✅ Las partículas SÍ se están moviendo: {diferencias}/{len(system.particles)} cambiaron")
-                        print(f"   📏 Diferencia máxima: {max_diff:.6f} metros")
-                    else:
-                        print(f"   ⚠️ PROBLEMA: Las partículas NO se están moviendo")
-                        print(f"   💡 Verifica que las restricciones y fuerzas estén funcionando")
+            if posiciones_frame_anterior is not None and frame == 2:
+                ambas = validas & np.isfinite(posiciones_frame_anterior).all(axis=1)
+                desplazamiento = np.linalg.norm(posiciones[ambas] - posiciones_frame_anterior[ambas], axis=1)
+                diferencias = int((desplazamiento > 0.001).sum())
+                if diferencias > 0:
+                    print(f"   ✅ Las partículas SÍ se están moviendo: {diferencias}/{len(posiciones)} cambiaron")
+                    print(f"   📏 Diferencia máxima: {desplazamiento.max():.6f} metros")
+                else:
+                    print(f"   ⚠️ PROBLEMA: Las partículas NO se están moviendo")
+                    print(f"   💡 Verifica que las restricciones y fuerzas estén funcionando")
             
             # Guardar posiciones actuales para comparar en el siguiente frame
-            posiciones_frame_anterior = []
-            for p in system.particles:
-                pos = p.location
-                if (isinstance(pos.x, (int, float)) and isinstance(pos.y, (int, float)) and isinstance(pos.z, (int, float)) and
-                    not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z))):
-                    posiciones_frame_anterior.append(mathutils.Vector((pos.x, pos.y, pos.z)))
-                else:
-                    # Si es inválida, usar la posición anterior o cero
-                    if len(posiciones_frame_anterior) > 0:
-                        posiciones_frame_anterior.append(mathutils.Vector(posiciones_frame_anterior[-1]))
-                    else:
-                        posiciones_frame_anterior.append(mathutils.Vector((0, 0, 0)))
+            posiciones_frame_anterior = np.array(posiciones)
             
             # Log: Estadísticas del Shape Key
-            if frame == 1 or frame % 10 == 0:
+            if (frame == 1 or frame % 10 == 0) and validas.any():
+                posiciones_min = posiciones[validas].min(axis=0)
+                posiciones_max = posiciones[validas].max(axis=0)
                 print(f"     ✓ {vertices_actualizados} vértices actualizados")
                 print(f"     📊 Rango de posiciones:")
-                print(f"        X: [{posiciones_min.x:.3f}, {posiciones_max.x:.3f}]")
-                print(f"        Y: [{posiciones_min.y:.3f}, {posiciones_max.y:.3f}]")
-                print(f"        Z: [{posiciones_min.z:.3f}, {posiciones_max.z:.3f}]")
+                print(f"        X: [{posiciones_min[0]:.3f}, {posiciones_max[0]:.3f}]")
+                print(f"        Y: [{posiciones_min[1]:.3f}, {posiciones_max[1]:.3f}]")
+                print(f"        Z: [{posiciones_min[2]:.3f}, {posiciones_max[2]:.3f}]")
                 
                 # Mostrar ejemplo de posiciones
                 if frame == 1:
                     print(f"     🔍 Ejemplo de posiciones (primeras 5 partículas):")
-                    for i in range(min(5, len(system.particles))):
-                        p = system.particles[i]
-                        print(f"        Partícula {i}: ({p.location.x:.3f}, {p.location.y:.3f}, {p.location.z:.3f})")
+                    for i, p in enumerate(posiciones[:5]):
+                        print(f"        Partícula {i}: ({p[0]:.3f}, {p[1]:.3f}, {p[2]:.3f})")
             
             # Progreso
             if frame % 10 == 0 or frame == num_frames:
@@ -1358,22 +1552,48 @@ def simular_y_guardar_shapekeys(context):
         
         # Crear animación
         print(f"\n   🎬 Creando animación con keyframes...")
-        crear_animacion_shapekeys(obj, num_frames)
+        if bake_writer is not None:
+            terminar_bake_cache(bake_writer, obj, scene)
+        else:
+            crear_animacion_shapekeys(obj, num_frames)
         
         print(f"\n" + "=" * 60)
         print(f"✅ SIMULACIÓN COMPLETADA")
         print("=" * 60)
-        print(f"   ✓ {num_frames} Shape Keys creados")
+        if bake_writer is not None:
+            print(f"   ✓ {num_frames} frames guardados en {bake_writer.ruta}")
+        else:
+            print(f"   ✓ {num_frames} Shape Keys creados")
         print(f"   ✓ Animación configurada")
         print(f"\n   💡 Presiona SPACE para reproducir la animación")
-        print(f"   💡 Los Shape Keys se activarán automáticamente por frame")
+        if bake_writer is not None:
+            print(f"   💡 El bake se leerá de la caché binaria en cada frame")
+        else:
+            print(f"   💡 Los Shape Keys se activarán automáticamente por frame")
         
     finally:
         # SIEMPRE resetear el flag, incluso si hay errores
         scene.pbd_cloth_is_simulating = False
+        if bake_writer is not None:
+            bake_writer.close()
         print(f"\n   🔄 Flag de simulación reseteado")
 
 
+def keyframes_bloque_shapekey(frame, num_frames):
+    """
+    Coordenadas planas [f0, v0, f1, v1, ...] de los keyframes del Shape Key activo
+    en 'frame': 0.0 en el frame anterior, 1.0 en el suyo y 0.0 en el siguiente
+    (sin salirse de 1..num_frames)
+    """
+    coords = []
+    if frame > 1:
+        coords += [frame - 1, 0.0]
+    coords += [frame, 1.0]
+    if frame < num_frames:
+        coords += [frame + 1, 0.0]
+    return coords
+
+
 def crear_animacion_shapekeys(obj, num_frames):
     """Crear keyframes para la animación de Shape Keys"""
     if not obj.data.shape_keys:
@@ -1396,67 +1616,37 @@ def crear_animacion_shapekeys(obj, num_frames):
         shape_keys.animation_data.action = action
     
     # Crear keyframes para cada Shape Key
-    # CRÍTICO: En modo absoluto, cada Shape Key debe tener keyframes en TODOS los frames
-    # - Valor 1.0 en su frame correspondiente
-    # - Valor 0.0 en TODOS los demás frames
+    # Con interpolación CONSTANT, el Shape Key del frame N solo necesita 3 keyframes:
+    # 0.0 en N-1, 1.0 en N y 0.0 en N+1 (antes y después se mantiene el 0.0).
+    # Total O(frames) keyframes en lugar de O(frames²), escritos en bloque con foreach_set.
     
-    print(f"   📝 Creando keyframes para {min(len(key_blocks) - 1, num_frames)} Shape Keys...")
+    num_bloques = max(min(len(key_blocks) - 1, num_frames), 0)
+    print(f"   📝 Creando keyframes para {num_bloques} Shape Keys...")
     
     # PRIMERO: Limpiar todas las F-curves existentes para empezar desde cero
     if action.fcurves:
         for fcurve in action.fcurves[:]:
             action.fcurves.remove(fcurve)
     
-    # SEGUNDO: Crear F-curves y keyframes para cada Shape Key
-    # CRÍTICO: En modo absoluto, cada Shape Key necesita keyframes en TODOS los frames
-    # donde su valor cambia. Necesitamos insertar keyframes en:
-    # - Frame 1: 0.0 para todos excepto sim_0001 (que tiene 1.0)
-    # - Frame N: 1.0 para sim_00NN
-    # - Frame N+1: 0.0 para todos
-    
-    print(f"   📝 Creando F-curves y keyframes...")
-    
-    # Crear todas las F-curves primero
+    # SEGUNDO: Una F-curve por Shape Key con sus keyframes añadidos de una vez
     fcurves_dict = {}
-    for i in range(1, min(len(key_blocks), num_frames + 1)):
-        key_name = key_blocks[i].name
-        data_path = f'key_blocks["{key_name}"].value'
+    total_keyframes_insertados = 0
+    for i in range(1, num_bloques + 1):
+        data_path = f'key_blocks["{key_blocks[i].name}"].value'
         fcurve = action.fcurves.new(data_path)
         fcurves_dict[i] = fcurve
-    
-    # Ahora insertar keyframes frame por frame (más eficiente y evita conflictos)
-    print(f"   📝 Insertando keyframes frame por frame (1 a {num_frames})...")
-    
-    total_keyframes_insertados = 0
-    for frame in range(1, num_frames + 1):
-        # Para cada frame, determinar qué Shape Key debe estar activo
-        shape_key_activo = frame  # Frame 1 = sim_0001, Frame 2 = sim_0002, etc.
         
-        if shape_key_activo < len(key_blocks):
-            # Insertar keyframes en todas las F-curves para este frame
-            for i, fcurve in fcurves_dict.items():
-                value = 1.0 if i == shape_key_activo else 0.0
-                
-                # Verificar si ya existe un keyframe en este frame
-                kp_existente = None
-                for kp in fcurve.keyframe_points:
-                    if abs(kp.co[0] - frame) < 0.01:
-                        kp_existente = kp
-                        break
-                
-                if kp_existente:
-                    # Actualizar valor existente
-                    kp_existente.co[1] = value
-                    kp_existente.interpolation = 'CONSTANT'
-                else:
-                    # Insertar nuevo keyframe
-                    kp = fcurve.keyframe_points.insert(frame, value)
-                    kp.interpolation = 'CONSTANT'
-                    total_keyframes_insertados += 1
+        # Frame i = Shape Key i (Frame 1 = sim_0001, Frame 2 = sim_0002, etc.)
+        coords = keyframes_bloque_shapekey(i, num_frames)
+        fcurve.keyframe_points.add(len(coords) // 2)
+        fcurve.keyframe_points.foreach_set('co', coords)
+        # 0 = 'CONSTANT' en el enum de interpolación
+        fcurve.keyframe_points.foreach_set('interpolation', [0] * (len(coords) // 2))
+        total_keyframes_insertados += len(coords) // 2
         
-        # Log de progreso cada 50 frames
-        if frame % 50 == 0:
-            print(f"      Progreso: Frame {frame}/{num_frames}...")
+        # Log de progreso cada 50 Shape Keys
+        if i % 50 == 0:
+            print(f"      Progreso: Shape Key {i}/{num_bloques}...")
     
     print(f"   ✓ Total de keyframes insertados: {total_keyframes_insertados}")
     
@@ -1470,28 +1660,18 @@ def crear_animacion_shapekeys(obj, num_frames):
     
     # Verificar algunos Shape Keys específicos
     for i in [1, 2, 3, 50, 100, 150]:
-        if i < len(key_blocks) and i in fcurves_dict:
+        if i in fcurves_dict:
             fcurve = fcurves_dict[i]
             key_name = key_blocks[i].name
             num_kps = len(fcurve.keyframe_points)
-            expected_kps = num_frames  # Debería tener keyframes en todos los frames
+            expected_kps = len(keyframes_bloque_shapekey(i, num_frames)) // 2
             status = "✅" if num_kps == expected_kps else "❌"
             print(f"      {status} {key_name}: {num_kps} keyframes (esperado: {expected_kps})")
             
-            # Verificar keyframe en su frame correspondiente
-            kp_en_frame = None
-            for kp in fcurve.keyframe_points:
-                if abs(kp.co[0] - i) < 0.01:
-                    kp_en_frame = kp
-                    break
-            
-            if kp_en_frame:
-                value = kp_en_frame.co[1]
-                expected_value = 1.0
-                status_val = "✅" if abs(value - expected_value) < 0.001 else "❌"
-                print(f"         {status_val} Frame {i}: {value:.6f} (esperado: {expected_value:.1f})")
-            else:
-                print(f"         ❌ No hay keyframe en Frame {i}")
+            # Verificar el valor en su frame correspondiente
+            value = fcurve.evaluate(i)
+            status_val = "✅" if abs(value - 1.0) < 0.001 else "❌"
+            print(f"         {status_val} Frame {i}: {value:.6f} (esperado: 1.0)")
     
     print(f"   ✓ Keyframes creados para todos los Shape Keys")
     
@@ -1859,6 +2039,15 @@ def diagnosticar_keyframes_shapekeys():
 # ============================================
 def simular_cubo_volumen(context):
     """Simular cubo con restricciones de volumen y guardar en Shape Keys"""
+    for _ in pasos_simular_cubo_volumen(context):
+        pass
+
+
+def pasos_simular_cubo_volumen(context):
+    """
+    Generador de simular_cubo_volumen: avanza un frame por cada next()
+    y devuelve (frames terminados, total) para el bake asíncrono
+    """
     scene = context.scene
     
     # Obtener parámetros
@@ -1950,6 +2139,8 @@ def simular_cubo_volumen(context):
     # Esto asegura que los cambios en el código se reflejen en Blender
     # Usar rutas completas con subcarpetas
     modules_to_reload = [
+        'geometry.TopologiaRejilla',
+        'geometry.CacheTopologia',
         'geometry.CuboVolumen',
         'constraints.VolumeConstraintTet',
         'constraints.VolumeConstraintGlobal',
@@ -2047,7 +2238,8 @@ def simular_cubo_volumen(context):
     # CRÍTICO: Verificar que crear_cubo_volumen retorna 6 valores
     # Si retorna menos, significa que el módulo no se recargó correctamente
     resultado = crear_cubo_volumen(
-        lado, densidad, stiffness_volumen, stiffness_global, subdivisiones
+        lado, densidad, stiffness_volumen, stiffness_global, subdivisiones,
+        cache=directorio_topologia(scene)
     )
     
     # Verificar número de valores retornados
@@ -2333,8 +2525,7 @@ def simular_cubo_volumen(context):
     # Sincronizar posiciones del mesh con las partículas del sistema PBD
     # Esto es crítico para que el mesh inicial coincida con las partículas
     if len(obj.data.vertices) == len(system.particles):
-        for i, vertex in enumerate(obj.data.vertices):
-            vertex.co = system.particles[i].location
+        escribir_coords(obj.data.vertices, posiciones_particulas(system))
         obj.data.update()
         print(f"   ✓ Mesh sincronizado con posiciones de partículas")
     else:
@@ -2434,8 +2625,14 @@ def simular_cubo_volumen(context):
             obj.shape_key_remove(obj.active_shape_key)
     
     # Crear Shape Key base (Basis) con las posiciones actuales
-    obj.shape_key_add(name="Basis")
-    print(f"   ✓ Shape Key 'Basis' creado")
+    # (con caché binaria el mesh se anima sin Shape Keys)
+    bake_writer = iniciar_bake_cache(scene, obj, num_frames, system)
+    if bake_writer is None:
+        obj.shape_key_add(name="Basis")
+        print(f"   ✓ Shape Key 'Basis' creado")
+    
+    # Respaldo para posiciones inválidas (el Basis no cambia durante el bake)
+    coords_basis = leer_coords(obj.data.vertices)
     
     # Marcar como simulando
     scene.pbd_cloth_is_simulating = True
@@ -2491,6 +2688,9 @@ def simular_cubo_volumen(context):
         
         # Simular frame por frame
         for frame in range(1, num_frames + 1):
+            # Punto de pausa del bake asíncrono: (frames terminados, total)
+            yield frame - 1, num_frames
+            
             # DEBUG: Estado al inicio de cada frame (solo primeros 3 frames)
             if frame <= 3:
                 print(f"\n{'='*60}")
@@ -2604,16 +2804,8 @@ def simular_cubo_volumen(context):
                     print(f"   📊 Frame {frame}, Volumen Global: V/V0 = {ratio_global:.6f}")
             
             # Actualizar mesh base con las posiciones actuales (para visualización en tiempo real)
-            # CRÍTICO: Validar posiciones antes de actualizar el mesh
-            for i, vertex in enumerate(obj.data.vertices):
-                if i < len(system.particles):
-                    pos = system.particles[i].location
-                    # Validar que la posición es válida antes de actualizar
-                    if (isinstance(pos.x, (int, float)) and isinstance(pos.y, (int, float)) and isinstance(pos.z, (int, float)) and
-                        not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z)) and
-                        not (math.isinf(pos.x) or math.isinf(pos.y) or math.isinf(pos.z))):
-                        vertex.co = mathutils.Vector((pos.x, pos.y, pos.z))
-                    # Si es inválida, mantener la posición anterior del vértice
+            # Las posiciones inválidas (NaN/Inf) mantienen la posición anterior del vértice
+            escribir_coords(obj.data.vertices, posiciones_particulas(system))
             obj.data.update()
             
             # Actualizar posición de la esfera visual si está habilitada
@@ -2627,55 +2819,20 @@ def simular_cubo_volumen(context):
                 # Insertar keyframe para la posición de la esfera en este frame (todos los ejes)
                 sphere_obj.keyframe_insert(data_path="location", frame=frame)
             
+            # Caché binaria: guardar el frame en el bake en lugar de crear un Shape Key
+            if bake_writer is not None:
+                bake_writer.write_frame(posiciones_particulas(system))
+                if frame % 10 == 0 or frame == num_frames:
+                    print(f"     ✅ Progreso: {frame}/{num_frames} frames ({frame / num_frames * 100:.1f}%)")
+                continue
+            
             # Crear Shape Key para este frame
             shape_key_name = f"sim_{frame:04d}"
             shape_key = obj.shape_key_add(name=shape_key_name)
             
-            # Actualizar posiciones de vértices en el Shape Key
-            # CRÍTICO: Validar que todas las posiciones sean válidas antes de guardar
-            # Si hay NaN o Inf, usar la posición del Basis o del mesh base
-            vertices_actualizados = 0
-            vertices_invalidos = 0
-            
-            # Obtener posiciones del Basis como respaldo (solo una vez, fuera del bucle)
-            basis_positions = None
-            if obj.data.shape_keys and len(obj.data.shape_keys.key_blocks) > 0:
-                try:
-                    basis = obj.data.shape_keys.key_blocks[0]
-                    if len(basis.data) == len(obj.data.vertices):
-                        basis_positions = [mathutils.Vector(basis.data[i].co) for i in range(len(basis.data))]
-                except:
-                    pass  # Si falla, usar mesh base como respaldo
-            
-            for i, vertex in enumerate(obj.data.vertices):
-                if i < len(system.particles):
-                    pos = system.particles[i].location
-                    
-                    # CRÍTICO: Validar que la posición es válida (no NaN, no Inf)
-                    try:
-                        is_valid = (
-                            isinstance(pos.x, (int, float)) and 
-                            isinstance(pos.y, (int, float)) and 
-                            isinstance(pos.z, (int, float)) and
-                            not (math.isnan(pos.x) or math.isnan(pos.y) or math.isnan(pos.z)) and
-                            not (math.isinf(pos.x) or math.isinf(pos.y) or math.isinf(pos.z))
-                        )
-                    except:
-                        is_valid = False
-                    
-                    if is_valid:
-                        # Guardar posición válida
-                        shape_key.data[i].co = mathutils.Vector((pos.x, pos.y, pos.z))
-                        vertices_actualizados += 1
-                    else:
-                        # CRÍTICO: Si la posición es inválida, usar respaldo
-                        vertices_invalidos += 1
-                        if basis_positions is not None and i < len(basis_positions):
-                            # Usar posición del Basis
-                            shape_key.data[i].co = mathutils.Vector(basis_positions[i])
-                        else:
-                            # Último recurso: usar posición del mesh base
-                            shape_key.data[i].co = mathutils.Vector(vertex.co)
+            # Volcar las posiciones al Shape Key de una vez
+            # CRÍTICO: Las posiciones inválidas (NaN/Inf) usan la posición del Basis
+            vertices_invalidos = escribir_coords(shape_key.data, posiciones_particulas(system), respaldo=coords_basis)
             
             # Log de advertencia solo si hay vértices inválidos (reducir frecuencia de logs)
             if vertices_invalidos > 0 and (frame <= 3 or frame % 20 == 0):
@@ -2689,7 +2846,10 @@ def simular_cubo_volumen(context):
         print(f"\n   ✅ Simulación completada: {num_frames} frames")
         
         # Crear animación con keyframes
-        crear_animacion_shapekeys(obj, num_frames)
+        if bake_writer is not None:
+            terminar_bake_cache(bake_writer, obj, scene)
+        else:
+            crear_animacion_shapekeys(obj, num_frames)
         
         print(f"\n   ✅ Animación creada con keyframes")
         
@@ -2700,6 +2860,8 @@ def simular_cubo_volumen(context):
         raise
     finally:
         scene.pbd_cloth_is_simulating = False
+        if bake_writer is not None:
+            bake_writer.close()
         
         # DEBUG: Estado final del sistema
         print(f"\n{'='*60}")
@@ -2726,6 +2888,15 @@ def simular_cubo_volumen(context):
 # ============================================
 def simular_esfera_volumen(context):
     """Simular esfera con restricciones de volumen y guardar en Shape Keys"""
+    for _ in pasos_simular_esfera_volumen(context):
+        pass
+
+
+def pasos_simular_esfera_volumen(context):
+    """
+    Generador de simular_esfera_volumen: avanza un frame por cada next()
+    y devuelve (frames terminados, total) para el bake asíncrono
+    """
     import bmesh
     import sys
     import importlib
@@ -2782,6 +2953,8 @@ def simular_esfera_volumen(context):
     
     # ===== PASO 2: Recargar módulos =====
     modules_to_reload = [
+        'geometry.TopologiaRejilla',
+        'geometry.CacheTopologia',
         'geometry.SphereVolume',
         'geometry.SphereSurfaceExtractor',
         'core.PBDSystem',
@@ -2805,7 +2978,8 @@ def simular_esfera_volumen(context):
         densidad=densidad,
         stiffness_volumen=stiffness_volumen,
         stiffness_global=stiffness_global,
-        subdivisiones=subdivisiones
+        subdivisiones=subdivisiones,
+        cache=directorio_topologia(scene)
     )
     
     system, tetraedros_indices, particulas_grid, particulas_pos = resultado
@@ -2832,25 +3006,15 @@ def simular_esfera_volumen(context):
     # ===== PASO 4: Crear mesh inicial =====
     # Extraer superficie - usar un umbral más permisivo para capturar todas las caras externas
     # El umbral debería ser un porcentaje del radio (partículas cerca de la superficie)
+    # (Sin duplicados y orientados hacia fuera; si nada pasa el umbral, devuelve todas las externas)
     triangulos_superficie = extraer_superficie_tetraedros(
         tetraedros_indices, 
-        system.particles, 
+        system, 
         umbral_distancia=radio * 0.8  # Reducido a 0.8 para capturar más triángulos
     )
     
     if len(triangulos_superficie) == 0:
         print(f"   ⚠️ ADVERTENCIA: No se extrajeron triángulos de superficie")
-        print(f"   🔍 Intentando sin filtro de distancia...")
-        triangulos_superficie = extraer_superficie_tetraedros(
-            tetraedros_indices, 
-            system.particles, 
-            umbral_distancia=None
-        )
-        print(f"   ✓ Encontrados {len(triangulos_superficie)} triángulos sin filtro")
-    
-    # Deduplicar triángulos
-    from geometry.SphereSurfaceExtractor import deduplicar_triangulos
-    triangulos_superficie = deduplicar_triangulos(triangulos_superficie)
     
     mesh, bm = generar_mesh_blender(
         system.particles,
@@ -2873,20 +3037,24 @@ def simular_esfera_volumen(context):
     # Esto evita problemas de sincronización entre mesh y shape keys
     mesh.update()
     
-    if not obj.data.shape_keys:
-        obj.shape_key_add(name="Basis")
-    
-    # Asegurar que el Basis tenga las posiciones correctas
-    basis_key = obj.data.shape_keys.key_blocks[0]  # Basis es siempre el primero
-    for i in range(min(len(basis_key.data), len(system.particles))):
-        pos = system.particles[i].location
-        basis_key.data[i].co = mathutils.Vector((pos.x, pos.y, pos.z))
+    # Con caché binaria el mesh se anima sin Shape Keys
+    bake_writer = iniciar_bake_cache(scene, obj, num_frames, system)
+    if bake_writer is None:
+        if not obj.data.shape_keys:
+            obj.shape_key_add(name="Basis")
+        
+        # Asegurar que el Basis tenga las posiciones correctas
+        basis_key = obj.data.shape_keys.key_blocks[0]  # Basis es siempre el primero
+        escribir_coords(basis_key.data, posiciones_particulas(system))
     
     # ===== PASO 6: Simulación =====
     scene.pbd_cloth_is_simulating = True
     
     try:
         for frame in range(1, num_frames + 1):
+            # Punto de pausa del bake asíncrono: (frames terminados, total)
+            yield frame - 1, num_frames
+            
             # Aplicar gravedad (en dirección Z negativo para que caiga hacia abajo)
             # En Blender, Z es el eje vertical (arriba/abajo)
             # Para que caiga hacia abajo, la fuerza debe ser negativa en Z
@@ -2909,6 +3077,13 @@ def simular_esfera_volumen(context):
             for particle in system.particles:
                 particle.force = mathutils.Vector((0.0, 0.0, 0.0))
             
+            # Caché binaria: guardar el frame en el bake en lugar de crear un Shape Key
+            if bake_writer is not None:
+                bake_writer.write_frame(posiciones_particulas(system))
+                if frame % 10 == 0 or frame == num_frames:
+                    print(f"     ✅ Progreso: {frame}/{num_frames} frames ({frame / num_frames * 100:.1f}%)")
+                continue
+            
             # CRÍTICO: Actualizar Shape Keys directamente, NO el mesh base
             # Esto evita el warning de CD_SHAPEKEY layers
             shape_key_name = f"Frame_{frame:04d}"
@@ -2923,9 +3098,7 @@ def simular_esfera_volumen(context):
             
             # Actualizar posiciones del Shape Key directamente desde las partículas
             # NO actualizar el mesh base con bmesh durante la simulación
-            for i in range(min(len(shape_key.data), len(system.particles))):
-                pos = system.particles[i].location
-                shape_key.data[i].co = mathutils.Vector((pos.x, pos.y, pos.z))
+            escribir_coords(shape_key.data, posiciones_particulas(system))
             
             # Solo actualizar el mesh base (Basis) una vez al final si es necesario
             # Durante la simulación, solo actualizamos los shape keys
@@ -2948,7 +3121,10 @@ def simular_esfera_volumen(context):
         mesh.update()
         
         # Crear animación
-        crear_animacion_shapekeys(obj, num_frames)
+        if bake_writer is not None:
+            terminar_bake_cache(bake_writer, obj, scene)
+        else:
+            crear_animacion_shapekeys(obj, num_frames)
         
     except Exception as e:
         print(f"\n   ❌ ERROR: {e}")
@@ -2957,6 +3133,8 @@ def simular_esfera_volumen(context):
         raise
     finally:
         scene.pbd_cloth_is_simulating = False
+        if bake_writer is not None:
+            bake_writer.close()
 
 
 # ============================================
@@ -2964,6 +3142,7 @@ def simular_esfera_volumen(context):
 # ============================================
 classes = [
     PBD_CLOTH_PT_Panel,
+    PBD_CLOTH_OT_CancelarBake,
     PBD_CLOTH_OT_SimularShapeKeys,
     PBD_CLOTH_OT_ResetSimulando,
     PBD_CLOTH_OT_DiagnosticarKeyframes,
@@ -2978,11 +3157,16 @@ def register():
     init_properties()
     for cls in classes:
         bpy.utils.register_class(cls)
+    registrar_handler_bake()
     print("✓ Panel PBD Cloth registrado")
 
 
 def unregister():
     """Desregistrar clases"""
+    if pbd_bake_frame_handler in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(pbd_bake_frame_handler)
+    for ruta in list(_bakes_abiertos):
+        cerrar_bake_cache(ruta)
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     print("✓ Panel PBD Cloth desregistrado")
@@ -0,0 +1,54 @@
+"""
+Volcado de posiciones de partículas a mallas de Blender en bloque
+Las posiciones se aplanan una sola vez en un buffer float32 y se escriben con
+foreach_set('co', ...) sobre cualquier colección con atributo 'co'
+(mesh.vertices, shape_key.data), en lugar de una asignación RNA por vértice.
+Requiere NumPy (Blender lo incluye siempre).
+"""
+import numpy as np
+
+
+def posiciones_particulas(fuente):
+    """
+    Posiciones (N,3) de un PBDSystem o de una lista de partículas / vectores
+    En modo arrays devuelve directamente store.pos (sin copiar)
+    """
+    store = getattr(fuente, 'store', None)
+    if store is not None:
+        return store.pos
+    particulas = getattr(fuente, 'particles', fuente)
+    n = len(particulas)
+    coords = (c for p in particulas for c in getattr(p, 'location', p))
+    return np.fromiter(coords, dtype=np.float64, count=3 * n).reshape(n, 3)
+
+
+def leer_coords(coleccion):
+    """Coordenadas (N,3) float32 de una colección con 'co' (foreach_get)"""
+    coords = np.empty(len(coleccion) * 3, dtype=np.float32)
+    coleccion.foreach_get('co', coords)
+    return coords.reshape(-1, 3)
+
+
+def escribir_coords(coleccion, posiciones, respaldo=None):
+    """
+    Escribir posiciones (N,3) en una colección con 'co' (foreach_set)
+    Las filas con NaN/Inf, y los vértices sin partícula, toman el valor de
+    'respaldo' (N,3) o, si no se da, conservan las coordenadas actuales.
+
+    Returns:
+        Número de posiciones inválidas sustituidas
+    """
+    n = len(coleccion)
+    pos = np.asarray(posiciones)[:n]
+    m = len(pos)
+    validas = np.isfinite(pos).all(axis=1)
+    invalidas = m - int(validas.sum())
+
+    if invalidas == 0 and m == n:
+        buffer = np.ascontiguousarray(pos, dtype=np.float32)
+    else:
+        buffer = leer_coords(coleccion) if respaldo is None else np.array(respaldo, dtype=np.float32).reshape(-1, 3)
+        buffer[:m][validas] = pos[validas]
+
+    coleccion.foreach_set('co', buffer.ravel())
+    return invalidas
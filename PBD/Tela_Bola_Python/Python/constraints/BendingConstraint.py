@@ -3,7 +3,7 @@ BendingConstraint para Position-Based Dynamics (Müller 2007)
 Mantiene constante el ángulo diedro entre dos triángulos adyacentes
 Migrado de JavaScript a Python para Blender
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.Constraint import Constraint
 
@@ -168,4 +168,53 @@ class BendingConstraint(Constraint):
                 nueva_pos = part4.location + delta_p4
                 if (not math.isnan(nueva_pos.x) and not math.isnan(nueva_pos.y) and not math.isnan(nueva_pos.z)):
                     part4.location = nueva_pos
-
+    
+    def proyecta_xpbd(self, dt):
+        """
+        Proyección XPBD del ángulo diedro: C = acos(d) - phi0 con compliance (xpbd_alpha)
+        Usa los gradientes exactos de Müller 2007 (Apéndice A, p1 en el origen):
+        q_i = -∂d/∂p_i, así que ∇_i C = q_i / sqrt(1 - d²) y Δp_i = w_i ∇_i C Δλ
+        """
+        p1 = self.particles[0].location
+        p2 = self.particles[1].location - p1
+        p3 = self.particles[2].location - p1
+        p4 = self.particles[3].location - p1
+        
+        c23 = p2.cross(p3)
+        c24 = p2.cross(p4)
+        len_23 = c23.length
+        len_24 = c24.length
+        if not (len_23 >= self.epsilon and len_24 >= self.epsilon):
+            return
+        n1 = c23 / len_23
+        n2 = c24 / len_24
+        
+        d = max(-1.0, min(1.0, n1.dot(n2)))
+        sqrt_term = math.sqrt(1.0 - d * d)
+        # Normales (anti)paralelas: el gradiente de acos no está definido (igual que en PBD)
+        if sqrt_term < self.epsilon:
+            return
+        self.C = math.acos(d) - self.phi0
+        
+        q3 = (p2.cross(n2) + n1.cross(p2) * d) / len_23
+        q4 = (p2.cross(n1) + n2.cross(p2) * d) / len_24
+        q2 = -((p3.cross(n2) + n1.cross(p3) * d) / len_23) - (p4.cross(n1) + n2.cross(p4) * d) / len_24
+        q1 = -(q2 + q3 + q4)
+        grads = [q / sqrt_term for q in (q1, q2, q3, q4)]
+        ws = [0.0 if p.bloqueada else p.w for p in self.particles]
+        
+        denom = sum(w * g.length_squared for w, g in zip(ws, grads))
+        if not denom >= self.epsilon:
+            return
+        
+        alpha = self.xpbd_alpha(denom, dt)
+        delta_lambda = self.xpbd_delta_lambda(self.C, denom, self.lambda_xpbd, alpha)
+        if not math.isfinite(delta_lambda):
+            return
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, max(w * g.length for w, g in zip(ws, grads)))
+        self.lambda_xpbd += delta_lambda
+        
+        for p, w, grad in zip(self.particles, ws, grads):
+            if w > 0.0:
+                p.location += grad * (w * delta_lambda)
@@ -0,0 +1,224 @@
+"""
+BendingConstraintBatch para Position-Based Dynamics (Müller 2007)
+Proyecta TODAS las restricciones de bending en pasadas NumPy
+Mismas fórmulas, epsilons y clamp que BendingConstraint
+Requiere el modo arrays de PBDSystem (ParticleStore)
+"""
+from core.Constraint import Constraint
+from core.ConstraintScheduler import colorear_indices
+from core.DeltaBuffer import DeltaBuffer
+from constraints.BendingConstraint import BendingConstraint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _norma(v):
+    return np.sqrt(np.einsum('ij,ij->i', v, v))
+
+
+class BendingConstraintBatch(BendingConstraint):
+    """
+    Lote de restricciones de bending guardado como arrays
+    indices: (B,4) índices (p1, p2, p3, p4) en el ParticleStore, p1-p2 es la arista compartida
+    phi0: (B,) ángulos diedros iniciales
+    stiffness / k_coef: (B,) rigidez y coeficiente ajustado por iteraciones
+    colores: filas de cada color (None = colorear al crear el lote)
+    """
+
+    def __init__(self, store, indices, phi0, k, metodo_coloreado='greedy', colores=None):
+        Constraint.__init__(self)
+        if np is None:
+            raise ImportError("BendingConstraintBatch requiere NumPy")
+
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64).reshape(-1, 4)
+        n = len(self.indices)
+        self.phi0 = np.broadcast_to(np.asarray(phi0, dtype=np.float64), (n,)).copy()
+        self.stiffness = np.broadcast_to(np.asarray(k, dtype=np.float64), (n,)).copy()
+        self.k_coef = self.stiffness.copy()
+        self.C = np.zeros(n, dtype=np.float64)
+        self.epsilon = 0.0001
+
+        if colores is None:
+            colores = colorear_indices(self.indices, store.n, metodo_coloreado)
+        self.colores = colores
+
+    @classmethod
+    def from_constraints(cls, store, constraints):
+        """
+        Crear un lote a partir de BendingConstraint existentes
+        (sus partículas deben ser ParticleView del mismo store)
+        """
+        indices = [[p.index for p in c.particles] for c in constraints]
+        phi0 = [c.phi0 for c in constraints]
+        ks = [c.stiffness for c in constraints]
+        return cls(store, indices, phi0, ks)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def compute_k_coef(self, n):
+        """
+        Ajustar coeficientes de rigidez según número de iteraciones del solver
+        k' = 1 - (1 - k)^(1/n)
+        """
+        if n > 0:
+            self.k_coef = 1.0 - np.power(1.0 - self.stiffness, 1.0 / n)
+        else:
+            self.k_coef = self.stiffness.copy()
+
+    def proyecta_restriccion(self):
+        """Proyecta todas las restricciones de bending, un color por pasada"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for color in self.colores:
+                self._proyectar_color(color)
+
+    def acumula_jacobi(self, buffer):
+        """Acumular en el DeltaBuffer las correcciones de todo el lote (sin colores)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            buffer.add(*self._correcciones(np.arange(len(self.indices))))
+
+    def _proyectar_color(self, sel):
+        indices, delta = self._correcciones(sel)
+        self.store.pos[indices] += delta
+
+    def _correcciones(self, sel):
+        """
+        Correcciones de las restricciones sel a partir de las posiciones actuales
+        Returns: (índices de partícula (M,), correcciones (M,3)), sin aplicarlas
+        """
+        pos = self.store.pos
+        eps = self.epsilon
+
+        idx = self.indices[sel]
+        p1 = pos[idx[:, 0]]
+        p2 = pos[idx[:, 1]]
+        p3 = pos[idx[:, 2]]
+        p4 = pos[idx[:, 3]]
+
+        # Normales n1 y n2
+        e1 = p2 - p1
+        e2 = p3 - p1
+        e3 = p4 - p1
+        n1 = np.cross(e1, e2)
+        n2 = np.cross(e1, e3)
+        len_n1 = _norma(n1)
+        len_n2 = _norma(n2)
+
+        # Validación: evitar normales degeneradas
+        ok = (len_n1 >= eps) & (len_n2 >= eps)
+        n1 = n1 / len_n1[:, None]
+        n2 = n2 / len_n2[:, None]
+
+        # d = dot(n1, n2) con clamp y C = acos(d) - phi0
+        d = np.clip(np.einsum('ij,ij->i', n1, n2), -1.0, 1.0)
+        C = np.arccos(d) - self.phi0[sel]
+        self.C[sel[ok]] = C[ok]
+        ok &= np.abs(C) >= eps
+
+        # Gradientes q1..q4 (Müller 2007, Apéndice B)
+        len_p2_p3 = _norma(p2 - p3)
+        len_p2_p4 = _norma(p2 - p4)
+        ok &= (len_p2_p3 >= eps) & (len_p2_p4 >= eps)
+
+        q3 = np.cross(e1, n2) / len_p2_p3[:, None]
+        q4 = np.cross(e1, n1) / len_p2_p4[:, None]
+        q2 = -(np.cross(e2, n2) / len_p2_p3[:, None] + np.cross(e3, n1) / len_p2_p4[:, None])
+        q1 = -(q2 + q3 + q4)
+        qs = (q1, q2, q3, q4)
+
+        sum_q2 = sum(np.einsum('ij,ij->i', q, q) for q in qs)
+        ok &= sum_q2 >= eps
+
+        w = self.store.w[idx]  # (m,4)
+        sum_w = w.sum(axis=1)
+        ok &= sum_w >= eps
+
+        sqrt_term = np.sqrt(1.0 - d * d)
+        ok &= sqrt_term >= eps
+        if not ok.any():
+            return DeltaBuffer.vacio()
+
+        factor = -(C / sqrt_term) / sum_q2 * self.k_coef[sel]
+
+        # Calcular correcciones con validación
+        bloqueada = self.store.bloqueada[idx]
+        salida_idx = []
+        salida_delta = []
+        for i, q in enumerate(qs):
+            aplicar = ok & ~bloqueada[:, i]
+            if not aplicar.any():
+                continue
+            delta = q[aplicar] * (4.0 * w[aplicar, i] * factor[aplicar] / sum_w[aplicar])[:, None]
+            validas = np.isfinite(delta).all(axis=1)
+            salida_delta.append(self.clamp_correction_rows(delta[validas]))
+            salida_idx.append(idx[aplicar, i][validas])
+
+        if not salida_idx:
+            return DeltaBuffer.vacio()
+        return np.concatenate(salida_idx), np.concatenate(salida_delta)
+
+    def reset_lambda(self):
+        """Reiniciar los multiplicadores XPBD de todo el lote"""
+        self.lambda_xpbd = np.zeros(len(self.indices), dtype=np.float64)
+
+    def proyecta_xpbd(self, dt):
+        """Proyección XPBD de todo el lote, un color por pasada (ver BendingConstraint.proyecta_xpbd)"""
+        if np.ndim(self.lambda_xpbd) == 0:
+            self.reset_lambda()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for color in self.colores:
+                self._proyectar_color_xpbd(color, dt)
+
+    def _proyectar_color_xpbd(self, sel, dt):
+        pos = self.store.pos
+        eps = self.epsilon
+
+        idx = self.indices[sel]
+        p1 = pos[idx[:, 0]]
+        p2 = pos[idx[:, 1]] - p1
+        p3 = pos[idx[:, 2]] - p1
+        p4 = pos[idx[:, 3]] - p1
+
+        c23 = np.cross(p2, p3)
+        c24 = np.cross(p2, p4)
+        len_23 = _norma(c23)[:, None]
+        len_24 = _norma(c24)[:, None]
+        n1 = c23 / len_23
+        n2 = c24 / len_24
+
+        d = np.clip(np.einsum('ij,ij->i', n1, n2), -1.0, 1.0)
+        sqrt_term = np.sqrt(1.0 - d * d)
+        C = np.arccos(d) - self.phi0[sel]
+        ok = (len_23[:, 0] >= eps) & (len_24[:, 0] >= eps) & (sqrt_term >= eps)
+        self.C[sel[ok]] = C[ok]
+
+        # q_i = -∂d/∂p_i (Müller 2007, Apéndice A) y ∇_i C = q_i / sqrt(1 - d²)
+        dd = d[:, None]
+        q3 = (np.cross(p2, n2) + np.cross(n1, p2) * dd) / len_23
+        q4 = (np.cross(p2, n1) + np.cross(n2, p2) * dd) / len_24
+        q2 = -(np.cross(p3, n2) + np.cross(n1, p3) * dd) / len_23 - (np.cross(p4, n1) + np.cross(n2, p4) * dd) / len_24
+        q1 = -(q2 + q3 + q4)
+        grads = [q / sqrt_term[:, None] for q in (q1, q2, q3, q4)]
+        normas = np.stack([_norma(g) for g in grads], axis=1)  # (m,4)
+
+        w = np.where(self.store.bloqueada[idx], 0.0, self.store.w[idx])  # (m,4)
+        denom = (w * normas * normas).sum(axis=1)
+        ok &= denom >= eps
+        if not ok.any():
+            return
+
+        sel = sel[ok]
+        denom = denom[ok]
+        alpha = self.xpbd_alpha(denom, dt, sel)
+        delta_lambda = self.xpbd_delta_lambda(C[ok], denom, self.lambda_xpbd[sel], alpha)
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, (w * normas)[ok].max(axis=1))
+        self.lambda_xpbd[sel] += delta_lambda
+
+        # Dentro de un color los índices no se repiten; w = 0 deja quietas las bloqueadas
+        for i, grad in enumerate(grads):
+            pos[idx[ok, i]] += grad[ok] * (w[ok, i] * delta_lambda)[:, None]
@@ -0,0 +1,406 @@
+"""
+Colliders - Colisionadores estáticos para Position-Based Dynamics
+Planos, esferas, cápsulas, cajas y mallas de triángulos (con BVH).
+Cada colisionador calcula de forma vectorizada la distancia con signo y la
+normal de contacto para un array de posiciones; ColliderSet resuelve todos
+los contactos de una iteración en una única narrowphase por lotes.
+
+Para la esfera dinámica con acoplamiento en dos sentidos ver SphereCollision.py
+"""
+from core.VectorBackend import mathutils
+from core.Constraint import Constraint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _normalizar(v):
+    """Normalizar filas (M,3); las filas nulas se devuelven como (0,0,1)"""
+    longitud = np.sqrt(np.einsum('ij,ij->i', v, v))
+    nula = longitud < 1e-12
+    longitud[nula] = 1.0
+    n = v / longitud[:, None]
+    n[nula] = (0.0, 0.0, 1.0)
+    return n, np.where(nula, 0.0, longitud)
+
+
+class Collider:
+    """
+    Clase base de los colisionadores estáticos
+    thickness: distancia de contacto (las partículas se mantienen a esta distancia de la superficie)
+    friction: fricción (0 = sin fricción, 1 = sin deslizamiento tangencial)
+    """
+
+    def __init__(self, thickness=0.0, friction=0.0):
+        if np is None:
+            raise ImportError(f"{type(self).__name__} requiere NumPy")
+        self.thickness = float(thickness)
+        self.friction = float(friction)
+        self.active = True
+
+    def aabb(self):
+        """Caja envolvente (lo, hi) o None si el colisionador no está acotado"""
+        return None
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        """
+        Distancia con signo y normal de contacto
+        pos: (M,3) posiciones
+        alcance: distancia máxima que interesa (fuera de ella el resultado puede ser +inf)
+        prev: (M,3) posiciones al inicio del paso (solo las usan las mallas, que no tienen interior)
+        token: el de preparar() si pos son las partículas que se prepararon (mallas);
+               None = consulta independiente
+        Returns: phi (M,), normal (M,3)
+        """
+        raise NotImplementedError
+
+
+class PlaneCollider(Collider):
+    """Plano infinito: point y normal (el lado de la normal es el exterior)"""
+
+    def __init__(self, point, normal, thickness=0.0, friction=0.0):
+        super().__init__(thickness, friction)
+        self.point = np.asarray(point, dtype=np.float64).reshape(3)
+        normal = np.asarray(normal, dtype=np.float64).reshape(1, 3)
+        self.normal = _normalizar(normal)[0][0]
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        phi = (pos - self.point) @ self.normal
+        return phi, np.broadcast_to(self.normal, pos.shape)
+
+
+class StaticSphereCollider(Collider):
+    """Esfera fija: center y radius"""
+
+    def __init__(self, center, radius, thickness=0.0, friction=0.0):
+        super().__init__(thickness, friction)
+        self.center = np.asarray(center, dtype=np.float64).reshape(3)
+        self.radius = float(radius)
+
+    def aabb(self):
+        return self.center - self.radius, self.center + self.radius
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        normal, longitud = _normalizar(pos - self.center)
+        return longitud - self.radius, normal
+
+
+class CapsuleCollider(Collider):
+    """Cápsula: segmento a-b con radio radius"""
+
+    def __init__(self, a, b, radius, thickness=0.0, friction=0.0):
+        super().__init__(thickness, friction)
+        self.a = np.asarray(a, dtype=np.float64).reshape(3)
+        self.b = np.asarray(b, dtype=np.float64).reshape(3)
+        self.radius = float(radius)
+
+    def aabb(self):
+        return np.minimum(self.a, self.b) - self.radius, np.maximum(self.a, self.b) + self.radius
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        ab = self.b - self.a
+        ab_sq = float(ab @ ab)
+        if ab_sq > 0:
+            t = np.clip(((pos - self.a) @ ab) / ab_sq, 0.0, 1.0)
+        else:
+            t = np.zeros(len(pos))
+        cercano = self.a + t[:, None] * ab
+        normal, longitud = _normalizar(pos - cercano)
+        return longitud - self.radius, normal
+
+
+class BoxCollider(Collider):
+    """
+    Caja orientada
+    center: centro; half_extents: semilados (3,)
+    rotation: matriz 3x3 cuyas columnas son los ejes locales (None = alineada con los ejes)
+    """
+
+    def __init__(self, center, half_extents, rotation=None, thickness=0.0, friction=0.0):
+        super().__init__(thickness, friction)
+        self.center = np.asarray(center, dtype=np.float64).reshape(3)
+        self.half_extents = np.asarray(half_extents, dtype=np.float64).reshape(3)
+        self.rotation = np.eye(3) if rotation is None else np.asarray(rotation, dtype=np.float64).reshape(3, 3)
+
+    def aabb(self):
+        radio = np.abs(self.rotation) @ self.half_extents
+        return self.center - radio, self.center + radio
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        local = (pos - self.center) @ self.rotation
+        d = np.abs(local) - self.half_extents
+        signo = np.where(local < 0, -1.0, 1.0)
+
+        # Fuera: distancia a la caja; dentro: la cara más cercana (distancia negativa)
+        exterior = np.maximum(d, 0.0)
+        normal_ext, dist_ext = _normalizar(exterior * signo)
+
+        eje = np.argmax(d, axis=1)
+        filas = np.arange(len(pos))
+        normal_int = np.zeros_like(local)
+        normal_int[filas, eje] = signo[filas, eje]
+
+        fuera = dist_ext > 0
+        phi = np.where(fuera, dist_ext, d[filas, eje])
+        normal = np.where(fuera[:, None], normal_ext, normal_int)
+        return phi, normal @ self.rotation.T
+
+
+class MeshCollider(Collider):
+    """
+    Malla de triángulos estática, tratada como una lámina de grosor thickness
+    (válida también para mallas abiertas). Los triángulos cercanos se buscan con una BVH.
+    El lado de la lámina se toma de la posición al inicio del paso, de modo que una
+    partícula que la atraviesa en un paso se devuelve al lado del que venía.
+    vertices: (V,3) en coordenadas de mundo; triangulos: (T,3) índices
+    """
+
+    def __init__(self, vertices, triangulos, thickness=0.01, friction=0.0, hoja_max=4):
+        super().__init__(thickness, friction)
+        from core.BVH import BVH
+        self.bvh = BVH(vertices, triangulos, hoja_max)
+        tri = self.bvh.vertices[self.bvh.triangulos]
+        self.tri_a = tri[:, 0]
+        self.tri_b = tri[:, 1]
+        self.tri_c = tri[:, 2]
+        self.tri_normal = _normalizar(np.cross(self.tri_b - self.tri_a, self.tri_c - self.tri_a))[0]
+        self._token = None  # Consulta preparada en preparar() (None = ninguna)
+
+    @classmethod
+    def from_blender_object(cls, obj, thickness=0.01, friction=0.0, depsgraph=None):
+        """
+        Crear el colisionador a partir de un objeto malla de Blender (en coordenadas de mundo)
+        depsgraph: si se indica, se usa la malla evaluada (con modificadores)
+        """
+        if depsgraph is not None:
+            obj_eval = obj.evaluated_get(depsgraph)
+            mesh = obj_eval.to_mesh()
+        else:
+            obj_eval = None
+            mesh = obj.data
+
+        mesh.calc_loop_triangles()
+        vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get('co', vertices)
+        triangulos = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int64)
+        mesh.loop_triangles.foreach_get('vertices', triangulos)
+
+        matriz = np.array(obj.matrix_world, dtype=np.float64)
+        vertices = vertices.reshape(-1, 3) @ matriz[:3, :3].T + matriz[:3, 3]
+
+        if obj_eval is not None:
+            obj_eval.to_mesh_clear()
+
+        print(f"   🔺 MeshCollider '{obj.name}': {len(vertices)} vértices, {len(triangulos) // 3} triángulos")
+        return cls(vertices, triangulos.reshape(-1, 3), thickness, friction)
+
+    def aabb(self):
+        return self.bvh.aabb()
+
+    def preparar(self, pos, prev, alcance, token=None):
+        """
+        Buscar en la BVH los triángulos candidatos de cada partícula (una vez por paso)
+        Cajas de consulta: segmento recorrido en el paso, ampliado con el alcance.
+        Se descartan los triángulos a más de alcance del más cercano de cada partícula
+        (se supone que durante las iteraciones la partícula se mueve menos que el alcance).
+        token: identificador de esta consulta; signed_distance solo reutiliza los
+               candidatos si recibe el mismo token (ColliderSet usa uno por rebuild)
+        """
+        q, t = self.bvh.query_aabbs(np.minimum(pos, prev) - alcance, np.maximum(pos, prev) + alcance)
+        orden = np.argsort(q, kind='stable')
+        q = q[orden]
+        t = t[orden]
+        self._token = token
+
+        if len(q) > 0:
+            from core.BVH import punto_triangulo_cercano
+            d = pos[q] - punto_triangulo_cercano(pos[q], self.tri_a[t], self.tri_b[t], self.tri_c[t])
+            dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+            dist[~np.isfinite(dist)] = np.inf
+            minimos = np.full(len(pos), np.inf)
+            np.minimum.at(minimos, q, dist)
+            cerca = dist <= minimos[q] + alcance
+            q = q[cerca]
+            t = t[cerca]
+
+        self._q = q
+        self._t = t
+        self._a = self.tri_a[t]
+        self._b = self.tri_b[t]
+        self._c = self.tri_c[t]
+
+        # Inicio de cada grupo de pares con la misma partícula
+        if len(q) > 0:
+            nuevo = np.ones(len(q), dtype=bool)
+            nuevo[1:] = q[1:] != q[:-1]
+            self._grupos = np.nonzero(nuevo)[0]
+        else:
+            self._grupos = np.zeros(0, dtype=np.int64)
+
+    def signed_distance(self, pos, alcance, prev=None, token=None):
+        phi = np.full(len(pos), np.inf)
+        normal = np.zeros_like(pos)
+
+        if prev is None:
+            prev = pos
+        if token is None or token is not self._token:
+            self.preparar(pos, prev, alcance)
+
+        q, t = self._q, self._t
+        if len(q) == 0:
+            return phi, normal
+
+        from core.BVH import punto_triangulo_cercano
+        p = pos[q]
+        n, dist = _normalizar(p - punto_triangulo_cercano(p, self._a, self._b, self._c))
+        dist[~np.isfinite(dist)] = np.inf
+
+        # Sobre la superficie, usar la normal del triángulo
+        sobre = dist < 1e-9
+        n[sobre] = self.tri_normal[t[sobre]]
+
+        # Quedarse con el triángulo más cercano de cada partícula (primer mínimo de cada grupo)
+        minimos = np.minimum.reduceat(dist, self._grupos)
+        cuenta = np.diff(np.append(self._grupos, len(q)))
+        candidatos = np.nonzero(dist <= np.repeat(minimos, cuenta))[0]
+        primero = np.ones(len(candidatos), dtype=bool)
+        primero[1:] = q[candidatos][1:] != q[candidatos][:-1]
+        elegidos = candidatos[primero & np.isfinite(dist[candidatos])]
+
+        q, t, dist, n = q[elegidos], t[elegidos], dist[elegidos], n[elegidos]
+
+        # Lado de la lámina al inicio del paso: si ahora está al otro lado, la ha atravesado
+        n_tri = self.tri_normal[t]
+        lado = np.where(np.einsum('ij,ij->i', prev[q] - self.tri_a[t], n_tri) < 0, -1.0, 1.0)
+        n_lado = n_tri * lado[:, None]
+        cruzada = np.einsum('ij,ij->i', pos[q] - self.tri_a[t], n_lado) < 0
+
+        phi[q] = np.where(cruzada, -dist, dist)
+        normal[q] = np.where(cruzada[:, None], n_lado, n)
+        return phi, normal
+
+
+class ColliderSet:
+    """
+    Conjunto de colisionadores estáticos de un PBDSystem
+    rebuild() (una vez por paso) selecciona para cada colisionador las partículas
+    cuyo recorrido toca su caja envolvente y prepara la búsqueda en las mallas.
+    project() (cada iteración) calcula el contacto más profundo de cada partícula
+    entre todos los colisionadores y aplica una única corrección por partícula.
+    stiffness: rigidez de la corrección (0-1)
+    margin: margen de búsqueda alrededor del grosor de cada colisionador
+    """
+
+    def __init__(self, system, stiffness=1.0, margin=0.01):
+        if np is None:
+            raise ImportError("ColliderSet requiere NumPy")
+        self.system = system
+        self.colliders = []
+        self.stiffness = stiffness
+        self.margin = margin
+        self.num_contactos = 0
+        self._candidatos = None  # Por colisionador: índices de partícula (o None si inactivo)
+        self._token = None  # Token de la consulta preparada en el último rebuild
+
+    def add(self, collider):
+        """Añadir un colisionador"""
+        self.colliders.append(collider)
+        self._candidatos = None
+        return collider
+
+    def __len__(self):
+        return len(self.colliders)
+
+    def _estado(self):
+        """Posiciones, posiciones previas y masas inversas (0 si bloqueada)"""
+        store = self.system.store
+        if store is not None:
+            return store.pos, store.prev, np.where(store.bloqueada, 0.0, store.w)
+        particles = self.system.particles
+        pos = np.array([tuple(p.location) for p in particles], dtype=np.float64).reshape(-1, 3)
+        prev = np.array([tuple(p.last_location) for p in particles], dtype=np.float64).reshape(-1, 3)
+        w = np.array([0.0 if p.bloqueada else p.w for p in particles], dtype=np.float64)
+        return pos, prev, w
+
+    def rebuild(self):
+        """Broadphase del paso (posiciones predichas)"""
+        pos, prev, w = self._estado()
+        libres = np.nonzero(w > 0)[0]
+        p_lo = np.minimum(pos[libres], prev[libres])
+        p_hi = np.maximum(pos[libres], prev[libres])
+
+        self._candidatos = []
+        self._token = object()
+        for collider in self.colliders:
+            if not collider.active:
+                self._candidatos.append(None)
+                continue
+            alcance = collider.thickness + self.margin
+
+            # Descartar partículas cuyo recorrido del paso no toca la caja del colisionador
+            caja = collider.aabb()
+            if caja is not None:
+                dentro = (np.all(p_hi >= caja[0] - alcance, axis=1) &
+                          np.all(p_lo <= caja[1] + alcance, axis=1))
+                sel = libres[dentro]
+            else:
+                sel = libres
+            self._candidatos.append(sel)
+
+            if len(sel) > 0 and hasattr(collider, 'preparar'):
+                collider.preparar(pos[sel], prev[sel], alcance, self._token)
+
+    def project(self):
+        """Narrowphase por lotes y resolución de contactos"""
+        self.num_contactos = 0
+        if not self.colliders:
+            return
+        if self._candidatos is None or len(self._candidatos) != len(self.colliders):
+            self.rebuild()
+
+        pos, prev, w = self._estado()
+        n_part = len(pos)
+        mejor_phi = np.full(n_part, np.inf)
+        mejor_normal = np.zeros((n_part, 3))
+        mejor_friccion = np.zeros(n_part)
+
+        for collider, sel in zip(self.colliders, self._candidatos):
+            if sel is None or len(sel) == 0 or not collider.active:
+                continue
+
+            phi, normal = collider.signed_distance(pos[sel], collider.thickness + self.margin, prev[sel],
+                                                   self._token)
+            phi = phi - collider.thickness
+            mas_profundo = phi < mejor_phi[sel]
+            idx = sel[mas_profundo]
+            mejor_phi[idx] = phi[mas_profundo]
+            mejor_normal[idx] = normal[mas_profundo]
+            mejor_friccion[idx] = collider.friction
+
+        idx = np.nonzero(mejor_phi < 0)[0]
+        self.num_contactos = len(idx)
+        if self.num_contactos == 0:
+            return
+
+        n = mejor_normal[idx]
+        delta = n * (-mejor_phi[idx] * self.stiffness)[:, None]
+
+        # Fricción: reducir el desplazamiento tangencial del paso
+        friccion = mejor_friccion[idx]
+        if friccion.any():
+            desplazamiento = pos[idx] + delta - prev[idx]
+            tangencial = desplazamiento - n * np.einsum('ij,ij->i', desplazamiento, n)[:, None]
+            delta -= tangencial * friccion[:, None]
+
+        validas = np.isfinite(delta).all(axis=1)
+        idx = idx[validas]
+        delta = Constraint.clamp_correction_rows(delta[validas])
+
+        if self.system.store is not None:
+            pos[idx] += delta
+        else:
+            for i, dp in zip(idx.tolist(), delta.tolist()):
+                particula = self.system.particles[i]
+                particula.location = particula.location + mathutils.Vector(dp)
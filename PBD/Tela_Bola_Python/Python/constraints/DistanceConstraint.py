@@ -3,7 +3,7 @@ DistanceConstraint para Position-Based Dynamics
 Mantiene constante la distancia entre dos partículas
 Migrado de JavaScript a Python para Blender
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.Constraint import Constraint
 
@@ -86,3 +86,34 @@ class DistanceConstraint(Constraint):
             if not (math.isnan(nueva_pos2.x) or math.isnan(nueva_pos2.y) or math.isnan(nueva_pos2.z)):
                 part2.location = nueva_pos2
 
+    def proyecta_xpbd(self, dt):
+        """Proyección XPBD: C = |p1 - p2| - d con compliance (xpbd_alpha), sin k' por iteraciones"""
+        part1 = self.particles[0]
+        part2 = self.particles[1]
+
+        vd = part1.location - part2.location
+        dist_actual = vd.length
+        if not math.isfinite(dist_actual) or dist_actual < self.epsilon:
+            return
+
+        self.C = dist_actual - self.d
+        w1 = 0.0 if part1.bloqueada else part1.w
+        w2 = 0.0 if part2.bloqueada else part2.w
+        w_sum = w1 + w2
+        if w_sum < self.epsilon:
+            return
+
+        alpha = self.xpbd_alpha(w_sum, dt)
+        delta_lambda = self.xpbd_delta_lambda(self.C, w_sum, self.lambda_xpbd, alpha)
+        if not math.isfinite(delta_lambda):
+            return
+        # Clamp antes de acumular (la dirección n es unitaria: |corrección| = |Δλ|)
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, 1.0)
+        self.lambda_xpbd += delta_lambda
+
+        correction = vd * (delta_lambda / dist_actual)
+        if w1 > 0.0:
+            part1.location = part1.location + correction * w1
+        if w2 > 0.0:
+            part2.location = part2.location - correction * w2
+
@@ -0,0 +1,169 @@
+"""
+DistanceConstraintBatch para Position-Based Dynamics
+Proyecta TODAS las restricciones de distancia de un sistema en pasadas NumPy
+Requiere el modo arrays de PBDSystem (ParticleStore)
+"""
+from core.Constraint import Constraint
+from core.ConstraintScheduler import colorear_indices
+from core.DeltaBuffer import DeltaBuffer
+from constraints.DistanceConstraint import DistanceConstraint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class DistanceConstraintBatch(DistanceConstraint):
+    """
+    Lote de restricciones de distancia guardado como arrays
+    indices: (E,2) índices de partícula en el ParticleStore
+    d: (E,) distancias de reposo
+    stiffness / k_coef: (E,) rigidez y coeficiente ajustado por iteraciones
+    colores: filas de cada color (None = colorear al crear el lote)
+
+    Las aristas se agrupan por colores (sin partículas compartidas dentro de un color):
+    dentro de un color la proyección es Jacobi (vectorizada) y entre colores es
+    Gauss-Seidel, igual que el bucle original arista a arista.
+    """
+
+    def __init__(self, store, indices, dists, k, metodo_coloreado='greedy', colores=None):
+        Constraint.__init__(self)
+        if np is None:
+            raise ImportError("DistanceConstraintBatch requiere NumPy")
+
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64).reshape(-1, 2)
+        n = len(self.indices)
+        self.d = np.broadcast_to(np.asarray(dists, dtype=np.float64), (n,)).copy()
+        self.stiffness = np.broadcast_to(np.asarray(k, dtype=np.float64), (n,)).copy()
+        self.k_coef = self.stiffness.copy()
+        self.C = np.zeros(n, dtype=np.float64)
+        self.epsilon = 0.0001
+
+        if colores is None:
+            colores = colorear_indices(self.indices, store.n, metodo_coloreado)
+        self.colores = colores
+
+    @classmethod
+    def from_constraints(cls, store, constraints):
+        """
+        Crear un lote a partir de DistanceConstraint existentes
+        (sus partículas deben ser ParticleView del mismo store)
+        """
+        indices = [(c.particles[0].index, c.particles[1].index) for c in constraints]
+        dists = [c.d for c in constraints]
+        ks = [c.stiffness for c in constraints]
+        return cls(store, indices, dists, ks)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def compute_k_coef(self, n):
+        """
+        Ajustar coeficientes de rigidez según número de iteraciones del solver
+        k' = 1 - (1 - k)^(1/n)
+        """
+        if n > 0:
+            self.k_coef = 1.0 - np.power(1.0 - self.stiffness, 1.0 / n)
+        else:
+            self.k_coef = self.stiffness.copy()
+
+    def proyecta_restriccion(self):
+        """Proyecta todas las aristas, un color por pasada"""
+        for color in self.colores:
+            self._proyectar_color(color)
+
+    def acumula_jacobi(self, buffer):
+        """Acumular en el DeltaBuffer las correcciones de todas las aristas (sin colores)"""
+        buffer.add(*self._correcciones(np.arange(len(self.indices))))
+
+    def _proyectar_color(self, sel):
+        indices, delta = self._correcciones(sel)
+        self.store.pos[indices] += delta
+
+    def _correcciones(self, sel):
+        """
+        Correcciones de las aristas sel a partir de las posiciones actuales
+        Returns: (índices de partícula (M,), correcciones (M,3)), sin aplicarlas
+        """
+        pos = self.store.pos
+        w = self.store.w
+        bloqueada = self.store.bloqueada
+
+        i = self.indices[sel, 0]
+        j = self.indices[sel, 1]
+
+        # Vector de diferencia entre partículas
+        vd = pos[i] - pos[j]
+        dist_actual = np.sqrt(np.einsum('ij,ij->i', vd, vd))
+
+        # Calcular constraint: C = |p1 - p2| - d
+        C = dist_actual - self.d[sel]
+        self.C[sel] = C
+
+        # Descartar aristas degeneradas, con ambas partículas fijas o con NaN
+        w_sum = w[i] + w[j]
+        validas = (dist_actual >= self.epsilon) & (w_sum >= self.epsilon) & np.isfinite(dist_actual)
+        if not validas.any():
+            return DeltaBuffer.vacio()
+
+        i = i[validas]
+        j = j[validas]
+        n = vd[validas] / dist_actual[validas, None]
+        delta_lambda = -self.k_coef[sel][validas] * C[validas] / w_sum[validas]
+        correction = n * delta_lambda[:, None]
+
+        # CRÍTICO: Clamp de corrección (Müller 2007, Macklin FleX)
+        correction = self.clamp_correction_rows(correction)
+
+        # Correcciones de cada extremo (dentro de un color los índices no se repiten)
+        libres_i = ~bloqueada[i]
+        libres_j = ~bloqueada[j]
+        return (np.concatenate((i[libres_i], j[libres_j])),
+                np.concatenate((correction[libres_i] * w[i[libres_i], None],
+                                -correction[libres_j] * w[j[libres_j], None])))
+
+    def reset_lambda(self):
+        """Reiniciar los multiplicadores XPBD de todas las aristas"""
+        self.lambda_xpbd = np.zeros(len(self.indices), dtype=np.float64)
+
+    def proyecta_xpbd(self, dt):
+        """Proyección XPBD de todas las aristas, un color por pasada"""
+        if np.ndim(self.lambda_xpbd) == 0:
+            self.reset_lambda()
+        for color in self.colores:
+            self._proyectar_color_xpbd(color, dt)
+
+    def _proyectar_color_xpbd(self, sel, dt):
+        pos = self.store.pos
+        bloqueada = self.store.bloqueada
+
+        i = self.indices[sel, 0]
+        j = self.indices[sel, 1]
+        wi = np.where(bloqueada[i], 0.0, self.store.w[i])
+        wj = np.where(bloqueada[j], 0.0, self.store.w[j])
+
+        vd = pos[i] - pos[j]
+        dist_actual = np.sqrt(np.einsum('ij,ij->i', vd, vd))
+        C = dist_actual - self.d[sel]
+        self.C[sel] = C
+
+        w_sum = wi + wj
+        validas = (dist_actual >= self.epsilon) & (w_sum >= self.epsilon) & np.isfinite(dist_actual)
+        if not validas.any():
+            return
+
+        sel = sel[validas]
+        w_sum = w_sum[validas]
+        alpha = self.xpbd_alpha(w_sum, dt, sel)
+        delta_lambda = self.xpbd_delta_lambda(C[validas], w_sum, self.lambda_xpbd[sel], alpha)
+        # Clamp antes de acumular (la dirección n es unitaria: |corrección| = |Δλ|)
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, 1.0)
+        self.lambda_xpbd[sel] += delta_lambda
+
+        correction = vd[validas] * (delta_lambda / dist_actual[validas])[:, None]
+
+        # Dentro de un color los índices no se repiten; w = 0 deja quietas las bloqueadas
+        pos[i[validas]] += correction * wi[validas, None]
+        pos[j[validas]] -= correction * wj[validas, None]
@@ -0,0 +1,175 @@
+"""
+SelfCollision - Auto-colisión partícula-partícula para telas PBD
+Cada paso se reconstruye un hash espacial con las posiciones predichas y se
+buscan los pares de partículas más cercanos que el grosor (más un margen).
+Los vecinos topológicos (unidos por una DistanceConstraint) se excluyen.
+En cada iteración del solver los contactos se resuelven en una pasada NumPy:
+las correcciones se acumulan por partícula y se promedian (Jacobi).
+"""
+from core.VectorBackend import mathutils
+from core.Constraint import Constraint
+from core.SpatialHash import SpatialHash
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SelfCollider:
+    """
+    Auto-colisión de las partículas de un PBDSystem
+    thickness: distancia mínima entre partículas no vecinas
+    stiffness: rigidez de la corrección (0-1)
+    margin: margen de búsqueda de pares (las partículas se mueven durante
+            las iteraciones después de construir el hash). Por defecto thickness/2
+    El coste crece con thickness + margin frente a la separación de la malla: cuando la
+    supera, los vecinos diagonales (no excluidos) pasan a ser candidatos. En una tela
+    100x100 de 1 m con solo restricciones de distancia y 5 iteraciones, el paso
+    cuesta ~20% más con thickness 0.005 y ~50% más con 0.012 (separación 0.01).
+    """
+
+    def __init__(self, system, thickness, stiffness=1.0, margin=None):
+        if np is None:
+            raise ImportError("SelfCollider requiere NumPy")
+        if thickness <= 0:
+            raise ValueError(f"thickness debe ser positivo (recibido {thickness})")
+
+        self.system = system
+        self.thickness = float(thickness)
+        self.stiffness = stiffness
+        self.margin = self.thickness * 0.5 if margin is None else float(margin)
+        self.active = True
+        self.epsilon = 0.0001
+
+        self.hash = SpatialHash(self.thickness + self.margin)
+        self.pares_i = np.zeros(0, dtype=np.int64)
+        self.pares_j = np.zeros(0, dtype=np.int64)
+        self.num_contactos = 0
+
+        self.excluidos = None
+        self._version = None
+        self.actualizar_vecinos()
+
+    def actualizar_vecinos(self):
+        """
+        Precalcular los pares excluidos a partir del grafo de DistanceConstraint
+        Se guardan como claves ordenadas min(i,j) * N + max(i,j)
+        """
+        from constraints.DistanceConstraint import DistanceConstraint
+
+        n = len(self.system.particles)
+        indice = None
+        aristas = []
+        for c in self.system.constraints:
+            if not isinstance(c, DistanceConstraint):
+                continue
+            if hasattr(c, 'indices'):
+                # DistanceConstraintBatch: aristas ya indexadas
+                aristas.append(c.indices[:, :2])
+                continue
+            if indice is None:
+                indice = {id(p): i for i, p in enumerate(self.system.particles)}
+            a = indice.get(id(c.particles[0]))
+            b = indice.get(id(c.particles[1]))
+            if a is not None and b is not None:
+                aristas.append(np.array([[a, b]], dtype=np.int64))
+
+        if aristas:
+            aristas = np.concatenate(aristas)
+            claves = np.minimum(aristas[:, 0], aristas[:, 1]) * n + np.maximum(aristas[:, 0], aristas[:, 1])
+            self.excluidos = np.unique(claves)
+        else:
+            self.excluidos = np.zeros(0, dtype=np.int64)
+
+        self._version = self.system.topology_version
+
+    def _posiciones(self):
+        """Posiciones actuales como array (N,3) (vista directa en modo arrays)"""
+        if self.system.store is not None:
+            return self.system.store.pos
+        return np.array([tuple(p.location) for p in self.system.particles], dtype=np.float64).reshape(-1, 3)
+
+    def _masas_inversas(self):
+        """Masas inversas (0 para partículas bloqueadas)"""
+        store = self.system.store
+        if store is not None:
+            return np.where(store.bloqueada, 0.0, store.w)
+        return np.array([0.0 if p.bloqueada else p.w for p in self.system.particles], dtype=np.float64)
+
+    def rebuild(self):
+        """
+        Reconstruir el hash y la lista de pares candidatos (una vez por paso)
+        """
+        if self._version != self.system.topology_version:
+            self.actualizar_vecinos()
+
+        pos = self._posiciones()
+        n = len(pos)
+        self.hash.build(pos)
+        i, j = self.hash.query_pairs(self.hash.cell_size)
+
+        # Excluir vecinos topológicos (búsqueda binaria en las claves ordenadas)
+        if len(i) > 0 and len(self.excluidos) > 0:
+            claves = i * n + j
+            k = np.searchsorted(self.excluidos, claves)
+            k[k == len(self.excluidos)] = 0
+            libres = self.excluidos[k] != claves
+            i = i[libres]
+            j = j[libres]
+
+        # Excluir pares en los que ninguna partícula puede moverse
+        w = self._masas_inversas()
+        movibles = (w[i] + w[j]) > 0
+        self.pares_i = i[movibles]
+        self.pares_j = j[movibles]
+
+    def project(self):
+        """Resolver los contactos entre los pares candidatos (una pasada vectorizada)"""
+        if not self.active or len(self.pares_i) == 0:
+            self.num_contactos = 0
+            return
+
+        pos = self._posiciones()
+        w = self._masas_inversas()
+        i = self.pares_i
+        j = self.pares_j
+
+        d = pos[i] - pos[j]
+        dist = np.sqrt(np.einsum('ij,ij->i', d, d))
+
+        # Contacto: más cerca que el grosor (las partículas coincidentes se ignoran)
+        contacto = (dist < self.thickness) & (dist > self.epsilon)
+        self.num_contactos = int(contacto.sum())
+        if self.num_contactos == 0:
+            return
+
+        i = i[contacto]
+        j = j[contacto]
+        wi = w[i]
+        wj = w[j]
+        normal = d[contacto] / dist[contacto][:, None]
+
+        # C = dist - grosor < 0 ; Δp = -C / (wi + wj) * n * k
+        s = (self.thickness - dist[contacto]) / (wi + wj) * self.stiffness
+        corr_i = normal * (s * wi)[:, None]
+        corr_j = normal * (-s * wj)[:, None]
+
+        # Acumular por partícula y promediar (una partícula puede estar en varios pares)
+        n = len(pos)
+        indices = np.concatenate((i, j))
+        correcciones = np.concatenate((corr_i, corr_j))
+        cuenta = np.bincount(indices, minlength=n)
+        delta = np.stack([np.bincount(indices, weights=correcciones[:, eje], minlength=n)
+                          for eje in range(3)], axis=1)
+
+        tocadas = np.nonzero(cuenta)[0]
+        delta = delta[tocadas] / cuenta[tocadas][:, None]
+        delta = Constraint.clamp_correction_rows(delta)
+
+        if self.system.store is not None:
+            pos[tocadas] += delta
+        else:
+            for idx, dp in zip(tocadas.tolist(), delta.tolist()):
+                particula = self.system.particles[idx]
+                particula.location = particula.location + mathutils.Vector(dp)
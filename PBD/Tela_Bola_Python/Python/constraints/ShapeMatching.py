@@ -0,0 +1,275 @@
+"""
+ShapeMatching - Shape Matching de Müller et al. (2005), "Meshless Deformations
+Based on Shape Matching", con clusters solapados (Lattice Shape Matching,
+Rivers y James 2007)
+Cada cluster busca la rotación R que mejor lleva su forma de reposo a las
+posiciones actuales: A_pq = Σ m (x - c)(q - q_cm)ᵀ y R es el factor de rotación
+de la descomposición polar de A_pq (por SVD, en lote para todos los clusters).
+El objetivo de cada partícula es la media de c + R (q - q_cm) de sus clusters.
+Como A_pq = Σ m x qᵀ - (Σ m x) q_cmᵀ, los productos m x qᵀ y m x se calculan una
+sola vez por partícula en cada pasada y cada cluster solo suma los de sus
+miembros (con clusters solapados hay ~27 pertenencias por partícula).
+Con clusters='lattice' las sumas por cluster son sumas de caja sobre la rejilla
+y se calculan con sumas prefijas por eje (FastLSM, Rivers y James 2007): el coste
+no depende del tamaño de los clusters.
+"""
+from core.Constraint import Constraint
+from core.VectorBackend import mathutils
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def celdas_lattice(posiciones, espaciado=None):
+    """
+    Celda entera (N,3) de cada partícula en una rejilla de lado 'espaciado'
+    (None = menor separación entre coordenadas distintas), con origen en la mínima
+    """
+    posiciones = np.asarray(posiciones, dtype=np.float64)
+    if espaciado is None:
+        separaciones = [np.diff(np.unique(np.round(posiciones[:, eje], 9))) for eje in range(3)]
+        separaciones = np.concatenate(separaciones)
+        separaciones = separaciones[separaciones > 1e-9]
+        if len(separaciones) == 0:
+            raise ValueError("No se puede deducir el espaciado de la rejilla")
+        espaciado = separaciones.min()
+    return np.rint((posiciones - posiciones.min(axis=0)) / espaciado).astype(np.int64)
+
+
+def clusters_lattice(posiciones, espaciado=None, radio=1):
+    """
+    Clusters de Lattice Shape Matching: uno por partícula, con las partículas
+    cuya posición de reposo está a ≤ radio celdas en cada eje (caja (2r+1)³)
+    posiciones: (N,3) posiciones de reposo sobre una rejilla de lado 'espaciado'
+    espaciado: lado de la celda (None = menor separación entre coordenadas distintas)
+    Returns: lista de arrays de índices (un cluster por partícula)
+    """
+    celdas = celdas_lattice(posiciones, espaciado)
+    indice = {tuple(c): i for i, c in enumerate(celdas.tolist())}
+    desplazamientos = [(dx, dy, dz)
+                       for dx in range(-radio, radio + 1)
+                       for dy in range(-radio, radio + 1)
+                       for dz in range(-radio, radio + 1)]
+
+    clusters = []
+    for cx, cy, cz in celdas.tolist():
+        miembros = [indice[(cx + dx, cy + dy, cz + dz)] for dx, dy, dz in desplazamientos
+                    if (cx + dx, cy + dy, cz + dz) in indice]
+        clusters.append(np.array(sorted(miembros), dtype=np.int64))
+    return clusters
+
+
+def suma_caja(campo, radio):
+    """
+    Suma de cada celda de un campo (X,Y,Z,k) con sus vecinas a ≤ radio celdas en cada
+    eje: tres pasadas separables con sumas prefijas (O(celdas), no O(celdas·(2r+1)³))
+    """
+    for eje in range(3):
+        n = campo.shape[eje]
+        forma_cero = list(campo.shape)
+        forma_cero[eje] = 1
+        acumulada = np.concatenate((np.zeros(forma_cero), np.cumsum(campo, axis=eje)), axis=eje)
+        i = np.arange(n)
+        hasta = np.minimum(i + radio + 1, n)
+        desde = np.maximum(i - radio, 0)
+        campo = np.take(acumulada, hasta, axis=eje) - np.take(acumulada, desde, axis=eje)
+    return campo
+
+
+class ShapeMatching:
+    """
+    Shape Matching de las partículas de un PBDSystem (se aplica con apply())
+    clusters: lista de secuencias de índices (pueden solaparse); None = un único
+              cluster con todas las partículas (Müller 2005); 'lattice' = un cluster
+              (2r+1)³ por partícula de la rejilla, resuelto con sumas de caja (FastLSM)
+    stiffness: fracción del camino hacia el objetivo en cada apply (0-1)
+    max_correction: límite de la corrección por partícula y apply (metros)
+    radio, espaciado: caja y lado de la rejilla con clusters='lattice' (ver clusters_lattice)
+    Las posiciones de reposo son las del sistema al crear el ShapeMatching.
+    """
+
+    MIN_CLUSTER = 4  # Con menos partículas (no coplanares) la rotación no está definida
+
+    def __init__(self, system, clusters=None, stiffness=0.5, max_correction=0.05, radio=1, espaciado=None):
+        if np is None:
+            raise ImportError("ShapeMatching requiere NumPy")
+
+        self.system = system
+        self.stiffness = stiffness
+        self.max_correction = max_correction
+        self.active = True
+
+        reposo = self._posiciones()
+        n = len(reposo)
+
+        # Peso de cada partícula: su masa; las fijas (masa inf) pesan como la más pesada
+        masa = self._masas()
+        finitas = np.isfinite(masa) & (masa > 0)
+        masa_max = masa[finitas].max() if finitas.any() else 1.0
+        self.masa = np.where(finitas, masa, masa_max)
+
+        # Forma de reposo (relativa a su media, para no perder precisión lejos del origen)
+        self.reposo = reposo - reposo.mean(axis=0)
+
+        self.lattice = isinstance(clusters, str)
+        if self.lattice:
+            if clusters != 'lattice':
+                raise ValueError(f"clusters debe ser una lista, None o 'lattice' (recibido {clusters!r})")
+            self._preparar_lattice(reposo, radio, espaciado)
+        else:
+            self._preparar_clusters(clusters, n)
+
+        print(f"✨ Shape Matching creado: {n} partículas, {self.num_clusters} clusters "
+              f"({self.num_pertenencias} pertenencias, stiffness={stiffness})")
+
+    def _preparar_clusters(self, clusters, n):
+        """Clusters explícitos: pertenencias ordenadas por cluster y sumas con reduceat"""
+        if clusters is None:
+            clusters = [np.arange(n)]
+        clusters = [np.asarray(c, dtype=np.int64) for c in clusters]
+        clusters = [c for c in clusters if len(c) >= self.MIN_CLUSTER]
+        if not clusters:
+            raise ValueError(f"ShapeMatching necesita algún cluster de ≥ {self.MIN_CLUSTER} partículas")
+
+        # Pertenencias ordenadas por cluster: miembro k = partícula miembros[k] del cluster de[k]
+        self.num_clusters = len(clusters)
+        self.miembros = np.concatenate(clusters)
+        self.num_pertenencias = len(self.miembros)
+        self.de = np.repeat(np.arange(self.num_clusters), [len(c) for c in clusters])
+        self.inicios = np.concatenate(([0], np.cumsum([len(c) for c in clusters])[:-1]))
+
+        m = self.masa[self.miembros]
+        self.masa_cluster = np.add.reduceat(m, self.inicios)
+        self.q_cm = np.add.reduceat(self.reposo[self.miembros] * m[:, None], self.inicios) / self.masa_cluster[:, None]
+        # Forma de reposo de cada pertenencia relativa al centro de masas de su cluster
+        self.q = self.reposo[self.miembros] - self.q_cm[self.de]
+
+        # Número de clusters de cada partícula (para promediar los objetivos)
+        self.num_clusters_particula = np.bincount(self.miembros, minlength=n)
+
+    def _preparar_lattice(self, reposo, radio, espaciado):
+        """
+        Clusters de rejilla: el cluster de cada partícula es la caja de su celda, así que
+        toda suma por cluster es una suma de caja del campo por partícula (suma_caja)
+        """
+        self.radio = radio
+        self.celdas = celdas_lattice(reposo, espaciado)
+        self.forma = tuple(int(v) for v in self.celdas.max(axis=0) + 1)
+        if len(np.unique(self.celdas, axis=0)) != len(self.celdas):
+            raise ValueError("clusters='lattice' necesita como mucho una partícula por celda")
+
+        tamano = self._por_cluster(np.ones(len(reposo)))
+        # Los clusters pequeños no cuentan: ni se rotan ni aportan objetivos
+        self.cluster_valido = tamano >= self.MIN_CLUSTER
+        if not self.cluster_valido.any():
+            raise ValueError(f"ShapeMatching necesita algún cluster de ≥ {self.MIN_CLUSTER} partículas")
+        self.num_clusters = int(self.cluster_valido.sum())
+        self.num_pertenencias = int(tamano[self.cluster_valido].sum())
+
+        self.masa_cluster = self._por_cluster(self.masa)
+        self.q_cm = self._por_cluster(self.reposo * self.masa[:, None]) / self.masa_cluster[:, None]
+        # Una partícula está en los clusters de las celdas de su caja (la caja es simétrica)
+        self.num_clusters_particula = np.rint(self._por_cluster(self.cluster_valido.astype(np.float64))).astype(np.int64)
+
+    def _por_cluster(self, valores):
+        """Suma de valores (N,) o (N,k) por partícula sobre el cluster de cada partícula (rejilla)"""
+        columna = valores.ndim == 1
+        valores = valores.reshape(len(valores), -1)
+        campo = np.zeros(self.forma + (valores.shape[1],))
+        cx, cy, cz = self.celdas.T
+        campo[cx, cy, cz] = valores
+        suma = suma_caja(campo, self.radio)[cx, cy, cz]
+        return suma[:, 0] if columna else suma
+
+    def _posiciones(self):
+        """Posiciones actuales como array (N,3) (vista directa en modo arrays)"""
+        if self.system.store is not None:
+            return self.system.store.pos
+        return np.array([tuple(p.location) for p in self.system.particles], dtype=np.float64).reshape(-1, 3)
+
+    def _masas(self):
+        if self.system.store is not None:
+            return np.array(self.system.store.masa, dtype=np.float64)
+        return np.array([p.masa for p in self.system.particles], dtype=np.float64)
+
+    def _movibles(self):
+        """Partículas que puede mover el Shape Matching (ni fijas ni en contacto con la esfera)"""
+        particulas = self.system.particles
+        if self.system.store is not None:
+            movibles = ~self.system.store.bloqueada
+        else:
+            movibles = np.fromiter((not p.bloqueada for p in particulas), dtype=bool, count=len(particulas))
+        # Las partículas en contacto con la esfera no se mueven: la colisión "gana"
+        if self.system.sphereCollider is not None:
+            movibles &= ~np.fromiter((p.inCollisionWithSphere for p in particulas), dtype=bool,
+                                     count=len(particulas))
+        return movibles
+
+    def rotaciones(self, pos):
+        """
+        Centros de masas (C,3) y rotaciones (C,3,3) de todos los clusters
+        R = U Vᵀ con A_pq = U Σ Vᵀ (det(R) = +1: sin reflexiones)
+        """
+        # Términos por partícula (A_pq no cambia al trasladar x: se centra para ganar precisión)
+        origen = pos.mean(axis=0)
+        mx = (pos - origen) * self.masa[:, None]
+        mxq = np.einsum('ni,nj->nij', mx, self.reposo).reshape(-1, 9)
+
+        # Sumas por cluster: Σ m x, Σ m x qᵀ (sumas de caja en la rejilla o reduceat)
+        if self.lattice:
+            sumas = self._por_cluster(np.hstack((mx, mxq)))
+            suma_mx, A = sumas[:, :3], sumas[:, 3:].reshape(-1, 3, 3)
+        else:
+            suma_mx = np.add.reduceat(mx[self.miembros], self.inicios)
+            A = np.add.reduceat(mxq[self.miembros], self.inicios).reshape(-1, 3, 3)
+        c = origen + suma_mx / self.masa_cluster[:, None]
+        A -= np.einsum('ci,cj->cij', suma_mx, self.q_cm)
+
+        U, _, Vt = np.linalg.svd(A)
+        reflejadas = np.linalg.det(U) * np.linalg.det(Vt) < 0
+        U[reflejadas, :, 2] *= -1.0
+        R = U @ Vt
+
+        # Clusters degenerados (A ≈ 0, p.ej. colapsados en un punto): sin rotación
+        degenerados = ~np.isfinite(A).all(axis=(1, 2)) | (np.abs(A).max(axis=(1, 2)) < 1e-12)
+        R[degenerados] = np.eye(3)
+        return c, R
+
+    def apply(self):
+        """Mover cada partícula hacia la media de los objetivos de sus clusters"""
+        if not self.active or self.stiffness <= 0:
+            return
+
+        pos = self._posiciones()
+        if not np.isfinite(pos).all():
+            return
+        c, R = self.rotaciones(pos)
+
+        # Objetivos g = c + R (q - q_cm) de cada pertenencia, sumados por partícula
+        if self.lattice:
+            # Σ_k (c_k - R_k q_cm_k) + (Σ_k R_k) q: dos sumas de caja de términos por cluster
+            T = c - np.einsum('kij,kj->ki', R, self.q_cm)
+            campo = np.hstack((T, R.reshape(-1, 9))) * self.cluster_valido[:, None]
+            sumas = self._por_cluster(campo)
+            objetivo = sumas[:, :3] + np.einsum('nij,nj->ni', sumas[:, 3:].reshape(-1, 3, 3), self.reposo)
+        else:
+            g = c[self.de] + np.einsum('kij,kj->ki', R[self.de], self.q)
+            n = len(pos)
+            objetivo = np.stack([np.bincount(self.miembros, weights=g[:, eje], minlength=n)
+                                 for eje in range(3)], axis=1)
+
+        tocadas = np.flatnonzero((self.num_clusters_particula > 0) & self._movibles())
+        if len(tocadas) == 0:
+            return
+        objetivo = objetivo[tocadas] / self.num_clusters_particula[tocadas][:, None]
+        delta = (objetivo - pos[tocadas]) * self.stiffness
+        delta = Constraint.clamp_correction_rows(delta, self.max_correction)
+
+        if self.system.store is not None:
+            pos[tocadas] += delta
+        else:
+            for idx, dp in zip(tocadas.tolist(), delta.tolist()):
+                particula = self.system.particles[idx]
+                particula.location = particula.location + mathutils.Vector(dp)
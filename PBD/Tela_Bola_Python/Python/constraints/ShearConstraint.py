@@ -3,7 +3,7 @@ ShearConstraint para Position-Based Dynamics
 Mantiene constante el ángulo interno de un triángulo en un vértice
 Migrado de JavaScript a Python para Blender
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.Constraint import Constraint
 
@@ -140,4 +140,48 @@ class ShearConstraint(Constraint):
                 nueva_pos = part2.location + delta_p2
                 if (not math.isnan(nueva_pos.x) and not math.isnan(nueva_pos.y) and not math.isnan(nueva_pos.z)):
                     part2.location = nueva_pos
-
+    
+    def proyecta_xpbd(self, dt):
+        """
+        Proyección XPBD del ángulo interno: C = acos(c) - psi0 con compliance (xpbd_alpha)
+        Mismos gradientes que proyecta_restriccion; Δp_i = w_i ∇_i C Δλ
+        """
+        x0 = self.particles[0].location
+        v1 = self.particles[1].location - x0
+        v2 = self.particles[2].location - x0
+        
+        len_v1 = v1.length
+        len_v2 = v2.length
+        if not (len_v1 >= self.epsilon and len_v2 >= self.epsilon):
+            return
+        v1 = v1 / len_v1
+        v2 = v2 / len_v2
+        
+        c = max(-1.0, min(1.0, v1.dot(v2)))
+        sqrt_term = math.sqrt(1.0 - c * c)
+        if sqrt_term < self.epsilon:
+            return
+        self.C = math.acos(c) - self.psi0
+        
+        factor = -1.0 / sqrt_term
+        grad_x1 = (v2 - v1 * c) * (factor / len_v1)
+        grad_x2 = (v1 - v2 * c) * (factor / len_v2)
+        grad_x0 = -(grad_x1 + grad_x2)
+        grads = (grad_x0, grad_x1, grad_x2)
+        ws = [0.0 if p.bloqueada else p.w for p in self.particles]
+        
+        denom = sum(w * g.length_squared for w, g in zip(ws, grads))
+        if not denom >= self.epsilon:
+            return
+        
+        alpha = self.xpbd_alpha(denom, dt)
+        delta_lambda = self.xpbd_delta_lambda(self.C, denom, self.lambda_xpbd, alpha)
+        if not math.isfinite(delta_lambda):
+            return
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, max(w * g.length for w, g in zip(ws, grads)))
+        self.lambda_xpbd += delta_lambda
+        
+        for p, w, grad in zip(self.particles, ws, grads):
+            if w > 0.0:
+                p.location += grad * (w * delta_lambda)
@@ -0,0 +1,205 @@
+"""
+ShearConstraintBatch para Position-Based Dynamics
+Proyecta TODAS las restricciones de shear en pasadas NumPy
+Mismas fórmulas, epsilons y clamp que ShearConstraint
+Requiere el modo arrays de PBDSystem (ParticleStore)
+"""
+from core.Constraint import Constraint
+from core.ConstraintScheduler import colorear_indices
+from core.DeltaBuffer import DeltaBuffer
+from constraints.ShearConstraint import ShearConstraint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ShearConstraintBatch(ShearConstraint):
+    """
+    Lote de restricciones de shear guardado como arrays
+    indices: (S,3) índices (x0, x1, x2) en el ParticleStore, el ángulo está en x0
+    psi0: (S,) ángulos iniciales
+    stiffness / k_coef: (S,) rigidez y coeficiente ajustado por iteraciones
+    colores: filas de cada color (None = colorear al crear el lote)
+    """
+
+    def __init__(self, store, indices, psi0, k, metodo_coloreado='greedy', colores=None):
+        Constraint.__init__(self)
+        if np is None:
+            raise ImportError("ShearConstraintBatch requiere NumPy")
+
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+        n = len(self.indices)
+        self.psi0 = np.broadcast_to(np.asarray(psi0, dtype=np.float64), (n,)).copy()
+        self.stiffness = np.broadcast_to(np.asarray(k, dtype=np.float64), (n,)).copy()
+        self.k_coef = self.stiffness.copy()
+        self.C = np.zeros(n, dtype=np.float64)
+        self.epsilon = 0.0001
+
+        if colores is None:
+            colores = colorear_indices(self.indices, store.n, metodo_coloreado)
+        self.colores = colores
+
+    @classmethod
+    def from_constraints(cls, store, constraints):
+        """
+        Crear un lote a partir de ShearConstraint existentes
+        (sus partículas deben ser ParticleView del mismo store)
+        """
+        indices = [[p.index for p in c.particles] for c in constraints]
+        psi0 = [c.psi0 for c in constraints]
+        ks = [c.stiffness for c in constraints]
+        return cls(store, indices, psi0, ks)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def compute_k_coef(self, n):
+        """
+        Ajustar coeficientes de rigidez según número de iteraciones del solver
+        k' = 1 - (1 - k)^(1/n)
+        """
+        if n > 0:
+            self.k_coef = 1.0 - np.power(1.0 - self.stiffness, 1.0 / n)
+        else:
+            self.k_coef = self.stiffness.copy()
+
+    def proyecta_restriccion(self):
+        """Proyecta todas las restricciones de shear, un color por pasada"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for color in self.colores:
+                self._proyectar_color(color)
+
+    def acumula_jacobi(self, buffer):
+        """Acumular en el DeltaBuffer las correcciones de todo el lote (sin colores)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            buffer.add(*self._correcciones(np.arange(len(self.indices))))
+
+    def _proyectar_color(self, sel):
+        indices, delta = self._correcciones(sel)
+        self.store.pos[indices] += delta
+
+    def _correcciones(self, sel):
+        """
+        Correcciones de las restricciones sel a partir de las posiciones actuales
+        Returns: (índices de partícula (M,), correcciones (M,3)), sin aplicarlas
+        """
+        pos = self.store.pos
+        eps = self.epsilon
+
+        idx = self.indices[sel]
+        x0 = pos[idx[:, 0]]
+        v1 = pos[idx[:, 1]] - x0
+        v2 = pos[idx[:, 2]] - x0
+
+        len_v1 = np.sqrt(np.einsum('ij,ij->i', v1, v1))
+        len_v2 = np.sqrt(np.einsum('ij,ij->i', v2, v2))
+
+        # Validación: evitar vectores degenerados
+        ok = (len_v1 >= eps) & (len_v2 >= eps)
+        v1 = v1 / len_v1[:, None]
+        v2 = v2 / len_v2[:, None]
+
+        # c = dot(v1, v2) con clamp y C = acos(c) - psi0
+        c = np.clip(np.einsum('ij,ij->i', v1, v2), -1.0, 1.0)
+        C = np.arccos(c) - self.psi0[sel]
+        self.C[sel[ok]] = C[ok]
+        ok &= np.abs(C) >= eps
+
+        sqrt_term = np.sqrt(1.0 - c * c)
+        ok &= sqrt_term >= eps
+
+        # Gradientes ∇x1, ∇x2 y ∇x0 = -∇x1 - ∇x2
+        factor = -1.0 / sqrt_term
+        grad_x1 = (v2 - v1 * c[:, None]) * (factor / len_v1)[:, None]
+        grad_x2 = (v1 - v2 * c[:, None]) * (factor / len_v2)[:, None]
+        grad_x0 = -(grad_x1 + grad_x2)
+        grads = (grad_x0, grad_x1, grad_x2)
+
+        grad_norm_sq = sum(np.einsum('ij,ij->i', g, g) for g in grads)
+        ok &= grad_norm_sq >= eps
+
+        w = self.store.w[idx]  # (m,3)
+        sum_w = w.sum(axis=1)
+        ok &= sum_w >= eps
+        if not ok.any():
+            return DeltaBuffer.vacio()
+
+        lambda_val = -C / grad_norm_sq * self.k_coef[sel]
+
+        # Calcular correcciones con validación
+        bloqueada = self.store.bloqueada[idx]
+        salida_idx = []
+        salida_delta = []
+        for i, grad in enumerate(grads):
+            aplicar = ok & ~bloqueada[:, i]
+            if not aplicar.any():
+                continue
+            delta = grad[aplicar] * ((w[aplicar, i] / sum_w[aplicar]) * lambda_val[aplicar])[:, None]
+            validas = np.isfinite(delta).all(axis=1)
+            salida_delta.append(self.clamp_correction_rows(delta[validas]))
+            salida_idx.append(idx[aplicar, i][validas])
+
+        if not salida_idx:
+            return DeltaBuffer.vacio()
+        return np.concatenate(salida_idx), np.concatenate(salida_delta)
+
+    def reset_lambda(self):
+        """Reiniciar los multiplicadores XPBD de todo el lote"""
+        self.lambda_xpbd = np.zeros(len(self.indices), dtype=np.float64)
+
+    def proyecta_xpbd(self, dt):
+        """Proyección XPBD de todo el lote, un color por pasada (ver ShearConstraint.proyecta_xpbd)"""
+        if np.ndim(self.lambda_xpbd) == 0:
+            self.reset_lambda()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for color in self.colores:
+                self._proyectar_color_xpbd(color, dt)
+
+    def _proyectar_color_xpbd(self, sel, dt):
+        pos = self.store.pos
+        eps = self.epsilon
+
+        idx = self.indices[sel]
+        x0 = pos[idx[:, 0]]
+        v1 = pos[idx[:, 1]] - x0
+        v2 = pos[idx[:, 2]] - x0
+
+        len_v1 = np.sqrt(np.einsum('ij,ij->i', v1, v1))
+        len_v2 = np.sqrt(np.einsum('ij,ij->i', v2, v2))
+        v1 = v1 / len_v1[:, None]
+        v2 = v2 / len_v2[:, None]
+
+        c = np.clip(np.einsum('ij,ij->i', v1, v2), -1.0, 1.0)
+        sqrt_term = np.sqrt(1.0 - c * c)
+        C = np.arccos(c) - self.psi0[sel]
+        ok = (len_v1 >= eps) & (len_v2 >= eps) & (sqrt_term >= eps)
+        self.C[sel[ok]] = C[ok]
+
+        # Gradientes ∇x1, ∇x2 y ∇x0 = -∇x1 - ∇x2
+        factor = -1.0 / sqrt_term
+        grad_x1 = (v2 - v1 * c[:, None]) * (factor / len_v1)[:, None]
+        grad_x2 = (v1 - v2 * c[:, None]) * (factor / len_v2)[:, None]
+        grad_x0 = -(grad_x1 + grad_x2)
+        grads = (grad_x0, grad_x1, grad_x2)
+        normas = np.stack([np.sqrt(np.einsum('ij,ij->i', g, g)) for g in grads], axis=1)  # (m,3)
+
+        w = np.where(self.store.bloqueada[idx], 0.0, self.store.w[idx])  # (m,3)
+        denom = (w * normas * normas).sum(axis=1)
+        ok &= denom >= eps
+        if not ok.any():
+            return
+
+        sel = sel[ok]
+        denom = denom[ok]
+        alpha = self.xpbd_alpha(denom, dt, sel)
+        delta_lambda = self.xpbd_delta_lambda(C[ok], denom, self.lambda_xpbd[sel], alpha)
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, (w * normas)[ok].max(axis=1))
+        self.lambda_xpbd[sel] += delta_lambda
+
+        # Dentro de un color los índices no se repiten; w = 0 deja quietas las bloqueadas
+        for i, grad in enumerate(grads):
+            pos[idx[ok, i]] += grad[ok] * (w[ok, i] * delta_lambda)[:, None]
@@ -2,7 +2,7 @@
 SphereCollision - Colisión entre esfera y partículas PBD
 Implementa detección y resolución de colisiones esfera-cubo
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 
 
@@ -3,21 +3,28 @@ VolumeConstraintGlobal para Position-Based Dynamics
 Restricción de volumen global tipo Müller 2007 (cloth balloons)
 Mantiene constante el volumen total de una malla cerrada
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.Constraint import Constraint
+from core.DeltaBuffer import DeltaBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class VolumeConstraintGlobal(Constraint):
     """Restricción de volumen global para una malla cerrada de triángulos"""
     
-    def __init__(self, particles, triangles, V0, k):
+    def __init__(self, particles, triangles, V0, k, store=None):
         """
         Constructor
         particles: lista de todas las partículas de la malla
         triangles: lista de triángulos, cada uno es (i0, i1, i2) con índices de partículas
         V0: volumen en reposo de la malla cerrada
         k: rigidez (stiffness) en [0, 1]
+        store: ParticleStore del sistema (opcional, modo arrays)
         """
         super().__init__()
         self.particles = particles  # Todas las partículas
@@ -27,6 +34,69 @@ class VolumeConstraintGlobal(Constraint):
         self.k_coef = k
         self.C = 0.0
         self.epsilon = 0.0001
+        self.store = store
+        
+        # Topología precalculada para la ruta vectorizada (si NumPy está disponible)
+        if np is not None:
+            self._preparar_adyacencia()
+    
+    def _preparar_adyacencia(self):
+        """
+        Precalcular (una sola vez) los arrays de la ruta vectorizada:
+        - triángulos válidos como array (F,3) en índices compactos
+        - adyacencia CSR vértice -> esquinas de triángulo (ordenadas por vértice)
+        """
+        n = len(self.particles)
+        tris = np.asarray(self.triangles, dtype=np.int64).reshape(-1, 3)
+        validos = (tris < n).all(axis=1) & (tris >= 0).all(axis=1)
+        tris = tris[validos]
+        
+        # Vértices usados por la malla y triángulos en índices compactos (0..U-1)
+        self._verts, inversa = np.unique(tris.ravel(), return_inverse=True)
+        self._tris_local = inversa.reshape(-1, 3)
+        
+        # CSR: esquinas (3F) ordenadas por vértice compacto + inicio de cada fila
+        esquinas = self._tris_local.ravel()
+        self._csr_orden = np.argsort(esquinas, kind='stable')
+        self._csr_ptr = np.searchsorted(esquinas[self._csr_orden], np.arange(len(self._verts)))
+    
+    def _posiciones_locales(self):
+        """Posiciones (U,3) de los vértices usados por la malla"""
+        if self.store is not None:
+            return self.store.pos[self._verts]
+        return np.array([tuple(self.particles[i].location) for i in self._verts.tolist()],
+                        dtype=np.float64).reshape(-1, 3)
+    
+    def volumen_y_gradientes(self, pos=None):
+        """
+        Volumen y gradientes por vértice en una sola pasada vectorizada
+        Los productos cruzados se comparten entre el volumen y los gradientes:
+        V = Σ cross(p0, p1) · p2 / 6 ; grad_i = Σ cross(p_j, p_k) / 6
+        
+        Returns:
+            (V, gradientes (U,3) alineados con los vértices de la malla)
+        """
+        if pos is None:
+            pos = self._posiciones_locales()
+        
+        tris = self._tris_local
+        p0 = pos[tris[:, 0]]
+        p1 = pos[tris[:, 1]]
+        p2 = pos[tris[:, 2]]
+        
+        cross_01 = np.cross(p0, p1)
+        cross_12 = np.cross(p1, p2)
+        cross_20 = np.cross(p2, p0)
+        
+        # Volumen: ignorar triángulos no finitos (como la versión escalar)
+        V_tri = np.einsum('ij,ij->i', cross_01, p2) / 6.0
+        V = float(V_tri[np.isfinite(V_tri)].sum())
+        
+        # Gradientes por esquina (F,3,3) -> reducción CSR por vértice
+        contrib = np.stack((cross_12, cross_20, cross_01), axis=1).reshape(-1, 3) / 6.0
+        gradientes = np.add.reduceat(contrib[self._csr_orden], self._csr_ptr, axis=0)
+        
+        return V, gradientes
     
     def calcular_volumen(self):
         """
@@ -53,8 +123,8 @@ class VolumeConstraintGlobal(Constraint):
             
             # Volumen del tetraedro formado por el triángulo y el origen
             # V_tri = dot(cross(p0, p1), p2) / 6
-            cross_p0_p1 = mathutils.Vector.cross(p0.location, p1.location)
-            V_tri = mathutils.Vector.dot(cross_p0_p1, p2.location) / 6.0
+            cross_p0_p1 = p0.location.cross(p1.location)
+            V_tri = cross_p0_p1.dot(p2.location) / 6.0
             
             if not (math.isnan(V_tri) or math.isinf(V_tri)):
                 V += V_tri
@@ -79,9 +149,9 @@ class VolumeConstraintGlobal(Constraint):
             
             # Gradiente para cada vértice del triángulo
             # grad_i = cross(p_j, p_k) / 6 (donde i, j, k son cíclicos)
-            grad0 = mathutils.Vector.cross(p1.location, p2.location) / 6.0
-            grad1 = mathutils.Vector.cross(p2.location, p0.location) / 6.0
-            grad2 = mathutils.Vector.cross(p0.location, p1.location) / 6.0
+            grad0 = p1.location.cross(p2.location) / 6.0
+            grad1 = p2.location.cross(p0.location) / 6.0
+            grad2 = p0.location.cross(p1.location) / 6.0
             
             # Acumular gradientes (una partícula puede estar en múltiples triángulos)
             if i0 not in gradients:
@@ -103,6 +173,10 @@ class VolumeConstraintGlobal(Constraint):
         """
         import math
         
+        if np is not None and len(self._verts) > 0:
+            self._proyecta_vectorizado()
+            return
+        
         # ===== 1. Calcular volumen actual =====
         V = self.calcular_volumen()
         
@@ -165,5 +239,118 @@ class VolumeConstraintGlobal(Constraint):
                         # Evita correcciones excesivas que causan ondas de choque y colapso
                         delta_p = self.clamp_correction(delta_p)
                         p.location += delta_p
-
-
+    
+    def _effective_k_coef(self, compression_ratio):
+        """Rigidez efectiva adaptativa (mismos casos que la ruta escalar)"""
+        if compression_ratio < 0.1:
+            return min(1.0, self.k_coef * 10.0)
+        elif compression_ratio < 0.3:
+            return min(1.0, self.k_coef * 5.0)
+        elif self.stiffness < 0.2 and compression_ratio < 0.7:
+            boost_factor = 1.0 + (0.7 - compression_ratio) * 5.0
+            return min(0.8, self.k_coef * boost_factor)
+        elif self.stiffness < 0.15:
+            return max(0.15, self.k_coef)
+        return self.k_coef
+    
+    def acumula_jacobi(self, buffer):
+        """Acumular en el DeltaBuffer las correcciones del volumen global (modo arrays)"""
+        if np is None or len(self._verts) == 0 or self.store is None:
+            self.proyecta_restriccion()
+            return
+        buffer.add(*self._correcciones_vectorizadas())
+    
+    def _proyecta_vectorizado(self):
+        """Ruta vectorizada de proyecta_restriccion (O(F) en NumPy)"""
+        indices, delta = self._correcciones_vectorizadas()
+        
+        if self.store is not None:
+            self.store.pos[indices] += delta
+        else:
+            for i, d in zip(indices.tolist(), delta.tolist()):
+                self.particles[i].location += mathutils.Vector(d)
+    
+    def _correcciones_vectorizadas(self):
+        """
+        Correcciones del volumen global a partir de las posiciones actuales
+        Returns: (índices de partícula (M,), correcciones (M,3)), sin aplicarlas
+        """
+        V, gradients = self.volumen_y_gradientes()
+        
+        if not math.isfinite(V):
+            return DeltaBuffer.vacio()
+        
+        self.C = V - self.V0
+        
+        # Masas inversas de los vértices (0 para bloqueadas)
+        if self.store is not None:
+            bloqueada = self.store.bloqueada[self._verts]
+            w = np.where(bloqueada, 0.0, self.store.w[self._verts])
+        else:
+            particulas = [self.particles[i] for i in self._verts.tolist()]
+            bloqueada = np.array([p.bloqueada for p in particulas], dtype=bool)
+            w = np.array([0.0 if p.bloqueada else p.w for p in particulas], dtype=np.float64)
+        
+        grad_sq = np.einsum('ij,ij->i', gradients, gradients)
+        denom = float((w * grad_sq).sum())
+        
+        if denom < self.epsilon:
+            return DeltaBuffer.vacio()
+        
+        compression_ratio = abs(V) / abs(self.V0) if abs(self.V0) > 1e-6 else 1.0
+        lambda_val = -self._effective_k_coef(compression_ratio) * self.C / denom
+        
+        if math.isnan(lambda_val) or math.isinf(lambda_val):
+            return DeltaBuffer.vacio()
+        
+        delta = gradients * (w * lambda_val)[:, None]
+        aplicar = ~bloqueada & np.isfinite(delta).all(axis=1)
+        # CRÍTICO: Clamp de corrección (Müller 2007, Macklin FleX)
+        delta = self.clamp_correction_rows(delta[aplicar])
+        
+        return self._verts[aplicar], delta
+    
+    def proyecta_xpbd(self, dt):
+        """
+        Proyección XPBD del volumen global (C = V - V0 con compliance)
+        Sin NumPy se usa la proyección PBD
+        """
+        if np is None or len(self._verts) == 0:
+            self.proyecta_restriccion()
+            return
+        
+        V, gradients = self.volumen_y_gradientes()
+        if not math.isfinite(V):
+            return
+        self.C = V - self.V0
+        
+        if self.store is not None:
+            bloqueada = self.store.bloqueada[self._verts]
+            w = np.where(bloqueada, 0.0, self.store.w[self._verts])
+        else:
+            particulas = [self.particles[i] for i in self._verts.tolist()]
+            bloqueada = np.array([p.bloqueada for p in particulas], dtype=bool)
+            w = np.array([0.0 if p.bloqueada else p.w for p in particulas], dtype=np.float64)
+        
+        denom = float((w * np.einsum('ij,ij->i', gradients, gradients)).sum())
+        if denom < self.epsilon:
+            return
+        
+        alpha = self.xpbd_alpha(denom, dt)
+        delta_lambda = self.xpbd_delta_lambda(self.C, denom, self.lambda_xpbd, alpha)
+        if not math.isfinite(delta_lambda):
+            return
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        paso_max = float((w * np.sqrt(np.einsum('ij,ij->i', gradients, gradients))).max())
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, paso_max)
+        self.lambda_xpbd += delta_lambda
+        
+        delta = gradients * (w * delta_lambda)[:, None]
+        aplicar = ~bloqueada & np.isfinite(delta).all(axis=1)
+        delta = delta[aplicar]
+        
+        if self.store is not None:
+            self.store.pos[self._verts[aplicar]] += delta
+        else:
+            for i, d in zip(self._verts[aplicar].tolist(), delta.tolist()):
+                self.particles[i].location += mathutils.Vector(d)
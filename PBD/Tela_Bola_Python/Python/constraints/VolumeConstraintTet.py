@@ -3,7 +3,7 @@ VolumeConstraintTet para Position-Based Dynamics
 Mantiene constante el volumen de un tetraedro
 Implementación exacta según especificaciones
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.Constraint import Constraint
 
@@ -223,3 +223,44 @@ class VolumeConstraintTet(Constraint):
             self.k_coef = self._original_k_coef
             delattr(self, '_original_k_coef')
 
+
+    def proyecta_xpbd(self, dt):
+        """
+        Proyección XPBD del volumen: C = V - V0 con compliance
+        Sin boost adaptativo: con substeps pequeños el tetraedro no llega a aplastarse
+        y la rigidez la fija solo la compliance (xpbd_alpha)
+        """
+        p0, p1, p2, p3 = self.particles
+
+        e1 = p1.location - p0.location
+        e2 = p2.location - p0.location
+        e3 = p3.location - p0.location
+
+        cross_e1_e2 = e1.cross(e2)
+        V = cross_e1_e2.dot(e3) / 6.0
+        if not math.isfinite(V):
+            return
+        self.C = V - self.V0
+
+        grad1 = e2.cross(e3) / 6.0
+        grad2 = e3.cross(e1) / 6.0
+        grad3 = cross_e1_e2 / 6.0
+        grad0 = -(grad1 + grad2 + grad3)
+        grads = (grad0, grad1, grad2, grad3)
+        ws = [0.0 if p.bloqueada else p.w for p in self.particles]
+
+        denom = sum(w * g.length_squared for w, g in zip(ws, grads))
+        if denom < self.epsilon:
+            return
+
+        alpha = self.xpbd_alpha(denom, dt)
+        delta_lambda = self.xpbd_delta_lambda(self.C, denom, self.lambda_xpbd, alpha)
+        if not math.isfinite(delta_lambda):
+            return
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, max(w * g.length for w, g in zip(ws, grads)))
+        self.lambda_xpbd += delta_lambda
+
+        for p, w, grad in zip(self.particles, ws, grads):
+            if w > 0.0:
+                p.location += grad * (w * delta_lambda)
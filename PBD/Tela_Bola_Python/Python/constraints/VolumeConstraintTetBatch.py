@@ -0,0 +1,283 @@
+"""
+VolumeConstraintTetBatch para Position-Based Dynamics
+Proyecta TODAS las restricciones de volumen por tetraedro en pasadas NumPy
+Misma física que VolumeConstraintTet (corrección de emergencia y boost adaptativo)
+Requiere el modo arrays de PBDSystem (ParticleStore)
+"""
+from core.Constraint import Constraint
+from core.ConstraintScheduler import colorear_indices
+from core.DeltaBuffer import DeltaBuffer
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VolumeConstraintTetBatch(VolumeConstraintTet):
+    """
+    Lote de restricciones de volumen guardado como arrays
+    indices: (T,4) índices de partícula en el ParticleStore
+    V0: (T,) volúmenes en reposo
+    stiffness / k_coef: (T,) rigidez y coeficiente ajustado por iteraciones
+    colores: filas de cada color (None = colorear al crear el lote)
+
+    Los tetraedros se agrupan por colores (sin partículas compartidas dentro de un color)
+    y cada color se proyecta en una sola pasada vectorizada.
+    """
+
+    def __init__(self, store, indices, V0, k, metodo_coloreado='greedy', colores=None):
+        Constraint.__init__(self)
+        if np is None:
+            raise ImportError("VolumeConstraintTetBatch requiere NumPy")
+
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64).reshape(-1, 4)
+        n = len(self.indices)
+        self.V0 = np.broadcast_to(np.asarray(V0, dtype=np.float64), (n,)).copy()
+        self.stiffness = np.broadcast_to(np.asarray(k, dtype=np.float64), (n,)).copy()
+        self.k_coef = self.stiffness.copy()
+        self.C = np.zeros(n, dtype=np.float64)
+        self.epsilon = 1e-8
+
+        if colores is None:
+            colores = colorear_indices(self.indices, store.n, metodo_coloreado)
+        self.colores = colores
+
+    @classmethod
+    def from_constraints(cls, store, constraints):
+        """
+        Crear un lote a partir de VolumeConstraintTet existentes
+        (sus partículas deben ser ParticleView del mismo store)
+        """
+        indices = [[p.index for p in c.particles] for c in constraints]
+        V0 = [c.V0 for c in constraints]
+        ks = [c.stiffness for c in constraints]
+        return cls(store, indices, V0, ks)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def compute_k_coef(self, n):
+        """
+        Ajustar coeficientes de rigidez según número de iteraciones del solver
+        k' = 1 - (1 - k)^(1/n)
+        """
+        if n > 0:
+            self.k_coef = 1.0 - np.power(1.0 - self.stiffness, 1.0 / n)
+        else:
+            self.k_coef = self.stiffness.copy()
+
+    def calcular_volumenes(self):
+        """Volumen con signo actual de todos los tetraedros (T,)"""
+        pos = self.store.pos
+        p0 = pos[self.indices[:, 0]]
+        e1 = pos[self.indices[:, 1]] - p0
+        e2 = pos[self.indices[:, 2]] - p0
+        e3 = pos[self.indices[:, 3]] - p0
+        return np.einsum('ij,ij->i', np.cross(e1, e2), e3) / 6.0
+
+    def recalcular_V0(self):
+        """Tomar las posiciones actuales como volúmenes de reposo"""
+        self.V0 = self.calcular_volumenes()
+
+    def proyecta_restriccion(self):
+        """Proyecta todos los tetraedros, un color por pasada"""
+        for color in self.colores:
+            self._proyectar_color(color)
+
+    def acumula_jacobi(self, buffer):
+        """Acumular en el DeltaBuffer las correcciones de todos los tetraedros (sin colores)"""
+        buffer.add(*self._correcciones(np.arange(len(self.indices))))
+
+    def _proyectar_color(self, sel):
+        indices, delta = self._correcciones(sel)
+        self.store.pos[indices] += delta
+
+    def _correcciones(self, sel):
+        """
+        Correcciones de los tetraedros sel a partir de las posiciones actuales
+        Returns: (índices de partícula (M,), correcciones (M,3)), sin aplicarlas
+        """
+        pos = self.store.pos
+        bloqueada = self.store.bloqueada
+        salida_idx = []
+        salida_delta = []
+
+        idx = self.indices[sel]
+        V0 = self.V0[sel]
+        k_coef = self.k_coef[sel]
+        stiffness = self.stiffness[sel]
+
+        # ===== 1. Calcular volumen actual =====
+        p0 = pos[idx[:, 0]]
+        e1 = pos[idx[:, 1]] - p0
+        e2 = pos[idx[:, 2]] - p0
+        e3 = pos[idx[:, 3]] - p0
+
+        cross_e1_e2 = np.cross(e1, e2)
+        V = np.einsum('ij,ij->i', cross_e1_e2, e3) / 6.0
+
+        # Tetraedros con posiciones NaN/Inf se ignoran (como en la versión escalar)
+        finitos = np.isfinite(V)
+        abs_V = np.abs(V)
+        abs_V0 = np.abs(V0)
+        con_V0 = abs_V0 > 1e-6
+        compression_ratio = np.ones_like(V)
+        compression_ratio[con_V0] = abs_V[con_V0] / abs_V0[con_V0]
+
+        # Pesos (0 para partículas bloqueadas)
+        w = np.where(bloqueada[idx], 0.0, self.store.w[idx])  # (m,4)
+        libres = ~bloqueada[idx]  # (m,4)
+
+        # ===== Corrección de emergencia (tetraedro aplastado o < 20%) =====
+        emergencia = finitos & ((abs_V < 1e-10) | (compression_ratio < 0.2))
+        if emergencia.any():
+            self._corregir_emergencia(emergencia, idx, e1, e2, e3, cross_e1_e2,
+                                      V0, k_coef, compression_ratio, libres,
+                                      salida_idx, salida_delta)
+
+        normales = finitos & ~emergencia
+        if not normales.any():
+            return self._juntar(salida_idx, salida_delta)
+
+        # ===== 2. Calcular constraint =====
+        C = V - V0
+        self.C[sel[normales]] = C[normales]
+
+        # ===== 3. Calcular gradientes =====
+        grad1 = np.cross(e2, e3) / 6.0
+        grad2 = np.cross(e3, e1) / 6.0
+        grad3 = cross_e1_e2 / 6.0
+        grad0 = -(grad1 + grad2 + grad3)
+        grads = (grad0, grad1, grad2, grad3)
+
+        # ===== 4. Calcular denominador =====
+        denom = sum(w[:, i] * np.einsum('ij,ij->i', g, g) for i, g in enumerate(grads))
+
+        pequeno = denom < self.epsilon
+        if pequeno.any():
+            muy_comprimido = pequeno & con_V0 & (abs_V < abs_V0 * 0.1)
+            avg_edge_length = (np.linalg.norm(e1, axis=1) +
+                               np.linalg.norm(e2, axis=1) +
+                               np.linalg.norm(e3, axis=1)) / 3.0
+            denom = np.where(muy_comprimido,
+                             np.maximum(self.epsilon, avg_edge_length * avg_edge_length * 0.01),
+                             np.where(pequeno, self.epsilon, denom))
+
+        # ===== 5. Rigidez efectiva adaptativa (mismos casos que VolumeConstraintTet) =====
+        caso1 = compression_ratio < 0.1
+        caso2 = ~caso1 & (compression_ratio < 0.3)
+        caso3 = ~caso1 & ~caso2 & (stiffness < 0.2) & (compression_ratio < 0.7)
+        caso4 = ~caso1 & ~caso2 & ~caso3 & (stiffness < 0.15)
+
+        effective_k_coef = k_coef.copy()
+        effective_k_coef[caso1] = np.minimum(1.0, k_coef[caso1] * 10.0)
+        effective_k_coef[caso2] = np.minimum(1.0, k_coef[caso2] * 5.0)
+        boost_factor = 1.0 + (0.7 - compression_ratio[caso3]) * 5.0
+        effective_k_coef[caso3] = np.minimum(0.8, k_coef[caso3] * boost_factor)
+        effective_k_coef[caso4] = np.maximum(0.15, k_coef[caso4])
+
+        lambda_val = -effective_k_coef * C / denom
+        normales &= np.isfinite(lambda_val)
+
+        # ===== 6. Correcciones =====
+        for i, grad in enumerate(grads):
+            aplicar = normales & libres[:, i]
+            if not aplicar.any():
+                continue
+            delta = grad[aplicar] * (w[aplicar, i] * lambda_val[aplicar])[:, None]
+            ok = np.isfinite(delta).all(axis=1)
+            salida_delta.append(self.clamp_correction_rows(delta[ok]))
+            salida_idx.append(idx[aplicar, i][ok])
+
+        return self._juntar(salida_idx, salida_delta)
+
+    @staticmethod
+    def _juntar(salida_idx, salida_delta):
+        if not salida_idx:
+            return DeltaBuffer.vacio()
+        return np.concatenate(salida_idx), np.concatenate(salida_delta)
+
+    def _corregir_emergencia(self, mask, idx, e1, e2, e3, cross_e1_e2,
+                             V0, k_coef, compression_ratio, libres,
+                             salida_idx, salida_delta):
+        """Empujar a lo largo de la normal los tetraedros aplastados (vectorizado)"""
+        normal = cross_e1_e2[mask]
+        alternativa = np.cross(e1[mask], e3[mask])
+        paralelos = np.einsum('ij,ij->i', normal, normal) < 1e-10
+        normal[paralelos] = alternativa[paralelos]
+
+        len_sq = np.einsum('ij,ij->i', normal, normal)
+        validos = len_sq > 1e-10
+        if not validos.any():
+            return
+
+        normal = normal[validos] / np.sqrt(len_sq[validos])[:, None]
+        ratio = compression_ratio[mask][validos]
+        edge_length = np.abs(V0[mask][validos]) ** (1.0 / 3.0)
+        push_distance = edge_length * np.where(ratio < 0.1, 0.5, np.where(ratio < 0.2, 0.3, 0.1))
+        effective_k_emergency = np.minimum(1.0, k_coef[mask][validos] * 5.0)
+
+        base = normal * (push_distance * effective_k_emergency)[:, None]
+        base = self.clamp_correction_rows(base)
+
+        idx_e = idx[mask][validos]
+        libres_e = libres[mask][validos]
+        for i in range(4):
+            # Alternar signo para expandir el tetraedro
+            sign = 1.0 if i % 2 == 0 else -1.0
+            aplicar = libres_e[:, i]
+            salida_idx.append(idx_e[aplicar, i])
+            salida_delta.append(base[aplicar] * sign)
+
+    def reset_lambda(self):
+        """Reiniciar los multiplicadores XPBD de todos los tetraedros"""
+        self.lambda_xpbd = np.zeros(len(self.indices), dtype=np.float64)
+
+    def proyecta_xpbd(self, dt):
+        """Proyección XPBD de todos los tetraedros, un color por pasada"""
+        if np.ndim(self.lambda_xpbd) == 0:
+            self.reset_lambda()
+        for color in self.colores:
+            self._proyectar_color_xpbd(color, dt)
+
+    def _proyectar_color_xpbd(self, sel, dt):
+        pos = self.store.pos
+        idx = self.indices[sel]
+        w = np.where(self.store.bloqueada[idx], 0.0, self.store.w[idx])  # (m,4)
+
+        p0 = pos[idx[:, 0]]
+        e1 = pos[idx[:, 1]] - p0
+        e2 = pos[idx[:, 2]] - p0
+        e3 = pos[idx[:, 3]] - p0
+
+        cross_e1_e2 = np.cross(e1, e2)
+        V = np.einsum('ij,ij->i', cross_e1_e2, e3) / 6.0
+        C = V - self.V0[sel]
+        self.C[sel] = C
+
+        grad1 = np.cross(e2, e3) / 6.0
+        grad2 = np.cross(e3, e1) / 6.0
+        grad3 = cross_e1_e2 / 6.0
+        grad0 = -(grad1 + grad2 + grad3)
+        grads = (grad0, grad1, grad2, grad3)
+        normas = np.stack([np.sqrt(np.einsum('ij,ij->i', g, g)) for g in grads], axis=1)  # (m,4)
+
+        denom = (w * normas * normas).sum(axis=1)
+        validos = np.isfinite(V) & (denom >= self.epsilon)
+        if not validos.any():
+            return
+
+        sel = sel[validos]
+        denom = denom[validos]
+        alpha = self.xpbd_alpha(denom, dt, sel)
+        delta_lambda = self.xpbd_delta_lambda(C[validos], denom, self.lambda_xpbd[sel], alpha)
+        # Clamp antes de acumular: ninguna partícula se mueve más de MAX_CORRECTION_PER_FRAME
+        delta_lambda = self.clamp_delta_lambda(delta_lambda, (w * normas)[validos].max(axis=1))
+        self.lambda_xpbd[sel] += delta_lambda
+
+        # Dentro de un color los índices no se repiten; w = 0 deja quietas las bloqueadas
+        for i, grad in enumerate(grads):
+            pos[idx[validos, i]] += grad[validos] * (w[validos, i] * delta_lambda)[:, None]
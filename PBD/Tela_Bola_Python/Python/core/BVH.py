@@ -0,0 +1,198 @@
+"""
+BVH - Jerarquía de cajas envolventes alineadas con los ejes (AABB) sobre triángulos
+Se construye una vez para geometría estática (mallas de colisión) y se guarda
+como arrays planos, de modo que las consultas de muchas cajas a la vez se
+recorren por niveles con NumPy en lugar de nodo a nodo.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class BVH:
+    """
+    BVH de triángulos con partición por la mediana del eje más largo
+    vertices: (V,3) posiciones
+    triangulos: (T,3) índices de vértice
+    hoja_max: número máximo de triángulos por hoja
+    """
+
+    def __init__(self, vertices, triangulos, hoja_max=4):
+        if np is None:
+            raise ImportError("BVH requiere NumPy")
+
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.triangulos = np.asarray(triangulos, dtype=np.int64).reshape(-1, 3)
+        self.hoja_max = max(1, int(hoja_max))
+        self.build()
+
+    def build(self):
+        """Construir el árbol (nodo 0 = raíz)"""
+        tri = self.vertices[self.triangulos]  # (T,3,3)
+        tri_lo = tri.min(axis=1)
+        tri_hi = tri.max(axis=1)
+        self.tri_lo = tri_lo
+        self.tri_hi = tri_hi
+        centros = (tri_lo + tri_hi) * 0.5
+
+        # Permutación de triángulos: cada nodo cubre un rango contiguo [inicio, inicio+cantidad)
+        self.orden = np.arange(len(self.triangulos), dtype=np.int64)
+        lo, hi, izq, der, inicio, cantidad = [], [], [], [], [], []
+
+        def nuevo_nodo(a, b):
+            sub = self.orden[a:b]
+            lo.append(tri_lo[sub].min(axis=0) if b > a else np.zeros(3))
+            hi.append(tri_hi[sub].max(axis=0) if b > a else np.zeros(3))
+            izq.append(-1)
+            der.append(-1)
+            inicio.append(a)
+            cantidad.append(b - a)
+            return len(lo) - 1
+
+        pila = [(nuevo_nodo(0, len(self.orden)), 0, len(self.orden))]
+        while pila:
+            nodo, a, b = pila.pop()
+            if b - a <= self.hoja_max:
+                continue
+
+            # Partir por la mediana de los centros en el eje más largo
+            eje = int(np.argmax(hi[nodo] - lo[nodo]))
+            sub = self.orden[a:b]
+            mitad = (b - a) // 2
+            particion = np.argpartition(centros[sub, eje], mitad)
+            self.orden[a:b] = sub[particion]
+
+            m = a + mitad
+            izq[nodo] = nuevo_nodo(a, m)
+            der[nodo] = nuevo_nodo(m, b)
+            cantidad[nodo] = 0  # Nodo interno
+            pila.append((izq[nodo], a, m))
+            pila.append((der[nodo], m, b))
+
+        self.nodo_lo = np.array(lo, dtype=np.float64).reshape(-1, 3)
+        self.nodo_hi = np.array(hi, dtype=np.float64).reshape(-1, 3)
+        self.nodo_izq = np.array(izq, dtype=np.int64)
+        self.nodo_der = np.array(der, dtype=np.int64)
+        self.nodo_inicio = np.array(inicio, dtype=np.int64)
+        self.nodo_cantidad = np.array(cantidad, dtype=np.int64)
+
+    @property
+    def num_nodos(self):
+        return len(self.nodo_lo)
+
+    def aabb(self):
+        """Caja envolvente de toda la malla (lo, hi)"""
+        return self.nodo_lo[0], self.nodo_hi[0]
+
+    def query_aabbs(self, lo, hi):
+        """
+        Pares (consulta, triángulo) cuyas cajas se solapan
+        lo, hi: (M,3) cajas de consulta
+        Returns: (q, t) arrays de índices (una entrada por par candidato)
+        """
+        lo = np.asarray(lo, dtype=np.float64).reshape(-1, 3)
+        hi = np.asarray(hi, dtype=np.float64).reshape(-1, 3)
+        vacio = np.zeros(0, dtype=np.int64)
+        if len(self.triangulos) == 0 or len(lo) == 0:
+            return vacio, vacio
+
+        # Frente de recorrido: pares (consulta, nodo) pendientes, empezando en la raíz
+        q = np.arange(len(lo), dtype=np.int64)
+        nodo = np.zeros(len(lo), dtype=np.int64)
+        salida_q = []
+        salida_t = []
+        while len(q) > 0:
+            solapa = (np.all(lo[q] <= self.nodo_hi[nodo], axis=1) &
+                      np.all(hi[q] >= self.nodo_lo[nodo], axis=1))
+            q = q[solapa]
+            nodo = nodo[solapa]
+
+            hoja = self.nodo_cantidad[nodo] > 0
+            if hoja.any():
+                qh = q[hoja]
+                nh = nodo[hoja]
+                counts = self.nodo_cantidad[nh]
+                total = int(counts.sum())
+                rel = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+                qh = np.repeat(qh, counts)
+                th = self.orden[np.repeat(self.nodo_inicio[nh], counts) + rel]
+
+                # Test de caja de cada triángulo de la hoja
+                solapa = (np.all(lo[qh] <= self.tri_hi[th], axis=1) &
+                          np.all(hi[qh] >= self.tri_lo[th], axis=1))
+                salida_q.append(qh[solapa])
+                salida_t.append(th[solapa])
+
+            interno = ~hoja
+            q = np.concatenate((q[interno], q[interno]))
+            nodo = np.concatenate((self.nodo_izq[nodo[interno]], self.nodo_der[nodo[interno]]))
+
+        if not salida_q:
+            return vacio, vacio
+        return np.concatenate(salida_q), np.concatenate(salida_t)
+
+
+def punto_triangulo_cercano(p, a, b, c):
+    """
+    Punto más cercano de cada triángulo (a, b, c) a cada punto p (Ericson 2005, 5.1.5)
+    Todos los argumentos son arrays (M,3); devuelve (M,3)
+    """
+    def dot(u, v):
+        return np.einsum('ij,ij->i', u, v)
+
+    ab = b - a
+    ac = c - a
+    ap = p - a
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+
+    bp = p - b
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+
+    cp = p - c
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    # Resultado como a + ab * v + ac * w (coordenadas baricéntricas por región)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Interior de la cara
+        denom = 1.0 / (va + vb + vc)
+        v = vb * denom
+        w = vc * denom
+
+        # Regiones de arista y vértice, de menor a mayor prioridad
+        region = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+        t = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        v = np.where(region, 1.0 - t, v)
+        w = np.where(region, t, w)
+
+        region = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        t = d2 / (d2 - d6)
+        v = np.where(region, 0.0, v)
+        w = np.where(region, t, w)
+
+        region = (d6 >= 0) & (d5 <= d6)
+        v = np.where(region, 0.0, v)
+        w = np.where(region, 1.0, w)
+
+        region = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        t = d1 / (d1 - d3)
+        v = np.where(region, t, v)
+        w = np.where(region, 0.0, w)
+
+        region = (d3 >= 0) & (d4 <= d3)
+        v = np.where(region, 1.0, v)
+        w = np.where(region, 0.0, w)
+
+        region = (d1 <= 0) & (d2 <= 0)
+        v = np.where(region, 0.0, v)
+        w = np.where(region, 0.0, w)
+
+    return a + ab * v[:, None] + ac * w[:, None]
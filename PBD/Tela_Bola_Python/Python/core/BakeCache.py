@@ -0,0 +1,183 @@
+"""
+BakeCache - Formato binario compacto para bakes de posiciones
+Fichero = cabecera fija de 64 bytes + (solo int16) tabla de cuantización por
+frame + bloque (frames, N, 3) contiguo. Se lee con np.memmap, así que
+reproducir un frame solo toca las páginas de ese frame y un bake de miles de
+frames no necesita un Shape Key por frame en memoria.
+
+Formatos:
+    'float32': posiciones exactas (12 bytes por partícula y frame)
+    'float16': mitad de tamaño, error relativo ~1e-3
+    'int16':   cuantizado por frame a la caja del frame (error ≤ tamaño/65534)
+"""
+import os
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MAGIC = b'PBDBAKE\0'
+VERSION = 1
+TAM_CABECERA = 64
+# magic, versión, formato, frames reservados, frames escritos, partículas, fps
+_CABECERA = struct.Struct('<8sIIIIIf')
+
+FORMATOS = ('float32', 'float16', 'int16')
+_DTYPES = {'float32': '<f4', 'float16': '<f2', 'int16': '<i2'}
+_Q_MAX = 32767
+
+
+def _disposicion(formato, frames, n):
+    """Offsets de la tabla de cuantización y del bloque de datos, y tamaño total"""
+    tam_tabla = frames * 6 * 4 if formato == 'int16' else 0
+    offset_datos = TAM_CABECERA + tam_tabla
+    tam_datos = frames * n * 3 * np.dtype(_DTYPES[formato]).itemsize
+    return TAM_CABECERA, offset_datos, offset_datos + tam_datos
+
+
+class BakeWriter:
+    """
+    Escritura frame a frame de un bake (el fichero se reserva completo al crearlo)
+    ruta: fichero de salida (se sobrescribe)
+    num_frames: frames reservados (el bake puede cerrarse con menos)
+    n: número de partículas
+    formato: 'float32', 'float16' o 'int16'
+    """
+
+    def __init__(self, ruta, num_frames, n, fps=60.0, formato='float32'):
+        if np is None:
+            raise ImportError("BakeWriter requiere NumPy")
+        if formato not in FORMATOS:
+            raise ValueError(f"formato debe ser uno de {FORMATOS} (recibido {formato!r})")
+        if num_frames < 1 or n < 1:
+            raise ValueError(f"Bake vacío: num_frames={num_frames}, n={n}")
+
+        self.ruta = ruta
+        self.formato = formato
+        self.num_frames = int(num_frames)
+        self.n = int(n)
+        self.fps = float(fps)
+        self.frames_escritos = 0
+
+        offset_tabla, offset_datos, total = _disposicion(formato, self.num_frames, self.n)
+        with open(ruta, 'wb') as f:
+            f.write(self._cabecera())
+            f.truncate(total)
+
+        self._datos = np.memmap(ruta, dtype=_DTYPES[formato], mode='r+', offset=offset_datos,
+                                shape=(self.num_frames, self.n, 3))
+        self._tabla = None
+        if formato == 'int16':
+            self._tabla = np.memmap(ruta, dtype='<f4', mode='r+', offset=offset_tabla,
+                                    shape=(self.num_frames, 2, 3))
+
+    def _cabecera(self):
+        cabecera = _CABECERA.pack(MAGIC, VERSION, FORMATOS.index(self.formato), self.num_frames,
+                                  self.frames_escritos, self.n, self.fps)
+        return cabecera.ljust(TAM_CABECERA, b'\0')
+
+    def write_frame(self, posiciones, frame=None):
+        """
+        Guardar las posiciones (N,3) de un frame (por defecto, el siguiente)
+        """
+        frame = self.frames_escritos if frame is None else frame
+        if not 0 <= frame < self.num_frames:
+            raise IndexError(f"frame {frame} fuera del bake ({self.num_frames} frames)")
+
+        pos = np.asarray(posiciones, dtype=np.float64).reshape(self.n, 3)
+        if self.formato == 'int16':
+            finitas = np.isfinite(pos).all(axis=1)
+            lo = pos[finitas].min(axis=0) if finitas.any() else np.zeros(3)
+            hi = pos[finitas].max(axis=0) if finitas.any() else np.zeros(3)
+            escala = np.maximum(hi - lo, 1e-12) / (2 * _Q_MAX)
+            q = np.rint((np.where(finitas[:, None], pos, lo) - lo) / escala) - _Q_MAX
+            self._datos[frame] = np.clip(q, -_Q_MAX, _Q_MAX)
+            self._tabla[frame, 0] = lo
+            self._tabla[frame, 1] = escala
+        else:
+            self._datos[frame] = pos
+
+        self.frames_escritos = max(self.frames_escritos, frame + 1)
+
+    def close(self):
+        """Volcar los datos y actualizar el número de frames escritos en la cabecera"""
+        if self._datos is None:
+            return
+        self._datos.flush()
+        if self._tabla is not None:
+            self._tabla.flush()
+        self._datos = None
+        self._tabla = None
+        with open(self.ruta, 'r+b') as f:
+            f.write(self._cabecera())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BakeCache:
+    """
+    Lectura de un bake con np.memmap (solo se cargan las páginas que se leen)
+    len(bake): frames escritos ; bake.frame(i): posiciones (N,3) float32
+    """
+
+    def __init__(self, ruta):
+        if np is None:
+            raise ImportError("BakeCache requiere NumPy")
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            cabecera = f.read(TAM_CABECERA)
+        if len(cabecera) < _CABECERA.size:
+            raise ValueError(f"{ruta}: fichero demasiado corto para ser un bake")
+
+        magic, version, formato, reservados, escritos, n, fps = _CABECERA.unpack_from(cabecera)
+        if magic != MAGIC:
+            raise ValueError(f"{ruta}: no es un bake PBD (magic {magic!r})")
+        if version != VERSION or formato >= len(FORMATOS):
+            raise ValueError(f"{ruta}: versión {version} / formato {formato} no soportados")
+
+        self.formato = FORMATOS[formato]
+        self.n = n
+        self.fps = fps
+        self.num_frames = escritos
+        self.mtime = os.path.getmtime(ruta)
+
+        offset_tabla, offset_datos, total = _disposicion(self.formato, reservados, n)
+        if os.path.getsize(ruta) < total:
+            raise ValueError(f"{ruta}: bake truncado")
+        self._datos = np.memmap(ruta, dtype=_DTYPES[self.formato], mode='r', offset=offset_datos,
+                                shape=(reservados, n, 3))
+        self._tabla = None
+        if self.formato == 'int16':
+            self._tabla = np.memmap(ruta, dtype='<f4', mode='r', offset=offset_tabla,
+                                    shape=(reservados, 2, 3))
+
+    def __len__(self):
+        return self.num_frames
+
+    def frame(self, i):
+        """Posiciones (N,3) float32 del frame i"""
+        if not 0 <= i < self.num_frames:
+            raise IndexError(f"frame {i} fuera del bake ({self.num_frames} frames)")
+        if self.formato == 'int16':
+            lo, escala = self._tabla[i]
+            return ((self._datos[i] + np.float32(_Q_MAX)) * escala + lo).astype(np.float32)
+        return np.array(self._datos[i], dtype=np.float32)
+
+    def close(self):
+        self._datos = None
+        self._tabla = None
+
+
+def guardar_bake(ruta, posiciones, fps=60.0, formato='float32'):
+    """Guardar de una vez un array (frames, N, 3)"""
+    posiciones = np.asarray(posiciones)
+    with BakeWriter(ruta, posiciones.shape[0], posiciones.shape[1], fps, formato) as writer:
+        for pos in posiciones:
+            writer.write_frame(pos)
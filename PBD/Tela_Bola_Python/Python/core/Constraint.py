@@ -3,7 +3,7 @@ Clase base abstracta Constraint para Position-Based Dynamics
 Migrado de JavaScript a Python para Blender
 """
 import math
-import mathutils
+from core.VectorBackend import mathutils
 
 
 class Constraint:
@@ -13,12 +13,20 @@ class Constraint:
     # Sin este clamp, un tetraedro puede corregir 0.3m de golpe, formando ondas de choque y colapso
     MAX_CORRECTION_PER_FRAME = 0.1  # metros (10cm máximo por frame)
     
+    # Rigidez mínima al derivar la compliance XPBD (k = 0 sería α~ infinita)
+    MIN_K_XPBD = 1e-6
+    
     def __init__(self):
         self.particles = []
         self.stiffness = 0.0
         self.k_coef = 0.0  # Coeficiente ajustado por número de iteraciones
         self.C = 0.0  # Valor de la restricción
-    
+        # XPBD (Macklin 2016): compliance α = 1/rigidez física, independiente de dt e iteraciones
+        # None = derivarla de stiffness (ver xpbd_alpha)
+        self.compliance = None
+        self.k_xpbd = None  # Fracción de C que corrige cada substep (compute_k_xpbd)
+        self.lambda_xpbd = 0.0  # Multiplicador de Lagrange acumulado en el substep
+
     @staticmethod
     def clamp_correction(correction_vector, max_magnitude=None):
         """
@@ -44,6 +52,46 @@ class Constraint:
         
         return correction_vector
     
+    @staticmethod
+    def clamp_correction_rows(corrections, max_magnitude=None):
+        """
+        Versión vectorizada de clamp_correction para lotes NumPy
+        Limita in-place la magnitud de cada fila de un array (M,3)
+        
+        Args:
+            corrections: array (M,3) de correcciones
+            max_magnitude: Magnitud máxima permitida (None = usa MAX_CORRECTION_PER_FRAME)
+        
+        Returns:
+            El mismo array, con las filas limitadas
+        """
+        import numpy as np
+        
+        if max_magnitude is None:
+            max_magnitude = Constraint.MAX_CORRECTION_PER_FRAME
+        
+        magnitudes = np.sqrt(np.einsum('ij,ij->i', corrections, corrections))
+        exceso = magnitudes > max_magnitude
+        if exceso.any():
+            corrections[exceso] *= (max_magnitude / magnitudes[exceso])[:, None]
+        
+        return corrections
+    
+    @staticmethod
+    def clamp_delta_lambda(delta_lambda, paso_max, max_magnitude=None):
+        """
+        Clamp de corrección para XPBD: limitar Δλ (escalar o array) antes de acumularlo,
+        para que λ siga correspondiendo al desplazamiento que de verdad se aplica
+        paso_max: mayor desplazamiento de una partícula por unidad de λ (max w_i |∇_i C|)
+        """
+        if max_magnitude is None:
+            max_magnitude = Constraint.MAX_CORRECTION_PER_FRAME
+        limite = max_magnitude / paso_max
+        if isinstance(delta_lambda, float):
+            return max(-limite, min(limite, delta_lambda))
+        import numpy as np
+        return np.clip(delta_lambda, -limite, limite)
+    
     def compute_k_coef(self, n):
         """
         Ajustar coeficiente de rigidez según número de iteraciones del solver
@@ -54,13 +102,70 @@ class Constraint:
         else:
             self.k_coef = self.stiffness
     
+    def compute_k_xpbd(self, substeps):
+        """
+        Rigidez por substep para la compliance derivada de stiffness:
+        k_sub = 1 - (1 - k)^(1/substeps), así un paso completo corrige la fracción k de C
+        """
+        if substeps > 1:
+            self.k_xpbd = 1.0 - pow(1.0 - self.stiffness, 1.0 / substeps)
+        else:
+            self.k_xpbd = self.stiffness
+    
     def proyecta_restriccion(self):
         """
         Método abstracto - debe ser implementado por subclases
         Proyecta las partículas para satisfacer la restricción
         """
         raise NotImplementedError("Las subclases deben implementar proyecta_restriccion()")
+
+    def reset_lambda(self):
+        """Reiniciar el multiplicador XPBD acumulado (al inicio de cada substep)"""
+        self.lambda_xpbd = 0.0
+
+    def proyecta_xpbd(self, dt):
+        """
+        Proyección XPBD con compliance para un substep de duración dt
+        Por defecto usa la proyección PBD (restricciones sin versión XPBD)
+        """
+        self.proyecta_restriccion()
+
+    def acumula_jacobi(self, buffer):
+        """
+        Solver Jacobi: sumar las correcciones en el DeltaBuffer sin mover las partículas
+        Por defecto proyecta directamente (restricciones sin versión Jacobi)
+        """
+        self.proyecta_restriccion()
+
+    def xpbd_alpha(self, denom, dt, sel=None):
+        """
+        α~ del substep (escalar, o array de las filas sel en los lotes)
+        Con compliance: α~ = α / dt².
+        Sin compliance (None) se deriva de la rigidez: α~ = Σ w |∇C|² (1 - k) / k, con el
+        que cada substep corrige la fracción k = k_xpbd de C (la misma que k' en PBD) por
+        muchas iteraciones que se hagan
+        """
+        compliance = self.compliance
+        if compliance is None:
+            k = self.stiffness if self.k_xpbd is None else self.k_xpbd
+            if sel is None:
+                k = max(k, self.MIN_K_XPBD)
+            else:
+                import numpy as np
+                k = np.maximum(k[sel], self.MIN_K_XPBD)
+            return denom * (1.0 - k) / k
+        if sel is not None and not isinstance(compliance, (int, float)):
+            compliance = compliance[sel]
+        return compliance / (dt * dt)
     
+    @staticmethod
+    def xpbd_delta_lambda(C, denom, lambda_acc, alpha):
+        """
+        Incremento del multiplicador XPBD (escalares o arrays NumPy)
+        alpha: α~ del substep (xpbd_alpha); Δλ = (-C - α~ λ) / (Σ w |∇C|² + α~)
+        """
+        return (-C - alpha * lambda_acc) / (denom + alpha)
+
     def display(self, scale_px):
         """
         Método abstracto - puede ser implementado por subclases para visualización
@@ -0,0 +1,60 @@
+"""
+DeltaBuffer - Acumulador de correcciones para el solver Jacobi
+Las restricciones no escriben en las posiciones: suman sus correcciones en un
+buffer (N,3) junto con un contador por partícula, y al final de la pasada se
+aplica la media de cada partícula escalada por el factor de relajación ω
+(Müller 2007 / Macklin 2014, "averaging" de correcciones).
+La acumulación es una suma, así que puede repartirse por trozos y reducirse.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class DeltaBuffer:
+    """
+    Buffer de correcciones de n partículas
+    delta: (n,3) suma de correcciones
+    count: (n,) número de correcciones recibidas por cada partícula
+    """
+
+    def __init__(self, n):
+        if np is None:
+            raise ImportError("DeltaBuffer requiere NumPy")
+        self.n = n
+        self.delta = np.zeros((n, 3), dtype=np.float64)
+        self.count = np.zeros(n, dtype=np.float64)
+
+    @staticmethod
+    def vacio():
+        """Par (índices, correcciones) sin elementos"""
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.float64)
+
+    def clear(self):
+        self.delta[:] = 0.0
+        self.count[:] = 0.0
+
+    def add(self, indices, correcciones):
+        """
+        Sumar correcciones (M,3) a las partículas indices (M,), que pueden repetirse
+        """
+        if len(indices) == 0:
+            return
+        self.count += np.bincount(indices, minlength=self.n)
+        for eje in range(3):
+            self.delta[:, eje] += np.bincount(indices, weights=correcciones[:, eje], minlength=self.n)
+
+    def apply(self, pos, omega=1.0, bloqueada=None):
+        """
+        pos += ω * delta / count en las partículas con correcciones
+        Returns: número de partículas corregidas
+        """
+        tocadas = self.count > 0
+        if bloqueada is not None:
+            tocadas &= ~bloqueada
+        if not tocadas.any():
+            return 0
+        pos[tocadas] += self.delta[tocadas] * (omega / self.count[tocadas])[:, None]
+        return int(tocadas.sum())
@@ -0,0 +1,97 @@
+"""
+GlobalDamping - Damping global de Müller (2007) vectorizado
+Calcula de una vez, para uno o varios cuerpos que comparten sistema, el centro
+de masas, la velocidad del centro de masas, el momento angular L y el tensor de
+inercia I (productos exteriores con einsum y sumas por cuerpo con bincount),
+resuelve ω = I⁻¹ L con np.linalg.solve y atenúa solo la parte no rígida de la
+velocidad: v = v_rígida + (1 - k) (v - v_rígida).
+Si I es casi singular (partículas alineadas) se usa la pseudo-inversa, que da
+la rotación de mínima norma en lugar de renunciar al damping angular.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Condición máxima de I para resolver directamente (por encima, pseudo-inversa)
+MAX_CONDICION = 1e8
+
+
+def _sumar_por_cuerpo(ids, valores, num_cuerpos):
+    """Suma por cuerpo de valores (M,) o (M,k) -> (B,) o (B,k)"""
+    if valores.ndim == 1:
+        return np.bincount(ids, weights=valores, minlength=num_cuerpos)
+    return np.stack([np.bincount(ids, weights=valores[:, j], minlength=num_cuerpos)
+                     for j in range(valores.shape[1])], axis=1)
+
+
+def velocidad_angular(I, L):
+    """
+    ω = I⁻¹ L para B cuerpos: I (B,3,3), L (B,3) -> ω (B,3)
+    Los tensores mal condicionados se resuelven con la pseudo-inversa
+    """
+    w = np.zeros_like(L)
+    if len(L) == 0:
+        return w
+    condicion = np.linalg.cond(I)
+    buenos = np.isfinite(condicion) & (condicion < MAX_CONDICION)
+    if buenos.any():
+        w[buenos] = np.linalg.solve(I[buenos], L[buenos][:, :, None])[:, :, 0]
+    if not buenos.all():
+        malos = ~buenos
+        w[malos] = np.einsum('bij,bj->bi', np.linalg.pinv(I[malos], rcond=1e-10), L[malos])
+    return w
+
+
+def amortiguar_global(pos, vel, masa, k_damping, bloqueada=None, cuerpos=None):
+    """
+    Damping global de Müller in-place sobre vel (N,3)
+    pos, vel: arrays (N,3); masa: (N,) (inf = partícula fija)
+    bloqueada: (N,) bool opcional; las fijas no cuentan ni se modifican
+    cuerpos: (N,) int opcional con el cuerpo de cada partícula (-1 = sin damping);
+             None = todo el sistema es un único cuerpo
+    Returns: número de partículas amortiguadas
+    """
+    validas = np.isfinite(masa) & (masa > 0)
+    validas &= np.isfinite(pos).all(axis=1) & np.isfinite(vel).all(axis=1)
+    if bloqueada is not None:
+        validas &= ~bloqueada
+    if cuerpos is not None:
+        validas &= cuerpos >= 0
+    indices = np.flatnonzero(validas)
+    if len(indices) == 0:
+        return 0
+
+    ids = cuerpos[indices] if cuerpos is not None else np.zeros(len(indices), dtype=np.int64)
+    num_cuerpos = int(ids.max()) + 1
+    m = masa[indices]
+    x = pos[indices]
+    v = vel[indices]
+
+    # A-B) Centro de masas y velocidad del centro de masas de cada cuerpo
+    M = np.bincount(ids, weights=m, minlength=num_cuerpos)
+    con_masa = M > 0
+    M_seguro = np.where(con_masa, M, 1.0)[:, None]
+    x_cm = _sumar_por_cuerpo(ids, x * m[:, None], num_cuerpos) / M_seguro
+    v_cm = _sumar_por_cuerpo(ids, v * m[:, None], num_cuerpos) / M_seguro
+
+    # C) Momento angular L = Σ r × (m v)
+    r = x - x_cm[ids]
+    L = _sumar_por_cuerpo(ids, np.cross(r, v * m[:, None]), num_cuerpos)
+
+    # D) Tensor de inercia I = Σ m (|r|² Id - r rᵀ)
+    r2 = np.einsum('ij,ij->i', r, r)
+    exterior = np.einsum('i,ij,ik->ijk', m, r, r).reshape(-1, 9)
+    I = -_sumar_por_cuerpo(ids, exterior, num_cuerpos).reshape(num_cuerpos, 3, 3)
+    I += _sumar_por_cuerpo(ids, m * r2, num_cuerpos)[:, None, None] * np.eye(3)
+
+    # E) Velocidad angular ω = I⁻¹ L
+    w = velocidad_angular(I, L)
+    w[~con_masa] = 0.0
+
+    # F-G) v = v_rígida + (1 - k) (v - v_rígida), con v_rígida = v_cm + ω × r
+    v_rigida = v_cm[ids] + np.cross(w[ids], r)
+    vel[indices] = v_rigida + (v - v_rigida) * (1.0 - k_damping)
+    return len(indices)
@@ -1,26 +1,59 @@
 """
 PBDSystem - Sistema de Position-Based Dynamics
 """
-import mathutils
+from core.VectorBackend import mathutils
 from core.Particle import Particle
 from constraints.DistanceConstraint import DistanceConstraint
+from constraints.BendingConstraint import BendingConstraint
+from constraints.ShearConstraint import ShearConstraint
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+from constraints.VolumeConstraintGlobal import VolumeConstraintGlobal
 
 
 class PBDSystem:
     """Sistema principal de simulación PBD"""
     
-    def __init__(self, n, mass):
+    def __init__(self, n, mass, use_arrays=False):
         """
         Constructor
         n: número de partículas a crear
         mass: masa de cada partícula
+        use_arrays: guardar las partículas en arrays NumPy (ParticleStore)
+                    y usar Particle como vista sobre ellos (requiere NumPy)
         """
         self.particles = []
+        self.store = None  # ParticleStore (solo en modo arrays)
+        self.topology_version = 0  # Se incrementa al cambiar las restricciones
         self.constraints = []
+        self.constraintsByType = {}  # Tipo concreto -> restricciones (en orden de inserción)
+        self.solvePlan = None  # SolvePlan compilado (se recompila al cambiar la topología)
         self.collisionObjects = []  # Array de objetos de colisión (esferas, planos, etc.)
+        self.colliders = None  # ColliderSet: colisionadores estáticos (planos, cajas, mallas...)
         self.sphereCollider = None  # Colisionador de esfera (opcional)
         self.niters = 5
         self.shapeMatching = None  # Shape Matching (opcional, para soft-bodies)
+        self.use_spatial_hash = True  # Broadphase con hash espacial para la esfera
+        self.sphereHash = None  # SpatialHash reconstruido en cada paso (si hay esfera)
+        self.sphereHashPos = None  # Posiciones con las que se construyó sphereHash
+        self.selfCollider = None  # Auto-colisión de partículas (opcional)
+        self.debug = False  # True = pipeline de depuración (chequeos de NaN y logs por fase)
+        self.strikes = None  # Pasos consecutivos con valores no finitos por partícula (release)
+        self.max_strikes = 3  # Tras estos pasos seguidos la partícula queda en cuarentena (bloqueada)
+        self.enCuarentena = set()  # Índices de partículas en cuarentena
+        self.avisoFinitud = False  # validateFiniteness ya avisó una vez (solo repite con debug)
+        self.solver_mode = 'pbd'  # 'pbd' (rigidez k por iteraciones) o 'xpbd' (compliance + substeps)
+        self.substeps = 1  # Substeps por paso en modo XPBD (niters = iteraciones por substep)
+        self.jacobi_omega = 1.5  # Relajación ω del solver Jacobi (1-2, Macklin 2014)
+        self.deltaBuffer = None  # DeltaBuffer del solver Jacobi (se crea al usarlo)
+        self.profiler = None  # Profiler de tiempos por fase (None = desactivado)
+        self.bodies = None  # Cuerpo de cada partícula (array de ids) para el damping por cuerpo
+        
+        # Modo arrays: las partículas son vistas sobre el ParticleStore
+        if use_arrays:
+            from core.ParticleStore import ParticleStore
+            self.store = ParticleStore(n, mass)
+            self.particles = self.store.create_views()
+            return
         
         # Crear partículas iniciales
         # CRÍTICO: Crear nuevos objetos Vector para cada partícula
@@ -40,28 +73,526 @@ class PBDSystem:
         self.niters = n
         for constraint in self.constraints:
             constraint.compute_k_coef(n)
+        self.solvePlan = None
+    
+    def set_solver_mode(self, mode, substeps=None, iterations=None, omega=None):
+        """
+        Elegir el solver del pipeline release
+        mode: 'pbd' (Gauss-Seidel), 'jacobi' (correcciones promediadas, modo arrays) o 'xpbd'
+        substeps: substeps por paso (XPBD; 'small steps' = muchos substeps con 1 iteración)
+        iterations: iteraciones por substep (XPBD) o por paso (PBD, Jacobi)
+        omega: factor de relajación del solver Jacobi
+        """
+        if mode not in ('pbd', 'jacobi', 'xpbd'):
+            raise ValueError(f"mode debe ser 'pbd', 'jacobi' o 'xpbd' (recibido {mode!r})")
+        if mode == 'jacobi' and self.store is None:
+            raise ValueError("El solver Jacobi requiere un PBDSystem creado con use_arrays=True")
+        self.solver_mode = mode
+        if omega is not None:
+            self.jacobi_omega = omega
+        if substeps is not None:
+            if substeps < 1:
+                raise ValueError(f"substeps debe ser >= 1 (recibido {substeps})")
+            self.substeps = int(substeps)
+        if iterations is None and mode == 'xpbd':
+            iterations = 1
+        if iterations is not None:
+            self.set_n_iters(int(iterations))
+    
+    def set_compliance(self, typeClass, alpha):
+        """
+        Compliance XPBD (α = 1/rigidez, en unidades de la restricción) de las
+        restricciones de tipo typeClass (incluye sus lotes). α = 0 es rígida.
+        alpha = None vuelve a derivarla de la rigidez (stiffness) de cada restricción.
+        """
+        if alpha is not None and alpha < 0:
+            raise ValueError(f"alpha debe ser >= 0 (recibido {alpha})")
+        for c in self.constraints:
+            if isinstance(c, typeClass):
+                c.compliance = alpha
+    
+    def set_bodies(self, cuerpos):
+        """
+        Asignar un cuerpo a cada partícula para que el damping global trate por
+        separado varios objetos que comparten sistema
+        cuerpos: secuencia (N,) de ids (>= 0; -1 = sin damping) o None = un único cuerpo
+        """
+        if cuerpos is None:
+            self.bodies = None
+            return
+        import numpy as np
+        cuerpos = np.asarray(cuerpos, dtype=np.int64)
+        if cuerpos.shape != (len(self.particles),):
+            raise ValueError(f"Se esperaban {len(self.particles)} ids de cuerpo, recibidos {cuerpos.shape}")
+        self.bodies = cuerpos
+    
+    def set_profiling(self, enabled=True, capacidad=600):
+        """
+        Activar/desactivar la medición de tiempos por fase de run() (pipelines release y XPBD)
+        capacidad: pasos que guarda el buffer circular
+        Returns: el Profiler activo (o None si se desactiva)
+        """
+        if not enabled:
+            self.profiler = None
+            return None
+        if self.profiler is None or self.profiler.frames.maxlen != capacidad:
+            from core.Profiler import Profiler
+            self.profiler = Profiler(capacidad)
+        return self.profiler
     
     def add_constraint(self, c):
         """Añadir una restricción al sistema"""
         self.constraints.append(c)
+        self.constraintsByType.setdefault(type(c), []).append(c)
         c.compute_k_coef(self.niters)
+        self.topology_version += 1
+    
+    def rebuildConstraintBuckets(self):
+        """Recalcular constraintsByType (tras modificar self.constraints directamente)"""
+        self.constraintsByType = {}
+        for c in self.constraints:
+            self.constraintsByType.setdefault(type(c), []).append(c)
+        self.topology_version += 1
+    
+    def getSolvePlan(self):
+        """SolvePlan del sistema (se recompila si cambió la topología o niters)"""
+        if self.solvePlan is None or not self.solvePlan.vigente(self):
+            from core.SolvePlan import SolvePlan
+            if sum(len(lista) for lista in self.constraintsByType.values()) != len(self.constraints):
+                self.rebuildConstraintBuckets()
+            self.solvePlan = SolvePlan(self)
+        return self.solvePlan
+    
+    def invalidateSolvePlan(self):
+        """Forzar la recompilación del plan (p.ej. tras cambiar la rigidez de volumen)"""
+        self.solvePlan = None
+    
+    def batch_constraints(self):
+        """
+        Sustituir las restricciones escalares por lotes vectorizados (solo modo arrays)
+        Llamar una vez terminada la configuración (V0, d, phi0 definitivos)
+        """
+        if self.store is None:
+            raise ValueError("batch_constraints requiere un PBDSystem creado con use_arrays=True")
+        
+        from constraints.DistanceConstraintBatch import DistanceConstraintBatch
+        from constraints.VolumeConstraintTetBatch import VolumeConstraintTetBatch
+        from constraints.BendingConstraintBatch import BendingConstraintBatch
+        from constraints.ShearConstraintBatch import ShearConstraintBatch
+        
+        lotes = [
+            (DistanceConstraint, DistanceConstraintBatch),
+            (VolumeConstraintTet, VolumeConstraintTetBatch),
+            (BendingConstraint, BendingConstraintBatch),
+            (ShearConstraint, ShearConstraintBatch),
+        ]
+        
+        for tipo, tipo_batch in lotes:
+            escalares = [c for c in self.constraints if type(c) is tipo]
+            if len(escalares) == 0:
+                continue
+            self.constraints = [c for c in self.constraints if type(c) is not tipo]
+            self.constraintsByType.pop(tipo, None)
+            self.add_constraint(tipo_batch.from_constraints(self.store, escalares))
+            print(f"   ⚡ {len(escalares)} {tipo.__name__} agrupadas en {tipo_batch.__name__}")
     
     def add_collision_object(self, obj):
         """Añadir un objeto de colisión al sistema"""
         self.collisionObjects.append(obj)
     
+    def add_collider(self, collider):
+        """
+        Añadir un colisionador estático (PlaneCollider, StaticSphereCollider,
+        CapsuleCollider, BoxCollider, MeshCollider). Se resuelven todos juntos
+        en una narrowphase por lotes (ColliderSet, requiere NumPy)
+        """
+        if self.colliders is None:
+            from constraints.Colliders import ColliderSet
+            self.colliders = ColliderSet(self)
+        return self.colliders.add(collider)
+    
     def set_sphere_collider(self, sphere_collider):
         """Configurar el colisionador de esfera"""
         self.sphereCollider = sphere_collider
     
+    def set_self_collider(self, self_collider):
+        """Configurar la auto-colisión (SelfCollider)"""
+        self.selfCollider = self_collider
+    
     def set_shape_matching(self, shapeMatching):
-        """Configurar Shape Matching (opcional)"""
+        """Configurar Shape Matching (opcional, p.ej. constraints.ShapeMatching)"""
         self.shapeMatching = shapeMatching
+        self.solvePlan = None  # El plan reparte las iteraciones según haya Shape Matching
+    
+    def run(self, dt, apply_damping=True, use_plane_col=True, use_sphere_col=True, use_shape_matching=True, debug_frame=None, floor_height=None, use_self_col=True):
+        """
+        Ejecutar un paso de simulación PBD
+        El solver lo decide solver_mode y self.debug solo añade instrumentación:
+        - 'pbd' / 'jacobi': runRelease (sin chequeos de NaN por fase, una única validación
+          vectorizada al final del paso) o, con self.debug = True, runDebug (mismo plan
+          y mismo solver, con chequeos de NaN por fase y logs de debug_frame).
+          Con 'jacobi' cada fase se resuelve con correcciones promediadas (projectJacobi).
+        - 'xpbd': runXPBD (substeps con compliance), instrumentado si self.debug.
+        Los parámetros son los de runDebug.
+        """
+        if self.solver_mode == 'xpbd':
+            return self.runXPBD(dt, apply_damping, use_plane_col, use_sphere_col, use_shape_matching,
+                                floor_height, use_self_col, debug_frame)
+        if self.debug:
+            return self.runDebug(dt, apply_damping, use_plane_col, use_sphere_col, use_shape_matching,
+                                 debug_frame, floor_height, use_self_col)
+        return self.runRelease(dt, apply_damping, use_plane_col, use_sphere_col, use_shape_matching,
+                               floor_height, use_self_col)
     
-    def run(self, dt, apply_damping=True, use_plane_col=True, use_sphere_col=True, use_shape_matching=True, debug_frame=None, floor_height=None):
+    def runRelease(self, dt, apply_damping=True, use_plane_col=True, use_sphere_col=True, use_shape_matching=True, floor_height=None, use_self_col=True):
+        """
+        Paso de simulación sin instrumentación (mismas fases que runDebug)
+        La finitud de posiciones y velocidades se comprueba una sola vez por paso
+        (validateFiniteness), y las partículas inválidas se ponen en cuarentena.
+        """
+        plan = self.getSolvePlan()
+        proyectar = self.projectJacobi if self.solver_mode == 'jacobi' else plan.proyectar
+        prof = self.profiler
+        if prof:
+            t = prof.inicio_paso()
+        
+        # 1. Predicción de posiciones (sin validación por partícula)
+        if self.store is not None:
+            self.store.predict(dt, validar=False)
+        else:
+            for particle in self.particles:
+                particle.update_fast(dt)
+        
+        if self.sphereCollider is not None and self.sphereCollider.active:
+            self.sphereCollider.update(dt)
+        if prof:
+            t = prof.vuelta('prediccion', t)
+        
+        # 1c. Broadphase
+        if use_sphere_col and self.sphereCollider is not None and self.sphereCollider.active:
+            self.rebuildSphereHash()
+        
+        if use_self_col and self.selfCollider is not None and self.selfCollider.active:
+            self.selfCollider.rebuild()
+        
+        if self.colliders is not None:
+            self.colliders.rebuild()
+        
+        for particle in self.particles:
+            particle.inCollisionWithSphere = False
+        if prof:
+            t = prof.vuelta('broadphase', t)
+        
+        # 2. Bucle de solver: ejecutar el plan compilado
+        for it in range(self.niters):
+            if plan.volumen_primero:
+                plan.proyectar_volumen(plan.iters_volumen[it], proyectar)
+                if prof:
+                    t = prof.vuelta('volumen', t)
+            
+            proyectar(plan.distancia)
+            if prof:
+                t = prof.vuelta('distancia', t)
+            proyectar(plan.shear)
+            if prof:
+                t = prof.vuelta('shear', t)
+            proyectar(plan.bending)
+            if prof:
+                t = prof.vuelta('bending', t)
+            
+            if self.shapeMatching and use_shape_matching and it < plan.shape_matching_iters:
+                self.shapeMatching.apply()
+                if prof:
+                    t = prof.vuelta('shape_matching', t)
+            
+            self.projectCollisions(use_plane_col, use_sphere_col, dt)
+            if prof:
+                t = prof.vuelta('colisiones', t)
+            
+            if use_plane_col and floor_height is not None:
+                self.projectFloorCollision(dt, floor_height)
+                if prof:
+                    t = prof.vuelta('suelo', t)
+            
+            if use_sphere_col and self.sphereCollider is not None:
+                self.projectSphereCollision(dt, floor_height)
+                if prof:
+                    t = prof.vuelta('esfera', t)
+            
+            if use_self_col and self.selfCollider is not None:
+                self.selfCollider.project()
+                if prof:
+                    t = prof.vuelta('auto_colision', t)
+            
+            if not plan.volumen_primero:
+                plan.proyectar_volumen(plan.iters_volumen[it], proyectar)
+                if prof:
+                    t = prof.vuelta('volumen', t)
+        
+        # 3. Velocidades PBD
+        if self.store is not None:
+            self.store.update_velocities(dt, validar=False)
+        else:
+            for particle in self.particles:
+                particle.update_pbd_vel_fast(dt)
+        if prof:
+            t = prof.vuelta('velocidades', t)
+        
+        # 4. Única validación de finitud del paso (antes del damping, que mezcla todas las partículas)
+        self.validateFiniteness()
+        if prof:
+            t = prof.vuelta('validacion', t)
+        
+        # 5. Damping global
+        if apply_damping:
+            self.applyGlobalDamping(0.1)
+            if prof:
+                prof.vuelta('damping', t)
+        
+        if prof:
+            prof.fin_paso()
+    
+    def runXPBD(self, dt, apply_damping=True, use_plane_col=True, use_sphere_col=True, use_shape_matching=True, floor_height=None, use_self_col=True, debug_frame=None):
+        """
+        Paso de simulación XPBD con substeps (Macklin 2016, 'Small Steps' 2019)
+        dt se divide en self.substeps substeps; en cada uno se predice, se reinician
+        los multiplicadores λ y se ejecutan self.niters iteraciones. La rigidez la fija
+        la compliance de cada restricción y no depende del número de iteraciones.
+        Sin set_compliance, la compliance se deriva de stiffness: cada paso corrige
+        la misma fracción k de C que en PBD, repartida entre los substeps.
+        Con self.debug = True la predicción y las velocidades validan cada partícula y,
+        en los frames 1-3 (debug_frame), se avisa de la fase que genere NaN.
+        """
+        depurar = self.debug
+        logs = depurar and debug_frame is not None and debug_frame <= 3
+        plan = self.getSolvePlan()
+        substeps = max(1, self.substeps)
+        h = dt / substeps
+        restricciones = plan.distancia + plan.shear + plan.bending + plan.tet + plan.global_
+        if plan.substeps_xpbd != substeps:
+            for c in restricciones:
+                c.compute_k_xpbd(substeps)
+            plan.substeps_xpbd = substeps
+        fases = (('distancia', plan.distancia), ('shear', plan.shear), ('bending', plan.bending),
+                 ('volumen', plan.tet + plan.global_))
+        prof = self.profiler
+        if prof:
+            t = prof.inicio_paso()
+        
+        # Las fuerzas externas se limpian al predecir: guardarlas para todos los substeps
+        if self.store is not None:
+            fuerzas = self.store.force.copy()
+        else:
+            fuerzas = [mathutils.Vector(p.force) for p in self.particles]
+        
+        for sub in range(substeps):
+            if sub > 0:
+                if self.store is not None:
+                    self.store.force[:] = fuerzas
+                else:
+                    for particle, f in zip(self.particles, fuerzas):
+                        particle.force = mathutils.Vector(f)
+            
+            # 1. Predicción del substep
+            if self.store is not None:
+                self.store.predict(h, validar=depurar)
+            elif depurar:
+                for particle in self.particles:
+                    particle.update(h)
+            else:
+                for particle in self.particles:
+                    particle.update_fast(h)
+            
+            if self.sphereCollider is not None and self.sphereCollider.active:
+                self.sphereCollider.update(h)
+            if prof:
+                t = prof.vuelta('prediccion', t)
+            
+            # 1c. Broadphase (las posiciones cambian poco en un substep)
+            if use_sphere_col and self.sphereCollider is not None and self.sphereCollider.active:
+                self.rebuildSphereHash()
+            
+            if use_self_col and self.selfCollider is not None and self.selfCollider.active:
+                self.selfCollider.rebuild()
+            
+            if self.colliders is not None:
+                self.colliders.rebuild()
+            
+            for particle in self.particles:
+                particle.inCollisionWithSphere = False
+            
+            for c in restricciones:
+                c.reset_lambda()
+            if prof:
+                t = prof.vuelta('broadphase', t)
+            
+            # 2. Iteraciones XPBD del substep
+            for it in range(self.niters):
+                for nombre, fase in fases:
+                    if logs and sub == 0 and it == 0:
+                        nan_antes = self.countNaN()
+                    for c in fase:
+                        c.proyecta_xpbd(h)
+                    if logs and sub == 0 and it == 0:
+                        nan_despues = self.countNaN()
+                        if nan_despues > nan_antes:
+                            print(f"   🔴 Frame {debug_frame}, substep 0, iter 0: fase '{nombre}' generó NaN: "
+                                  f"{nan_antes} -> {nan_despues}")
+                    if prof:
+                        t = prof.vuelta(nombre, t)
+                
+                if self.shapeMatching and use_shape_matching and it < plan.shape_matching_iters:
+                    self.shapeMatching.apply()
+                    if prof:
+                        t = prof.vuelta('shape_matching', t)
+                
+                self.projectCollisions(use_plane_col, use_sphere_col, h)
+                if prof:
+                    t = prof.vuelta('colisiones', t)
+                
+                if use_plane_col and floor_height is not None:
+                    self.projectFloorCollision(h, floor_height)
+                    if prof:
+                        t = prof.vuelta('suelo', t)
+                
+                if use_sphere_col and self.sphereCollider is not None:
+                    self.projectSphereCollision(h, floor_height)
+                    if prof:
+                        t = prof.vuelta('esfera', t)
+                
+                if use_self_col and self.selfCollider is not None:
+                    self.selfCollider.project()
+                    if prof:
+                        t = prof.vuelta('auto_colision', t)
+            
+            # 3. Velocidades del substep
+            if self.store is not None:
+                self.store.update_velocities(h, validar=depurar)
+            elif depurar:
+                for particle in self.particles:
+                    particle.update_pbd_vel(h)
+            else:
+                for particle in self.particles:
+                    particle.update_pbd_vel_fast(h)
+            if prof:
+                t = prof.vuelta('velocidades', t)
+        
+        if logs:
+            nan_count = self.countNaN()
+            if nan_count > 0:
+                print(f"   🔴 Frame {debug_frame}: {nan_count} partículas con NaN tras los {substeps} substeps XPBD")
+            else:
+                print(f"   ✅ Frame {debug_frame}: Todas válidas tras los {substeps} substeps XPBD")
+        
+        # 4. Validación y damping una vez por paso
+        self.validateFiniteness()
+        if prof:
+            t = prof.vuelta('validacion', t)
+        
+        if apply_damping:
+            self.applyGlobalDamping(0.1, debug_frame=debug_frame if depurar else None)
+            if prof:
+                prof.vuelta('damping', t)
+        
+        if prof:
+            prof.fin_paso()
+    
+    def projectJacobi(self, constraints):
+        """
+        Resolver una fase con el solver Jacobi (solo modo arrays)
+        Todas las restricciones se evalúan con las mismas posiciones y suman sus
+        correcciones en el DeltaBuffer; después cada partícula se mueve
+        ω * (media de sus correcciones).
+        """
+        if not constraints:
+            return
+        if self.deltaBuffer is None or self.deltaBuffer.n != self.store.n:
+            from core.DeltaBuffer import DeltaBuffer
+            self.deltaBuffer = DeltaBuffer(self.store.n)
+        
+        buffer = self.deltaBuffer
+        buffer.clear()
+        for c in constraints:
+            c.acumula_jacobi(buffer)
+        buffer.apply(self.store.pos, self.jacobi_omega, self.store.bloqueada)
+    
+    def countNaN(self):
+        """Número de partículas con alguna coordenada NaN (logs de depuración)"""
+        if self.store is not None:
+            import numpy as np
+            return int(np.isnan(self.store.pos).any(axis=1).sum())
+        import math
+        return sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
+    
+    def validateFiniteness(self):
+        """
+        Comprobar en una sola reducción vectorizada que posiciones y velocidades son finitas
+        Las partículas inválidas vuelven a su posición al inicio del paso con velocidad 0.
+        Si una partícula falla max_strikes pasos seguidos queda en cuarentena (bloqueada).
+        Solo avisa la primera vez, al entrar partículas en cuarentena o con self.debug
+        (en release se llama en cada paso).
+        Returns: número de partículas inválidas en este paso
+        """
+        n = len(self.particles)
+        if n == 0:
+            return 0
+        
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        
+        if np is None:
+            import math
+            invalidas = [i for i, p in enumerate(self.particles)
+                         if not all(math.isfinite(v) for v in (*p.location, *p.velocity))]
+            if not invalidas:
+                self.strikes = None
+                return 0
+        else:
+            if self.store is not None:
+                pos, prev, vel = self.store.pos, self.store.prev, self.store.vel
+            else:
+                pos = np.array([tuple(p.location) for p in self.particles], dtype=np.float64)
+                vel = np.array([tuple(p.velocity) for p in self.particles], dtype=np.float64)
+            
+            validas = np.isfinite(np.hstack((pos, vel))).all(axis=1)
+            if validas.all():
+                self.strikes = None
+                return 0
+            invalidas = np.nonzero(~validas)[0].tolist()
+        
+        # Contar pasos consecutivos con fallos (se reinicia en cuanto un paso es válido)
+        anteriores = self.strikes or {}
+        self.strikes = {i: anteriores.get(i, 0) + 1 for i in invalidas}
+        
+        import math
+        en_cuarentena = len(self.enCuarentena)
+        for i in invalidas:
+            p = self.particles[i]
+            origen = p.last_location
+            if not all(math.isfinite(v) for v in origen):
+                origen = mathutils.Vector((0.0, 0.0, 0.0))
+            p.location = mathutils.Vector(tuple(origen))
+            p.last_location = mathutils.Vector(tuple(origen))
+            p.velocity = mathutils.Vector((0.0, 0.0, 0.0))
+            
+            if self.strikes[i] >= self.max_strikes and i not in self.enCuarentena:
+                p.set_bloqueada(True)
+                self.enCuarentena.add(i)
+        
+        if self.debug or not self.avisoFinitud or len(self.enCuarentena) > en_cuarentena:
+            print(f"   ⚠️ validateFiniteness: {len(invalidas)} partículas con valores no finitos restauradas "
+                  f"({len(self.enCuarentena)} en cuarentena)")
+            if not self.debug and not self.avisoFinitud:
+                print("      (no se volverá a avisar salvo nuevas cuarentenas; self.debug = True para verlo en cada paso)")
+            self.avisoFinitud = True
+        return len(invalidas)
+    
+    def runDebug(self, dt, apply_damping=True, use_plane_col=True, use_sphere_col=True, use_shape_matching=True, debug_frame=None, floor_height=None, use_self_col=True):
         # DEBUG: Estado al inicio de run (solo primeros frames)
         if debug_frame is not None and debug_frame <= 3:
-            print(f"      DEBUG PBDSystem.run: Frame {debug_frame}, dt={dt:.6f}")
+            print(f"      DEBUG PBDSystem.runDebug: Frame {debug_frame}, dt={dt:.6f}")
             print(f"         Partículas: {len(self.particles)}, Restricciones: {len(self.constraints)}")
             print(f"         Primeras 3 partículas al INICIO de run:")
             for i in range(min(3, len(self.particles))):
@@ -69,7 +600,7 @@ class PBDSystem:
                 print(f"            Partícula {i}: loc=({p.location.x:.6f}, {p.location.y:.6f}, {p.location.z:.6f}), "
                       f"vel=({p.velocity.x:.6f}, {p.velocity.y:.6f}, {p.velocity.z:.6f})")
         """
-        Ejecutar un paso de simulación PBD
+        Ejecutar un paso de simulación PBD (pipeline de depuración, con chequeos de NaN por fase)
         
         dt: timestep
         apply_damping: aplicar damping global de Müller
@@ -78,6 +609,7 @@ class PBDSystem:
         use_shape_matching: usar Shape Matching
         debug_frame: número de frame para logs (None = sin logs)
         floor_height: altura del suelo para colisiones (None = desactivado)
+        use_self_col: usar auto-colisión (si hay SelfCollider)
         """
         import math
         
@@ -88,8 +620,11 @@ class PBDSystem:
                 print(f"   🔴 Frame {debug_frame}: {nan_count} partículas con NaN ANTES de update()")
         
         # 1. Predicción de posiciones (integración explícita)
-        for particle in self.particles:
-            particle.update(dt)
+        if self.store is not None:
+            self.store.predict(dt)
+        else:
+            for particle in self.particles:
+                particle.update(dt)
         
         # 1b. Predicción de posición de la esfera (si existe)
         # CRÍTICO: Actualizar posición de la esfera ANTES del solver, igual que las partículas
@@ -97,6 +632,16 @@ class PBDSystem:
         if self.sphereCollider is not None and self.sphereCollider.active:
             self.sphereCollider.update(dt)
         
+        # 1c. Broadphase: reconstruir el hash espacial con las posiciones predichas
+        if use_sphere_col and self.sphereCollider is not None and self.sphereCollider.active:
+            self.rebuildSphereHash()
+        
+        if use_self_col and self.selfCollider is not None and self.selfCollider.active:
+            self.selfCollider.rebuild()
+        
+        if self.colliders is not None:
+            self.colliders.rebuild()
+        
         # LOG: Verificar posiciones DESPUÉS de update (solo frame 1-3)
         if debug_frame is not None and debug_frame <= 3:
             nan_count = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
@@ -107,103 +652,48 @@ class PBDSystem:
         for particle in self.particles:
             particle.inCollisionWithSphere = False
         
-        # Número de iteraciones para Shape Matching (30% del total)
-        shapeMatchingIterations = max(1, int(self.niters * 0.3))
+        # Mismo plan que runRelease: fases, orden de volumen, sub-iteraciones de volumen
+        # e iteraciones con Shape Matching (así debug y release resuelven lo mismo)
+        plan = self.getSolvePlan()
+        
+        def proyectar_fase(nombre, fase, proyectar):
+            """Proyectar una fase y, en la primera iteración de los frames 1-3, avisar si generó NaN"""
+            if not (debug_frame is not None and debug_frame <= 3 and it == 0):
+                proyectar(fase)
+                return
+            nan_antes = self.countNaN()
+            proyectar(fase)
+            nan_despues = self.countNaN()
+            if nan_despues > nan_antes:
+                print(f"   🔴 Frame {debug_frame}, iter {it}: {nombre} generó NaN: {nan_antes} -> {nan_despues}")
+        
+        # Mismo solver que runRelease (Gauss-Seidel o Jacobi según solver_mode)
+        proyectar = self.projectJacobi if self.solver_mode == 'jacobi' else plan.proyectar
+        
+        def proyectar_volumen(fase):
+            plan.proyectar_volumen(plan.iters_volumen[it], proyectar)
         
         # 2. Bucle de solver de restricciones
         for it in range(self.niters):
             # LOG: Verificar posiciones antes de restricciones (solo primera iteración, frame 1-3)
             if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_count = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
+                nan_count = self.countNaN()
                 if nan_count > 0:
                     print(f"   🔴 Frame {debug_frame}, iter {it}: {nan_count} partículas con NaN ANTES de restricciones")
             
-            # Importar aquí para evitar imports circulares y para detectar stiffness
-            from constraints.BendingConstraint import BendingConstraint
-            from constraints.ShearConstraint import ShearConstraint
-            from constraints.VolumeConstraintTet import VolumeConstraintTet
-            from constraints.VolumeConstraintGlobal import VolumeConstraintGlobal
-            
-            # NUEVO: Detectar si hay stiffness muy bajo en restricciones de volumen
-            # Si es así, resolver volumen PRIMERO para darle prioridad
-            min_volume_stiffness = 1.0
-            for c in self.constraints:
-                if type(c).__name__ in ['VolumeConstraintTet', 'VolumeConstraintGlobal']:
-                    if hasattr(c, 'stiffness'):
-                        min_volume_stiffness = min(min_volume_stiffness, c.stiffness)
-            
-            # ORDEN DE RESOLUCIÓN ADAPTATIVO
+            # ORDEN DE RESOLUCIÓN ADAPTATIVO (decidido en el plan)
             # Si stiffness de volumen < 0.25 → Resolver volumen PRIMERO
-            # De lo contrario → Orden normal (distancias primero)
-            if min_volume_stiffness < 0.25:
-                # MODO VOLUMEN PRIMERO (para stiffness bajo)
-                # 2a. Resolver restricciones de volumen PRIMERO (múltiples iteraciones)
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_before_vol = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                
-                # Calcular iteraciones de volumen
-                if min_volume_stiffness > 0.7:
-                    num_volume_iterations = 5 if it < 3 else 3
-                elif min_volume_stiffness > 0.3:
-                    num_volume_iterations = 8 if it < 3 else 5
-                else:
-                    num_volume_iterations = 12 if it < 3 else 8
-                
-                for vol_iter in range(num_volume_iterations):
-                    self.projectConstraintsOfType(VolumeConstraintTet)
-                    self.projectConstraintsOfType(VolumeConstraintGlobal)
-                
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_after_vol = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                    if nan_after_vol > nan_before_vol:
-                        print(f"   🔴 Frame {debug_frame}, iter {it}: VolumeConstraint generó NaN: {nan_before_vol} -> {nan_after_vol}")
-                
-                # 2b. Luego distancias (con menos fuerza gracias al ajuste adaptativo)
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_before_dist = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                
-                self.projectConstraintsOfType(DistanceConstraint)
-            else:
-                # MODO NORMAL (orden original para stiffness normal/alto)
-                # 2a. Resolver restricciones internas en orden específico
-                # LOG: Antes de DistanceConstraint
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_before_dist = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                
-                self.projectConstraintsOfType(DistanceConstraint)
-            
-            # LOG: Después de DistanceConstraint
-            if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_after_dist = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                if nan_after_dist > nan_before_dist:
-                    print(f"   🔴 Frame {debug_frame}, iter {it}: DistanceConstraint generó NaN: {nan_before_dist} -> {nan_after_dist}")
-            
-            # LOG: Antes de ShearConstraint
-            if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_before_shear = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-            
-            self.projectConstraintsOfType(ShearConstraint)
-            
-            # LOG: Después de ShearConstraint
-            if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_after_shear = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                if nan_after_shear > nan_before_shear:
-                    print(f"   🔴 Frame {debug_frame}, iter {it}: ShearConstraint generó NaN: {nan_before_shear} -> {nan_after_shear}")
+            # De lo contrario → Orden normal (distancias primero, volumen tras las colisiones)
+            if plan.volumen_primero:
+                proyectar_fase('VolumeConstraint', None, proyectar_volumen)
             
-            # LOG: Antes de BendingConstraint
-            if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_before_bend = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-            
-            self.projectConstraintsOfType(BendingConstraint)
-            
-            # LOG: Después de BendingConstraint
-            if debug_frame is not None and debug_frame <= 3 and it == 0:
-                nan_after_bend = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                if nan_after_bend > nan_before_bend:
-                    print(f"   🔴 Frame {debug_frame}, iter {it}: BendingConstraint generó NaN: {nan_before_bend} -> {nan_after_bend}")
+            # 2a. Resolver restricciones internas en orden específico
+            proyectar_fase('DistanceConstraint', plan.distancia, proyectar)
+            proyectar_fase('ShearConstraint', plan.shear, proyectar)
+            proyectar_fase('BendingConstraint', plan.bending, proyectar)
             
-            # 2b. APLICAR SHAPE MATCHING (Müller 2005) en primeras iteraciones
-            if self.shapeMatching and use_shape_matching and it < shapeMatchingIterations:
+            # 2b. APLICAR SHAPE MATCHING (Müller 2005) en las iteraciones del plan
+            if self.shapeMatching and use_shape_matching and it < plan.shape_matching_iters:
                 self.shapeMatching.apply()
             
             # 2c. Resolver colisiones PRIMERO (antes de restricciones de volumen)
@@ -218,37 +708,14 @@ class PBDSystem:
             if use_sphere_col and self.sphereCollider is not None:
                 self.projectSphereCollision(dt, floor_height)
             
+            # 2d3. Auto-colisión (pares candidatos del hash de este paso)
+            if use_self_col and self.selfCollider is not None:
+                self.selfCollider.project()
+            
             # 2e. Resolver restricciones de volumen DESPUÉS de colisiones (para corregir el aplastamiento)
             # SOLO si NO se resolvieron al principio (stiffness >= 0.25)
-            if min_volume_stiffness >= 0.25:
-                # MODO NORMAL: Volumen después de colisiones
-                # LOG: Antes de VolumeConstraint
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_before_vol = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                
-                # Calcular iteraciones basadas en stiffness:
-                # - Stiffness alto (>0.7): 3-5 iteraciones
-                # - Stiffness medio (0.3-0.7): 5-8 iteraciones  
-                # - Stiffness bajo (<0.3): 8-12 iteraciones
-                if min_volume_stiffness > 0.7:
-                    num_volume_iterations = 5 if it < 3 else 3
-                elif min_volume_stiffness > 0.3:
-                    num_volume_iterations = 8 if it < 3 else 5
-                else:
-                    num_volume_iterations = 12 if it < 3 else 8
-                
-                for vol_iter in range(num_volume_iterations):
-                    # Proyectar restricciones de volumen por tetraedros
-                    self.projectConstraintsOfType(VolumeConstraintTet)
-                    
-                    # Proyectar restricción de volumen global (si existe)
-                    self.projectConstraintsOfType(VolumeConstraintGlobal)
-                
-                # LOG: Después de VolumeConstraint
-                if debug_frame is not None and debug_frame <= 3 and it == 0:
-                    nan_after_vol = sum(1 for p in self.particles if (math.isnan(p.location.x) or math.isnan(p.location.y) or math.isnan(p.location.z)))
-                    if nan_after_vol > nan_before_vol:
-                        print(f"   🔴 Frame {debug_frame}, iter {it}: VolumeConstraint generó NaN: {nan_before_vol} -> {nan_after_vol}")
+            if not plan.volumen_primero:
+                proyectar_fase('VolumeConstraint', None, proyectar_volumen)
             
             # LOG: Verificar posiciones después de todas las restricciones (solo primera iteración, frame 1-3)
             if debug_frame is not None and debug_frame <= 3 and it == 0:
@@ -279,8 +746,11 @@ class PBDSystem:
         
         # 3. Actualizar velocidades basándose en el cambio de posición
         # v[i] = (p_new[i] - p_old[i]) / dt
-        for particle in self.particles:
-            particle.update_pbd_vel(dt)
+        if self.store is not None:
+            self.store.update_velocities(dt)
+        else:
+            for particle in self.particles:
+                particle.update_pbd_vel(dt)
         
         # LOG: Verificar velocidades DESPUÉS de update_pbd_vel (solo frame 2-3)
         if debug_frame is not None and debug_frame >= 2 and debug_frame <= 3:
@@ -334,6 +804,65 @@ class PBDSystem:
             # Se pueden añadir más tipos de colisiones aquí
             if hasattr(obj, 'project'):
                 obj.project(self.particles, dt)
+        
+        # Colisionadores estáticos: una única narrowphase por lotes
+        if self.colliders is not None:
+            self.colliders.project()
+    
+    def rebuildSphereHash(self):
+        """
+        Reconstruir el hash espacial de partículas para la colisión con la esfera
+        Tamaño de celda ≈ radio de la esfera. Una vez por paso (posiciones predichas).
+        """
+        self.sphereHash = None
+        if not self.use_spatial_hash or len(self.particles) == 0:
+            return
+        
+        from core.SpatialHash import SpatialHash
+        
+        # Copia de las posiciones: getSphereCandidates mide cuánto se han movido desde aquí
+        if self.store is not None:
+            self.sphereHashPos = self.store.pos.copy()
+        else:
+            self.sphereHashPos = [tuple(p.location) for p in self.particles]
+        
+        self.sphereHash = SpatialHash(self.sphereCollider.radius)
+        self.sphereHash.build(self.sphereHashPos)
+    
+    def sphereHashDisplacement(self):
+        """Máximo desplazamiento de una partícula desde que se construyó el hash de la esfera"""
+        import math
+        if self.store is not None:
+            import numpy as np
+            d = self.store.pos - self.sphereHashPos
+            return math.sqrt(float(np.einsum('ij,ij->i', d, d).max()))
+        
+        maximo = 0.0
+        for p, (x, y, z) in zip(self.particles, self.sphereHashPos):
+            loc = p.location
+            d2 = (loc.x - x) ** 2 + (loc.y - y) ** 2 + (loc.z - z) ** 2
+            if d2 > maximo:
+                maximo = d2
+        return math.sqrt(maximo)
+    
+    def getSphereCandidates(self):
+        """
+        Partículas candidatas a colisionar con la esfera (en orden de índice)
+        Las partículas se mueven durante las iteraciones del solver después de construir
+        el hash: la consulta se amplía con el máximo desplazamiento desde entonces, así que
+        los candidatos incluyen a todas las partículas que estén ahora dentro de la esfera
+        y el resultado es el mismo que recorriéndolas todas.
+        """
+        if self.sphereHash is None:
+            return self.particles
+        
+        import math
+        margen = self.sphereHashDisplacement()
+        if not math.isfinite(margen):
+            return self.particles  # Posiciones no finitas: recorrido completo
+        indices = self.sphereHash.query_sphere(self.sphereCollider.center,
+                                               self.sphereCollider.radius + margen)
+        return [self.particles[i] for i in indices]
     
     def projectFloorCollision(self, dt, floor_height=0.0):
         """
@@ -403,8 +932,8 @@ class PBDSystem:
         # Velocidad de la esfera (para calcular velocidad relativa)
         sphere_velocity = self.sphereCollider.velocity
         
-        # Resolver colisión para cada partícula
-        for particle in self.particles:
+        # Resolver colisión solo para las partículas candidatas del hash espacial
+        for particle in self.getSphereCandidates():
             if particle.bloqueada:
                 continue
             
@@ -566,6 +1095,46 @@ class PBDSystem:
         0 = sin damping
         1 = elimina todo movimiento no rígido
         Recomendado: 0.1 - 0.2
+        
+        Con NumPy se calcula vectorizado (core.GlobalDamping), por cuerpo si hay
+        self.bodies; sin NumPy se usa applyGlobalDampingScalar.
+        """
+        n = len(self.particles)
+        if n == 0:
+            return
+        
+        try:
+            import numpy as np
+            from core.GlobalDamping import amortiguar_global
+        except ImportError:
+            np = None
+        
+        if np is None:
+            if self.bodies is not None:
+                raise ImportError("El damping por cuerpo requiere NumPy")
+            return self.applyGlobalDampingScalar(k_damping, debug_frame)
+        
+        if self.store is not None:
+            store = self.store
+            amortiguadas = amortiguar_global(store.pos, store.vel, store.masa, k_damping,
+                                             store.bloqueada, self.bodies)
+        else:
+            pos = np.array([tuple(p.location) for p in self.particles], dtype=np.float64)
+            vel = np.array([tuple(p.velocity) for p in self.particles], dtype=np.float64)
+            masa = np.array([p.masa for p in self.particles], dtype=np.float64)
+            bloqueada = np.array([p.bloqueada for p in self.particles], dtype=bool)
+            amortiguadas = amortiguar_global(pos, vel, masa, k_damping, bloqueada, self.bodies)
+            for particle, v, libre in zip(self.particles, vel, ~bloqueada):
+                if libre:
+                    particle.velocity = mathutils.Vector(v)
+        
+        if debug_frame is not None and debug_frame <= 3 and amortiguadas < n:
+            print(f"   ⚠️ Damping: {n - amortiguadas}/{n} partículas excluidas (fijas, sin masa o no finitas)")
+    
+    def applyGlobalDampingScalar(self, k_damping, debug_frame=None):
+        """
+        Damping global de Müller sin NumPy (un único cuerpo, mathutils)
+        Si el tensor de inercia es singular solo se amortigua la traslación
         """
         import math
         
@@ -2,7 +2,7 @@
 Clase Particle para Position-Based Dynamics
 Migrado de JavaScript a Python para Blender
 """
-import mathutils
+from core.VectorBackend import mathutils
 
 
 class Particle:
@@ -186,6 +186,38 @@ class Particle:
         self.acceleration = mathutils.Vector((0.0, 0.0, 0.0))
         self.force = mathutils.Vector((0.0, 0.0, 0.0))
     
+    def update_pbd_vel_fast(self, dt):
+        """
+        Igual que update_pbd_vel pero sin comprobaciones de NaN/Inf
+        (pipeline release: PBDSystem.validateFiniteness valida una vez por paso)
+        """
+        self.velocity = (self.location - self.last_location) / dt
+    
+    def update_fast(self, dt):
+        """
+        Igual que update pero sin comprobaciones de NaN/Inf ni logs
+        (pipeline release: PBDSystem.validateFiniteness valida una vez por paso)
+        """
+        if self.isSphere and (not self.isDynamic or not self.isReleased):
+            self.last_location = mathutils.Vector(self.location)
+            self.velocity = mathutils.Vector((0.0, 0.0, 0.0))
+            self.acceleration = mathutils.Vector((0.0, 0.0, 0.0))
+            self.force = mathutils.Vector((0.0, 0.0, 0.0))
+            return
+        
+        if self.bloqueada or dt <= 0:
+            return
+        
+        # Aceleración solo si la masa es finita y positiva
+        if self.masa > 0 and self.masa != float('inf'):
+            self.velocity = self.velocity + (self.force * self.w) * dt
+        
+        self.last_location = mathutils.Vector(self.location)
+        self.location = self.location + self.velocity * dt
+        
+        self.acceleration = mathutils.Vector((0.0, 0.0, 0.0))
+        self.force = mathutils.Vector((0.0, 0.0, 0.0))
+    
     def getLocation(self):
         return self.location
     
@@ -0,0 +1,329 @@
+"""
+ParticleStore - Almacenamiento de partículas en estructura de arrays (SoA)
+Guarda posiciones, posiciones previas, velocidades y fuerzas en arrays contiguos
+(N,3) de NumPy, y la masa inversa y el flag 'bloqueada' en arrays (N,).
+
+Las partículas del sistema pasan a ser vistas (ParticleView) sobre una fila
+de estos arrays, de modo que las restricciones existentes siguen funcionando
+con .location, .velocity, .w, .bloqueada, etc.
+"""
+import math
+from core.VectorBackend import mathutils
+from core.Particle import Particle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VectorView:
+    """
+    Vista de escritura directa sobre una fila (3,) de un array del ParticleStore
+    Implementa el subconjunto de mathutils.Vector que usa el motor:
+    x/y/z, indexado, aritmética, dot, cross, length, normalized y copy.
+    Las operaciones que no son in-place devuelven mathutils.Vector.
+    """
+
+    __slots__ = ('_array', '_index')
+
+    def __init__(self, array, index):
+        self._array = array
+        self._index = index
+
+    def to_vector(self):
+        """Copia de la fila como mathutils.Vector"""
+        row = self._array[self._index]
+        return mathutils.Vector((float(row[0]), float(row[1]), float(row[2])))
+
+    # ===== Componentes =====
+    @property
+    def x(self):
+        return float(self._array[self._index, 0])
+
+    @x.setter
+    def x(self, value):
+        self._array[self._index, 0] = value
+
+    @property
+    def y(self):
+        return float(self._array[self._index, 1])
+
+    @y.setter
+    def y(self, value):
+        self._array[self._index, 1] = value
+
+    @property
+    def z(self):
+        return float(self._array[self._index, 2])
+
+    @z.setter
+    def z(self, value):
+        self._array[self._index, 2] = value
+
+    # ===== Protocolo de secuencia (permite mathutils.Vector(view)) =====
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return float(self._array[self._index, i])
+
+    def __setitem__(self, i, value):
+        self._array[self._index, i] = value
+
+    def __iter__(self):
+        row = self._array[self._index]
+        return iter((float(row[0]), float(row[1]), float(row[2])))
+
+    def __repr__(self):
+        return f"VectorView({self.x:.6f}, {self.y:.6f}, {self.z:.6f})"
+
+    # ===== Aritmética (devuelve mathutils.Vector) =====
+    @staticmethod
+    def _coerce(other):
+        if isinstance(other, VectorView):
+            return other.to_vector()
+        return other
+
+    def __add__(self, other):
+        return self.to_vector() + VectorView._coerce(other)
+
+    def __radd__(self, other):
+        return mathutils.Vector(other) + self.to_vector()
+
+    def __sub__(self, other):
+        return self.to_vector() - VectorView._coerce(other)
+
+    def __rsub__(self, other):
+        return mathutils.Vector(other) - self.to_vector()
+
+    def __mul__(self, other):
+        return self.to_vector() * VectorView._coerce(other)
+
+    def __rmul__(self, other):
+        return VectorView._coerce(other) * self.to_vector()
+
+    def __truediv__(self, other):
+        return self.to_vector() / other
+
+    def __neg__(self):
+        return -self.to_vector()
+
+    # ===== Operaciones in-place (escriben directamente en el array) =====
+    def __iadd__(self, other):
+        self._array[self._index] += tuple(other)
+        return self
+
+    def __isub__(self, other):
+        self._array[self._index] -= tuple(other)
+        return self
+
+    def __imul__(self, other):
+        self._array[self._index] *= other
+        return self
+
+    def __itruediv__(self, other):
+        self._array[self._index] /= other
+        return self
+
+    # ===== API de mathutils.Vector =====
+    def dot(self, other):
+        return self.to_vector().dot(VectorView._coerce(other))
+
+    def cross(self, other):
+        return self.to_vector().cross(VectorView._coerce(other))
+
+    @property
+    def length(self):
+        row = self._array[self._index]
+        return math.sqrt(float(row[0]) ** 2 + float(row[1]) ** 2 + float(row[2]) ** 2)
+
+    @property
+    def length_squared(self):
+        row = self._array[self._index]
+        return float(row[0]) ** 2 + float(row[1]) ** 2 + float(row[2]) ** 2
+
+    def normalized(self):
+        return self.to_vector().normalized()
+
+    def copy(self):
+        return self.to_vector()
+
+
+class ParticleStore:
+    """
+    Estructura de arrays (SoA) para las partículas de un PBDSystem
+    pos, prev, vel, force: arrays (N,3) float64
+    w, masa: arrays (N,) float64 (masa inversa y masa)
+    bloqueada: array (N,) bool
+    """
+
+    def __init__(self, n, mass):
+        """
+        Constructor
+        n: número de partículas
+        mass: masa de cada partícula
+        """
+        if np is None:
+            raise ImportError("ParticleStore requiere NumPy (modo de arrays no disponible)")
+
+        self.n = n
+        self.pos = np.zeros((n, 3), dtype=np.float64)
+        self.prev = np.zeros((n, 3), dtype=np.float64)
+        self.vel = np.zeros((n, 3), dtype=np.float64)
+        self.force = np.zeros((n, 3), dtype=np.float64)
+
+        self.masa = np.full(n, float(mass), dtype=np.float64)
+        self.w = np.full(n, 1.0 / mass if mass > 0 else 0.0, dtype=np.float64)
+        self.bloqueada = np.zeros(n, dtype=bool)
+
+    def __len__(self):
+        return self.n
+
+    def nbytes(self):
+        """Memoria ocupada por los arrays (bytes)"""
+        return (self.pos.nbytes + self.prev.nbytes + self.vel.nbytes + self.force.nbytes +
+                self.masa.nbytes + self.w.nbytes + self.bloqueada.nbytes)
+
+    def create_views(self):
+        """Crear una ParticleView por cada fila del store"""
+        return [ParticleView(self, i) for i in range(self.n)]
+
+    def predict(self, dt, validar=True):
+        """
+        Predicción de posiciones vectorizada (equivalente a Particle.update)
+        v += (f * w) * dt ; prev = pos ; pos += v * dt
+        Las partículas bloqueadas no se mueven. Las filas no finitas se revierten
+        (validar=False omite esa comprobación: la hace PBDSystem.validateFiniteness).
+        """
+        if dt <= 0 or not math.isfinite(dt):
+            return
+
+        libres = ~self.bloqueada
+
+        # Aceleración solo para masas finitas y positivas
+        masa_valida = libres & np.isfinite(self.masa) & (self.masa > 0)
+        accel = self.force * self.w[:, None]
+        accel[~masa_valida] = 0.0
+
+        self.prev[libres] = self.pos[libres]
+        self.vel[libres] += accel[libres] * dt
+        self.pos[libres] += self.vel[libres] * dt
+
+        # Revertir filas inválidas (NaN/Inf) a la posición anterior
+        if validar:
+            invalidas = libres & ~np.isfinite(self.pos).all(axis=1)
+            if invalidas.any():
+                self.pos[invalidas] = self.prev[invalidas]
+                self.vel[invalidas] = 0.0
+
+        # Limpiar fuerzas
+        self.force[libres] = 0.0
+
+    def update_velocities(self, dt, validar=True):
+        """
+        Velocidades PBD vectorizadas (equivalente a Particle.update_pbd_vel)
+        v = (pos - prev) / dt
+        validar=False no descarta las filas no finitas (las trata PBDSystem.validateFiniteness)
+        """
+        if dt <= 0 or not math.isfinite(dt):
+            return
+
+        if not validar:
+            np.subtract(self.pos, self.prev, out=self.vel)
+            self.vel /= dt
+            return
+
+        nueva_vel = (self.pos - self.prev) / dt
+        validas = np.isfinite(nueva_vel).all(axis=1)
+        self.vel[validas] = nueva_vel[validas]
+
+        # Mantener la velocidad anterior salvo que también sea inválida
+        vel_invalidas = ~validas & ~np.isfinite(self.vel).all(axis=1)
+        self.vel[vel_invalidas] = 0.0
+
+
+class ParticleView(Particle):
+    """
+    Partícula proxy sobre una fila del ParticleStore
+    Hereda los métodos de Particle (update, update_pbd_vel, set_bloqueada...)
+    pero location, last_location, velocity, force, masa, w y bloqueada
+    se leen y escriben en los arrays del store.
+    """
+
+    def __init__(self, store, index, options=None):
+        if options is None:
+            options = {}
+
+        self._store = store
+        self._index = index
+
+        # Atributos no almacenados en arrays (igual que Particle)
+        self.acceleration = mathutils.Vector((0.0, 0.0, 0.0))
+        self.display_size = options.get('displaySize', 0.1)
+        self.radius = options.get('radius', 0.0)
+        self.isSphere = options.get('isSphere', False)
+        self.isDynamic = options.get('isDynamic', True)
+        self.isReleased = options.get('isReleased', True) if self.isSphere else True
+        self.inCollisionWithSphere = False
+        self.debugId = None
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def location(self):
+        return VectorView(self._store.pos, self._index)
+
+    @location.setter
+    def location(self, value):
+        self._store.pos[self._index] = tuple(value)
+
+    @property
+    def last_location(self):
+        return VectorView(self._store.prev, self._index)
+
+    @last_location.setter
+    def last_location(self, value):
+        self._store.prev[self._index] = tuple(value)
+
+    @property
+    def velocity(self):
+        return VectorView(self._store.vel, self._index)
+
+    @velocity.setter
+    def velocity(self, value):
+        self._store.vel[self._index] = tuple(value)
+
+    @property
+    def force(self):
+        return VectorView(self._store.force, self._index)
+
+    @force.setter
+    def force(self, value):
+        self._store.force[self._index] = tuple(value)
+
+    @property
+    def masa(self):
+        return float(self._store.masa[self._index])
+
+    @masa.setter
+    def masa(self, value):
+        self._store.masa[self._index] = value
+
+    @property
+    def w(self):
+        return float(self._store.w[self._index])
+
+    @w.setter
+    def w(self, value):
+        self._store.w[self._index] = value
+
+    @property
+    def bloqueada(self):
+        return bool(self._store.bloqueada[self._index])
+
+    @bloqueada.setter
+    def bloqueada(self, value):
+        self._store.bloqueada[self._index] = value
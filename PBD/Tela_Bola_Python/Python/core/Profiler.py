@@ -0,0 +1,125 @@
+"""
+Profiler - Tiempos por fase de PBDSystem.run
+Cada paso de simulación se mide como una serie de vueltas de cronómetro
+(predicción, cada tipo de restricción, colisiones, velocidades, damping...)
+que se suman por fase y se guardan en un buffer circular de los últimos pasos.
+Desactivado (system.profiler = None) el coste es una comprobación por fase.
+
+Uso:
+    profiler = system.set_profiling(True)
+    ... system.run(dt) ...
+    print(profiler.informe())
+    profiler.to_csv("tiempos.csv")
+"""
+import csv
+import json
+import time
+from collections import deque
+
+
+class Profiler:
+    """
+    Tiempos por fase de los últimos 'capacidad' pasos
+    frames: deque de dicts fase -> segundos (más 'paso' y 'total')
+    """
+
+    # Orden de las columnas en los informes (las fases desconocidas van al final)
+    FASES = (
+        'prediccion', 'broadphase', 'distancia', 'shear', 'bending', 'volumen',
+        'shape_matching', 'colisiones', 'suelo', 'esfera', 'auto_colision',
+        'velocidades', 'validacion', 'damping',
+    )
+
+    def __init__(self, capacidad=600):
+        self.frames = deque(maxlen=capacidad)
+        self.pasos = 0  # Pasos medidos desde el último clear()
+        self._actual = None
+        self._inicio = 0.0
+
+    def inicio_paso(self):
+        """Empezar a medir un paso; devuelve el instante inicial para vuelta()"""
+        self._actual = {}
+        self._inicio = time.perf_counter()
+        return self._inicio
+
+    def vuelta(self, fase, t0):
+        """Sumar a 'fase' el tiempo desde t0; devuelve el instante actual"""
+        t = time.perf_counter()
+        self._actual[fase] = self._actual.get(fase, 0.0) + (t - t0)
+        return t
+
+    def fin_paso(self):
+        """Cerrar el paso y guardarlo en el buffer circular"""
+        if self._actual is None:
+            return
+        self._actual['total'] = time.perf_counter() - self._inicio
+        self._actual['paso'] = self.pasos
+        self.frames.append(self._actual)
+        self.pasos += 1
+        self._actual = None
+
+    def clear(self):
+        self.frames.clear()
+        self.pasos = 0
+        self._actual = None
+
+    def fases(self):
+        """Fases medidas en el buffer, en el orden de FASES"""
+        medidas = set()
+        for frame in self.frames:
+            medidas.update(frame)
+        medidas -= {'paso', 'total'}
+        return [f for f in self.FASES if f in medidas] + sorted(medidas - set(self.FASES))
+
+    def resumen(self):
+        """
+        Estadísticas de cada fase en el buffer (milisegundos por paso)
+        Returns: dict fase -> {'media_ms', 'max_ms', 'porcentaje'} (incluye 'total')
+        """
+        n = len(self.frames)
+        if n == 0:
+            return {}
+        total = sum(f['total'] for f in self.frames)
+        resumen = {}
+        for fase in self.fases() + ['total']:
+            tiempos = [f.get(fase, 0.0) for f in self.frames]
+            resumen[fase] = {
+                'media_ms': sum(tiempos) / n * 1000.0,
+                'max_ms': max(tiempos) * 1000.0,
+                'porcentaje': sum(tiempos) / total * 100.0 if total > 0 else 0.0,
+            }
+        return resumen
+
+    def informe(self):
+        """Tabla de texto con el resumen (fases ordenadas por tiempo medio)"""
+        resumen = self.resumen()
+        if not resumen:
+            return "⏱️ Profiler: sin pasos medidos"
+        lineas = [f"⏱️ Tiempos por fase (últimos {len(self.frames)} pasos):",
+                  f"   {'fase':<16}{'media ms':>10}{'max ms':>10}{'%':>8}"]
+        fases = sorted((f for f in resumen if f != 'total'), key=lambda f: -resumen[f]['media_ms'])
+        for fase in fases + ['total']:
+            r = resumen[fase]
+            lineas.append(f"   {fase:<16}{r['media_ms']:>10.3f}{r['max_ms']:>10.3f}{r['porcentaje']:>7.1f}%")
+        return "\n".join(lineas)
+
+    def to_csv(self, ruta):
+        """Un paso por fila: paso, ms de cada fase y ms totales"""
+        fases = self.fases()
+        with open(ruta, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['paso'] + [f"{fase}_ms" for fase in fases] + ['total_ms'])
+            for frame in self.frames:
+                writer.writerow([frame['paso']] +
+                                [f"{frame.get(fase, 0.0) * 1000.0:.6f}" for fase in fases] +
+                                [f"{frame['total'] * 1000.0:.6f}"])
+
+    def to_json(self, ruta):
+        """Resumen y pasos (en ms) en JSON"""
+        datos = {
+            'resumen': self.resumen(),
+            'frames': [{fase: (v if fase == 'paso' else v * 1000.0) for fase, v in frame.items()}
+                       for frame in self.frames],
+        }
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=2)
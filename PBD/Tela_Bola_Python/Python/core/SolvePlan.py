@@ -0,0 +1,103 @@
+"""
+SolvePlan - Plan de resolución compilado para PBDSystem.runRelease
+Agrupa las restricciones por fase (distancia, shear, bending, volumen) a partir
+de los cubos por tipo de PBDSystem, y decide una sola vez el orden de volumen
+(primero o después de las colisiones) y las sub-iteraciones de volumen de cada
+iteración. Se recompila solo cuando cambia la topología o el número de iteraciones.
+"""
+from constraints.DistanceConstraint import DistanceConstraint
+from constraints.ShearConstraint import ShearConstraint
+from constraints.BendingConstraint import BendingConstraint
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+from constraints.VolumeConstraintGlobal import VolumeConstraintGlobal
+
+
+# Con Shape Matching la forma global la mantiene el Shape Matching en cada
+# iteración: los tetraedros solo corrigen el volumen local y basta con una
+# fracción de sus sub-iteraciones
+FRACCION_VOLUMEN_CON_SHAPE_MATCHING = 0.25
+
+
+def _sub_iteraciones_volumen(min_volume_stiffness, it):
+    """Sub-iteraciones de volumen de la iteración it (mismos umbrales que runDebug)"""
+    if min_volume_stiffness > 0.7:
+        return 5 if it < 3 else 3
+    elif min_volume_stiffness > 0.3:
+        return 8 if it < 3 else 5
+    return 12 if it < 3 else 8
+
+
+class SolvePlan:
+    """
+    Plan compilado de un PBDSystem
+    distancia, shear, bending, tet, global_: listas de restricciones de cada fase
+    volumen_primero: resolver volumen antes que distancias (rigidez de volumen < 0.25)
+    iters_volumen: sub-iteraciones de volumen por iteración del solver
+    shape_matching_iters: iteraciones en las que se aplica Shape Matching
+                          (todas si el sistema tiene Shape Matching)
+    """
+
+    def __init__(self, system):
+        self.version = system.topology_version
+        self.niters = system.niters
+        self.num_constraints = len(system.constraints)
+
+        cubos = system.constraintsByType
+        self.distancia = self._fase(cubos, DistanceConstraint)
+        self.shear = self._fase(cubos, ShearConstraint)
+        self.bending = self._fase(cubos, BendingConstraint)
+        self.tet = self._fase(cubos, VolumeConstraintTet)
+        self.global_ = self._fase(cubos, VolumeConstraintGlobal)
+
+        self.min_volume_stiffness = 1.0
+        for c in self.tet + self.global_:
+            if hasattr(c, 'stiffness'):
+                stiffness = c.stiffness
+                # Los lotes vectorizados guardan la rigidez como array
+                if hasattr(stiffness, 'min'):
+                    stiffness = float(stiffness.min()) if len(stiffness) > 0 else 1.0
+                self.min_volume_stiffness = min(self.min_volume_stiffness, stiffness)
+
+        self.volumen_primero = self.min_volume_stiffness < 0.25
+        self.iters_volumen = [_sub_iteraciones_volumen(self.min_volume_stiffness, it)
+                              for it in range(self.niters)]
+        self.shape_matching_iters = max(1, int(self.niters * 0.3))
+
+        self.substeps_xpbd = None  # Substeps con los que se calculó k_xpbd (runXPBD)
+
+        self.con_shape_matching = system.shapeMatching is not None
+        if self.con_shape_matching:
+            self.shape_matching_iters = self.niters
+            self.iters_volumen = [max(1, int(n * FRACCION_VOLUMEN_CON_SHAPE_MATCHING))
+                                  for n in self.iters_volumen]
+
+    @staticmethod
+    def _fase(cubos, tipo_fase):
+        """Restricciones de los cubos cuyo tipo es tipo_fase o una subclase (p.ej. los lotes)"""
+        fase = []
+        for tipo, lista in cubos.items():
+            if issubclass(tipo, tipo_fase):
+                fase.extend(lista)
+        return fase
+
+    def vigente(self, system):
+        """True si el plan sigue siendo válido para el estado actual del sistema"""
+        return (self.version == system.topology_version and
+                self.niters == system.niters and
+                self.num_constraints == len(system.constraints) and
+                self.con_shape_matching == (system.shapeMatching is not None))
+
+    def proyectar_volumen(self, n, proyectar=None):
+        """
+        n sub-iteraciones de volumen: tetraedros y después volumen global
+        proyectar: función que resuelve una lista de restricciones (por defecto Gauss-Seidel)
+        """
+        proyectar = proyectar or self.proyectar
+        for vol_iter in range(n):
+            proyectar(self.tet)
+            proyectar(self.global_)
+
+    @staticmethod
+    def proyectar(lista):
+        for c in lista:
+            c.proyecta_restriccion()
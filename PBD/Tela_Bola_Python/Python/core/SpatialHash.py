@@ -0,0 +1,245 @@
+"""
+SpatialHash - Rejilla uniforme con hash espacial (Teschner et al. 2003)
+Broadphase para colisiones: las consultas solo recorren las partículas de las
+celdas que solapan la región pedida, en lugar de las N partículas.
+Se reconstruye una vez por paso a partir de las posiciones predichas.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Primos grandes para mezclar las coordenadas de celda (Teschner 2003)
+P1 = 73856093
+P2 = 19349663
+P3 = 83492791
+
+
+class SpatialHash:
+    """
+    Hash espacial de partículas
+    cell_size: tamaño de celda (≈ radio de la consulta típica)
+    Con NumPy las celdas se guardan como claves ordenadas (búsqueda binaria);
+    sin NumPy se usa un diccionario celda -> lista de índices.
+    """
+
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError(f"cell_size debe ser positivo (recibido {cell_size})")
+        self.cell_size = float(cell_size)
+        self.inv_cell_size = 1.0 / self.cell_size
+        self.n = 0
+        self.positions = None
+        self.table_size = 1
+
+        # Ruta NumPy
+        self._sorted_keys = None
+        self._order = None
+        self._celdas = None
+        self._cell_start = None
+        self._cell_count = None
+        # Ruta sin NumPy
+        self._cells = None
+
+    def _hash(self, cx, cy, cz):
+        """Clave de tabla para coordenadas de celda (escalares o arrays int64)"""
+        return ((cx * P1) ^ (cy * P2) ^ (cz * P3)) % self.table_size
+
+    def build(self, positions):
+        """
+        Reconstruir el hash
+        positions: array (N,3) o secuencia de tuplas/vectores (x, y, z)
+        """
+        self.n = len(positions)
+        self.table_size = max(1, 2 * self.n)
+
+        if np is not None:
+            self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+            self._celdas = np.floor(self.positions * self.inv_cell_size).astype(np.int64)
+            # La tabla hash se construye al consultarla (query_pairs normalmente no la usa)
+            self._sorted_keys = None
+        else:
+            self.positions = [tuple(p) for p in positions]
+            self._cells = {}
+            for i, (x, y, z) in enumerate(self.positions):
+                key = self._hash(int(math.floor(x * self.inv_cell_size)),
+                                 int(math.floor(y * self.inv_cell_size)),
+                                 int(math.floor(z * self.inv_cell_size)))
+                self._cells.setdefault(key, []).append(i)
+
+    def _construir_tabla(self):
+        """Tabla hash de las celdas del último build (ruta NumPy)"""
+        celdas = self._celdas
+        keys = self._hash(celdas[:, 0], celdas[:, 1], celdas[:, 2])
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._order]
+        # Tabla densa clave -> (inicio, cantidad) en el orden por clave
+        self._cell_count = np.bincount(keys, minlength=self.table_size)
+        self._cell_start = np.cumsum(self._cell_count) - self._cell_count
+
+    def _rango_celdas(self, lo, hi):
+        """Coordenadas enteras de celda que cubren la caja [lo, hi]"""
+        c_lo = [int(math.floor(v * self.inv_cell_size)) for v in lo]
+        c_hi = [int(math.floor(v * self.inv_cell_size)) for v in hi]
+        return c_lo, c_hi
+
+    def query_aabb(self, lo, hi):
+        """
+        Índices (ordenados, sin repetir) de las partículas en celdas que solapan la caja [lo, hi]
+        Pueden incluir falsos positivos (colisiones de hash): filtrar en la narrowphase.
+        """
+        if self.n == 0:
+            return []
+
+        c_lo, c_hi = self._rango_celdas(lo, hi)
+        keys = set()
+        for cx in range(c_lo[0], c_hi[0] + 1):
+            for cy in range(c_lo[1], c_hi[1] + 1):
+                for cz in range(c_lo[2], c_hi[2] + 1):
+                    keys.add(self._hash(cx, cy, cz))
+
+        if np is not None:
+            if self._sorted_keys is None:
+                self._construir_tabla()
+            keys = np.fromiter(keys, dtype=np.int64, count=len(keys))
+            starts = np.searchsorted(self._sorted_keys, keys, side='left')
+            ends = np.searchsorted(self._sorted_keys, keys, side='right')
+            trozos = [self._order[s:e] for s, e in zip(starts.tolist(), ends.tolist()) if e > s]
+            if not trozos:
+                return []
+            return np.unique(np.concatenate(trozos)).tolist()
+
+        indices = set()
+        for key in keys:
+            indices.update(self._cells.get(key, ()))
+        return sorted(indices)
+
+    def query_sphere(self, center, radius):
+        """Candidatos para una esfera (celdas que solapan su caja envolvente)"""
+        cx, cy, cz = center
+        return self.query_aabb((cx - radius, cy - radius, cz - radius),
+                               (cx + radius, cy + radius, cz + radius))
+
+    def query_pairs(self, radius):
+        """
+        Todos los pares (i, j) con i < j y distancia < radius (requiere radius <= cell_size)
+        Con NumPy se barre en X cada fila de celdas (Y, Z) junto con 4 de sus 8 filas
+        vecinas (cada par de filas se visita desde uno solo de sus lados): los candidatos
+        de una partícula son solo los de su ventana [x - radius, x + radius].
+        Returns: arrays (i, j) ordenados por (i, j) con NumPy, o lista de tuplas sin NumPy
+        """
+        if radius > self.cell_size:
+            raise ValueError(f"query_pairs requiere radius <= cell_size ({radius} > {self.cell_size})")
+
+        if np is None:
+            pares = set()
+            for i, (x, y, z) in enumerate(self.positions):
+                for j in self.query_sphere((x, y, z), radius):
+                    if j > i and math.dist(self.positions[i], self.positions[j]) < radius:
+                        pares.add((i, j))
+            return sorted(pares)
+
+        vacio = np.zeros(0, dtype=np.int64)
+        if self.n == 0:
+            return vacio, vacio
+
+        # Barrido en X por filas de celdas (sin hash): cada partícula se ordena por su fila
+        # (celda en Y y Z, con una de margen) y, dentro de la fila, por su X, con una única
+        # clave en coma flotante fila * ancho + x. Las compañeras de una fila vecina son un
+        # tramo contiguo con |x_j - x_i| <= radius (no las tres celdas completas a lo largo
+        # de X), y no hay colisiones de hash ni duplicados
+        filas_yz = np.floor(self.positions[:, 1:] * self.inv_cell_size)
+        filas_yz -= filas_yz.min(axis=0) - 1.0
+        alto = filas_yz[:, 0].max() + 2.0
+        x = self.positions[:, 0]
+        x0 = x.min() - 2.0 * self.cell_size
+        ancho = x.max() - x0 + 2.0 * self.cell_size
+        valor = (filas_yz[:, 1] * alto + filas_yz[:, 0]) * ancho + (x - x0)
+        tope = float(valor.max())
+        if not math.isfinite(tope) or tope * 2.0 ** -52 * 4 >= radius * 1e-6:
+            # Posiciones no finitas o tan dispersas que la clave perdería precisión: tabla hash
+            return self._pares_hash(radius)
+        orden = np.argsort(valor, kind='stable')
+        valor = valor[orden]
+        posiciones = self.positions[orden]
+        todas = np.arange(self.n, dtype=np.int64)
+        r = radius * (1.0 + 1e-6)  # Holgura de redondeo: los candidatos se filtran después
+
+        # Tramos [desde, hasta) de compañeras de cada partícula (índices en el orden por fila):
+        # su propia fila con j > i y las filas de la mitad positiva (dz = 1 con cualquier dy,
+        # o dz = 0 con dy = 1), así cada par de filas vecinas se visita desde un solo lado
+        desde = [todas + 1]
+        hasta = [np.searchsorted(valor, valor + r, side='right')]
+        for salto in (alto - 1.0, alto, alto + 1.0, 1.0):
+            objetivo = valor + salto * ancho
+            desde.append(np.searchsorted(valor, objetivo - r, side='left'))
+            hasta.append(np.searchsorted(valor, objetivo + r, side='right'))
+        desde = np.concatenate(desde)
+        cuenta = np.maximum(np.concatenate(hasta) - desde, 0)
+        total = int(cuenta.sum())
+        if total == 0:
+            return vacio, vacio
+
+        # Expandir los tramos en pares candidatos y filtrar por distancia
+        a = np.repeat(np.tile(todas, 5), cuenta)
+        b = np.repeat(desde, cuenta) + (np.arange(total, dtype=np.int64) -
+                                        np.repeat(np.cumsum(cuenta) - cuenta, cuenta))
+        d = posiciones[a] - posiciones[b]
+        cerca = np.einsum('ij,ij->i', d, d) < radius * radius
+        i = orden[a[cerca]]
+        j = orden[b[cerca]]
+
+        # Cada par aparece una sola vez: ordenar como la ruta con hash (por i, luego j)
+        claves = np.minimum(i, j) * self.n + np.maximum(i, j)
+        claves.sort()
+        return claves // self.n, claves % self.n
+
+    def _pares_hash(self, radius):
+        """
+        query_pairs sobre la tabla hash (posiciones no finitas o demasiado dispersas)
+        Recorre la celda propia y 13 de las 26 vecinas de cada partícula.
+        """
+        if self._sorted_keys is None:
+            self._construir_tabla()
+        vacio = np.zeros(0, dtype=np.int64)
+
+        # Celda propia + mitad "positiva" de las vecinas en orden lexicográfico
+        vecinas = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                   if (dx, dy, dz) >= (0, 0, 0)]
+        todas = np.arange(self.n, dtype=np.int64)
+        lista_i = []
+        lista_j = []
+        for dx, dy, dz in vecinas:
+            keys = self._hash(self._celdas[:, 0] + dx, self._celdas[:, 1] + dy, self._celdas[:, 2] + dz)
+            starts = self._cell_start[keys]
+            counts = self._cell_count[keys]
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # Expandir los rangos [start, start+count) de cada partícula
+            i = np.repeat(todas, counts)
+            rel = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            j = self._order[np.repeat(starts, counts) + rel]
+
+            # En la celda propia cada par aparece dos veces; fuera de ella, i == j
+            # solo puede aparecer por colisión de hash
+            mask = i < j if (dx, dy, dz) == (0, 0, 0) else i != j
+            i = i[mask]
+            j = j[mask]
+
+            # Filtrar por distancia antes de acumular (la mayoría de candidatos se descartan)
+            d = self.positions[i] - self.positions[j]
+            cerca = np.einsum('ij,ij->i', d, d) < radius * radius
+            lista_i.append(np.minimum(i[cerca], j[cerca]))
+            lista_j.append(np.maximum(i[cerca], j[cerca]))
+
+        if not lista_i:
+            return vacio, vacio
+
+        # Quitar duplicados (celdas vecinas distintas con la misma clave de hash)
+        claves = np.unique(np.concatenate(lista_i) * self.n + np.concatenate(lista_j))
+        return claves // self.n, claves % self.n
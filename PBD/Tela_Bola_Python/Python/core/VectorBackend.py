@@ -0,0 +1,195 @@
+"""
+VectorBackend - Backend de vectores del motor PBD
+Dentro de Blender se usa mathutils.Vector. Fuera de Blender (CPython normal:
+bakes por lotes, profiling, multiprocessing) se usa una implementación en
+Python puro que cubre el subconjunto de mathutils.Vector que usa el motor.
+
+Uso en los módulos del motor:
+    from core.VectorBackend import mathutils
+    v = mathutils.Vector((0, 0, 0))
+
+El backend se elige al importar. Se puede forzar el de Python puro
+con la variable de entorno PBD_VECTOR_BACKEND=python.
+"""
+import math
+import numbers
+import os
+import types
+
+
+class Vector:
+    """
+    Vector 3D compatible con el subconjunto de mathutils.Vector del motor:
+    x/y/z, indexado, aritmética, dot, cross, length, length_squared,
+    normalized, normalize y copy.
+    """
+
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, seq=(0.0, 0.0, 0.0)):
+        x, y, z = seq
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    # ===== Protocolo de secuencia =====
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return (self.x, self.y, self.z)[i]
+
+    def __setitem__(self, i, value):
+        if i == 0 or i == -3:
+            self.x = float(value)
+        elif i == 1 or i == -2:
+            self.y = float(value)
+        elif i == 2 or i == -1:
+            self.z = float(value)
+        else:
+            raise IndexError("Vector: índice fuera de rango")
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __repr__(self):
+        return f"Vector(({self.x:.4f}, {self.y:.4f}, {self.z:.4f}))"
+
+    def __eq__(self, other):
+        try:
+            ox, oy, oz = other
+        except (TypeError, ValueError):
+            return NotImplemented
+        return self.x == ox and self.y == oy and self.z == oz
+
+    __hash__ = None  # Mutable, como mathutils.Vector sin freeze()
+
+    # ===== Aritmética =====
+    def __add__(self, other):
+        ox, oy, oz = other
+        return Vector((self.x + ox, self.y + oy, self.z + oz))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        ox, oy, oz = other
+        return Vector((self.x - ox, self.y - oy, self.z - oz))
+
+    def __rsub__(self, other):
+        ox, oy, oz = other
+        return Vector((ox - self.x, oy - self.y, oz - self.z))
+
+    def __mul__(self, other):
+        # numbers.Real incluye los escalares de NumPy (np.float32, np.int64...)
+        if isinstance(other, numbers.Real):
+            other = float(other)
+            return Vector((self.x * other, self.y * other, self.z * other))
+        # Producto elemento a elemento (como mathutils >= 2.8)
+        try:
+            ox, oy, oz = other
+        except (TypeError, ValueError):
+            return NotImplemented
+        return Vector((self.x * ox, self.y * oy, self.z * oz))
+
+    __rmul__ = __mul__
+
+    def __matmul__(self, other):
+        return self.dot(other)
+
+    def __truediv__(self, other):
+        return Vector((self.x / other, self.y / other, self.z / other))
+
+    def __neg__(self):
+        return Vector((-self.x, -self.y, -self.z))
+
+    def __iadd__(self, other):
+        ox, oy, oz = other
+        self.x += ox
+        self.y += oy
+        self.z += oz
+        return self
+
+    def __isub__(self, other):
+        ox, oy, oz = other
+        self.x -= ox
+        self.y -= oy
+        self.z -= oz
+        return self
+
+    def __imul__(self, other):
+        if isinstance(other, numbers.Real):
+            other = float(other)
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        else:
+            try:
+                ox, oy, oz = other
+            except (TypeError, ValueError):
+                return NotImplemented
+            self.x *= ox
+            self.y *= oy
+            self.z *= oz
+        return self
+
+    def __itruediv__(self, other):
+        self.x /= other
+        self.y /= other
+        self.z /= other
+        return self
+
+    # ===== API de mathutils.Vector =====
+    def dot(self, other):
+        ox, oy, oz = other
+        return self.x * ox + self.y * oy + self.z * oz
+
+    def cross(self, other):
+        ox, oy, oz = other
+        return Vector((self.y * oz - self.z * oy,
+                       self.z * ox - self.x * oz,
+                       self.x * oy - self.y * ox))
+
+    @property
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    @property
+    def length_squared(self):
+        return self.x * self.x + self.y * self.y + self.z * self.z
+
+    def normalized(self):
+        # mathutils devuelve el vector nulo si la longitud es 0
+        length = self.length
+        if length == 0.0:
+            return Vector((0.0, 0.0, 0.0))
+        return Vector((self.x / length, self.y / length, self.z / length))
+
+    def normalize(self):
+        length = self.length
+        if length != 0.0:
+            self.x /= length
+            self.y /= length
+            self.z /= length
+
+    def copy(self):
+        return Vector((self.x, self.y, self.z))
+
+    def to_tuple(self):
+        return (self.x, self.y, self.z)
+
+
+# ===== Selección del backend al importar =====
+if os.environ.get('PBD_VECTOR_BACKEND', '').lower() == 'python':
+    mathutils = None
+else:
+    try:
+        import mathutils
+    except ImportError:
+        mathutils = None
+
+if mathutils is None:
+    # Espacio de nombres con la misma forma que el módulo mathutils
+    mathutils = types.SimpleNamespace(Vector=Vector)
+    BACKEND = 'python'
+else:
+    BACKEND = 'mathutils'
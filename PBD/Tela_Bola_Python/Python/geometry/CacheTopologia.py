@@ -0,0 +1,124 @@
+"""
+CacheTopologia - Caché en disco de la topología de los cuerpos generados
+Cada topología (posiciones, índices de cada grupo de restricciones y sus
+valores de reposo: longitudes, V0, phi0...) se guarda en un .npz cuyo nombre
+es el hash del generador y sus parámetros geométricos (tamaño, subdivisiones).
+La rigidez no forma parte de la clave: solo se aplica al crear las
+restricciones, así que un barrido de rigideces reutiliza la misma topología.
+
+Grupos: cada grupo 'g' de restricciones son los arrays g_indices y g_reposo,
+más g_colores (color de cada fila) si ya se colorearon para los lotes.
+
+Uso:
+    cache = CacheTopologia("//pbd_topologia")
+    datos = cache.obtener('cubo', {'tamano': 1.0, 'subdivisiones': 20}, construir)
+"""
+import hashlib
+import json
+import os
+import zipfile
+
+from core.ConstraintScheduler import colorear_indices, colores_por_fila
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Cambiar al modificar algún generador para invalidar la caché
+VERSION_TOPOLOGIA = 1
+
+
+def clave_topologia(generador, parametros):
+    """Hash estable (hex) de un generador y sus parámetros"""
+    texto = json.dumps({'version': VERSION_TOPOLOGIA, 'generador': generador, 'parametros': parametros},
+                       sort_keys=True)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def grupos(datos):
+    """Nombres de los grupos de restricciones de una topología"""
+    return [k[:-len('_indices')] for k in datos if k.endswith('_indices')]
+
+
+def colorear_grupos(datos):
+    """Añadir g_colores a los grupos que no lo tienen; True si se añadió alguno"""
+    n = len(datos['posiciones'])
+    nuevos = False
+    for g in grupos(datos):
+        if g + '_colores' in datos:
+            continue
+        indices = datos[g + '_indices']
+        datos[g + '_colores'] = colores_por_fila(colorear_indices(indices, n), len(indices))
+        nuevos = True
+    return nuevos
+
+
+class CacheTopologia:
+    """
+    Directorio de topologías <generador>_<hash>.npz
+    aciertos / fallos: topologías leídas de disco / construidas
+    """
+
+    def __init__(self, directorio):
+        if np is None:
+            raise ImportError("CacheTopologia requiere NumPy")
+        self.directorio = directorio
+        self.aciertos = 0
+        self.fallos = 0
+
+    def ruta(self, generador, parametros):
+        return os.path.join(self.directorio, f"{generador}_{clave_topologia(generador, parametros)}.npz")
+
+    def cargar(self, ruta):
+        """Arrays del .npz (None si no existe o está dañado)"""
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with np.load(ruta, allow_pickle=False) as f:
+                return {k: f[k] for k in f.files}
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"   ⚠️ Topología en caché ilegible ({os.path.basename(ruta)}): {e}")
+            return None
+
+    def guardar(self, ruta, datos):
+        """Escritura atómica (varios procesos pueden generar la misma topología)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = ruta + f'.{os.getpid()}.tmp'
+        with open(temporal, 'wb') as f:
+            np.savez(f, **datos)
+        os.replace(temporal, ruta)
+
+    def obtener(self, generador, parametros, construir, colorear=False):
+        """
+        Topología de la caché o, si no está, construir() y guardarla
+        construir: función sin argumentos que devuelve el dict de arrays
+        colorear: incluir g_colores (para crear lotes sin volver a colorear)
+        """
+        ruta = self.ruta(generador, parametros)
+        datos = self.cargar(ruta)
+        cambiada = datos is None
+        if cambiada:
+            self.fallos += 1
+            datos = construir()
+        else:
+            self.aciertos += 1
+            print(f"   ⚡ Topología '{generador}' leída de la caché ({os.path.basename(ruta)})")
+        if colorear and colorear_grupos(datos):
+            cambiada = True
+        if cambiada:
+            self.guardar(ruta, datos)
+        return datos
+
+
+def obtener_topologia(cache, generador, parametros, construir, colorear=False):
+    """
+    Topología con caché opcional
+    cache: CacheTopologia, directorio (str) o None (construir siempre)
+    """
+    if cache is None:
+        return construir()
+    if not isinstance(cache, CacheTopologia):
+        cache = CacheTopologia(cache)
+    return cache.obtener(generador, parametros, construir, colorear)
@@ -2,13 +2,23 @@
 Funciones para crear un cubo con restricciones de volumen
 Genera tetraedros interiores y calcula volúmenes iniciales
 """
-import mathutils
-import math
+from core.VectorBackend import mathutils
 from core.PBDSystem import PBDSystem
 from constraints.VolumeConstraintTet import VolumeConstraintTet
 from constraints.VolumeConstraintGlobal import VolumeConstraintGlobal
 from constraints.DistanceConstraint import DistanceConstraint
 from constraints.BendingConstraint import BendingConstraint
+from geometry.TopologiaRejilla import (
+    rejilla_cubo, colocar_particulas, aristas_rejilla, tetraedros_rejilla, quads_caras_caja,
+    triangulos_quads, longitudes, volumenes_tetraedros, volumen_cerrado, angulos_diedros,
+    crear_grupo,
+)
+from geometry.CacheTopologia import obtener_topologia
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def calcular_volumen_tetraedro(p0, p1, p2, p3):
@@ -237,9 +247,71 @@ def generar_triangulos_cubo_subdividido(subdivisiones=3):
     return triangulos
 
 
-def crear_cubo_volumen(lado, densidad, stiffness_volumen, stiffness_global=None, subdivisiones=3):
+def rigidez_distancia(stiffness_volumen):
+    """
+    Rigidez de las aristas compatible con la rigidez de volumen
+    Si el volumen es débil (< 0.3), las distancias también deben ser más suaves:
+    así no "bloquean" la geometría y el volumen puede actuar
+    """
+    if stiffness_volumen < 0.3:
+        # Volumen suave → Distancias también suaves (pero un poco más rígidas)
+        return min(0.5, stiffness_volumen + 0.2)
+    elif stiffness_volumen < 0.6:
+        # Volumen medio → Distancias medias
+        return 0.6
+    # Volumen rígido → Distancias rígidas
+    return 0.8
+
+
+def topologia_cubo(lado, subdivisiones):
+    """
+    Topología del cubo subdividido (no depende de la rigidez ni de la densidad)
+    Returns: dict de arrays: posiciones (N,3), triangulos (caras externas), V0_global
+             y los grupos distancia, volumen, bending y diagonales (g_indices, g_reposo)
+    """
+    # Vértices de la rejilla (índice z*s² + y*s + x)
+    s = subdivisiones
+    ids = rejilla_cubo(s)
+    step = lado / (s - 1) if s > 1 else lado
+    coords = -lado / 2.0 + np.arange(s) * step
+    z, y, x = np.meshgrid(coords, coords, coords, indexing='ij')
+    pos = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+    
+    # Aristas X, Y, Z y tetraedros (5 por celda), sin longitudes ni volúmenes nulos
+    aristas = aristas_rejilla(ids)
+    dists = longitudes(pos, aristas)
+    tets = tetraedros_rejilla(ids)
+    V0 = volumenes_tetraedros(pos, tets)
+    
+    # Caras externas: triángulos, bending (arista compartida q1-q3) y diagonales de cada quad
+    quads, invertidas = quads_caras_caja(ids)
+    triangulos = triangulos_quads(quads, invertidas)
+    quads_bending = quads[:, [1, 3, 0, 2]]
+    diagonales = quads[:, [0, 2, 1, 3]].reshape(-1, 2)
+    dists_diagonales = longitudes(pos, diagonales)
+    
+    return {
+        'posiciones': pos,
+        'triangulos': triangulos,
+        'V0_global': np.float64(volumen_cerrado(pos, triangulos)),
+        'distancia_indices': aristas[dists > 1e-6],
+        'distancia_reposo': dists[dists > 1e-6],
+        'volumen_indices': tets[V0 > 1e-6],
+        'volumen_reposo': V0[V0 > 1e-6],
+        'bending_indices': quads_bending,
+        'bending_reposo': angulos_diedros(pos, quads_bending),
+        'diagonales_indices': diagonales[dists_diagonales > 1e-6],
+        'diagonales_reposo': dists_diagonales[dists_diagonales > 1e-6],
+    }
+
+
+def crear_cubo_volumen(lado, densidad, stiffness_volumen, stiffness_global=None, subdivisiones=3, use_arrays=False,
+                       cache=None):
     """
     Crear un cubo con restricciones de volumen (subdividido para más realismo)
+    La topología (aristas, tetraedros, caras, quads de bending y diagonales) se
+    genera con NumPy de una vez (topologia_cubo); en modo arrays cada tipo de
+    restricción se crea directamente como un único lote vectorizado.
     
     Args:
         lado: longitud del lado del cubo
@@ -247,515 +319,56 @@ def crear_cubo_volumen(lado, densidad, stiffness_volumen, stiffness_global=None,
         stiffness_volumen: rigidez de las restricciones de volumen por tetraedro [0, 1]
         stiffness_global: rigidez de la restricción global (opcional, None para desactivar)
         subdivisiones: número de subdivisiones por eje (3 = 3x3x3 = 27 vértices, 4 = 64 vértices, etc.)
+        use_arrays: crear el sistema en modo arrays (ParticleStore, requiere NumPy)
+        cache: CacheTopologia o directorio de la caché de topologías (None = sin caché)
     
     Returns:
-        PBDSystem configurado con el cubo y sus restricciones de volumen
+        (system, volumen, global, distancia, bending, diagonales): en modo arrays
+        cada grupo es un lote (DistanceConstraintBatch...); en modo objetos, una lista
     """
-    # ===== 1. Generar vértices del cubo subdividido =====
-    vertices_pos = generar_vertices_cubo_subdividido(lado, subdivisiones)
-    N = len(vertices_pos)
+    if np is None:
+        raise ImportError("crear_cubo_volumen requiere NumPy")
     
-    volumen_cubo = lado * lado * lado
-    masa_total = densidad * volumen_cubo
-    masa_particula = masa_total / N
-    
-    system = PBDSystem(N, masa_particula)
-    
-    # Inicializar partículas en las posiciones de los vértices
-    # CRÍTICO: Asegurar que las velocidades y fuerzas estén en cero
-    # DEBUG: Verificar que cada partícula tiene su propio objeto Vector
-    print(f"   🔍 DEBUG: Inicializando {N} partículas...")
-    for i, pos in enumerate(vertices_pos):
-        # CRÍTICO: Crear nuevos objetos Vector para cada partícula
-        system.particles[i].location = mathutils.Vector(pos)
-        system.particles[i].last_location = mathutils.Vector(pos)  # Nuevo Vector, no referencia
-        # CRÍTICO: Resetear velocidades y fuerzas para evitar estado residual
-        system.particles[i].velocity = mathutils.Vector((0.0, 0.0, 0.0))
-        system.particles[i].force = mathutils.Vector((0.0, 0.0, 0.0))
-        system.particles[i].acceleration = mathutils.Vector((0.0, 0.0, 0.0))
-        
-        # DEBUG: Verificar primeras 3 partículas
-        if i < 3:
-            p = system.particles[i]
-            print(f"      Partícula {i}: loc={p.location}, last_loc={p.last_location}, "
-                  f"id(loc)={id(p.location)}, id(last_loc)={id(p.last_location)}")
+    datos = obtener_topologia(cache, 'cubo', {'lado': float(lado), 'subdivisiones': int(subdivisiones)},
+                              lambda: topologia_cubo(lado, subdivisiones), colorear=use_arrays)
     
+    # ===== 1. Partículas =====
+    pos = datos['posiciones']
+    N = len(pos)
+    volumen_cubo = lado * lado * lado
+    masa_particula = densidad * volumen_cubo / N
+    system = PBDSystem(N, masa_particula, use_arrays=use_arrays)
+    colocar_particulas(system, pos)
     print(f"   ✓ {N} partículas inicializadas")
     
-    # ===== 2. Generar tetraedros interiores =====
-    tetraedros_indices = generar_tetraedros_cubo_subdividido(subdivisiones)
-    
-    # ===== 3. Crear restricciones de DISTANCIA para mantener la forma del cubo =====
-    # INTENCIÓN: Mantener las aristas a su longitud natural, evitando que el cubo se estire o comprima
-    # Esto es complementario a las restricciones de volumen y ayuda a mantener la forma cúbica
-    distance_constraints = []
-    # CRÍTICO: La rigidez de distancia debe ser compatible con la rigidez de volumen
-    # Si el volumen es débil (< 0.3), las distancias también deben ser más suaves
-    # Esto evita que las distancias "bloqueen" la geometría y el volumen no pueda actuar
-    if stiffness_volumen < 0.3:
-        # Volumen suave → Distancias también suaves (pero un poco más rígidas)
-        distance_stiffness = min(0.5, stiffness_volumen + 0.2)
-    elif stiffness_volumen < 0.6:
-        # Volumen medio → Distancias medias
-        distance_stiffness = 0.6
-    else:
-        # Volumen rígido → Distancias rígidas
-        distance_stiffness = 0.8
-    
+    # ===== 2. Restricciones de DISTANCIA en las aristas X, Y, Z =====
+    distance_stiffness = rigidez_distancia(stiffness_volumen)
     print(f"   📊 Stiffness de distancia ajustado: {distance_stiffness:.2f} (basado en stiffness de volumen: {stiffness_volumen:.2f})")
-    
-    # Calcular distancia esperada entre vértices adyacentes
-    step = lado / (subdivisiones - 1) if subdivisiones > 1 else lado
-    
-    # Función auxiliar para obtener índice de vértice en la grilla
-    def get_idx(x, y, z):
-        return z * subdivisiones * subdivisiones + y * subdivisiones + x
-    
-    # Crear restricciones de distancia en las 3 direcciones (X, Y, Z)
-    # Esto crea una malla de restricciones que mantiene la estructura del cubo
-    for z in range(subdivisiones):
-        for y in range(subdivisiones):
-            for x in range(subdivisiones):
-                idx = get_idx(x, y, z)
-                
-                # Restricción en dirección X (vértice adyacente a la derecha)
-                if x < subdivisiones - 1:
-                    idx_right = get_idx(x + 1, y, z)
-                    if idx < N and idx_right < N:
-                        p0 = system.particles[idx]
-                        p1 = system.particles[idx_right]
-                        # Calcular distancia inicial
-                        dist0 = (p1.location - p0.location).length
-                        if dist0 > 1e-6:
-                            constraint = DistanceConstraint(p0, p1, dist0, distance_stiffness)
-                            distance_constraints.append(constraint)
-                            system.add_constraint(constraint)
-                
-                # Restricción en dirección Y (vértice adyacente arriba)
-                if y < subdivisiones - 1:
-                    idx_up = get_idx(x, y + 1, z)
-                    if idx < N and idx_up < N:
-                        p0 = system.particles[idx]
-                        p1 = system.particles[idx_up]
-                        dist0 = (p1.location - p0.location).length
-                        if dist0 > 1e-6:
-                            constraint = DistanceConstraint(p0, p1, dist0, distance_stiffness)
-                            distance_constraints.append(constraint)
-                            system.add_constraint(constraint)
-                
-                # Restricción en dirección Z (vértice adyacente arriba en Z)
-                if z < subdivisiones - 1:
-                    idx_front = get_idx(x, y, z + 1)
-                    if idx < N and idx_front < N:
-                        p0 = system.particles[idx]
-                        p1 = system.particles[idx_front]
-                        dist0 = (p1.location - p0.location).length
-                        if dist0 > 1e-6:
-                            constraint = DistanceConstraint(p0, p1, dist0, distance_stiffness)
-                            distance_constraints.append(constraint)
-                            system.add_constraint(constraint)
-    
+    distance_constraints = crear_grupo(system, DistanceConstraint, datos, 'distancia', distance_stiffness)
     print(f"   ✓ {len(distance_constraints)} restricciones de distancia creadas para mantener forma cúbica")
     
-    # ===== 4. Calcular volúmenes iniciales (V0) de cada tetraedro =====
-    # NOTA: Los V0 se calculan aquí con las posiciones actuales
-    # Si el cubo se mueve después, los V0 deben recalcularse o el cubo debe moverse antes
-    volume_constraints = []
-    for tet in tetraedros_indices:
-        i0, i1, i2, i3 = tet
-        # Validar índices
-        if i0 >= N or i1 >= N or i2 >= N or i3 >= N:
-            continue
-        
-        p0 = system.particles[i0]
-        p1 = system.particles[i1]
-        p2 = system.particles[i2]
-        p3 = system.particles[i3]
-        
-        # Calcular volumen inicial
-        V0 = calcular_volumen_tetraedro(
-            p0.location, p1.location, p2.location, p3.location
-        )
-        
-        # Solo crear constraint si el volumen es válido (positivo y no demasiado pequeño)
-        if V0 > 1e-6:
-            constraint = VolumeConstraintTet(p0, p1, p2, p3, V0, stiffness_volumen)
-            volume_constraints.append(constraint)
-            system.add_constraint(constraint)
-            
-            # DEBUG: Verificar primeras 3 restricciones
-            if len(volume_constraints) <= 3:
-                print(f"      DEBUG CuboVolumen: Constraint {len(volume_constraints)-1} creada - "
-                      f"V0={V0:.6f}, stiffness={stiffness_volumen:.4f}, "
-                      f"id(V0)={id(constraint.V0) if hasattr(constraint, 'V0') else 'N/A'}")
-    
-    # ===== 5. (Opcional) Crear restricción de volumen global =====
+    # ===== 3. Restricciones de VOLUMEN por tetraedro (5 por celda) =====
+    volume_constraints = crear_grupo(system, VolumeConstraintTet, datos, 'volumen', stiffness_volumen)
+    print(f"   ✓ {len(volume_constraints)} restricciones de volumen por tetraedro")
+    
+    # ===== 4. (Opcional) Restricción de volumen global =====
     global_volume_constraint = None
-    # CRÍTICO: Crear la restricción si stiffness_global no es None
-    # El valor mínimo ya se aplicó en blender_tela_shapekeys.py
     if stiffness_global is not None and stiffness_global > 1e-6:
-        # Calcular volumen global inicial
-        triangulos = generar_triangulos_cubo_subdividido(subdivisiones)
-        
-        # Calcular V0 usando la fórmula de Müller 2007
-        V0_global = 0.0
-        for tri in triangulos:
-            i0, i1, i2 = tri
-            # Validar índices
-            if i0 >= N or i1 >= N or i2 >= N:
-                continue
-            
-            p0 = system.particles[i0]
-            p1 = system.particles[i1]
-            p2 = system.particles[i2]
-            
-            cross_p0_p1 = mathutils.Vector.cross(p0.location, p1.location)
-            V_tri = mathutils.Vector.dot(cross_p0_p1, p2.location) / 6.0
-            V0_global += V_tri
-        
-        # Crear constraint global
         global_volume_constraint = VolumeConstraintGlobal(
-            system.particles, triangulos, V0_global, stiffness_global
+            system.particles, datos['triangulos'].tolist(), float(datos['V0_global']), stiffness_global,
+            store=system.store
         )
         system.add_constraint(global_volume_constraint)
     
-    # ===== 6. Crear restricciones de BENDING para las caras externas =====
-    # INTENCIÓN: Evitar que las caras del cubo se plieguen o colapsen
-    # Se aplican solo en la superficie para no interferir con las restricciones de volumen internas
-    bending_constraints = []
+    # ===== 5. BENDING en las caras externas =====
     bending_stiffness = 0.1  # Rigidez baja para permitir cierta deformación
-    
-    # Función auxiliar para calcular phi0 (ángulo inicial entre dos triángulos adyacentes)
-    def calcular_phi0(p1, p2, p3, p4):
-        """
-        Calcular ángulo diedro inicial entre dos triángulos que comparten una arista
-        p1, p2: vértices de la arista compartida
-        p3: tercer vértice del primer triángulo
-        p4: tercer vértice del segundo triángulo
-        """
-        e1 = p2.location - p1.location
-        e2 = p3.location - p1.location
-        e3 = p4.location - p1.location
-        
-        n1 = mathutils.Vector.cross(e1, e2)
-        n2 = mathutils.Vector.cross(e1, e3)
-        
-        len_n1 = n1.length
-        len_n2 = n2.length
-        
-        if len_n1 < 1e-6 or len_n2 < 1e-6:
-            return 0.087  # ~5 grados por defecto para evitar degeneración
-        
-        n1 = n1.normalized()
-        n2 = n2.normalized()
-        
-        d = n1.dot(n2)
-        d = max(-1.0, min(1.0, d))
-        
-        if abs(d - 1.0) < 1e-6:  # Si los vectores son casi paralelos, ángulo es 0
-            return 0.087  # ~5 grados
-        
-        return math.acos(d)
-    
-    # Crear restricciones de bending para cada cara del cubo
-    # Solo en las caras externas (superficie del cubo)
-    
-    # Cara inferior (z = 0)
-    for y in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            # Cada cuadrado de la cara se divide en 2 triángulos
-            # Necesitamos crear bending constraints entre triángulos adyacentes
-            
-            # Triángulo 1: (x,y,0), (x+1,y,0), (x,y+1,0)
-            # Triángulo 2: (x+1,y,0), (x+1,y+1,0), (x,y+1,0)
-            # Arista compartida: (x+1,y,0) - (x,y+1,0)
-            
-            p1_idx = get_idx(x + 1, y, 0)      # Vértice 1 de arista compartida
-            p2_idx = get_idx(x, y + 1, 0)      # Vértice 2 de arista compartida
-            p3_idx = get_idx(x, y, 0)          # Tercer vértice triángulo 1
-            p4_idx = get_idx(x + 1, y + 1, 0)  # Tercer vértice triángulo 2
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
-    # Cara superior (z = subdivisiones - 1)
-    for y in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            p1_idx = get_idx(x + 1, y, subdivisiones - 1)
-            p2_idx = get_idx(x, y + 1, subdivisiones - 1)
-            p3_idx = get_idx(x, y, subdivisiones - 1)
-            p4_idx = get_idx(x + 1, y + 1, subdivisiones - 1)
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
-    # Cara frontal (y = 0)
-    for z in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            p1_idx = get_idx(x + 1, 0, z)
-            p2_idx = get_idx(x, 0, z + 1)
-            p3_idx = get_idx(x, 0, z)
-            p4_idx = get_idx(x + 1, 0, z + 1)
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
-    # Cara trasera (y = subdivisiones - 1)
-    for z in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            p1_idx = get_idx(x + 1, subdivisiones - 1, z)
-            p2_idx = get_idx(x, subdivisiones - 1, z + 1)
-            p3_idx = get_idx(x, subdivisiones - 1, z)
-            p4_idx = get_idx(x + 1, subdivisiones - 1, z + 1)
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
-    # Cara izquierda (x = 0)
-    for z in range(subdivisiones - 1):
-        for y in range(subdivisiones - 1):
-            p1_idx = get_idx(0, y + 1, z)
-            p2_idx = get_idx(0, y, z + 1)
-            p3_idx = get_idx(0, y, z)
-            p4_idx = get_idx(0, y + 1, z + 1)
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
-    # Cara derecha (x = subdivisiones - 1)
-    for z in range(subdivisiones - 1):
-        for y in range(subdivisiones - 1):
-            p1_idx = get_idx(subdivisiones - 1, y + 1, z)
-            p2_idx = get_idx(subdivisiones - 1, y, z + 1)
-            p3_idx = get_idx(subdivisiones - 1, y, z)
-            p4_idx = get_idx(subdivisiones - 1, y + 1, z + 1)
-            
-            if p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N:
-                p1 = system.particles[p1_idx]
-                p2 = system.particles[p2_idx]
-                p3 = system.particles[p3_idx]
-                p4 = system.particles[p4_idx]
-                
-                phi0 = calcular_phi0(p1, p2, p3, p4)
-                bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                bending_constraints.append(bc)
-                system.add_constraint(bc)
-    
+    bending_constraints = crear_grupo(system, BendingConstraint, datos, 'bending', bending_stiffness)
     print(f"   ✓ {len(bending_constraints)} restricciones de bending creadas para caras externas")
     
-    # ===== 7. Crear restricciones DIAGONALES para las caras externas =====
-    # INTENCIÓN: Evitar el cizallamiento (shearing) de las caras del cubo
-    # Las restricciones diagonales conectan vértices diagonalmente en cada cara
-    # Esto previene que las caras se deformen en forma de paralelogramo
-    diagonal_constraints = []
-    # CRÍTICO: Las diagonales deben ser compatibles con el volumen
-    # Usar aproximadamente la misma rigidez que las distancias, o un poco menos
+    # ===== 6. DIAGONALES de las caras externas (evitan el cizallamiento) =====
     diagonal_stiffness = distance_stiffness * 0.8  # 80% de la rigidez de distancia
-    print(f"   📊 Stiffness diagonal ajustado: {diagonal_stiffness:.2f}")
-    
-    # Cara inferior (z = 0)
-    for y in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            # Diagonal 1: (x,y,0) -> (x+1,y+1,0)
-            p0_idx = get_idx(x, y, 0)
-            p1_idx = get_idx(x + 1, y + 1, 0)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (x+1,y,0) -> (x,y+1,0)
-            p0_idx = get_idx(x + 1, y, 0)
-            p1_idx = get_idx(x, y + 1, 0)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    # Cara superior (z = subdivisiones - 1)
-    for y in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            # Diagonal 1: (x,y,z_max) -> (x+1,y+1,z_max)
-            p0_idx = get_idx(x, y, subdivisiones - 1)
-            p1_idx = get_idx(x + 1, y + 1, subdivisiones - 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (x+1,y,z_max) -> (x,y+1,z_max)
-            p0_idx = get_idx(x + 1, y, subdivisiones - 1)
-            p1_idx = get_idx(x, y + 1, subdivisiones - 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    # Cara frontal (y = 0)
-    for z in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            # Diagonal 1: (x,0,z) -> (x+1,0,z+1)
-            p0_idx = get_idx(x, 0, z)
-            p1_idx = get_idx(x + 1, 0, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (x+1,0,z) -> (x,0,z+1)
-            p0_idx = get_idx(x + 1, 0, z)
-            p1_idx = get_idx(x, 0, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    # Cara trasera (y = subdivisiones - 1)
-    for z in range(subdivisiones - 1):
-        for x in range(subdivisiones - 1):
-            # Diagonal 1: (x,y_max,z) -> (x+1,y_max,z+1)
-            p0_idx = get_idx(x, subdivisiones - 1, z)
-            p1_idx = get_idx(x + 1, subdivisiones - 1, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (x+1,y_max,z) -> (x,y_max,z+1)
-            p0_idx = get_idx(x + 1, subdivisiones - 1, z)
-            p1_idx = get_idx(x, subdivisiones - 1, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    # Cara izquierda (x = 0)
-    for z in range(subdivisiones - 1):
-        for y in range(subdivisiones - 1):
-            # Diagonal 1: (0,y,z) -> (0,y+1,z+1)
-            p0_idx = get_idx(0, y, z)
-            p1_idx = get_idx(0, y + 1, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (0,y+1,z) -> (0,y,z+1)
-            p0_idx = get_idx(0, y + 1, z)
-            p1_idx = get_idx(0, y, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    # Cara derecha (x = subdivisiones - 1)
-    for z in range(subdivisiones - 1):
-        for y in range(subdivisiones - 1):
-            # Diagonal 1: (x_max,y,z) -> (x_max,y+1,z+1)
-            p0_idx = get_idx(subdivisiones - 1, y, z)
-            p1_idx = get_idx(subdivisiones - 1, y + 1, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-            
-            # Diagonal 2: (x_max,y+1,z) -> (x_max,y,z+1)
-            p0_idx = get_idx(subdivisiones - 1, y + 1, z)
-            p1_idx = get_idx(subdivisiones - 1, y, z + 1)
-            if p0_idx < N and p1_idx < N:
-                p0 = system.particles[p0_idx]
-                p1 = system.particles[p1_idx]
-                dist0 = (p1.location - p0.location).length
-                if dist0 > 1e-6:
-                    dc = DistanceConstraint(p0, p1, dist0, diagonal_stiffness)
-                    diagonal_constraints.append(dc)
-                    system.add_constraint(dc)
-    
-    print(f"   ✓ {len(diagonal_constraints)} restricciones diagonales creadas para caras externas")
+    diagonal_constraints = crear_grupo(system, DistanceConstraint, datos, 'diagonales', diagonal_stiffness)
+    print(f"   ✓ {len(diagonal_constraints)} restricciones diagonales creadas para caras externas "
+          f"(stiffness {diagonal_stiffness:.2f})")
     
     return system, volume_constraints, global_volume_constraint, distance_constraints, bending_constraints, diagonal_constraints
-
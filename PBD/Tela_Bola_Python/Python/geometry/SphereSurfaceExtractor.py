@@ -2,9 +2,58 @@
 Extractor de superficie para esfera PBD
 Encuentra las caras externas del mesh tetraédrico y genera triángulos para visualización
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Caras de un tetraedro (i0, i1, i2, i3) con volumen positivo, orientadas hacia fuera
+# (opuestas a i0, i1, i2 e i3): la normal (b - a) × (c - a) se aleja del cuarto vértice
+CARAS_TETRAEDRO = ((1, 2, 3), (0, 3, 2), (0, 1, 3), (0, 2, 1))
+
+
+def _posiciones(particulas):
+    """Posiciones (N,3) de un array, un PBDSystem o una lista de partículas / vectores"""
+    if isinstance(particulas, np.ndarray):
+        return np.asarray(particulas, dtype=np.float64).reshape(-1, 3)
+    from blender.blender_writeback import posiciones_particulas
+    return posiciones_particulas(particulas)
+
+
+def caras_superficie(tetraedros, posiciones):
+    """
+    Caras que pertenecen a un solo tetraedro, orientadas como su tetraedro
+    (normales hacia fuera), en el orden de los tetraedros
+    Los tetraedros con volumen negativo se invierten antes de sacar sus caras.
+    Returns: (F,3) int64
+    """
+    tets = np.asarray(tetraedros, dtype=np.int64).reshape(-1, 4)
+    if len(tets) == 0:
+        return np.zeros((0, 3), dtype=np.int64)
+    
+    p = posiciones[tets]
+    volumen = np.einsum('ij,ij->i', np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0]), p[:, 3] - p[:, 0])
+    invertidos = volumen < 0
+    if invertidos.any():
+        tets = tets.copy()
+        tets[invertidos] = tets[invertidos][:, [0, 1, 3, 2]]
+    
+    # (4T,3) caras orientadas; se cuentan por sus índices ordenados
+    caras = tets[:, CARAS_TETRAEDRO].reshape(-1, 3)
+    ordenadas = np.sort(caras, axis=1)
+    n = int(ordenadas.max()) + 1
+    if n < 2 ** 21:
+        # Clave de 64 bits (a·n + b)·n + c: mucho más rápido que unique por filas
+        clave = (ordenadas[:, 0] * n + ordenadas[:, 1]) * n + ordenadas[:, 2]
+        _, inversa, cuenta = np.unique(clave, return_inverse=True, return_counts=True)
+    else:
+        _, inversa, cuenta = np.unique(ordenadas, axis=0, return_inverse=True, return_counts=True)
+    return caras[cuenta[inversa.reshape(-1)] == 1]
+
 
 def extraer_superficie_tetraedros(tetraedros, particulas, umbral_distancia=None):
     """
@@ -12,89 +61,39 @@ def extraer_superficie_tetraedros(tetraedros, particulas, umbral_distancia=None)
     Las caras externas son aquellas que pertenecen a un solo tetraedro
     
     Args:
-        tetraedros: lista de tetraedros, cada uno es (i0, i1, i2, i3) con índices
-        particulas: lista de partículas (objetos Particle o mathutils.Vector)
+        tetraedros: lista o array (T,4) de tetraedros (i0, i1, i2, i3)
+        particulas: PBDSystem, lista de partículas (Particle o mathutils.Vector) o array (N,3)
         umbral_distancia: distancia mínima al centro para considerar superficie (opcional)
     
     Returns:
-        Lista de triángulos de superficie, cada uno es (i0, i1, i2) con índices ordenados
+        Lista de triángulos de superficie (i0, i1, i2) orientados hacia fuera, sin
+        duplicados (no hace falta deduplicar_triangulos)
     """
-    # Contar ocurrencias de cada cara (triángulo)
-    caras_contador = {}
+    if np is None:
+        raise ImportError("extraer_superficie_tetraedros requiere NumPy")
+    
+    posiciones = _posiciones(particulas)
+    triangulos = caras_superficie(tetraedros, posiciones)
+    
+    # Opcionalmente, filtrar por distancia del centro del triángulo al origen
+    if umbral_distancia is not None and len(triangulos) > 0:
+        centros = posiciones[triangulos].mean(axis=1)
+        cerca = np.sqrt((centros * centros).sum(axis=1)) >= umbral_distancia
+        if cerca.any():
+            triangulos = triangulos[cerca]
+        else:
+            print(f"   ⚠️ No se encontraron triángulos con umbral {umbral_distancia}, usando todos los externos")
     
-    # Iterar sobre todos los tetraedros
-    for tetra in tetraedros:
-        if len(tetra) != 4:
-            continue
-        
-        v0, v1, v2, v3 = tetra
-        
-        # Cada tetraedro tiene 4 caras (triángulos)
-        # Ordenar índices para normalizar la representación de la cara
-        caras = [
-            tuple(sorted([v0, v1, v2])),  # Cara opuesta a v3
-            tuple(sorted([v0, v1, v3])),  # Cara opuesta a v2
-            tuple(sorted([v0, v2, v3])),  # Cara opuesta a v1
-            tuple(sorted([v1, v2, v3])),  # Cara opuesta a v0
-        ]
-        
-        for cara in caras:
-            if cara in caras_contador:
-                caras_contador[cara] += 1
-            else:
-                caras_contador[cara] = 1
-    
-    # Las caras que aparecen solo una vez son caras externas
-    triangulos_superficie = []
-    
-    for cara, count in caras_contador.items():
-        if count == 1:
-            # Opcionalmente, filtrar por distancia al centro
-            if umbral_distancia is not None:
-                # Obtener posiciones de los vértices
-                v0_idx, v1_idx, v2_idx = cara
-                if v0_idx < len(particulas) and v1_idx < len(particulas) and v2_idx < len(particulas):
-                    # Obtener posición (puede ser Particle o Vector)
-                    if hasattr(particulas[v0_idx], 'location'):
-                        p0 = particulas[v0_idx].location
-                    else:
-                        p0 = mathutils.Vector(particulas[v0_idx])
-                    
-                    # Calcular centro del triángulo
-                    if hasattr(particulas[v1_idx], 'location'):
-                        p1 = particulas[v1_idx].location
-                    else:
-                        p1 = mathutils.Vector(particulas[v1_idx])
-                    
-                    if hasattr(particulas[v2_idx], 'location'):
-                        p2 = particulas[v2_idx].location
-                    else:
-                        p2 = mathutils.Vector(particulas[v2_idx])
-                    
-                    centro_triangulo = (p0 + p1 + p2) / 3.0
-                    distancia = centro_triangulo.length
-                    
-                    # Solo incluir si está cerca de la superficie (mayor o igual al umbral)
-                    if distancia >= umbral_distancia:
-                        # Usar índices ordenados (ya están ordenados en 'cara')
-                        triangulos_superficie.append(cara)
-            else:
-                # Sin filtro: usar todos los triángulos de superficie
-                # Los índices ya están ordenados en 'cara'
-                triangulos_superficie.append(cara)
-    
-    # Si no encontramos triángulos con filtro, intentar sin filtro
-    if len(triangulos_superficie) == 0 and umbral_distancia is not None:
-        print(f"   ⚠️ No se encontraron triángulos con umbral {umbral_distancia}, intentando sin filtro...")
-        return extraer_superficie_tetraedros(tetraedros, particulas, umbral_distancia=None)
-    
-    return triangulos_superficie
+    return triangulos.tolist()
+
+
 
 
 def deduplicar_triangulos(triangulos):
     """
     Eliminar triángulos duplicados manteniendo solo uno de cada
-    (Normalmente ya están ordenados, pero por seguridad)
+    (extraer_superficie_tetraedros ya no devuelve duplicados; se mantiene para
+    listas de triángulos de otras fuentes)
     
     Args:
         triangulos: lista de triángulos, cada uno es (i0, i1, i2)
@@ -201,22 +200,29 @@ def actualizar_mesh_blender_desde_particulas(mesh, bmesh_obj, particulas, triang
     Args:
         mesh: mesh de Blender existente
         bmesh_obj: objeto bmesh existente
-        particulas: lista de partículas (objetos Particle con .location)
+        particulas: lista de partículas (objetos Particle con .location), PBDSystem o array (N,3)
         triangulos: lista de triángulos (puede ser None si ya están en el bmesh)
+    
+    Sin triángulos nuevos solo cambian las posiciones: se escriben directamente en
+    mesh.vertices con foreach_set y el bmesh no se toca (el mesh pasa a ser la referencia).
     """
     import bmesh
+    from blender.blender_writeback import posiciones_particulas, escribir_coords
+    
+    if triangulos is None:
+        escribir_coords(mesh.vertices, posiciones_particulas(particulas))
+        mesh.update()
+        return
     
     # Asegurar lookup tables
     bmesh_obj.verts.ensure_lookup_table()
     bmesh_obj.faces.ensure_lookup_table()
     
     # Actualizar posiciones de vértices
+    posiciones = posiciones_particulas(particulas)
     for i, vert in enumerate(bmesh_obj.verts):
-        if i < len(particulas):
-            if hasattr(particulas[i], 'location'):
-                vert.co = particulas[i].location.copy()
-            else:
-                vert.co = mathutils.Vector(particulas[i])
+        if i < len(posiciones):
+            vert.co = mathutils.Vector(posiciones[i])
     
     # Si se proporcionan nuevos triángulos, regenerar caras
     if triangulos is not None:
@@ -2,14 +2,24 @@
 Funciones para crear una esfera con restricciones de volumen (PBD Sphere)
 Genera partículas dentro de una esfera, tetraedros interiores y calcula volúmenes iniciales
 """
-import mathutils
+from core.VectorBackend import mathutils
 import math
 from core.PBDSystem import PBDSystem
 from constraints.VolumeConstraintTet import VolumeConstraintTet
 from constraints.VolumeConstraintGlobal import VolumeConstraintGlobal
 from constraints.DistanceConstraint import DistanceConstraint
 from constraints.BendingConstraint import BendingConstraint
-from geometry.CuboVolumen import calcular_volumen_tetraedro
+from geometry.CuboVolumen import rigidez_distancia
+from geometry.TopologiaRejilla import (
+    rejilla_mascara, colocar_particulas, aristas_rejilla, tetraedros_rejilla, caras_frontera,
+    emparejar_triangulos, longitudes, volumenes_tetraedros, angulos_diedros, crear_grupo,
+)
+from geometry.CacheTopologia import obtener_topologia
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def generar_particulas_esfera(radio, subdivisiones, centro=None):
@@ -308,9 +318,66 @@ def generar_triangulos_superficie_esfera(particulas, particulas_grid, subdivisio
     return triangulos_superficie
 
 
-def crear_esfera_volumen(radio, densidad, stiffness_volumen, stiffness_global=None, subdivisiones=3):
+def rejilla_esfera(radio, subdivisiones):
+    """
+    Nodos de la rejilla (s+1)³ que caen dentro de la esfera (centrada en el origen)
+    Returns: posiciones (N,3) y rejilla de índices (s+1, s+1, s+1) con -1 fuera
+             (numeradas en el orden de generar_particulas_esfera: x, y, z)
+    """
+    spacing = (2.0 * radio) / subdivisiones if subdivisiones > 1 else radio
+    coords = -radio + np.arange(subdivisiones + 1) * spacing
+    x, y, z = np.meshgrid(coords, coords, coords, indexing='ij')
+    nodos = np.stack([x, y, z], axis=-1)
+    dentro = np.sqrt((nodos * nodos).sum(axis=-1)) <= radio
+    return nodos[dentro], rejilla_mascara(dentro)
+
+
+def rigidez_distancia_esfera(stiffness_volumen):
+    """Rigidez de las aristas según la de volumen (como el cubo, con un mínimo de 0.4)"""
+    if stiffness_volumen < 0.15:
+        return 0.4
+    return rigidez_distancia(stiffness_volumen)
+
+
+def topologia_esfera(radio, subdivisiones):
+    """
+    Topología de la esfera (no depende de la rigidez ni de la densidad)
+    Returns: dict de arrays: posiciones (N,3), celdas (N,3) de la rejilla, tetraedros,
+             triangulos de superficie y los grupos distancia, volumen y bending
+    """
+    pos, ids = rejilla_esfera(radio, subdivisiones)
+    aristas = aristas_rejilla(ids)
+    dists = longitudes(pos, aristas)
+    tets = tetraedros_rejilla(ids)
+    V0 = volumenes_tetraedros(pos, tets)
+    validos = np.abs(V0) > 1e-10  # Ignorar tetraedros degenerados
+    
+    # Superficie: caras de un solo tetraedro con algún vértice cerca del radio
+    caras = caras_frontera(tets)
+    superficie = np.sqrt((pos * pos).sum(axis=1)) >= radio * 0.95
+    triangulos = caras[superficie[caras].any(axis=1)]
+    quads = emparejar_triangulos(triangulos)
+    
+    return {
+        'posiciones': pos,
+        'celdas': np.argwhere(ids >= 0),  # Orden C = orden de los índices de partícula
+        'tetraedros': tets,
+        'triangulos': triangulos,
+        'distancia_indices': aristas[dists > 1e-6],
+        'distancia_reposo': dists[dists > 1e-6],
+        'volumen_indices': tets[validos],
+        'volumen_reposo': V0[validos],
+        'bending_indices': quads,
+        'bending_reposo': angulos_diedros(pos, quads),
+    }
+
+
+def crear_esfera_volumen(radio, densidad, stiffness_volumen, stiffness_global=None, subdivisiones=3, use_arrays=False,
+                         cache=None):
     """
     Crear una esfera con restricciones de volumen (subdividida para más realismo)
+    La topología se genera con NumPy de una vez (topologia_esfera) y en modo
+    arrays cada tipo de restricción se crea directamente como un lote.
     
     Args:
         radio: radio de la esfera
@@ -318,326 +385,76 @@ def crear_esfera_volumen(radio, densidad, stiffness_volumen, stiffness_global=No
         stiffness_volumen: rigidez de las restricciones de volumen por tetraedro [0, 1]
         stiffness_global: rigidez de la restricción global (opcional, None para desactivar)
         subdivisiones: número de subdivisiones por eje (3 = 3x3x3 grid)
+        use_arrays: crear el sistema en modo arrays (ParticleStore, requiere NumPy)
+        cache: CacheTopologia o directorio de la caché de topologías (None = sin caché)
     
     Returns:
-        Tupla (PBDSystem, lista_tetraedros, lista_triangulos_superficie, particulas_grid)
+        Tupla (PBDSystem, lista_tetraedros, particulas_grid, posiciones (N,3))
     """
-    # ===== 1. Generar partículas dentro de la esfera =====
-    particulas_pos, particulas_grid = generar_particulas_esfera(radio, subdivisiones)
-    N = len(particulas_pos)
+    if np is None:
+        raise ImportError("crear_esfera_volumen requiere NumPy")
+    
+    datos = obtener_topologia(cache, 'esfera', {'radio': float(radio), 'subdivisiones': int(subdivisiones)},
+                              lambda: topologia_esfera(radio, subdivisiones), colorear=use_arrays)
     
+    # ===== 1. Partículas: nodos de la rejilla dentro de la esfera =====
+    pos = datos['posiciones']
+    N = len(pos)
     if N == 0:
         raise ValueError(f"No se generaron partículas para la esfera con radio={radio}, subdivisiones={subdivisiones}")
     
-    print(f"   📊 Generadas {N} partículas dentro de la esfera")
-    print(f"   📊 Mapeadas {len(particulas_grid)} partículas al grid")
-    
-    # DEBUG: Mostrar ejemplos de partículas
-    if N > 0:
-        print(f"   🔍 DEBUG: Ejemplos de partículas generadas:")
-        for i in range(min(3, N)):
-            pos = particulas_pos[i]
-            print(f"      Partícula {i}: pos=({pos.x:.4f}, {pos.y:.4f}, {pos.z:.4f}), "
-                  f"distancia_centro={(pos - mathutils.Vector((0,0,0))).length:.4f}")
-    
-    # Calcular masa
     volumen_esfera = (4.0 / 3.0) * math.pi * radio * radio * radio
     masa_total = densidad * volumen_esfera
-    masa_particula = masa_total / N if N > 0 else 0.0
-    
-    system = PBDSystem(N, masa_particula)
-    
-    # Inicializar partículas
-    print(f"   🔍 DEBUG: Inicializando {N} partículas...")
-    for i, pos in enumerate(particulas_pos):
-        system.particles[i].location = mathutils.Vector(pos)
-        system.particles[i].last_location = mathutils.Vector(pos)
-        system.particles[i].velocity = mathutils.Vector((0.0, 0.0, 0.0))
-        system.particles[i].force = mathutils.Vector((0.0, 0.0, 0.0))
-        system.particles[i].acceleration = mathutils.Vector((0.0, 0.0, 0.0))
-        
-        # DEBUG: Verificar primeras 3 partículas
-        if i < 3:
-            p = system.particles[i]
-            print(f"      DEBUG SphereVolume: Partícula {i} inicializada - "
-                  f"loc=({p.location.x:.6f}, {p.location.y:.6f}, {p.location.z:.6f}), "
-                  f"id(loc)={id(p.location)}, id(last_loc)={id(p.last_location)}")
-    
-    print(f"   ✓ {N} partículas inicializadas")
-    
-    # ===== 2. Generar tetraedros =====
-    print(f"   🔍 DEBUG: Generando tetraedros...")
-    tetraedros_indices = generar_tetraedros_esfera(radio, subdivisiones, particulas_pos, particulas_grid)
-    print(f"   📊 Generados {len(tetraedros_indices)} tetraedros")
-    
-    # DEBUG: Mostrar ejemplos de tetraedros
-    if len(tetraedros_indices) > 0:
-        print(f"   🔍 DEBUG: Ejemplos de tetraedros generados:")
-        for i in range(min(3, len(tetraedros_indices))):
-            tetra = tetraedros_indices[i]
-            v0, v1, v2, v3 = tetra
-            # Calcular volumen del tetraedro
-            if v0 < N and v1 < N and v2 < N and v3 < N:
-                p0 = system.particles[v0].location
-                p1 = system.particles[v1].location
-                p2 = system.particles[v2].location
-                p3 = system.particles[v3].location
-                V = calcular_volumen_tetraedro(p0, p1, p2, p3)
-                print(f"      Tetraedro {i}: vértices=[{v0}, {v1}, {v2}, {v3}], V={V:.6f}")
-    
-    # CRÍTICO: Validar que se generaron suficientes tetraedros
-    if len(tetraedros_indices) == 0:
+    system = PBDSystem(N, masa_total / N, use_arrays=use_arrays)
+    colocar_particulas(system, pos)
+    print(f"   📊 Generadas {N} partículas dentro de la esfera")
+    
+    # ===== 2. Tetraedros de las celdas completamente dentro =====
+    tets = datos['tetraedros']
+    if len(tets) == 0:
         raise ValueError(f"❌ ERROR: No se generaron tetraedros para la esfera. "
-                        f"Esto causará colapso. Verifica que las partículas estén correctamente mapeadas al grid. "
-                        f"Partículas: {N}, Grid mapeado: {len(particulas_grid)}")
-    elif len(tetraedros_indices) < N / 10:
-        print(f"   ⚠️ ADVERTENCIA: Solo se generaron {len(tetraedros_indices)} tetraedros para {N} partículas.")
-        print(f"   ⚠️ Ratio esperado: ~{N/5} tetraedros (5 tetraedros por cubo, ~{N/8} cubos).")
+                        f"Esto causará colapso. Aumenta las subdivisiones o el radio. Partículas: {N}")
+    elif len(tets) < N / 10:
+        print(f"   ⚠️ ADVERTENCIA: Solo se generaron {len(tets)} tetraedros para {N} partículas.")
         print(f"   ⚠️ Esto puede causar inestabilidad. Considera aumentar las subdivisiones o el radio.")
+    print(f"   📊 Generados {len(tets)} tetraedros ({len(tets) / N:.2f} por partícula)")
     
-    # Calcular ratio de tetraedros por partícula
-    ratio_tetra = len(tetraedros_indices) / N if N > 0 else 0
-    print(f"   📊 Ratio: {ratio_tetra:.2f} tetraedros por partícula (óptimo: ~0.6-1.0)")
-    
-    # ===== 3. Crear restricciones de DISTANCIA =====
-    # Ajustar stiffness de distancia basado en stiffness de volumen (igual que el cubo)
-    # CRÍTICO: Asegurar stiffness mínimo para evitar colapso
+    # ===== 3. Restricciones de DISTANCIA entre vecinos X, Y, Z =====
+    distance_stiffness = rigidez_distancia_esfera(stiffness_volumen)
     if stiffness_volumen < 0.15:
-        # Stiffness muy bajo: garantizar mínimo para distancia
-        distance_stiffness = 0.4
         print(f"   ⚠️ ADVERTENCIA: Stiffness de volumen muy bajo ({stiffness_volumen:.2f}). Usando stiffness de distancia mínimo (0.4)")
-    elif stiffness_volumen < 0.3:
-        distance_stiffness = min(0.5, stiffness_volumen + 0.2)
-    elif stiffness_volumen < 0.6:
-        distance_stiffness = 0.6
-    else:
-        distance_stiffness = 0.8
-    
-    print(f"   📊 Stiffness de distancia ajustado: {distance_stiffness:.2f} (basado en stiffness de volumen: {stiffness_volumen:.2f})")
-    
-    # Generar aristas entre partículas vecinas
-    aristas = generar_aristas_esfera(particulas_pos, particulas_grid, subdivisiones, radio)
-    
-    print(f"   🔍 DEBUG: Creando restricciones de distancia a partir de {len(aristas)} aristas...")
-    distance_constraints = []
-    distancias_ejemplo = []
-    
-    for i0, i1 in aristas:
-        if i0 < N and i1 < N:
-            p0 = system.particles[i0]
-            p1 = system.particles[i1]
-            dist0 = (p1.location - p0.location).length
-            if dist0 > 1e-6:
-                constraint = DistanceConstraint(p0, p1, dist0, distance_stiffness)
-                distance_constraints.append(constraint)
-                system.add_constraint(constraint)
-                
-                # DEBUG: Guardar ejemplos
-                if len(distancias_ejemplo) < 3:
-                    distancias_ejemplo.append((i0, i1, dist0))
-    
-    print(f"   ✓ Creadas {len(distance_constraints)} restricciones de distancia")
-    
-    # DEBUG: Mostrar ejemplos de restricciones de distancia
-    if distancias_ejemplo:
-        print(f"   🔍 DEBUG: Ejemplos de restricciones de distancia:")
-        for idx, (i0, i1, d) in enumerate(distancias_ejemplo):
-            print(f"      DistanceConstraint {idx}: partículas [{i0}, {i1}], distancia={d:.6f}, stiffness={distance_stiffness:.4f}")
-    
-    # CRÍTICO: Validar que hay suficientes restricciones de distancia
-    if len(distance_constraints) < N / 2:
-        print(f"   ⚠️ ADVERTENCIA: Solo {len(distance_constraints)} restricciones de distancia para {N} partículas.")
-        print(f"   ⚠️ Esto puede causar inestabilidad. Verifica el mapeo del grid.")
-    
-    # ===== 4. Crear restricciones de VOLUMEN por tetraedro =====
-    # CRÍTICO: Asegurar stiffness mínimo para evitar colapso total
-    effective_volume_stiffness = max(0.1, stiffness_volumen)  # Mínimo 0.1 para evitar colapso completo
+    distance_constraints = crear_grupo(system, DistanceConstraint, datos, 'distancia', distance_stiffness)
+    print(f"   ✓ Creadas {len(distance_constraints)} restricciones de distancia (stiffness {distance_stiffness:.2f})")
+    
+    # ===== 4. Restricciones de VOLUMEN por tetraedro =====
+    # Mínimo 0.1 para evitar el colapso completo
+    effective_volume_stiffness = max(0.1, stiffness_volumen)
     if stiffness_volumen < 0.1:
         print(f"   ⚠️ ADVERTENCIA: Stiffness de volumen muy bajo ({stiffness_volumen:.2f}). Aplicando mínimo (0.1) para evitar colapso.")
-    
-    print(f"   🔍 DEBUG: Creando restricciones de volumen para {len(tetraedros_indices)} tetraedros...")
-    volume_constraints = []
-    tetraedros_validos = 0
-    tetraedros_degenerados = 0
-    
-    for tetra_idx, tetra in enumerate(tetraedros_indices):
-        i0, i1, i2, i3 = tetra
-        if i0 < N and i1 < N and i2 < N and i3 < N:
-            p0 = system.particles[i0]
-            p1 = system.particles[i1]
-            p2 = system.particles[i2]
-            p3 = system.particles[i3]
-            
-            # Calcular volumen inicial
-            V0 = calcular_volumen_tetraedro(p0.location, p1.location, p2.location, p3.location)
-            
-            if abs(V0) > 1e-10:  # Ignorar tetraedros degenerados
-                # Usar stiffness efectivo (mínimo garantizado)
-                constraint = VolumeConstraintTet(p0, p1, p2, p3, V0, effective_volume_stiffness)
-                volume_constraints.append(constraint)
-                system.add_constraint(constraint)
-                tetraedros_validos += 1
-                
-                # DEBUG: Verificar primeras 3 restricciones
-                if len(volume_constraints) <= 3:
-                    print(f"      DEBUG SphereVolume: VolumeConstraint {len(volume_constraints)-1} creada - "
-                          f"tetraedro_idx={tetra_idx}, vértices=[{i0}, {i1}, {i2}, {i3}], "
-                          f"V0={V0:.6f}, stiffness={effective_volume_stiffness:.4f}, "
-                          f"id(V0)={id(constraint.V0) if hasattr(constraint, 'V0') else 'N/A'}")
-            else:
-                tetraedros_degenerados += 1
-                # DEBUG: Mostrar primeros tetraedros degenerados
-                if tetraedros_degenerados <= 3:
-                    print(f"      ⚠️ DEBUG: Tetraedro {tetra_idx} degenerado - vértices=[{i0}, {i1}, {i2}, {i3}], V0={V0:.10f}")
-    
-    print(f"   ✓ Creadas {len(volume_constraints)} restricciones de volumen local")
-    if tetraedros_degenerados > 0:
-        print(f"   ⚠️ ADVERTENCIA: {tetraedros_degenerados} tetraedros degenerados ignorados")
-    
-    # CRÍTICO: Validar que hay suficientes restricciones de volumen
+    volume_constraints = crear_grupo(system, VolumeConstraintTet, datos, 'volumen', effective_volume_stiffness)
     if len(volume_constraints) == 0:
         raise ValueError(f"❌ ERROR: No se crearon restricciones de volumen. La esfera colapsará.")
-    elif len(volume_constraints) < len(tetraedros_indices) * 0.5:
-        print(f"   ⚠️ ADVERTENCIA: Solo {len(volume_constraints)} de {len(tetraedros_indices)} tetraedros tienen restricciones válidas.")
+    print(f"   ✓ Creadas {len(volume_constraints)} restricciones de volumen local")
+    if len(volume_constraints) < len(tets):
+        print(f"   ⚠️ ADVERTENCIA: {len(tets) - len(volume_constraints)} tetraedros degenerados ignorados")
     
-    # ===== 5. Crear restricción de VOLUMEN GLOBAL (opcional) =====
+    # ===== 5. (Opcional) VOLUMEN GLOBAL sobre los triángulos de superficie =====
+    triangulos_superficie = datos['triangulos']
     global_constraint = None
     if stiffness_global is not None and stiffness_global > 0:
-        print(f"   🔍 DEBUG: Creando restricción de volumen global...")
-        # Generar triángulos de superficie
-        triangulos_superficie = generar_triangulos_superficie_esfera(
-            particulas_pos, particulas_grid, subdivisiones, radio
-        )
-        
-        # Calcular volumen inicial global
-        V0_global = volumen_esfera  # Usar el volumen teórico de la esfera
-        
+        # V0 global: volumen teórico de la esfera
         global_constraint = VolumeConstraintGlobal(
-            system.particles, triangulos_superficie, V0_global, stiffness_global
+            system.particles, triangulos_superficie.tolist(), volumen_esfera, stiffness_global, store=system.store
         )
         system.add_constraint(global_constraint)
-        
         print(f"   ✓ Creada restricción de volumen global con {len(triangulos_superficie)} triángulos de superficie")
-        print(f"   🔍 DEBUG: VolumeConstraintGlobal - V0={V0_global:.6f}, stiffness={stiffness_global:.4f}, "
-              f"triángulos={len(triangulos_superficie)}")
-    else:
-        # Si no hay volumen global, necesitamos generar triángulos de superficie para bending
-        triangulos_superficie = generar_triangulos_superficie_esfera(
-            particulas_pos, particulas_grid, subdivisiones, radio
-        )
     
-    # ===== 6. Crear restricciones de BENDING para la superficie =====
-    # INTENCIÓN: Evitar que la superficie de la esfera se pliegue o colapse
-    # Se aplican solo en la superficie para no interferir con las restricciones de volumen internas
-    print(f"   🔍 DEBUG: Creando restricciones de bending a partir de {len(triangulos_superficie)} triángulos de superficie...")
-    bending_constraints = []
+    # ===== 6. BENDING entre triángulos de superficie adyacentes =====
     bending_stiffness = 0.1  # Rigidez baja para permitir cierta deformación
-    
-    # Función auxiliar para calcular phi0 (ángulo inicial entre dos triángulos adyacentes)
-    def calcular_phi0(p1, p2, p3, p4):
-        """
-        Calcular ángulo diedro inicial entre dos triángulos que comparten una arista
-        p1, p2: vértices de la arista compartida
-        p3: tercer vértice del primer triángulo
-        p4: tercer vértice del segundo triángulo
-        """
-        e1 = p2.location - p1.location
-        e2 = p3.location - p1.location
-        e3 = p4.location - p1.location
-        
-        n1 = mathutils.Vector.cross(e1, e2)
-        n2 = mathutils.Vector.cross(e1, e3)
-        
-        len_n1 = n1.length
-        len_n2 = n2.length
-        
-        if len_n1 < 1e-6 or len_n2 < 1e-6:
-            return 0.087  # ~5 grados por defecto
-        
-        n1 = n1.normalized()
-        n2 = n2.normalized()
-        
-        d = n1.dot(n2)
-        d = max(-1.0, min(1.0, d))
-        
-        if abs(d - 1.0) < 1e-6:
-            return 0.087  # ~5 grados
-        
-        return math.acos(d)
-    
-    # Encontrar triángulos adyacentes (que comparten una arista)
-    # Para cada triángulo, buscar otros triángulos que compartan exactamente 2 vértices
-    triangulos_procesados = set()
-    
-    for i, tri1 in enumerate(triangulos_superficie):
-        if i in triangulos_procesados:
-            continue
-        
-        v0_1, v1_1, v2_1 = tri1
-        set_tri1 = set(tri1)
-        
-        # Buscar triángulos adyacentes
-        for j, tri2 in enumerate(triangulos_superficie):
-            if i == j or j in triangulos_procesados:
-                continue
-            
-            v0_2, v1_2, v2_2 = tri2
-            set_tri2 = set(tri2)
-            
-            # Encontrar vértices compartidos (deben ser exactamente 2)
-            shared_verts = set_tri1.intersection(set_tri2)
-            
-            if len(shared_verts) == 2:
-                # Estos dos triángulos comparten una arista - crear bending constraint
-                shared_list = list(shared_verts)
-                p1_idx, p2_idx = shared_list[0], shared_list[1]
-                
-                # Encontrar los otros dos vértices (uno en cada triángulo)
-                other_verts_tri1 = set_tri1 - shared_verts
-                other_verts_tri2 = set_tri2 - shared_verts
-                
-                if len(other_verts_tri1) == 1 and len(other_verts_tri2) == 1:
-                    p3_idx = list(other_verts_tri1)[0]  # Vértice único del triángulo 1
-                    p4_idx = list(other_verts_tri2)[0]  # Vértice único del triángulo 2
-                    
-                    # Validar índices
-                    if (p1_idx < N and p2_idx < N and p3_idx < N and p4_idx < N):
-                        p1 = system.particles[p1_idx]
-                        p2 = system.particles[p2_idx]
-                        p3 = system.particles[p3_idx]
-                        p4 = system.particles[p4_idx]
-                        
-                        # Calcular ángulo inicial
-                        phi0 = calcular_phi0(p1, p2, p3, p4)
-                        
-                        # Crear bending constraint
-                        bc = BendingConstraint(p1, p2, p3, p4, phi0, bending_stiffness)
-                        bending_constraints.append(bc)
-                        system.add_constraint(bc)
-                        
-                        # DEBUG: Mostrar primeros ejemplos
-                        if len(bending_constraints) <= 3:
-                            print(f"      DEBUG SphereVolume: BendingConstraint {len(bending_constraints)-1} creada - "
-                                  f"vértices=[{p1_idx}, {p2_idx}, {p3_idx}, {p4_idx}], "
-                                  f"phi0={phi0:.6f} rad ({math.degrees(phi0):.2f}°), stiffness={bending_stiffness:.4f}")
-                        
-                        # Marcar ambos triángulos como procesados para evitar duplicados
-                        triangulos_procesados.add(i)
-                        triangulos_procesados.add(j)
-                        break  # Solo un vecino por triángulo por iteración
-    
+    bending_constraints = crear_grupo(system, BendingConstraint, datos, 'bending', bending_stiffness)
     print(f"   ✓ Creadas {len(bending_constraints)} restricciones de bending en la superficie")
-    
-    # DEBUG: Estadísticas finales de restricciones
-    print(f"\n   🔍 DEBUG: RESUMEN DE RESTRICCIONES:")
-    print(f"      - Restricciones de distancia: {len(distance_constraints)}")
-    print(f"      - Restricciones de volumen local: {len(volume_constraints)}")
-    print(f"      - Restricción de volumen global: {'Sí' if global_constraint is not None else 'No'}")
-    print(f"      - Restricciones de bending: {len(bending_constraints)}")
-    print(f"      - TOTAL: {len(system.constraints)} restricciones")
-    print(f"      - Partículas: {N}")
-    print(f"      - Tetraedros: {len(tetraedros_indices)} (válidos: {tetraedros_validos}, degenerados: {tetraedros_degenerados})")
+    print(f"   📊 TOTAL: {len(system.constraints)} restricciones, {N} partículas")
     
     # ===== 7. Retornar sistema y datos adicionales =====
-    return system, tetraedros_indices, particulas_grid, particulas_pos
-
+    particulas_grid = dict(zip(map(tuple, datos['celdas'].tolist()), range(N)))
+    return system, list(map(tuple, tets.tolist())), particulas_grid, pos
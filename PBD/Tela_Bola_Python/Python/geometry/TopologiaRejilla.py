@@ -0,0 +1,357 @@
+"""
+TopologiaRejilla - Topología de mallas sobre rejillas regulares (NumPy)
+Genera de una vez, con máscaras y desplazamientos sobre la rejilla de índices,
+las aristas, tetraedros, caras, quads de bending y valores de reposo que
+CuboVolumen, SphereVolume y Tela construían celda a celda con bucles anidados.
+
+La rejilla de índices 'ids' es un array de enteros con un eje por dimensión
+(x, y[, z]) y el índice de partícula de cada nodo, o -1 si el nodo no existe.
+Los arrays salen en el mismo orden que los bucles originales, así que las
+restricciones (y el coloreado de los lotes) son las mismas.
+"""
+from constraints.DistanceConstraint import DistanceConstraint
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+from constraints.BendingConstraint import BendingConstraint
+from constraints.ShearConstraint import ShearConstraint
+from core.ConstraintScheduler import grupos_de_colores
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Desplazamiento (dx, dy, dz) de las esquinas v0..v7 de una celda
+#   v0-v3: cara inferior (z), v4-v7: cara superior (z + 1)
+ESQUINAS_CELDA = (
+    (0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+    (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1),
+)
+
+# División de una celda en tetraedros (índices de esquina), todos con volumen positivo
+#   5: diagonal principal (la división original de CuboVolumen)
+#   6: Kuhn / Freudenthal alrededor de v0-v6 (conforme entre celdas vecinas)
+DIVISIONES_CELDA = {
+    5: ((0, 1, 3, 4), (1, 4, 5, 6), (1, 3, 4, 6), (1, 2, 3, 6), (3, 4, 6, 7)),
+    6: ((0, 1, 2, 6), (0, 1, 6, 5), (0, 3, 6, 2), (0, 3, 7, 6), (0, 4, 5, 6), (0, 4, 6, 7)),
+}
+
+
+def rejilla_cubo(subdivisiones):
+    """
+    Rejilla de índices (s, s, s) del cubo subdividido: ids[x, y, z] = z*s² + y*s + x
+    """
+    s = subdivisiones
+    return np.arange(s ** 3, dtype=np.int64).reshape(s, s, s).transpose(2, 1, 0)
+
+
+def rejilla_mascara(dentro):
+    """
+    Rejilla de índices a partir de una máscara de nodos existentes
+    Los nodos se numeran en orden C (el primer eje es el más lento)
+    """
+    ids = np.full(dentro.shape, -1, dtype=np.int64)
+    ids[dentro] = np.arange(int(dentro.sum()), dtype=np.int64)
+    return ids
+
+
+def _desplazada(ids, eje, paso):
+    """ids del nodo vecino (nodo + paso en 'eje') en cada nodo, -1 si no existe"""
+    vecino = np.full_like(ids, -1)
+    origen = [slice(None)] * ids.ndim
+    destino = [slice(None)] * ids.ndim
+    if paso > 0:
+        destino[eje] = slice(0, ids.shape[eje] - paso)
+        origen[eje] = slice(paso, None)
+    else:
+        destino[eje] = slice(-paso, None)
+        origen[eje] = slice(0, ids.shape[eje] + paso)
+    vecino[tuple(destino)] = ids[tuple(origen)]
+    return vecino
+
+
+def aristas_rejilla(ids, hacia_atras=False, con_eje=False):
+    """
+    Aristas entre nodos vecinos en cada eje de la rejilla
+    Orden: por partícula (índice creciente) y, dentro de cada una, por eje;
+    cada arista es (nodo, vecino) con el vecino en +1 (o en -1 si hacia_atras)
+    Returns: (E,2) int64 (y (E,) con el eje de cada arista si con_eje)
+    """
+    paso = -1 if hacia_atras else 1
+    existe = ids >= 0
+    nodos = ids[existe]
+    vecinos = np.stack([_desplazada(ids, eje, paso)[existe] for eje in range(ids.ndim)], axis=1)
+
+    orden = np.argsort(nodos, kind='stable')
+    nodos = nodos[orden]
+    vecinos = vecinos[orden]
+
+    validas = vecinos >= 0
+    aristas = np.stack([np.broadcast_to(nodos[:, None], vecinos.shape)[validas], vecinos[validas]], axis=1)
+    if con_eje:
+        ejes = np.broadcast_to(np.arange(ids.ndim), vecinos.shape)[validas]
+        return aristas, ejes
+    return aristas
+
+
+def tetraedros_rejilla(ids, division=5):
+    """
+    Tetraedros de todas las celdas con las 8 esquinas presentes
+    Orden: celdas por índice de su esquina v0, tetraedros de DIVISIONES_CELDA[division]
+    Returns: (T,4) int64
+    """
+    patron = np.array(DIVISIONES_CELDA[division], dtype=np.int64)
+    nx, ny, nz = ids.shape
+    esquinas = np.stack([ids[dx:nx - 1 + dx, dy:ny - 1 + dy, dz:nz - 1 + dz]
+                         for dx, dy, dz in ESQUINAS_CELDA], axis=-1).reshape(-1, 8)
+    esquinas = esquinas[(esquinas >= 0).all(axis=1)]
+    esquinas = esquinas[np.argsort(esquinas[:, 0], kind='stable')]
+    return esquinas[:, patron].reshape(-1, 4)
+
+
+# Caras de una rejilla en caja: (eje fijo, extremo, eje u (rápido), eje w (lento), invertida)
+# en el orden de CuboVolumen: inferior, superior, frontal, trasera, izquierda, derecha
+CARAS_CAJA = (
+    (2, 0, 0, 1, False), (2, -1, 0, 1, True),
+    (1, 0, 0, 2, False), (1, -1, 0, 2, True),
+    (0, 0, 1, 2, False), (0, -1, 1, 2, True),
+)
+
+
+def quads_caras_caja(ids):
+    """
+    Quads (q0, q1, q2, q3) = (u,w), (u+1,w), (u+1,w+1), (u,w+1) de las 6 caras de la caja
+    Returns: (Q,4) int64 y (Q,) bool con las caras cuya normal exterior es q0 q3 q2 q1
+    """
+    quads = []
+    invertidas = []
+    for eje, extremo, eje_u, eje_w, invertida in CARAS_CAJA:
+        cara = np.take(ids, extremo, axis=eje)
+        # Ejes restantes de la cara en orden (w, u): el bucle externo es w
+        restantes = [e for e in range(3) if e != eje]
+        cara = cara.transpose(restantes.index(eje_w), restantes.index(eje_u))
+        q = np.stack([cara[:-1, :-1], cara[:-1, 1:], cara[1:, 1:], cara[1:, :-1]], axis=-1).reshape(-1, 4)
+        quads.append(q)
+        invertidas.append(np.full(len(q), invertida))
+    return np.concatenate(quads), np.concatenate(invertidas)
+
+
+def triangulos_quads(quads, invertidas=None):
+    """Dos triángulos por quad (diagonal q0-q2), con la orientación de cada quad: (2Q,3)"""
+    tris = quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, 2, 3)
+    if invertidas is not None:
+        tris[invertidas] = quads[invertidas][:, [0, 2, 1, 0, 3, 2]].reshape(-1, 2, 3)
+    return tris.reshape(-1, 3)
+
+
+def caras_frontera(tetraedros):
+    """
+    Caras que pertenecen a un solo tetraedro, con sus índices ordenados
+    Orden: primera aparición (caras 012, 013, 023, 123 de cada tetraedro)
+    Returns: (F,3) int64
+    """
+    tets = np.asarray(tetraedros, dtype=np.int64).reshape(-1, 4)
+    caras = np.sort(tets[:, [0, 1, 2, 0, 1, 3, 0, 2, 3, 1, 2, 3]].reshape(-1, 3), axis=1)
+    if len(caras) == 0:
+        return caras
+    unicas, primera, cuenta = np.unique(caras, axis=0, return_index=True, return_counts=True)
+    solas = cuenta == 1
+    return unicas[solas][np.argsort(primera[solas], kind='stable')]
+
+
+def emparejar_triangulos(triangulos):
+    """
+    Pares de triángulos que comparten arista, emparejados en orden: cada triángulo
+    sin pareja toma el primer vecino libre (cada triángulo entra en un solo par)
+    Returns: (B,4) int64 (p1, p2, p3, p4) con p1 < p2 la arista compartida,
+             p3 el vértice opuesto del primer triángulo y p4 el del segundo
+    """
+    tris = np.sort(np.asarray(triangulos, dtype=np.int64).reshape(-1, 3), axis=1)
+    T = len(tris)
+    if T < 2:
+        return np.zeros((0, 4), dtype=np.int64)
+
+    # Aristas (a < b) de cada triángulo y su vértice opuesto
+    a = tris[:, [0, 0, 1]].ravel()
+    b = tris[:, [1, 2, 2]].ravel()
+    opuesto = tris[:, [2, 1, 0]].ravel()
+    duenio = np.repeat(np.arange(T), 3)
+    clave = a * (int(tris.max()) + 1) + b
+    orden = np.argsort(clave, kind='stable')
+    clave = clave[orden]
+
+    # Todos los pares de triángulos con la misma arista (grupos pequeños: >2 solo si no es variedad)
+    pares = []
+    d = 1
+    while d < len(clave):
+        iguales = np.flatnonzero(clave[:-d] == clave[d:])
+        if len(iguales) == 0:
+            break
+        pares.append(np.stack([orden[iguales], orden[iguales + d]], axis=1))
+        d += 1
+    if not pares:
+        return np.zeros((0, 4), dtype=np.int64)
+    pares = np.concatenate(pares)
+    # Ambos sentidos (esquina -> esquina), ordenados por triángulo y vecino
+    pares = np.concatenate([pares, pares[:, ::-1]])
+    pares = pares[np.lexsort((duenio[pares[:, 1]], duenio[pares[:, 0]]))]
+
+    tri_i = duenio[pares[:, 0]].tolist()
+    tri_j = duenio[pares[:, 1]].tolist()
+    emparejado = [False] * T
+    elegidos = []
+    k = 0
+    while k < len(tri_i):
+        i = tri_i[k]
+        if not emparejado[i]:
+            while k < len(tri_i) and tri_i[k] == i:
+                if not emparejado[tri_j[k]]:
+                    emparejado[i] = emparejado[tri_j[k]] = True
+                    elegidos.append(k)
+                    break
+                k += 1
+        while k < len(tri_i) and tri_i[k] == i:
+            k += 1
+
+    elegidos = np.array(elegidos, dtype=np.int64)
+    e1 = pares[elegidos, 0]
+    e2 = pares[elegidos, 1]
+    return np.stack([a[e1], b[e1], opuesto[e1], opuesto[e2]], axis=1)
+
+
+# ===== Valores de reposo =====
+
+def longitudes(pos, aristas):
+    """Longitud de cada arista (E,)"""
+    d = pos[aristas[:, 1]] - pos[aristas[:, 0]]
+    return np.sqrt(np.einsum('ij,ij->i', d, d))
+
+
+def volumenes_tetraedros(pos, tetraedros):
+    """Volumen con signo de cada tetraedro: dot(cross(p1-p0, p2-p0), p3-p0) / 6"""
+    p0 = pos[tetraedros[:, 0]]
+    e1 = pos[tetraedros[:, 1]] - p0
+    e2 = pos[tetraedros[:, 2]] - p0
+    e3 = pos[tetraedros[:, 3]] - p0
+    return np.einsum('ij,ij->i', np.cross(e1, e2), e3) / 6.0
+
+
+def volumen_cerrado(pos, triangulos):
+    """Volumen encerrado por una malla cerrada: Σ dot(cross(p0, p1), p2) / 6 (Müller 2007)"""
+    p0 = pos[triangulos[:, 0]]
+    p1 = pos[triangulos[:, 1]]
+    p2 = pos[triangulos[:, 2]]
+    return float(np.einsum('ij,ij->i', np.cross(p0, p1), p2).sum() / 6.0)
+
+
+def angulos_diedros(pos, quads, umbral=1e-6, defecto=0.087, defecto_plano=0.087):
+    """
+    Ángulo inicial phi0 de cada restricción de bending (p1, p2, p3, p4)
+    Ángulo entre n1 = (p2-p1) x (p3-p1) y n2 = (p2-p1) x (p4-p1)
+    umbral: normales más cortas dan 'defecto'
+    defecto_plano: valor para normales paralelas (None = acos(1) = 0)
+    """
+    p1 = pos[quads[:, 0]]
+    e1 = pos[quads[:, 1]] - p1
+    n1 = np.cross(e1, pos[quads[:, 2]] - p1)
+    n2 = np.cross(e1, pos[quads[:, 3]] - p1)
+    len_n1 = np.sqrt(np.einsum('ij,ij->i', n1, n1))
+    len_n2 = np.sqrt(np.einsum('ij,ij->i', n2, n2))
+    degeneradas = (len_n1 < umbral) | (len_n2 < umbral)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = np.einsum('ij,ij->i', n1, n2) / (len_n1 * len_n2)
+    d = np.clip(np.nan_to_num(d), -1.0, 1.0)
+    phi0 = np.arccos(d)
+    if defecto_plano is not None:
+        phi0[np.abs(d - 1.0) < 1e-6] = defecto_plano
+    phi0[degeneradas] = defecto
+    return phi0
+
+
+def angulos_vertice(pos, ternas, umbral=1e-4, defecto=None):
+    """
+    Ángulo inicial psi0 de cada restricción de shear (x0, x1, x2), con vértice en x0
+    Vectores más cortos que 'umbral' dan 'defecto' (None = pi/2)
+    """
+    v1 = pos[ternas[:, 1]] - pos[ternas[:, 0]]
+    v2 = pos[ternas[:, 2]] - pos[ternas[:, 0]]
+    len_v1 = np.sqrt(np.einsum('ij,ij->i', v1, v1))
+    len_v2 = np.sqrt(np.einsum('ij,ij->i', v2, v2))
+    degenerados = (len_v1 < umbral) | (len_v2 < umbral)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        c = np.einsum('ij,ij->i', v1, v2) / (len_v1 * len_v2)
+    psi0 = np.arccos(np.clip(np.nan_to_num(c), -1.0, 1.0))
+    psi0[degenerados] = np.pi / 2 if defecto is None else defecto
+    return psi0
+
+
+# ===== Creación de restricciones =====
+
+def _tipo_batch(tipo):
+    """Clase de lote vectorizado de cada restricción escalar"""
+    from constraints.DistanceConstraintBatch import DistanceConstraintBatch
+    from constraints.VolumeConstraintTetBatch import VolumeConstraintTetBatch
+    from constraints.BendingConstraintBatch import BendingConstraintBatch
+    from constraints.ShearConstraintBatch import ShearConstraintBatch
+    return {
+        DistanceConstraint: DistanceConstraintBatch,
+        VolumeConstraintTet: VolumeConstraintTetBatch,
+        BendingConstraint: BendingConstraintBatch,
+        ShearConstraint: ShearConstraintBatch,
+    }[tipo]
+
+
+def crear_restricciones(system, tipo, indices, reposo, k, colores=None):
+    """
+    Añadir al sistema una restricción 'tipo' por fila de 'indices'
+    (DistanceConstraint, VolumeConstraintTet, BendingConstraint o ShearConstraint)
+    En modo arrays se crea directamente un único lote vectorizado (sin objetos
+    por restricción); en modo objetos, una restricción escalar por fila.
+    colores: color de cada fila ya calculado (opcional, solo modo arrays)
+
+    Returns:
+        El lote (modo arrays) o la lista de restricciones (modo objetos)
+    """
+    if len(indices) == 0:
+        return []
+    if system.store is not None:
+        if colores is not None:
+            colores = grupos_de_colores(colores)
+        lote = _tipo_batch(tipo)(system.store, indices, reposo, k, colores=colores)
+        system.add_constraint(lote)
+        return lote
+
+    particulas = system.particles
+    restricciones = []
+    for fila, valor in zip(np.asarray(indices).tolist(), np.asarray(reposo).tolist()):
+        c = tipo(*[particulas[i] for i in fila], valor, k)
+        restricciones.append(c)
+        system.add_constraint(c)
+    return restricciones
+
+
+def crear_grupo(system, tipo, datos, grupo, k):
+    """crear_restricciones con los arrays grupo_indices / grupo_reposo / grupo_colores de una topología"""
+    return crear_restricciones(system, tipo, datos[grupo + '_indices'], datos[grupo + '_reposo'], k,
+                               colores=datos.get(grupo + '_colores'))
+
+
+def colocar_particulas(system, posiciones):
+    """Posiciones iniciales (N,3): location = last_location, velocidad y fuerza a cero"""
+    if system.store is not None:
+        store = system.store
+        store.pos[:] = posiciones
+        store.prev[:] = posiciones
+        store.vel[:] = 0.0
+        store.force[:] = 0.0
+        return
+
+    from core.VectorBackend import mathutils
+    for p, xyz in zip(system.particles, np.asarray(posiciones, dtype=np.float64).tolist()):
+        p.location = mathutils.Vector(xyz)
+        p.last_location = mathutils.Vector(xyz)
+        p.velocity = mathutils.Vector((0.0, 0.0, 0.0))
+        p.force = mathutils.Vector((0.0, 0.0, 0.0))
+        p.acceleration = mathutils.Vector((0.0, 0.0, 0.0))
@@ -0,0 +1,8 @@
+"""
+Configuración de pytest: los módulos del motor (core, constraints, geometry...)
+se importan desde la carpeta Python/, igual que en Blender
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+"""
+Ida y vuelta de BakeCache en cada formato (float32 exacto, float16 y int16 con
+su error de cuantización)
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.BakeCache import BakeCache, BakeWriter, FORMATOS, guardar_bake
+
+
+def trayectoria(frames=5, n=37):
+    """Frames (F,N,3) con cajas distintas por frame"""
+    rng = np.random.default_rng(11)
+    pos = rng.uniform(-1.0, 1.0, size=(frames, n, 3)).astype(np.float32)
+    return pos * np.arange(1, frames + 1, dtype=np.float32)[:, None, None]
+
+
+def tolerancia(formato, frame):
+    if formato == 'float32':
+        return 0.0
+    if formato == 'float16':
+        return float(np.abs(frame).max()) * 1e-3
+    return float((frame.max(axis=0) - frame.min(axis=0)).max()) / 65534 * 1.01
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_ida_y_vuelta(tmp_path, formato):
+    pos = trayectoria()
+    ruta = str(tmp_path / f"bake_{formato}.pbdbake")
+    guardar_bake(ruta, pos, fps=30.0, formato=formato)
+    
+    bake = BakeCache(ruta)
+    try:
+        assert bake.formato == formato
+        assert len(bake) == len(pos)
+        assert bake.n == pos.shape[1]
+        assert bake.fps == 30.0
+        for i, esperado in enumerate(pos):
+            leido = bake.frame(i)
+            assert leido.dtype == np.float32 and leido.shape == esperado.shape
+            assert np.abs(leido - esperado).max() <= tolerancia(formato, esperado)
+        with pytest.raises(IndexError):
+            bake.frame(len(pos))
+    finally:
+        bake.close()
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_bake_cerrado_con_menos_frames(tmp_path, formato):
+    pos = trayectoria()
+    ruta = str(tmp_path / "parcial.pbdbake")
+    with BakeWriter(ruta, 10, pos.shape[1], formato=formato) as writer:
+        for frame in pos[:3]:
+            writer.write_frame(frame)
+    
+    bake = BakeCache(ruta)
+    try:
+        assert len(bake) == 3
+        assert np.abs(bake.frame(2) - pos[2]).max() <= tolerancia(formato, pos[2])
+    finally:
+        bake.close()
+
+
+def test_formato_desconocido(tmp_path):
+    with pytest.raises(ValueError):
+        BakeWriter(str(tmp_path / "x.pbdbake"), 1, 1, formato='float64')
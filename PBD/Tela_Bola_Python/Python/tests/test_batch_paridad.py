@@ -0,0 +1,92 @@
+"""
+Paridad entre los lotes vectorizados (modo arrays) y las restricciones escalares
+Dentro de un color las filas no comparten partícula, así que proyectar el lote
+equivale a proyectar las restricciones escalares una a una en el orden de los colores.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from constraints.BendingConstraint import BendingConstraint
+from constraints.DistanceConstraint import DistanceConstraint
+from constraints.ShearConstraint import ShearConstraint
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+from core.PBDSystem import PBDSystem
+from geometry.CuboVolumen import topologia_cubo
+from geometry.Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from geometry.TopologiaRejilla import colocar_particulas, crear_grupo
+
+
+N_ALTO, N_ANCHO = 6, 7
+
+
+def posiciones(system):
+    return np.array([[float(v) for v in p.location] for p in system.particles])
+
+
+def perturbar(system, escala=0.03):
+    """Las restricciones se crean en reposo: un ruido fijo las saca de él"""
+    rng = np.random.default_rng(7)
+    pos = posiciones(system)
+    colocar_particulas(system, pos + rng.normal(scale=escala, size=pos.shape))
+    system.set_n_iters(4)
+    return system
+
+
+def tela_perturbada(use_arrays, tipo):
+    """Tela pequeña con un solo tipo de restricción"""
+    tela = crea_tela(1.0, 1.2, 0.5, N_ALTO, N_ANCHO, 0.7, 0.01, use_arrays=use_arrays)
+    if tipo is not DistanceConstraint:
+        tela.constraints = []
+        tela.constraintsByType = {}
+    if tipo is BendingConstraint:
+        add_bending_constraints(tela, N_ALTO, N_ANCHO, 0.4)
+    elif tipo is ShearConstraint:
+        add_shear_constraints(tela, N_ALTO, N_ANCHO, 0.6)
+    return perturbar(tela)
+
+
+def cubo_perturbado(use_arrays):
+    """Cubo 4x4x4 solo con las restricciones de volumen por tetraedro"""
+    datos = topologia_cubo(1.0, 4)
+    system = PBDSystem(len(datos['posiciones']), 1.0, use_arrays=use_arrays)
+    colocar_particulas(system, datos['posiciones'])
+    crear_grupo(system, VolumeConstraintTet, datos, 'volumen', 0.8)
+    return perturbar(system)
+
+
+def comprobar_paridad(lote_sys, escalar_sys, tipo):
+    """Una pasada del lote frente a las escalares en el orden de sus colores"""
+    assert np.array_equal(posiciones(lote_sys), posiciones(escalar_sys))
+    
+    (lote,) = lote_sys.constraints
+    escalares = escalar_sys.constraintsByType[tipo]
+    assert len(lote) == len(escalares)
+    
+    # Mismas filas en el mismo orden
+    for fila, c in zip(lote.indices.tolist(), escalares):
+        assert fila == [escalar_sys.particles.index(p) for p in c.particles]
+    
+    inicio = posiciones(lote_sys)
+    lote.proyecta_restriccion()
+    for color in lote.colores:
+        for fila in color.tolist():
+            escalares[fila].proyecta_restriccion()
+    
+    assert np.abs(posiciones(lote_sys) - inicio).max() > 1e-4
+    np.testing.assert_allclose(posiciones(lote_sys), posiciones(escalar_sys), rtol=0, atol=1e-10)
+    np.testing.assert_allclose(lote.C, [c.C for c in escalares], rtol=0, atol=1e-10)
+
+
+def test_distancia():
+    comprobar_paridad(tela_perturbada(True, DistanceConstraint), tela_perturbada(False, DistanceConstraint),
+                      DistanceConstraint)
+
+
+def test_volumen_tetraedros():
+    comprobar_paridad(cubo_perturbado(True), cubo_perturbado(False), VolumeConstraintTet)
+
+
+@pytest.mark.parametrize("tipo", [ShearConstraint, BendingConstraint])
+def test_shear_y_bending(tipo):
+    comprobar_paridad(tela_perturbada(True, tipo), tela_perturbada(False, tipo), tipo)
@@ -0,0 +1,82 @@
+"""
+BVH frente a las referencias de fuerza bruta: todos los pares de cajas y el
+punto más cercano de cada triángulo por minimización directa
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.BVH import BVH, punto_triangulo_cercano
+
+
+def malla_aleatoria(semilla, num_tris=300):
+    rng = np.random.default_rng(semilla)
+    centros = rng.uniform(-1.0, 1.0, size=(num_tris, 1, 3))
+    vertices = (centros + rng.normal(scale=0.08, size=(num_tris, 3, 3))).reshape(-1, 3)
+    return vertices, np.arange(len(vertices)).reshape(-1, 3)
+
+
+@pytest.mark.parametrize("semilla,hoja_max", [(0, 1), (1, 4), (2, 16)])
+def test_query_aabbs_igual_a_todos_los_pares(semilla, hoja_max):
+    vertices, tris = malla_aleatoria(semilla)
+    bvh = BVH(vertices, tris, hoja_max=hoja_max)
+    
+    rng = np.random.default_rng(50 + semilla)
+    lo = rng.uniform(-1.2, 1.0, size=(200, 3))
+    hi = lo + rng.uniform(0.0, 0.3, size=(200, 3))
+    q, t = bvh.query_aabbs(lo, hi)
+    
+    tri = vertices[tris]
+    t_lo, t_hi = tri.min(axis=1), tri.max(axis=1)
+    solapa = ((lo[:, None, :] <= t_hi[None]) & (hi[:, None, :] >= t_lo[None])).all(axis=2)
+    esperado = sorted(zip(*(a.tolist() for a in np.nonzero(solapa))))
+    assert sorted(zip(q.tolist(), t.tolist())) == esperado
+
+
+def test_query_aabbs_vacio():
+    vertices, tris = malla_aleatoria(3, num_tris=10)
+    q, t = BVH(vertices, tris).query_aabbs(np.zeros((0, 3)), np.zeros((0, 3)))
+    assert len(q) == len(t) == 0
+
+
+def cercano_referencia(p, a, b, c):
+    """Proyección en el plano si cae dentro; si no, el más cercano de las tres aristas"""
+    n = np.cross(b - a, c - a)
+    proy = p - n * ((p - a) @ n) / (n @ n)
+    dentro = all(np.cross(v1 - v0, proy - v0) @ n >= 0 for v0, v1 in ((a, b), (b, c), (c, a)))
+    if dentro:
+        return proy
+    candidatos = []
+    for v0, v1 in ((a, b), (b, c), (c, a)):
+        e = v1 - v0
+        t = np.clip((p - v0) @ e / (e @ e), 0.0, 1.0)
+        candidatos.append(v0 + t * e)
+    return min(candidatos, key=lambda x: np.linalg.norm(p - x))
+
+
+# Punto de cada región de Voronoi del triángulo (0,0,0), (1,0,0), (0,1,0) y su punto más cercano
+REGIONES = {
+    'vertice_a': ((-1.0, -0.5, 0.3), (0.0, 0.0, 0.0)),
+    'vertice_b': ((2.0, -0.5, -0.2), (1.0, 0.0, 0.0)),
+    'vertice_c': ((-0.3, 2.0, 0.5), (0.0, 1.0, 0.0)),
+    'arista_ab': ((0.4, -1.0, 0.2), (0.4, 0.0, 0.0)),
+    'arista_ac': ((-1.0, 0.3, -0.4), (0.0, 0.3, 0.0)),
+    'arista_bc': ((1.0, 1.0, 0.1), (0.5, 0.5, 0.0)),
+    'cara': ((0.2, 0.3, -0.7), (0.2, 0.3, 0.0)),
+}
+
+
+@pytest.mark.parametrize("region", sorted(REGIONES))
+def test_punto_triangulo_cercano_por_region(region):
+    p, esperado = REGIONES[region]
+    a, b, c = (np.array([v], dtype=np.float64) for v in ((0, 0, 0), (1, 0, 0), (0, 1, 0)))
+    cercano = punto_triangulo_cercano(np.array([p], dtype=np.float64), a, b, c)
+    np.testing.assert_allclose(cercano[0], esperado, atol=1e-12)
+
+
+def test_punto_triangulo_cercano_aleatorio():
+    rng = np.random.default_rng(9)
+    p, a, b, c = (rng.normal(size=(2000, 3)) for _ in range(4))
+    cercano = punto_triangulo_cercano(p, a, b, c)
+    esperado = np.array([cercano_referencia(*fila) for fila in zip(p, a, b, c)])
+    np.testing.assert_allclose(cercano, esperado, atol=1e-9)
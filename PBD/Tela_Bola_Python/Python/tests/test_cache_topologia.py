@@ -0,0 +1,77 @@
+"""
+CacheTopologia: un acierto devuelve la misma topología que el fallo que la
+guardó, y los sistemas creados con y sin caché son idénticos
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from geometry.CacheTopologia import CacheTopologia, obtener_topologia
+from geometry.CuboVolumen import crear_cubo_volumen, topologia_cubo
+from geometry.SphereVolume import crear_esfera_volumen
+
+
+def test_fallo_y_acierto(tmp_path):
+    cache = CacheTopologia(str(tmp_path))
+    parametros = {'lado': 1.0, 'subdivisiones': 4}
+    construidas = []
+    
+    def construir():
+        construidas.append(1)
+        return topologia_cubo(1.0, 4)
+    
+    primera = cache.obtener('cubo', parametros, construir)
+    segunda = cache.obtener('cubo', parametros, construir)
+    assert (cache.fallos, cache.aciertos, len(construidas)) == (1, 1, 1)
+    assert sorted(primera) == sorted(segunda)
+    for k in primera:
+        assert np.array_equal(primera[k], segunda[k]), k
+    
+    # Otros parámetros geométricos: otra entrada
+    cache.obtener('cubo', {'lado': 2.0, 'subdivisiones': 4}, lambda: topologia_cubo(2.0, 4))
+    assert cache.fallos == 2
+
+
+def test_colorear_tras_acierto_sin_colores(tmp_path):
+    cache = CacheTopologia(str(tmp_path))
+    parametros = {'lado': 1.0, 'subdivisiones': 3}
+    cache.obtener('cubo', parametros, lambda: topologia_cubo(1.0, 3))
+    datos = cache.obtener('cubo', parametros, lambda: topologia_cubo(1.0, 3), colorear=True)
+    assert 'volumen_colores' in datos
+    
+    # Los colores añadidos se guardaron con la topología
+    datos = obtener_topologia(str(tmp_path), 'cubo', parametros, lambda: pytest.fail("no debía construir"))
+    assert len(datos['volumen_colores']) == len(datos['volumen_indices'])
+
+
+def lotes(system):
+    """(tipo, indices, reposo, colores) de cada lote del sistema, en orden"""
+    resultado = []
+    for c in system.constraints:
+        reposo = next(getattr(c, a) for a in ('d', 'V0', 'phi0', 'psi0') if hasattr(c, a))
+        resultado.append((type(c).__name__, c.indices, reposo, c.colores))
+    return resultado
+
+
+@pytest.mark.parametrize("crear", [
+    lambda cache: crear_cubo_volumen(1.0, 1000.0, 0.5, subdivisiones=4, use_arrays=True, cache=cache)[0],
+    lambda cache: crear_esfera_volumen(1.0, 1000.0, 0.5, subdivisiones=5, use_arrays=True, cache=cache)[0],
+], ids=['cubo', 'esfera'])
+def test_sistema_con_y_sin_cache(tmp_path, crear):
+    cache = CacheTopologia(str(tmp_path))
+    sin_cache = crear(None)
+    fallo = crear(cache)
+    acierto = crear(cache)
+    assert (cache.fallos, cache.aciertos) == (1, 1)
+    
+    esperado = lotes(sin_cache)
+    for system in (fallo, acierto):
+        assert np.array_equal(system.store.pos, sin_cache.store.pos)
+        obtenido = lotes(system)
+        assert [l[0] for l in obtenido] == [l[0] for l in esperado]
+        for (_, ind, rep, col), (_, ind0, rep0, col0) in zip(obtenido, esperado):
+            assert np.array_equal(ind, ind0)
+            assert np.array_equal(rep, rep0)
+            assert len(col) == len(col0)
+            for a, b in zip(col, col0):
+                assert np.array_equal(np.sort(a), np.sort(b))
@@ -0,0 +1,61 @@
+"""
+Validez del coloreado de ConstraintScheduler: cada restricción recibe un color
+y dos restricciones del mismo color nunca comparten partícula
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.ConstraintScheduler import colorear, colorear_indices, colores_por_fila, grupos_de_colores
+from geometry.CuboVolumen import topologia_cubo
+from geometry.SphereVolume import topologia_esfera
+
+
+def conjuntos_de_prueba():
+    cubo = topologia_cubo(1.0, 5)
+    esfera = topologia_esfera(1.0, 6)
+    rng = np.random.default_rng(3)
+    return {
+        'aristas_cubo': (cubo['distancia_indices'], len(cubo['posiciones'])),
+        'tetraedros_cubo': (cubo['volumen_indices'], len(cubo['posiciones'])),
+        'tetraedros_esfera': (esfera['volumen_indices'], len(esfera['posiciones'])),
+        'bending_esfera': (esfera['bending_indices'], len(esfera['posiciones'])),
+        'aleatorio': (rng.integers(0, 40, size=(300, 3)), 40),
+    }
+
+
+CONJUNTOS = conjuntos_de_prueba()
+
+
+def comprobar_colores(conjuntos, colores):
+    assert len(colores) == len(conjuntos)
+    assert min(colores) >= 0
+    for color in set(colores):
+        particulas = [idx for fila, c in zip(conjuntos, colores) if c == color for idx in set(fila)]
+        assert len(particulas) == len(set(particulas)), f"color {color} comparte partículas"
+
+
+@pytest.mark.parametrize("metodo", ['greedy', 'dsatur'])
+@pytest.mark.parametrize("nombre", sorted(CONJUNTOS))
+def test_coloreado_valido(metodo, nombre):
+    indices, n = CONJUNTOS[nombre]
+    conjuntos = indices.tolist()
+    comprobar_colores(conjuntos, colorear(conjuntos, n, metodo))
+
+
+@pytest.mark.parametrize("metodo", ['greedy', 'dsatur'])
+def test_grupos_cubren_cada_fila_una_vez(metodo):
+    indices, n = CONJUNTOS['tetraedros_esfera']
+    grupos = colorear_indices(indices, n, metodo)
+    filas = np.concatenate(grupos)
+    assert np.array_equal(np.sort(filas), np.arange(len(indices)))
+    
+    # colores_por_fila y grupos_de_colores son inversos
+    color = colores_por_fila(grupos, len(indices))
+    for a, b in zip(grupos, grupos_de_colores(color)):
+        assert np.array_equal(np.sort(a), b)
+
+
+def test_metodo_desconocido():
+    with pytest.raises(ValueError):
+        colorear([(0, 1)], 2, 'aleatorio')
@@ -0,0 +1,57 @@
+"""
+DeltaBuffer frente a un bucle partícula a partícula (índices repetidos incluidos)
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.DeltaBuffer import DeltaBuffer
+
+
+def media_referencia(n, indices, correcciones):
+    """Suma y número de correcciones por partícula con un bucle"""
+    suma = np.zeros((n, 3))
+    cuenta = np.zeros(n)
+    for i, c in zip(indices.tolist(), correcciones):
+        suma[i] += c
+        cuenta[i] += 1
+    return suma, cuenta
+
+
+@pytest.mark.parametrize("semilla", [0, 1])
+@pytest.mark.parametrize("omega", [1.0, 1.5])
+def test_add_y_apply_con_indices_repetidos(semilla, omega):
+    n = 50
+    rng = np.random.default_rng(semilla)
+    indices = rng.integers(0, n - 10, size=400)  # Las 10 últimas no reciben correcciones
+    correcciones = rng.normal(size=(400, 3))
+    bloqueada = np.zeros(n, dtype=bool)
+    bloqueada[::7] = True
+    
+    buffer = DeltaBuffer(n)
+    # En dos trozos: la acumulación es una suma
+    buffer.add(indices[:150], correcciones[:150])
+    buffer.add(indices[150:], correcciones[150:])
+    
+    suma, cuenta = media_referencia(n, indices, correcciones)
+    np.testing.assert_allclose(buffer.delta, suma, atol=1e-12)
+    np.testing.assert_array_equal(buffer.count, cuenta)
+    
+    pos = rng.normal(size=(n, 3))
+    esperado = pos.copy()
+    for i in range(n):
+        if cuenta[i] > 0 and not bloqueada[i]:
+            esperado[i] += omega * suma[i] / cuenta[i]
+    corregidas = buffer.apply(pos, omega, bloqueada)
+    assert corregidas == int(((cuenta > 0) & ~bloqueada).sum())
+    np.testing.assert_allclose(pos, esperado, atol=1e-12)
+
+
+def test_clear_y_vacio():
+    buffer = DeltaBuffer(4)
+    buffer.add(np.array([1, 1]), np.ones((2, 3)))
+    buffer.clear()
+    buffer.add(*DeltaBuffer.vacio())
+    pos = np.zeros((4, 3))
+    assert buffer.apply(pos) == 0
+    assert not pos.any()
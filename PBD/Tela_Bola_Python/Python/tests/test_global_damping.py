@@ -0,0 +1,86 @@
+"""
+amortiguar_global frente a PBDSystem.applyGlobalDampingScalar (bucle con mathutils)
+"""
+import contextlib
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.GlobalDamping import amortiguar_global
+from core.PBDSystem import PBDSystem
+from core.VectorBackend import mathutils
+
+
+def sistema_aleatorio(semilla, n=40, fijas=()):
+    rng = np.random.default_rng(semilla)
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = PBDSystem(n, 1.0)
+    for p, x, v, m in zip(system.particles, rng.normal(size=(n, 3)), rng.normal(size=(n, 3)),
+                          rng.uniform(0.5, 2.0, size=n)):
+        p.location = mathutils.Vector(x)
+        p.velocity = mathutils.Vector(v)
+        p.masa = float(m)
+        p.w = 1.0 / p.masa
+    for i in fijas:
+        system.particles[i].set_bloqueada(True)
+    return system
+
+
+def arrays(system):
+    pos = np.array([tuple(p.location) for p in system.particles])
+    vel = np.array([tuple(p.velocity) for p in system.particles])
+    masa = np.array([p.masa for p in system.particles])
+    bloqueada = np.array([p.bloqueada for p in system.particles])
+    return pos, vel, masa, bloqueada
+
+
+@pytest.mark.parametrize("semilla,fijas", [(0, ()), (1, (0, 5)), (2, (3,))])
+@pytest.mark.parametrize("k", [0.1, 1.0])
+def test_igual_al_escalar(semilla, fijas, k):
+    system = sistema_aleatorio(semilla, fijas=fijas)
+    pos, vel, masa, bloqueada = arrays(system)
+    
+    system.applyGlobalDampingScalar(k)
+    esperado = arrays(system)[1]
+    
+    amortiguadas = amortiguar_global(pos, vel, masa, k, bloqueada)
+    assert amortiguadas == len(pos) - len(fijas)
+    np.testing.assert_allclose(vel, esperado, rtol=0, atol=1e-10)
+
+
+def test_movimiento_rigido_intacto():
+    # v = v0 + ω × x no tiene parte no rígida: k = 1 no la cambia
+    system = sistema_aleatorio(4)
+    pos, _, masa, _ = arrays(system)
+    vel = np.array([0.3, -0.1, 0.2]) + np.cross([0.5, 1.0, -2.0], pos)
+    esperado = vel.copy()
+    amortiguar_global(pos, vel, masa, 1.0)
+    np.testing.assert_allclose(vel, esperado, atol=1e-10)
+
+
+def test_por_cuerpo_igual_a_cada_cuerpo_por_separado():
+    system = sistema_aleatorio(5, n=60)
+    pos, vel, masa, _ = arrays(system)
+    cuerpos = np.repeat([0, 1, -1], 20)
+    
+    por_cuerpo = vel.copy()
+    amortiguar_global(pos, por_cuerpo, masa, 0.3, cuerpos=cuerpos)
+    
+    separado = vel.copy()
+    for b in (0, 1):
+        sel = cuerpos == b
+        v = vel[sel].copy()
+        amortiguar_global(pos[sel], v, masa[sel], 0.3)
+        separado[sel] = v
+    np.testing.assert_allclose(por_cuerpo, separado, atol=1e-12)
+
+
+def test_particulas_alineadas():
+    # Tensor de inercia singular: la pseudo-inversa sigue amortiguando la parte no rígida
+    pos = np.stack([np.linspace(0, 1, 10), np.zeros(10), np.zeros(10)], axis=1)
+    vel = np.zeros((10, 3))
+    vel[:, 0] = np.linspace(-1, 1, 10)  # Estiramiento: no es rígido
+    amortiguar_global(pos, vel, np.ones(10), 1.0)
+    np.testing.assert_allclose(vel, 0.0, atol=1e-12)
@@ -0,0 +1,154 @@
+"""
+Modo objetos con un Vector estricto como el de Blender: mathutils.Vector solo
+opera con otros Vector (sumar una lista o una tupla lanza TypeError), mientras
+que el Vector de Python puro de VectorBackend acepta cualquier secuencia de 3.
+"""
+import contextlib
+import io
+import numbers
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.VectorBackend import Vector, mathutils
+from constraints.Colliders import (BoxCollider, CapsuleCollider, MeshCollider, PlaneCollider,
+                                   StaticSphereCollider)
+from constraints.SelfCollision import SelfCollider
+from constraints.ShapeMatching import ShapeMatching
+from constraints.SphereCollision import SphereCollider
+from geometry.CuboVolumen import crear_cubo_volumen
+from geometry.Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from geometry.TopologiaRejilla import colocar_particulas
+
+
+N = 8
+
+
+def _solo_vector(op):
+    def estricta(self, other):
+        if not isinstance(other, Vector):
+            raise TypeError(f"Vector {op.__name__}: operando {type(other).__name__} no es Vector")
+        return op(self, other)
+    return estricta
+
+
+def _solo_vector_o_escalar(op):
+    def estricta(self, other):
+        if not isinstance(other, (Vector, numbers.Real)):
+            raise TypeError(f"Vector {op.__name__}: operando {type(other).__name__} no válido")
+        return op(self, other)
+    return estricta
+
+
+@pytest.fixture
+def vector_estricto(monkeypatch):
+    """Vector de VectorBackend con las reglas de operandos de mathutils"""
+    for nombre in ('__add__', '__radd__', '__sub__', '__rsub__', '__iadd__', '__isub__', 'dot', 'cross'):
+        monkeypatch.setattr(Vector, nombre, _solo_vector(getattr(Vector, nombre)))
+    for nombre in ('__mul__', '__rmul__', '__imul__'):
+        monkeypatch.setattr(Vector, nombre, _solo_vector_o_escalar(getattr(Vector, nombre)))
+
+
+def test_vector_estricto_rechaza_listas(vector_estricto):
+    v = Vector((1.0, 2.0, 3.0))
+    with pytest.raises(TypeError):
+        v += [1.0, 0.0, 0.0]
+    assert v + Vector((1.0, 0.0, 0.0)) == (2.0, 2.0, 3.0)
+
+
+def posiciones(system):
+    return np.array([tuple(p.location) for p in system.particles])
+
+
+def pasos(system, n=3):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(n):
+            system.run(1 / 60, use_sphere_col=False)
+    return posiciones(system)
+
+
+def tela_doblada(use_arrays):
+    """Tela N x N con la mitad superior doblada encima de la inferior (a 2 mm)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tela = crea_tela(1.0, 1.0, 0.5, N, N, 0.9, 0.01, use_arrays=use_arrays)
+    pos = posiciones(tela)
+    arriba = pos[:, 1] > 0.5
+    pos[arriba, 1] = 1.0 - pos[arriba, 1]
+    pos[arriba, 2] = 0.002
+    colocar_particulas(tela, pos)
+    tela.set_self_collider(SelfCollider(tela, 0.01))
+    return tela
+
+
+def test_auto_colision(vector_estricto):
+    objetos, arrays = tela_doblada(False), tela_doblada(True)
+    inicio = posiciones(objetos)
+    for tela in (objetos, arrays):
+        tela.selfCollider.rebuild()
+        tela.selfCollider.project()
+        assert tela.selfCollider.num_contactos > 0
+    assert np.abs(posiciones(objetos) - inicio).max() > 1e-4
+    np.testing.assert_allclose(posiciones(objetos), posiciones(arrays), rtol=0, atol=1e-12)
+    
+    # Y en pasos completos (el orden de proyección de los lotes es otro: sin paridad exacta)
+    assert np.isfinite(pasos(objetos)).all()
+
+
+COLISIONADORES = {
+    'plano': lambda: PlaneCollider((0.0, 0.0, 0.01), (0.0, 0.0, 1.0)),
+    'esfera': lambda: StaticSphereCollider((0.0, 0.5, 0.05), 0.2),
+    'capsula': lambda: CapsuleCollider((-0.3, 0.5, 0.02), (0.3, 0.5, 0.02), 0.1),
+    'caja': lambda: BoxCollider((0.0, 0.5, 0.0), (0.2, 0.2, 0.05)),
+    'malla': lambda: MeshCollider([(-1.0, -1.0, 0.005), (1.0, -1.0, 0.005), (1.0, 2.0, 0.005), (-1.0, 2.0, 0.005)],
+                                  [(0, 1, 2), (0, 2, 3)], thickness=0.01),
+}
+
+
+def tela_con_colisionador(use_arrays, nombre):
+    with contextlib.redirect_stdout(io.StringIO()):
+        tela = crea_tela(1.0, 1.0, 0.5, N, N, 0.9, 0.01, use_arrays=use_arrays)
+    tela.add_collider(COLISIONADORES[nombre]())
+    return tela
+
+
+@pytest.mark.parametrize("nombre", sorted(COLISIONADORES))
+def test_colisionadores(vector_estricto, nombre):
+    objetos, arrays = tela_con_colisionador(False, nombre), tela_con_colisionador(True, nombre)
+    inicio = posiciones(objetos)
+    for tela in (objetos, arrays):
+        tela.colliders.rebuild()
+        tela.colliders.project()
+        assert tela.colliders.num_contactos > 0
+    assert np.abs(posiciones(objetos) - inicio).max() > 1e-4
+    np.testing.assert_allclose(posiciones(objetos), posiciones(arrays), rtol=0, atol=1e-12)
+    assert np.isfinite(pasos(objetos)).all()
+
+
+def cubo_blando():
+    system = crear_cubo_volumen(1.0, 100.0, 0.5, stiffness_global=0.5, subdivisiones=3)[0]
+    system.set_shape_matching(ShapeMatching(system, stiffness=0.5))
+    return system
+
+
+def tela_sobre_esfera():
+    tela = crea_tela(1.0, 1.0, 0.5, 6, 6, 0.9, 0.01)
+    add_bending_constraints(tela, 6, 6, 0.3)
+    add_shear_constraints(tela, 6, 6, 0.5)
+    tela.set_sphere_collider(SphereCollider(mathutils.Vector((0.0, 0.5, -0.2)), 0.3))
+    return tela
+
+
+@pytest.mark.parametrize("modo", ['pbd', 'xpbd'])
+@pytest.mark.parametrize("crear", [cubo_blando, tela_sobre_esfera], ids=['cubo', 'tela'])
+def test_pasos_completos(vector_estricto, modo, crear):
+    """Todas las restricciones, el damping y el suelo, en release y en debug"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = crear()
+        system.set_solver_mode(modo, substeps=2 if modo == 'xpbd' else None)
+        for frame in range(6):
+            system.debug = frame == 5
+            for p in system.particles:
+                p.force = mathutils.Vector((0.0, 0.0, -9.81 * p.masa))
+            system.run(1 / 60, floor_height=-0.01, debug_frame=frame)
+    assert np.isfinite(posiciones(system)).all()
@@ -0,0 +1,88 @@
+"""
+SpatialHash frente a recorridos O(n) / O(n²) de todas las partículas
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.SpatialHash import SpatialHash
+
+
+def nube(n, semilla, escala=1.0):
+    """Partículas en una caja, con algunas repetidas (distancia 0)"""
+    rng = np.random.default_rng(semilla)
+    pos = rng.uniform(-escala, escala, size=(n, 3))
+    pos[n // 2:n // 2 + 5] = pos[0]
+    return pos
+
+
+@pytest.mark.parametrize("semilla", [0, 1, 2])
+def test_query_sphere_contiene_a_las_cercanas(semilla):
+    pos = nube(500, semilla)
+    rng = np.random.default_rng(100 + semilla)
+    grid = SpatialHash(0.2)
+    grid.build(pos)
+    for centro, radio in zip(rng.uniform(-1.2, 1.2, size=(40, 3)), rng.uniform(0.05, 0.5, size=40)):
+        candidatos = grid.query_sphere(tuple(centro), radio)
+        assert candidatos == sorted(set(candidatos))
+        dentro = np.flatnonzero(np.linalg.norm(pos - centro, axis=1) <= radio)
+        assert set(dentro.tolist()) <= set(candidatos)
+
+
+def test_query_aabb_contiene_a_las_de_la_caja():
+    pos = nube(400, 5)
+    grid = SpatialHash(0.3)
+    grid.build(pos)
+    lo, hi = np.array([-0.4, -0.1, 0.0]), np.array([0.5, 0.7, 0.35])
+    dentro = np.flatnonzero(((pos >= lo) & (pos <= hi)).all(axis=1))
+    assert set(dentro.tolist()) <= set(grid.query_aabb(lo, hi))
+
+
+def test_vacio():
+    grid = SpatialHash(0.1)
+    grid.build(np.zeros((0, 3)))
+    assert grid.query_sphere((0.0, 0.0, 0.0), 1.0) == []
+
+
+def pares_fuerza_bruta(pos, radio):
+    """Pares (i, j), i < j, con |pi - pj|² < radio² (mismo criterio que query_pairs)"""
+    d = pos[:, None, :] - pos[None, :, :]
+    cerca = np.einsum('ijk,ijk->ij', d, d) < radio * radio
+    i, j = np.nonzero(np.triu(cerca, k=1))
+    return list(zip(i.tolist(), j.tolist()))
+
+
+@pytest.mark.parametrize("semilla,radio,celda", [(0, 0.1, 0.1), (1, 0.15, 0.2), (2, 0.05, 0.3), (3, 0.3, 0.3)])
+def test_query_pairs_igual_a_fuerza_bruta(semilla, radio, celda):
+    pos = nube(600, semilla)
+    grid = SpatialHash(celda)
+    grid.build(pos)
+    i, j = grid.query_pairs(radio)
+    assert list(zip(i.tolist(), j.tolist())) == pares_fuerza_bruta(pos, radio)
+
+
+def test_query_pairs_tela_plana():
+    # Rejilla regular: muchas distancias exactamente en el límite de las celdas
+    x, y = np.meshgrid(np.linspace(0, 1, 25), np.linspace(0, 1, 25))
+    pos = np.stack([x.ravel(), y.ravel(), np.zeros(x.size)], axis=1)
+    grid = SpatialHash(0.05)
+    grid.build(pos)
+    i, j = grid.query_pairs(0.05)
+    assert list(zip(i.tolist(), j.tolist())) == pares_fuerza_bruta(pos, 0.05)
+
+
+def test_query_pairs_dispersas_usa_la_tabla_hash():
+    # Coordenadas enormes: la clave de barrido perdería precisión
+    pos = nube(300, 4, escala=0.5)
+    pos[0] = (1e12, 0.0, 0.0)
+    grid = SpatialHash(0.1)
+    grid.build(pos)
+    i, j = grid.query_pairs(0.1)
+    assert list(zip(i.tolist(), j.tolist())) == pares_fuerza_bruta(pos, 0.1)
+
+
+def test_query_pairs_radio_mayor_que_la_celda():
+    grid = SpatialHash(0.1)
+    grid.build(nube(10, 0))
+    with pytest.raises(ValueError):
+        grid.query_pairs(0.2)
@@ -0,0 +1,98 @@
+"""
+SphereSurfaceExtractor: las caras externas de un mesh tetraédrico salen
+orientadas hacia fuera (lejos del cuarto vértice de su tetraedro)
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from geometry.CuboVolumen import topologia_cubo
+from core.VectorBackend import mathutils
+from geometry.SphereSurfaceExtractor import CARAS_TETRAEDRO, caras_superficie, extraer_superficie_tetraedros
+from geometry.SphereVolume import topologia_esfera
+
+
+def superficie_referencia(tetraedros, posiciones):
+    """Caras externas contando cada cara (por sus índices ordenados) con un diccionario"""
+    posiciones = [mathutils.Vector(p) for p in posiciones]
+    caras_contador = {}
+    for v0, v1, v2, v3 in tetraedros:
+        p0 = posiciones[v0]
+        if (posiciones[v1] - p0).cross(posiciones[v2] - p0).dot(posiciones[v3] - p0) < 0:
+            v2, v3 = v3, v2
+        tetra = (v0, v1, v2, v3)
+        for a, b, c in CARAS_TETRAEDRO:
+            cara = (tetra[a], tetra[b], tetra[c])
+            caras_contador.setdefault(tuple(sorted(cara)), [cara, 0])[1] += 1
+    return [cara for cara, cuenta in caras_contador.values() if cuenta == 1]
+
+
+def volumenes(pos, tets):
+    p = pos[tets]
+    return np.einsum('ij,ij->i', np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0]), p[:, 3] - p[:, 0]) / 6.0
+
+
+def volumen_encerrado(pos, triangulos):
+    """Volumen con signo (teorema de la divergencia): positivo si las normales salen"""
+    a, b, c = (pos[triangulos[:, k]] for k in range(3))
+    return np.einsum('ij,ij->i', a, np.cross(b, c)).sum() / 6.0
+
+
+def normales(pos, triangulos):
+    a, b, c = (pos[triangulos[:, k]] for k in range(3))
+    return np.cross(b - a, c - a)
+
+
+def opuestos(tets, triangulos):
+    """Cuarto vértice del tetraedro de cada triángulo"""
+    cuarto = {}
+    for tet in tets.tolist():
+        for k in range(4):
+            cuarto[tuple(sorted(tet[:k] + tet[k + 1:]))] = tet[k]
+    return np.array([cuarto[tuple(sorted(t))] for t in triangulos.tolist()])
+
+
+_CUBO = topologia_cubo(1.0, 4)
+_ESFERA = topologia_esfera(1.0, 6)
+# (posiciones, tetraedros) de cada mesh
+TOPOLOGIAS = {
+    'cubo': (_CUBO['posiciones'], _CUBO['volumen_indices']),
+    'esfera': (_ESFERA['posiciones'], _ESFERA['tetraedros']),
+}
+
+
+@pytest.mark.parametrize("invertir", [False, True], ids=['positivos', 'invertidos'])
+@pytest.mark.parametrize("nombre", sorted(TOPOLOGIAS))
+def test_normales_hacia_fuera(nombre, invertir):
+    pos, tets = TOPOLOGIAS[nombre]
+    if invertir:
+        # Los tetraedros con volumen negativo se reorientan antes de sacar sus caras
+        tets = tets[:, [0, 1, 3, 2]]
+    tris = caras_superficie(tets, pos)
+    assert len(tris) > 0
+    
+    # Cada cara se aleja del cuarto vértice de su tetraedro
+    lejos = pos[opuestos(tets, tris)] - pos[tris[:, 0]]
+    assert (np.einsum('ij,ij->i', normales(pos, tris), lejos) < 0).all()
+    
+    # Las caras externas encierran exactamente el volumen de los tetraedros
+    assert volumen_encerrado(pos, tris) == pytest.approx(np.abs(volumenes(pos, tets)).sum(), rel=1e-9)
+
+
+def test_caras_de_la_caja_del_cubo():
+    pos, tets = TOPOLOGIAS['cubo']
+    tris = caras_superficie(tets, pos)
+    n = normales(pos, tris)
+    for eje in range(3):
+        for extremo in (-0.5, 0.5):
+            en_cara = np.isclose(pos[tris][:, :, eje], extremo).all(axis=1)
+            assert en_cara.any()
+            assert (np.sign(n[en_cara, eje]) == np.sign(extremo)).all()
+
+
+@pytest.mark.parametrize("nombre", sorted(TOPOLOGIAS))
+def test_igual_a_referencia(nombre):
+    pos, tets = TOPOLOGIAS[nombre]
+    vectorizado = extraer_superficie_tetraedros(tets, pos)
+    referencia = superficie_referencia(tets.tolist(), pos.tolist())
+    assert sorted(map(tuple, vectorizado)) == sorted(map(tuple, referencia))
@@ -0,0 +1,147 @@
+"""
+Topología NumPy de la tela, el cubo y la esfera frente a los bucles
+originales: mismas partículas, mismos índices en el mismo orden y mismos
+valores de reposo
+"""
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.VectorBackend import mathutils
+from geometry.Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from geometry.CuboVolumen import (topologia_cubo, calcular_volumen_tetraedro, generar_vertices_cubo_subdividido,
+                                  generar_tetraedros_cubo_subdividido)
+from geometry.SphereVolume import (topologia_esfera, generar_particulas_esfera, generar_tetraedros_esfera,
+                                   generar_aristas_esfera)
+
+
+def indices_y_reposo(system, tipo, reposo):
+    """(índices, valores de reposo) de las restricciones de un tipo en modo objetos"""
+    indice = {id(p): i for i, p in enumerate(system.particles)}
+    cs = [c for c in system.constraints if type(c).__name__ == tipo]
+    return [tuple(indice[id(p)] for p in c.particles) for c in cs], [getattr(c, reposo) for c in cs]
+
+
+# ===== Oráculos: los bucles de los generadores escalares =====
+
+def tela_referencia(n_alto, n_ancho, dx, dy):
+    """Aristas de la tela: con la partícula anterior en i (horizontal) y en j (vertical)"""
+    aristas, dists = [], []
+    for i in range(n_ancho):
+        for j in range(n_alto):
+            idx = i * n_alto + j
+            if i > 0:
+                aristas.append((idx, idx - n_alto))
+                dists.append(dx)
+            if j > 0:
+                aristas.append((idx, idx - 1))
+                dists.append(dy)
+    return aristas, dists
+
+
+def bending_referencia(pos, n_alto, n_ancho):
+    """Quads horizontales (arista p1-p3) y luego verticales (arista p1-p2) con su phi0"""
+    def phi0(p1, p2, p3, p4):
+        e1, e2, e3 = pos[p2] - pos[p1], pos[p3] - pos[p1], pos[p4] - pos[p1]
+        n1, n2 = e1.cross(e2), e1.cross(e3)
+        if n1.length < 0.0001 or n2.length < 0.0001:
+            return 0
+        return math.acos(max(-1.0, min(1.0, n1.normalized().dot(n2.normalized()))))
+
+    quads = []
+    for orden in ((0, 2, 1, 3), (0, 1, 2, 3)):
+        for i in range(n_ancho - 1):
+            for j in range(n_alto - 1):
+                q = (i * n_alto + j, i * n_alto + j + 1, (i + 1) * n_alto + j, (i + 1) * n_alto + j + 1)
+                quads.append(tuple(q[k] for k in orden))
+    return quads, [phi0(*q) for q in quads]
+
+
+def shear_referencia(pos, n_alto, n_ancho):
+    """4 ternas por quad: ángulo en p00, p10 y p01 (triángulo inferior) y en p11"""
+    def psi0(p0, p1, p2):
+        v1, v2 = pos[p1] - pos[p0], pos[p2] - pos[p0]
+        if v1.length < 0.0001 or v2.length < 0.0001:
+            return math.pi / 2
+        return math.acos(max(-1.0, min(1.0, v1.normalized().dot(v2.normalized()))))
+
+    ternas = []
+    for i in range(n_ancho - 1):
+        for j in range(n_alto - 1):
+            p00, p01 = i * n_alto + j, i * n_alto + j + 1
+            p10, p11 = (i + 1) * n_alto + j, (i + 1) * n_alto + j + 1
+            ternas += [(p00, p10, p01), (p10, p00, p11), (p01, p00, p11), (p11, p10, p01)]
+    return ternas, [psi0(*t) for t in ternas]
+
+
+def aristas_cubo_referencia(pos, s):
+    """Aristas X, Y y Z de cada vértice en orden z, y, x"""
+    aristas, dists = [], []
+    for z in range(s):
+        for y in range(s):
+            for x in range(s):
+                idx = z * s * s + y * s + x
+                for avanza, vecino in ((x < s - 1, idx + 1), (y < s - 1, idx + s), (z < s - 1, idx + s * s)):
+                    d = (pos[vecino] - pos[idx]).length if avanza else 0.0
+                    if d > 1e-6:
+                        aristas.append((idx, vecino))
+                        dists.append(d)
+    return aristas, dists
+
+
+def tets_referencia(pos, tets, validos):
+    """Tetraedros con volumen válido y su V0"""
+    V0 = [calcular_volumen_tetraedro(*(pos[i] for i in t)) for t in tets]
+    return [t for t, v in zip(tets, V0) if validos(v)], [v for v in V0 if validos(v)]
+
+
+def comprobar(indices, reposo, indices_ref, reposo_ref):
+    assert np.array_equal(np.asarray(indices).reshape(len(indices_ref), -1), np.asarray(indices_ref))
+    assert np.allclose(reposo, reposo_ref, rtol=0, atol=1e-12)
+
+
+# ===== Tests =====
+
+@pytest.mark.parametrize("n_alto, n_ancho", [(2, 2), (5, 7), (8, 3)])
+def test_tela(n_alto, n_ancho):
+    alto, ancho = 1.3, 0.9
+    tela = crea_tela(alto, ancho, 0.2, n_alto, n_ancho, 0.8, 0.01)
+    add_bending_constraints(tela, n_alto, n_ancho, 0.3)
+    add_shear_constraints(tela, n_alto, n_ancho, 0.5)
+
+    # Posiciones: columnas i en X (centradas), filas j en Y
+    dx, dy = ancho / (n_ancho - 1.0), alto / (n_alto - 1.0)
+    pos = [mathutils.Vector((-ancho / 2.0 + dx * i, dy * j, 0)) for i in range(n_ancho) for j in range(n_alto)]
+    assert np.allclose([tuple(p.location) for p in tela.particles], [tuple(p) for p in pos], rtol=0, atol=1e-12)
+
+    comprobar(*indices_y_reposo(tela, 'DistanceConstraint', 'd'), *tela_referencia(n_alto, n_ancho, dx, dy))
+    comprobar(*indices_y_reposo(tela, 'BendingConstraint', 'phi0'), *bending_referencia(pos, n_alto, n_ancho))
+    comprobar(*indices_y_reposo(tela, 'ShearConstraint', 'psi0'), *shear_referencia(pos, n_alto, n_ancho))
+
+
+@pytest.mark.parametrize("subdivisiones", [2, 3, 5])
+def test_cubo(subdivisiones):
+    datos = topologia_cubo(1.7, subdivisiones)
+    pos = generar_vertices_cubo_subdividido(1.7, subdivisiones)
+    assert np.allclose(datos['posiciones'], [tuple(p) for p in pos], rtol=0, atol=1e-12)
+
+    comprobar(datos['distancia_indices'], datos['distancia_reposo'], *aristas_cubo_referencia(pos, subdivisiones))
+    comprobar(datos['volumen_indices'], datos['volumen_reposo'],
+              *tets_referencia(pos, generar_tetraedros_cubo_subdividido(subdivisiones), lambda v: v > 1e-6))
+
+
+@pytest.mark.parametrize("radio, subdivisiones", [(1.0, 3), (0.8, 6), (2.5, 9)])
+def test_esfera(radio, subdivisiones):
+    datos = topologia_esfera(radio, subdivisiones)
+    pos, grid = generar_particulas_esfera(radio, subdivisiones)
+    assert np.allclose(datos['posiciones'], [tuple(p) for p in pos], rtol=0, atol=1e-12)
+    assert {tuple(c): i for i, c in enumerate(datos['celdas'].tolist())} == grid
+
+    aristas = [a for a in generar_aristas_esfera(pos, grid, subdivisiones, radio)
+               if (pos[a[1]] - pos[a[0]]).length > 1e-6]
+    comprobar(datos['distancia_indices'], datos['distancia_reposo'],
+              aristas, [(pos[b] - pos[a]).length for a, b in aristas])
+    tets = generar_tetraedros_esfera(radio, subdivisiones, pos, grid)
+    comprobar(datos['volumen_indices'], datos['volumen_reposo'], *tets_referencia(pos, tets, lambda v: abs(v) > 1e-10))
@@ -0,0 +1,71 @@
+"""
+blender_writeback: posiciones de los dos modos y volcado con foreach_set,
+sustituyendo las filas no finitas
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from blender.blender_writeback import posiciones_particulas, leer_coords, escribir_coords
+from core.PBDSystem import PBDSystem
+from core.VectorBackend import mathutils
+
+
+class Coleccion:
+    """Colección con 'co' como mesh.vertices: foreach_get / foreach_set sobre un buffer plano"""
+
+    def __init__(self, coords):
+        self.co = np.array(coords, dtype=np.float32).ravel()
+
+    def __len__(self):
+        return len(self.co) // 3
+
+    def foreach_get(self, atributo, destino):
+        destino[:] = self.co
+
+    def foreach_set(self, atributo, origen):
+        assert len(origen) == len(self.co)
+        self.co[:] = origen
+
+
+def sistema(use_arrays, pos):
+    system = PBDSystem(len(pos), 0.1, use_arrays=use_arrays)
+    for p, x in zip(system.particles, pos):
+        p.location = mathutils.Vector(x.tolist())
+    return system
+
+
+def test_posiciones_en_ambos_modos():
+    pos = np.random.default_rng(3).normal(size=(9, 3))
+    objetos = posiciones_particulas(sistema(False, pos))
+    arrays = sistema(True, pos)
+    assert np.array_equal(objetos, pos)
+    assert posiciones_particulas(arrays) is arrays.store.pos
+    assert np.array_equal(posiciones_particulas([tuple(x) for x in pos]), pos)
+
+
+def test_escribir_y_sustituir_invalidas():
+    actuales = np.arange(12, dtype=np.float32).reshape(4, 3)
+    coleccion = Coleccion(actuales)
+    pos = np.random.default_rng(5).normal(size=(4, 3))
+    assert escribir_coords(coleccion, pos) == 0
+    assert np.array_equal(leer_coords(coleccion), pos.astype(np.float32))
+
+    # Filas con NaN/Inf: conservan las coordenadas actuales o toman el respaldo
+    malas = pos * 2.0
+    malas[1, 0], malas[3, 2] = np.nan, np.inf
+    assert escribir_coords(coleccion, malas) == 2
+    esperado = malas.astype(np.float32)
+    esperado[[1, 3]] = pos[[1, 3]]
+    assert np.array_equal(leer_coords(coleccion), esperado)
+
+    respaldo = -np.ones((4, 3))
+    assert escribir_coords(coleccion, malas, respaldo=respaldo) == 2
+    esperado[[1, 3]] = -1.0
+    assert np.array_equal(leer_coords(coleccion), esperado)
+
+
+def test_vertices_sin_particula_conservan_coordenadas():
+    coleccion = Coleccion(np.ones((5, 3)))
+    escribir_coords(coleccion, np.zeros((3, 3)))
+    assert np.array_equal(leer_coords(coleccion), [[0, 0, 0]] * 3 + [[1, 1, 1]] * 2)
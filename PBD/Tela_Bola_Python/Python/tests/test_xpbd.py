@@ -0,0 +1,190 @@
+"""
+Solver XPBD: convergencia independiente de los substeps, λ reiniciado en cada
+substep y compliance 0 equivalente a la proyección PBD rígida
+"""
+import contextlib
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from constraints.BendingConstraint import BendingConstraint
+from constraints.DistanceConstraint import DistanceConstraint
+from constraints.ShearConstraint import ShearConstraint
+from constraints.VolumeConstraintTet import VolumeConstraintTet
+from core.PBDSystem import PBDSystem
+from core.VectorBackend import mathutils
+from geometry.Tela import crea_tela, add_bending_constraints, add_shear_constraints
+from geometry.TopologiaRejilla import colocar_particulas, crear_restricciones
+
+from test_batch_paridad import N_ALTO, N_ANCHO, cubo_perturbado, posiciones, tela_perturbada
+
+
+G = 9.81
+FPS = 60
+
+
+# ===== Cadena colgante =====
+
+def cadena(use_arrays, n=10, d=0.1, masa=0.05, rigidez=1.0):
+    """n partículas en vertical separadas d (longitud de reposo), la superior fija"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = PBDSystem(n, masa, use_arrays=use_arrays)
+    colocar_particulas(system, np.stack([np.zeros(n), np.zeros(n), -d * np.arange(n)], axis=1))
+    system.particles[0].set_bloqueada(True)
+    aristas = np.stack([np.arange(n - 1), np.arange(1, n)], axis=1)
+    crear_restricciones(system, DistanceConstraint, aristas, np.full(n - 1, d), rigidez)
+    return system
+
+
+def simular(system, frames, cuasiestatico=False):
+    """
+    Pasos con gravedad. cuasiestatico: parar las partículas tras cada paso (el rebote
+    de toda la cadena es movimiento rígido, que el damping global no atenúa)
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(frames):
+            for p in system.particles:
+                if not p.bloqueada:
+                    p.force = mathutils.Vector((0.0, 0.0, -G * p.masa))
+            system.run(1.0 / FPS, use_plane_col=False, use_sphere_col=False)
+            if cuasiestatico:
+                for p in system.particles:
+                    p.velocity = mathutils.Vector((0.0, 0.0, 0.0))
+    return posiciones(system)
+
+
+def estiramiento_equilibrio(n, d, masa, alpha):
+    """Con compliance α cada arista se alarga α · (peso que cuelga de ella)"""
+    colgando = masa * G * np.arange(n - 1, 0, -1)
+    return -np.concatenate([[0.0], np.cumsum(d + alpha * colgando)])
+
+
+@pytest.mark.parametrize("use_arrays", [True, False], ids=['arrays', 'objetos'])
+def test_cadena_converge_igual_con_1_y_n_substeps(use_arrays):
+    n, d, masa, alpha = 10, 0.1, 0.05, 0.002
+    esperado = estiramiento_equilibrio(n, d, masa, alpha)
+    finales = []
+    for substeps, iteraciones in ((1, 40), (10, 4)):
+        system = cadena(use_arrays, n, d, masa)
+        system.set_solver_mode('xpbd', substeps=substeps, iterations=iteraciones)
+        system.set_compliance(DistanceConstraint, alpha)
+        finales.append(simular(system, 6 * FPS, cuasiestatico=True))
+        np.testing.assert_allclose(finales[-1][:, 2], esperado, atol=1e-6)
+    np.testing.assert_allclose(finales[0], finales[1], atol=1e-6)
+
+
+def test_lambda_se_reinicia_en_cada_substep():
+    """Un λ acumulado de antes no cambia el paso: cada substep empieza en λ = 0"""
+    resultados = []
+    for basura in (0.0, 50.0):
+        system = cadena(True)
+        system.set_solver_mode('xpbd', substeps=4, iterations=2)
+        system.set_compliance(DistanceConstraint, 0.01)
+        simular(system, 5)
+        for c in system.constraints:
+            c.lambda_xpbd = np.full(len(c), basura)
+        resultados.append(simular(system, 1))
+    np.testing.assert_array_equal(resultados[0], resultados[1])
+    
+    # En equilibrio, λ al final de cada paso es el mismo (no crece paso a paso)
+    system = cadena(False, rigidez=0.9)
+    system.set_solver_mode('xpbd', substeps=2, iterations=3)
+    simular(system, 3 * FPS, cuasiestatico=True)
+    antes = [c.lambda_xpbd for c in system.constraints]
+    simular(system, 1, cuasiestatico=True)
+    np.testing.assert_allclose([c.lambda_xpbd for c in system.constraints], antes, rtol=1e-3)
+
+
+@pytest.mark.parametrize("use_arrays", [True, False], ids=['arrays', 'objetos'])
+def test_compliance_cero_igual_a_pbd_rigido_en_el_paso(use_arrays):
+    pbd = cadena(use_arrays, rigidez=1.0)
+    pbd.set_n_iters(6)
+    xpbd = cadena(use_arrays, rigidez=0.3)
+    xpbd.set_solver_mode('xpbd', substeps=1, iterations=6)
+    xpbd.set_compliance(DistanceConstraint, 0.0)
+    for system in (pbd, xpbd):
+        system.particles[-1].location = mathutils.Vector((0.05, 0.0, -0.9))
+        colocar_particulas(system, posiciones(system))
+    np.testing.assert_allclose(simular(pbd, 5), simular(xpbd, 5), rtol=0, atol=1e-12)
+
+
+# ===== Una pasada de cada tipo =====
+
+def perturbado(tipo, use_arrays):
+    if tipo is VolumeConstraintTet:
+        return cubo_perturbado(use_arrays)
+    return tela_perturbada(use_arrays, tipo)
+
+
+@pytest.mark.parametrize("use_arrays", [True, False], ids=['arrays', 'objetos'])
+@pytest.mark.parametrize("tipo", [DistanceConstraint, VolumeConstraintTet])
+def test_compliance_cero_igual_a_pbd_rigido(tipo, use_arrays):
+    pbd, xpbd = perturbado(tipo, use_arrays), perturbado(tipo, use_arrays)
+    for c in pbd.constraints:
+        c.stiffness = np.ones_like(c.stiffness) if use_arrays else 1.0
+    pbd.set_n_iters(1)
+    xpbd.set_compliance(tipo, 0.0)
+    
+    inicio = posiciones(pbd)
+    for c in pbd.constraints:
+        c.proyecta_restriccion()
+    for c in xpbd.constraints:
+        c.reset_lambda()
+        c.proyecta_xpbd(1.0 / FPS)
+    assert np.abs(posiciones(pbd) - inicio).max() > 1e-3
+    np.testing.assert_allclose(posiciones(xpbd), posiciones(pbd), rtol=0, atol=1e-12)
+
+
+def tela_cilindrica(tipo, radio=0.5):
+    """Tela enrollada en un cilindro (ángulos de reposo no nulos) con un ruido pequeño"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tela = crea_tela(1.0, 1.2, 0.5, N_ALTO, N_ANCHO, 0.7, 0.01)
+        tela.constraints = []
+        tela.constraintsByType = {}
+        pos = posiciones(tela)
+        x = pos[:, 0] / radio
+        colocar_particulas(tela, np.stack([radio * np.sin(x), pos[:, 1], radio * (1.0 - np.cos(x))], axis=1))
+        if tipo is BendingConstraint:
+            add_bending_constraints(tela, N_ALTO, N_ANCHO, 0.4)
+        else:
+            add_shear_constraints(tela, N_ALTO, N_ANCHO, 0.6)
+    rng = np.random.default_rng(3)
+    pos = posiciones(tela)
+    colocar_particulas(tela, pos + rng.normal(scale=0.002, size=pos.shape))
+    return tela
+
+
+def residuo(c):
+    """C de un shear (ángulo en p0) o un bending (ángulo diedro) a partir de las posiciones"""
+    p = [np.array(tuple(q.location)) for q in c.particles]
+    if isinstance(c, ShearConstraint):
+        v1, v2 = p[1] - p[0], p[2] - p[0]
+        coseno = v1 @ v2 / np.linalg.norm(v1) / np.linalg.norm(v2)
+        return np.arccos(np.clip(coseno, -1.0, 1.0)) - c.psi0
+    n1 = np.cross(p[1] - p[0], p[2] - p[0])
+    n2 = np.cross(p[1] - p[0], p[3] - p[0])
+    coseno = n1 @ n2 / np.linalg.norm(n1) / np.linalg.norm(n2)
+    return np.arccos(np.clip(coseno, -1.0, 1.0)) - c.phi0
+
+
+@pytest.mark.parametrize("tipo", [ShearConstraint, BendingConstraint])
+def test_compliance_cero_resuelve_shear_y_bending(tipo):
+    """
+    Shear y bending PBD reparten la corrección con w_i / Σw (no es la proyección
+    completa): con α = 0 cada restricción, proyectada sola, queda resuelta a primer orden
+    """
+    system = tela_cilindrica(tipo)
+    system.set_compliance(tipo, 0.0)
+    comprobadas = 0
+    for c in system.constraints:
+        inicio = posiciones(system)
+        C0 = residuo(c)
+        c.reset_lambda()
+        c.proyecta_xpbd(1.0 / FPS)
+        if abs(C0) > 1e-3:
+            assert abs(residuo(c)) < 0.05 * abs(C0)
+            comprobadas += 1
+        colocar_particulas(system, inicio)
+    assert comprobadas > len(system.constraints) // 2
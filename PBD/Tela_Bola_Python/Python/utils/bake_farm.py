@@ -0,0 +1,294 @@
+"""
+Granja de bakes headless para barridos de parámetros
+Simula sin Blender el cubo y la esfera de volumen (misma escena que
+simular_cubo_volumen / simular_esfera_volumen) en un pool de procesos.
+Cada configuración se guarda en una caché en disco cuyo nombre es el hash
+de sus parámetros, así que relanzar un barrido solo hornea lo que falta.
+Los bakes usan el formato binario de core.BakeCache (<hash>.pbdbake) y
+los parámetros van al lado en <hash>.json.
+La topología de cada cuerpo (tetraedros, aristas, V0...) se guarda en
+<cache>/topologia (geometry.CacheTopologia) y la comparten todas las
+configuraciones con el mismo tamaño y subdivisiones.
+El modo del PBDSystem (arrays u objetos) es un parámetro más: por defecto se
+elige por número de partículas, porque con pocas partículas el bucle por
+objetos es más rápido que los lotes vectorizados (muchos colores de pocas filas).
+
+Uso:
+    python utils/bake_farm.py barrido.json --cache bakes --procesos 8
+
+barrido.json: cada clave es un parámetro de PARAMETROS_BASE; los valores que
+son listas se combinan en rejilla, p.ej.
+    {"tipo": "cubo", "stiffness_volumen": [0.2, 0.5, 0.8],
+     "stiffness_global": [null, 0.3], "subdivisiones": [3, 4], "gravedad": [4.9, 9.81],
+     "modo": ["arrays", "objetos"]}
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Añadir la ruta del directorio padre al path de Python (también en los procesos hijos)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.BakeCache import BakeCache, guardar_bake
+from core.VectorBackend import mathutils
+
+
+# Cambiar al modificar la escena o el formato para invalidar la caché
+VERSION_CACHE = 3
+
+# Partículas a partir de las que modo=None usa arrays (cruce medido con 5 iteraciones:
+# cubo de 125 partículas ~104 ms/frame en objetos y ~114 en arrays; de 216, ~205 y ~132)
+UMBRAL_ARRAYS = 150
+
+# Parámetros de una configuración (valores por defecto del panel de Blender)
+PARAMETROS_BASE = {
+    'tipo': 'cubo',              # 'cubo' o 'esfera'
+    'tamano': None,              # Lado del cubo o radio de la esfera (None = 1.0 / 0.5)
+    'densidad': 100.0,           # kg/m³
+    'stiffness_volumen': 0.8,
+    'stiffness_global': None,    # None = sin restricción de volumen global
+    'subdivisiones': None,       # None = 3 (cubo) / 4 (esfera)
+    'gravedad': 9.81,            # Módulo de la gravedad (siempre hacia -Z)
+    'num_frames': 150,
+    'solver_iterations': 5,
+    'floor_height': 0.0,         # None = sin suelo
+    'start_height': None,        # None = 5.0 (cubo) / 2.0 (esfera)
+    'fps': 60,
+    'modo': None,                # 'arrays', 'objetos' o None = según UMBRAL_ARRAYS
+}
+
+
+def normalizar_parametros(parametros):
+    """Completar con PARAMETROS_BASE y resolver los valores por defecto de cada tipo"""
+    desconocidos = set(parametros) - set(PARAMETROS_BASE)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)}")
+
+    p = dict(PARAMETROS_BASE)
+    p.update(parametros)
+    if p['tipo'] not in ('cubo', 'esfera'):
+        raise ValueError(f"tipo debe ser 'cubo' o 'esfera' (recibido {p['tipo']!r})")
+
+    es_cubo = p['tipo'] == 'cubo'
+    if p['tamano'] is None:
+        p['tamano'] = 1.0 if es_cubo else 0.5
+    if p['subdivisiones'] is None:
+        p['subdivisiones'] = 3 if es_cubo else 4
+    if p['start_height'] is None:
+        p['start_height'] = 5.0 if es_cubo else 2.0
+    if p['modo'] is None:
+        p['modo'] = 'arrays' if numero_particulas(p) >= UMBRAL_ARRAYS else 'objetos'
+    elif p['modo'] not in ('arrays', 'objetos'):
+        raise ValueError(f"modo debe ser 'arrays', 'objetos' o None (recibido {p['modo']!r})")
+    # Mismo mínimo que el panel para evitar el colapso completo
+    if p['stiffness_global'] is not None and p['stiffness_global'] < 0.05:
+        p['stiffness_global'] = 0.05
+    return p
+
+
+def numero_particulas(p):
+    """Partículas de la escena (sin construirla) a partir de tipo, tamaño y subdivisiones"""
+    if p['tipo'] == 'cubo':
+        return p['subdivisiones'] ** 3
+    from geometry.SphereVolume import rejilla_esfera
+    return len(rejilla_esfera(p['tamano'], p['subdivisiones'])[0])
+
+
+def clave_parametros(parametros):
+    """Hash estable (hex) de una configuración normalizada"""
+    texto = json.dumps({'version': VERSION_CACHE, 'parametros': normalizar_parametros(parametros)},
+                       sort_keys=True)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def expandir_rejilla(barrido):
+    """
+    Lista de configuraciones a partir de un dict parámetro -> valor o lista de valores
+    (producto cartesiano de las listas)
+    """
+    claves = sorted(barrido)
+    valores = [v if isinstance(v, (list, tuple)) else [v] for v in (barrido[k] for k in claves)]
+    return [dict(zip(claves, combinacion)) for combinacion in itertools.product(*valores)]
+
+
+def ruta_cache(cache_dir, parametros):
+    return os.path.join(cache_dir, clave_parametros(parametros) + '.pbdbake')
+
+
+def crear_sistema(p, cache_topologia=None):
+    """
+    PBDSystem de la escena en el modo de p['modo'], colocado a su altura inicial
+    (en modo arrays las restricciones ya se crean como lotes)
+    p: parámetros normalizados
+    cache_topologia: directorio de la caché de topologías (None = generarla siempre)
+    """
+    use_arrays = p['modo'] == 'arrays'
+    if p['tipo'] == 'cubo':
+        from geometry.CuboVolumen import crear_cubo_volumen
+        system = crear_cubo_volumen(p['tamano'], p['densidad'], p['stiffness_volumen'],
+                                    p['stiffness_global'], p['subdivisiones'], use_arrays=use_arrays,
+                                    cache=cache_topologia)[0]
+        offset_z = p['start_height'] - p['tamano'] / 2.0
+    else:
+        from geometry.SphereVolume import crear_esfera_volumen
+        system = crear_esfera_volumen(p['tamano'], p['densidad'], p['stiffness_volumen'],
+                                      p['stiffness_global'], p['subdivisiones'], use_arrays=use_arrays,
+                                      cache=cache_topologia)[0]
+        offset_z = p['start_height']
+
+    # Traslación rígida: V0, distancias y ángulos de reposo no cambian
+    if system.store is not None:
+        system.store.pos[:, 2] += offset_z
+        system.store.prev[:, 2] += offset_z
+    else:
+        for particle in system.particles:
+            particle.location.z += offset_z
+            particle.last_location.z += offset_z
+
+    system.set_n_iters(p['solver_iterations'])
+    return system
+
+
+def aplicar_gravedad(system, gravedad):
+    """Fuerza peso (hacia -Z) en las partículas no bloqueadas"""
+    store = system.store
+    if store is not None:
+        masa = np.where(np.isfinite(store.masa), store.masa, 0.0)
+        store.force[:] = 0.0
+        store.force[~store.bloqueada, 2] = gravedad * masa[~store.bloqueada]
+        return
+    for particle in system.particles:
+        peso = 0.0 if particle.bloqueada else gravedad * particle.masa
+        particle.force = mathutils.Vector((0.0, 0.0, peso))
+
+
+def posiciones_sistema(system):
+    """Posiciones actuales (N,3) en cualquiera de los dos modos"""
+    if system.store is not None:
+        return system.store.pos
+    return np.array([tuple(particle.location) for particle in system.particles])
+
+
+def simular(parametros, cache_topologia=None):
+    """
+    Hornear una configuración sin Blender
+    cache_topologia: directorio de la caché de topologías (opcional)
+    Returns: array float32 (num_frames + 1, N, 3) con las posiciones (frame 0 = inicial)
+    """
+    p = normalizar_parametros(parametros)
+    dt = 1.0 / p['fps']
+    floor_height = p['floor_height']
+    gravedad = -abs(p['gravedad'])
+
+    system = crear_sistema(p, cache_topologia)
+
+    posiciones = np.empty((p['num_frames'] + 1, len(system.particles), 3), dtype=np.float32)
+    posiciones[0] = posiciones_sistema(system)
+    for frame in range(1, p['num_frames'] + 1):
+        aplicar_gravedad(system, gravedad)
+        system.run(dt, apply_damping=True, use_plane_col=floor_height is not None,
+                   use_sphere_col=False, use_shape_matching=False, floor_height=floor_height)
+        posiciones[frame] = posiciones_sistema(system)
+    return posiciones
+
+
+def hornear(parametros, cache_dir):
+    """
+    Trabajo de un proceso del pool: hornear si no está en caché
+    Returns: (parámetros, ruta, segundos, True si ya estaba en caché)
+    """
+    ruta = ruta_cache(cache_dir, parametros)
+    if os.path.exists(ruta):
+        return parametros, ruta, 0.0, True
+
+    inicio = time.perf_counter()
+    # Los prints del solver en cada proceso solo ensucian la salida del barrido
+    with contextlib.redirect_stdout(io.StringIO()):
+        posiciones = simular(parametros, os.path.join(cache_dir, 'topologia'))
+
+    # Escritura atómica: un barrido interrumpido no deja ficheros a medias
+    # (el .json se escribe antes, así que un .pbdbake existente siempre lo tiene)
+    p = normalizar_parametros(parametros)
+    with open(os.path.splitext(ruta)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(p, f, sort_keys=True)
+    temporal = ruta + f'.{os.getpid()}.tmp'
+    guardar_bake(temporal, posiciones, fps=p['fps'])
+    os.replace(temporal, ruta)
+    return parametros, ruta, time.perf_counter() - inicio, False
+
+
+def cargar_bake(ruta):
+    """
+    (BakeCache, parámetros normalizados) de un bake de la caché
+    bake.frame(i) lee solo el frame i del fichero (frame 0 = inicial)
+    """
+    with open(os.path.splitext(ruta)[0] + '.json', 'r', encoding='utf-8') as f:
+        parametros = json.load(f)
+    return BakeCache(ruta), parametros
+
+
+def ejecutar_barrido(configuraciones, cache_dir, procesos=None):
+    """
+    Hornear una lista de configuraciones (o un dict de rejilla) en un pool de procesos
+    procesos: número de procesos (None = número de CPUs)
+    Returns: lista de (parámetros, ruta) en el orden de entrada
+    """
+    if np is None:
+        raise ImportError("bake_farm requiere NumPy")
+    if isinstance(configuraciones, dict):
+        configuraciones = expandir_rejilla(configuraciones)
+    for c in configuraciones:
+        normalizar_parametros(c)  # Validar antes de lanzar procesos
+
+    os.makedirs(cache_dir, exist_ok=True)
+    rutas = [None] * len(configuraciones)
+    total = len(configuraciones)
+    inicio = time.perf_counter()
+
+    print(f"🏭 Barrido: {total} configuraciones, caché en {cache_dir}")
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(hornear, c, cache_dir): i for i, c in enumerate(configuraciones)}
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            i = futuros[futuro]
+            try:
+                parametros, ruta, segundos, en_cache = futuro.result()
+            except Exception as e:
+                print(f"   ❌ [{hechos}/{total}] {configuraciones[i]}: {e}")
+                continue
+            rutas[i] = ruta
+            estado = "en caché" if en_cache else f"{segundos:.1f}s"
+            print(f"   ✓ [{hechos}/{total}] {os.path.basename(ruta)} ({estado}) {parametros}")
+
+    print(f"✅ Barrido terminado en {time.perf_counter() - inicio:.1f}s")
+    return [(c, r) for c, r in zip(configuraciones, rutas)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de bakes PBD headless en varios procesos")
+    parser.add_argument('barrido', help="JSON con un dict de rejilla o una lista de configuraciones")
+    parser.add_argument('--cache', default='bakes', help="directorio de la caché (por defecto ./bakes)")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos del pool (por defecto, CPUs)")
+    args = parser.parse_args(argv)
+
+    with open(args.barrido, 'r', encoding='utf-8') as f:
+        barrido = json.load(f)
+    ejecutar_barrido(barrido, args.cache, args.procesos)
+
+
+if __name__ == '__main__':
+    main()